@@ -4,7 +4,14 @@ from typing import Any
 from flask import Blueprint, jsonify, request, Response
 
 from backend.auth_decorators import login_required, roles_required
+from backend.db import get_pool_stats
 from backend.services import admin_service
+from backend.services.admission_service import admission_engine
+from backend.services.auth_service import get_user_cache_stats
+from backend.services.event_service import get_event_cache_stats
+from backend.services.analytics_cube import get_analytics_cube_stats
+from backend.services.facet_index import get_facet_index_stats
+from backend.services.registration_service import RegistrationError, promote_waiting_list
 
 admin_bp = Blueprint("admin_api", __name__)
 
@@ -118,6 +125,23 @@ def delete_user(user_id: int):
         return _error_response(str(e), "服务器内部错误", 500)
 
 
+@admin_bp.get("/admin/runtime/stats")
+@login_required
+@roles_required("admin")
+def runtime_stats():
+    """当前 worker 进程的运行时统计（连接池、缓存命中率等），用于容量调优。"""
+    return jsonify(
+        {
+            "db_pool": get_pool_stats(),
+            "auth_user_cache": get_user_cache_stats(),
+            "registration_admission": admission_engine.stats(),
+            "event_cache": get_event_cache_stats(),
+            "facet_index": get_facet_index_stats(),
+            "analytics_cube": get_analytics_cube_stats(),
+        }
+    )
+
+
 @admin_bp.get("/admin/tags")
 @login_required
 @roles_required("admin")
@@ -211,6 +235,40 @@ def force_registration():
         return _error_response(str(e), "服务器内部错误", 500)
 
 
+@admin_bp.post("/admin/sessions/<int:session_id>/promote")
+@login_required
+@roles_required("admin")
+def promote_session_waiting_list(session_id: int):
+    """
+    批量候补转正：可选地先扩容，然后按候补顺序填满空余名额。
+    Body（均可选）：{"capacity": 120, "limit": 50}
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        limit = int(data["limit"]) if data.get("limit") is not None else None
+        capacity = int(data["capacity"]) if data.get("capacity") is not None else None
+    except (TypeError, ValueError):
+        return _error_response("limit and capacity must be integers", "limit 和 capacity 必须为整数", 400)
+
+    try:
+        result = promote_waiting_list(session_id, limit=limit, new_capacity=capacity)
+    except RegistrationError as e:
+        status_code = 404 if "不存在" in str(e) else 400
+        return _error_response(str(e), str(e), status_code)
+    except Exception as e:
+        return _error_response(str(e), "服务器内部错误", 500)
+
+    # 名额已变化，让本进程的批量准入计数重新加载
+    admission_engine.invalidate(session_id)
+    return jsonify(
+        {
+            **result,
+            "message_en": f"Promoted {result['promoted']} waiting registrations",
+            "message_zh": f"已将 {result['promoted']} 位候补转为正式报名",
+        }
+    )
+
+
 @admin_bp.get("/admin/events/<int:eid>/groups/summary")
 @login_required
 @roles_required("admin")
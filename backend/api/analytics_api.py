@@ -1,34 +1,116 @@
 # backend/api/analytics_api.py
-from datetime import datetime
+from datetime import datetime, timezone
 from flask import Blueprint, jsonify, request, g
 
-from sqlalchemy import func
+from sqlalchemy import func, select
 
 from backend.services.analytic_service import (
     get_event_overview,
+    get_event_overview_counters,
+    get_event_no_show_rates,
     get_session_stats,
     get_user_stats,
     get_event_registration_trend,
+    get_registration_trend,
     AnalyticError,
 )
+from backend.services.analytics_cube import get_analytics_cube
+from backend.services.event_service import get_event_version, get_session_version, get_tag_version
+from backend.services.registration_service import get_user_registration_version
 from backend.auth_decorators import login_required, roles_required
 from backend.db_orm import SessionLocal
-from backend.models.models import Registration, EventSession, Event, EventTag, Tag, EventUserGroup, AudienceGroup
+from backend.utils.http_cache import conditional_json, make_etag
+from backend.utils.pagination import decode_registration_cursor, parse_limit
+from backend.config import load_config
+from backend.models.models import (
+    AudienceGroup,
+    Event,
+    EventSession,
+    EventStats,
+    EventTag,
+    EventUserGroup,
+    Registration,
+    Tag,
+)
 from backend.auth_decorators import login_required
 
+config = load_config()
+
 analytics_bp = Blueprint("analytics_api", __name__)
 
 
+def _event_etag(kind: str, eid: int, *extra):
+    """
+    活动级统计的 ETag：活动 updated_at + 场次数 + 场次 version 之和，再加上查询参数。
+    活动不存在时抛 AnalyticError，与各统计函数的行为一致。
+    """
+    version = get_event_version(eid)
+    if version is None:
+        raise AnalyticError("活动不存在")
+    return make_etag(
+        kind, eid, version["updated_at"], version["session_count"], version["version_sum"], *extra
+    )
+
+
+def _cube_event_etag(kind: str, eid: int, *extra):
+    """
+    由立方体回答的活动级统计：ETag 取立方体视图里的 version，与响应数据同源
+    （立方体落后于数据库时不会把旧数据配上新 ETag）；立方体关闭或该活动尚未同步时退回 _event_etag。
+    """
+    cube = get_analytics_cube()
+    version = cube.event_version(eid) if cube is not None else None
+    if version is None:
+        return _event_etag(kind, eid, *extra)
+    return make_etag(
+        kind, "cube", eid, version["updated_at"], version["session_count"], version["version_sum"], *extra
+    )
+
+
 @analytics_bp.get("/events/<int:eid>/overview")
 @login_required
 def event_overview_api(eid: int):
+    """
+    活动概览。可选 query 参数:
+      - start / end: 只统计该时间段内开始的场次
+      - registrations=0: 不返回报名明细（只要计数时使用）
+      - registrations_limit / registrations_cursor: 报名明细分页，
+        下一页游标见响应体 registrations_next_cursor
+    不带分页参数时返回全部报名明细（与旧版一致）。
+    """
     start_str = request.args.get("start")
     end_str = request.args.get("end")
     start = datetime.fromisoformat(start_str) if start_str else None
     end = datetime.fromisoformat(end_str) if end_str else None
+    include_registrations = request.args.get("registrations", "1").lower() not in ("0", "false", "no")
+    limit_raw = request.args.get("registrations_limit")
+    cursor_raw = request.args.get("registrations_cursor")
+    try:
+        limit = parse_limit(limit_raw) if limit_raw or cursor_raw else None
+        cursor = decode_registration_cursor(cursor_raw)
+    except ValueError:
+        return (
+            jsonify(
+                {
+                    "error": "invalid_request",
+                    "message_zh": "registrations_limit 或 registrations_cursor 参数不合法",
+                    "message_en": "Invalid registrations_limit or registrations_cursor",
+                }
+            ),
+            400,
+        )
     try:
-        data = get_event_overview(eid, start=start, end=end)
-        return jsonify(data), 200
+        etag = _event_etag("event-overview", eid, start, end, include_registrations, limit, cursor_raw)
+        return conditional_json(
+            etag,
+            lambda: get_event_overview(
+                eid,
+                start=start,
+                end=end,
+                include_registrations=include_registrations,
+                registrations_limit=limit,
+                registrations_cursor=cursor,
+            ),
+        )
     except AnalyticError as e:
         return (
             jsonify(
@@ -53,12 +135,95 @@ def event_overview_api(eid: int):
         )
 
 
+@analytics_bp.post("/events/overview:batch")
+@login_required
+def event_overview_batch_api():
+    """
+    多个活动的概览计数（看板一次取回所有卡片），一条分组查询。
+
+    请求 JSON：
+      {"eids": [1, 2, 3], "start": "2025-12-01", "end": "2025-12-31"}   start / end 可选
+
+    返回：
+      {
+        "results": [{"eid", "title", "status", "session_count", "total_registrations",
+                     "registered_count", "waiting_count", "cancelled_count", "checked_in_count"}, ...],
+        "missing": [不存在的 eid]
+      }
+    results 按请求中 eid 的顺序（去重）排列；不含场次与报名明细，需要时再调单个活动的 overview。
+    """
+    data = request.get_json(silent=True) or {}
+    eids = data.get("eids")
+    if not isinstance(eids, list) or not eids or not all(
+        isinstance(eid, int) and not isinstance(eid, bool) for eid in eids
+    ):
+        return (
+            jsonify(
+                {
+                    "error": "invalid_request",
+                    "message_zh": "请提供整数形式的 eids 列表",
+                    "message_en": "Provide a non-empty list of integer eids",
+                }
+            ),
+            400,
+        )
+    eids = list(dict.fromkeys(eids))
+    if len(eids) > config.ANALYTICS_BATCH_MAX_EVENTS:
+        return (
+            jsonify(
+                {
+                    "error": "invalid_request",
+                    "message_zh": f"单次最多 {config.ANALYTICS_BATCH_MAX_EVENTS} 个活动",
+                    "message_en": f"At most {config.ANALYTICS_BATCH_MAX_EVENTS} events per request",
+                }
+            ),
+            400,
+        )
+    try:
+        start = datetime.fromisoformat(data["start"]) if data.get("start") else None
+        end = datetime.fromisoformat(data["end"]) if data.get("end") else None
+    except (TypeError, ValueError):
+        return (
+            jsonify(
+                {
+                    "error": "invalid_request",
+                    "message_zh": "start / end 必须是 ISO 格式时间",
+                    "message_en": "start / end must be ISO datetimes",
+                }
+            ),
+            400,
+        )
+
+    try:
+        counters = get_event_overview_counters(eids, start=start, end=end)
+    except Exception as e:
+        return (
+            jsonify(
+                {
+                    "error": "server_error",
+                    "message_zh": "服务器内部错误",
+                    "message_en": "Internal server error: " + str(e),
+                }
+            ),
+            500,
+        )
+    return jsonify(
+        {
+            "results": [counters[eid] for eid in eids if eid in counters],
+            "missing": [eid for eid in eids if eid not in counters],
+        }
+    ), 200
+
+
 @analytics_bp.get("/sessions/<int:session_id>")
 @login_required
 def session_stats_api(session_id: int):
     try:
-        data = get_session_stats(session_id)
-        return jsonify(data), 200
+        version = get_session_version(session_id)
+        if version is None:
+            raise AnalyticError("场次不存在")
+        etag = make_etag("session-stats", session_id, version)
+        return conditional_json(etag, lambda: get_session_stats(session_id))
     except AnalyticError as e:
         return (
             jsonify(
@@ -90,8 +255,17 @@ def my_stats_api():
     user_id = current_user["user_id"]
 
     try:
-        data = get_user_stats(user_id)
-        return jsonify(data), 200
+        version = get_user_registration_version(user_id)
+        etag = make_etag(
+            "user-stats",
+            user_id,
+            current_user.get("name"),
+            current_user.get("email"),
+            version["registration_count"],
+            version["version_sum"],
+            version["ended_count"],
+        )
+        return conditional_json(etag, lambda: get_user_stats(user_id))
     except AnalyticError as e:
         return (
             jsonify(
@@ -132,8 +306,11 @@ def event_trend_api(eid: int):
     end = datetime.fromisoformat(end_str) if end_str else None
 
     try:
-        data = get_event_registration_trend(eid, start=start, end=end)
-        return jsonify(data), 200
+        # 缺省 end 时窗口截止到今天（UTC），日期变化后 ETag 随之变化
+        etag = _cube_event_etag("event-trend", eid, start, end or datetime.now(timezone.utc).date())
+        return conditional_json(
+            etag, lambda: get_event_registration_trend(eid, start=start, end=end)
+        )
     except AnalyticError as e:
         return (
             jsonify(
@@ -147,11 +324,97 @@ def event_trend_api(eid: int):
         )
 
 
+@analytics_bp.get("/trends/<dimension>/<int:key>")
+@login_required
+def registration_trend_api(dimension: str, key: int):
+    """
+    报名趋势。dimension 为 event / tag / type / org，key 为对应的 eid / tag_id / type_id / org_id。
+    可选 query 参数:
+      - bucket: hour / day（默认）/ week
+      - start / end: ISO 时间，按桶边界对齐；缺省时取最近若干个桶
+    返回 {"dimension", "key", "bucket", "start", "end", "series": [{"bucket_start", "count"}]}，
+    series 只含有报名的桶。
+    """
+    try:
+        start = datetime.fromisoformat(request.args["start"]) if request.args.get("start") else None
+        end = datetime.fromisoformat(request.args["end"]) if request.args.get("end") else None
+    except ValueError:
+        return (
+            jsonify(
+                {
+                    "error": "invalid_request",
+                    "message_zh": "start / end 必须是 ISO 格式时间",
+                    "message_en": "start / end must be ISO datetimes",
+                }
+            ),
+            400,
+        )
+
+    try:
+        trend = get_registration_trend(
+            dimension, key, request.args.get("bucket", "day"), start=start, end=end
+        )
+    except AnalyticError as e:
+        return (
+            jsonify(
+                {
+                    "error": "analytic_error",
+                    "message_zh": str(e),
+                    "message_en": str(e),
+                }
+            ),
+            400,
+        )
+    except Exception as e:
+        return (
+            jsonify(
+                {
+                    "error": "server_error",
+                    "message_zh": "服务器内部错误",
+                    "message_en": "Internal server error: " + str(e),
+                }
+            ),
+            500,
+        )
+    return jsonify(trend), 200
+
+
 @analytics_bp.get("/events/<int:eid>/group-stats")
 @login_required
 @roles_required("staff", "admin")
 def event_group_stats(eid: int):
-    """按观众群体统计某活动的报名/签到人数。"""
+    """按观众群体统计某活动的报名/签到人数。分组调整会递增场次 version，因此同样适用活动级 ETag。"""
+    try:
+        etag = _cube_event_etag("event-group-stats", eid)
+        return conditional_json(etag, lambda: _load_event_group_stats(eid))
+    except AnalyticError as e:
+        return (
+            jsonify(
+                {
+                    "error": "analytic_error",
+                    "message_zh": str(e),
+                    "message_en": str(e),
+                }
+            ),
+            400,
+        )
+    except Exception as e:
+        return (
+            jsonify(
+                {
+                    "error": "server_error",
+                    "message_zh": "服务器内部错误",
+                    "message_en": "Internal server error: " + str(e),
+                }
+            ),
+            500,
+        )
+
+
+def _load_event_group_stats(eid: int):
+    cube = get_analytics_cube()
+    if cube is not None:
+        return cube.group_stats(eid)
     db = SessionLocal()
     try:
         rows = (
@@ -169,15 +432,38 @@ def event_group_stats(eid: int):
             .group_by(AudienceGroup.group_name)
             .all()
         )
-        return jsonify(
-            [
+        return [
+            {
+                "group_name": r.group_name,
+                "registrations": r.registrations,
+                "checkins": r.checkins,
+            }
+            for r in rows
+        ]
+    finally:
+        db.close()
+
+
+@analytics_bp.get("/events/<int:eid>/no-show")
+@login_required
+@roles_required("staff", "admin")
+def event_no_show_api(eid: int):
+    """活动已结束场次的爽约率（registered 且未签到）。随时间推移会有场次结束，因此不做条件请求。"""
+    try:
+        rates = get_event_no_show_rates([eid])
+        if eid not in rates:
+            raise AnalyticError("活动不存在")
+        return jsonify(rates[eid]), 200
+    except AnalyticError as e:
+        return (
+            jsonify(
                 {
-                    "group_name": r.group_name,
-                    "registrations": r.registrations,
-                    "checkins": r.checkins,
+                    "error": "analytic_error",
+                    "message_zh": str(e),
+                    "message_en": str(e),
                 }
-                for r in rows
-            ]
+            ),
+            400,
         )
     except Exception as e:
         return (
@@ -190,46 +476,25 @@ def event_group_stats(eid: int):
             ),
             500,
         )
-    finally:
-        db.close()
 
 
 @analytics_bp.get("/tags/<tag_name>/overview")
 @login_required
 @roles_required("staff", "admin")
 def tag_overview(tag_name: str):
-    """按标签汇总：活动数、场次数、报名数、签到数。"""
-    db = SessionLocal()
+    """按标签汇总：活动数、场次数、报名数、签到数。立方体开启时 ETag 取立方体视图里的版本。"""
     try:
-        rows = (
-            db.query(
-                Event.eid,
-                Event.title,
-                func.count(EventSession.session_id).label("session_count"),
-                func.count(Registration.user_id).label("registrations"),
-                func.count(Registration.checkin_time).filter(Registration.checkin_time.isnot(None)).label("checkins"),
-            )
-            .select_from(Event)
-            .join(EventTag, EventTag.eid == Event.eid)
-            .join(Tag, Tag.tag_id == EventTag.tag_id)
-            .outerjoin(EventSession, EventSession.eid == Event.eid)
-            .outerjoin(Registration, Registration.session_id == EventSession.session_id)
-            .filter(Tag.tag_name == tag_name)
-            .group_by(Event.eid, Event.title)
-            .all()
-        )
-        return jsonify(
-            [
-                {
-                    "eid": r.eid,
-                    "title": r.title,
-                    "session_count": r.session_count,
-                    "registrations": r.registrations,
-                    "checkins": r.checkins,
-                }
-                for r in rows
-            ]
+        cube = get_analytics_cube()
+        version = cube.tag_version(tag_name) if cube is not None else get_tag_version(tag_name)
+        etag = make_etag(
+            "tag-overview",
+            tag_name,
+            version["event_count"],
+            version["updated_at"],
+            version["session_count"],
+            version["version_sum"],
         )
+        return conditional_json(etag, lambda: _load_tag_overview(tag_name))
     except Exception as e:
         return (
             jsonify(
@@ -241,5 +506,67 @@ def tag_overview(tag_name: str):
             ),
             500,
         )
+
+
+def _load_tag_overview(tag_name: str):
+    """
+    live：活动 LEFT JOIN 场次 LEFT JOIN 报名后分组计数；
+    materialized：按主键读 EVENT_STATS，场次数走 idx_session_eid 的相关子查询。
+    ANALYTICS_CUBE 开启时由进程内立方体计算（与 live 口径一致）。
+    """
+    cube = get_analytics_cube()
+    if cube is not None:
+        return cube.tag_overview(tag_name)
+    db = SessionLocal()
+    try:
+        if config.ANALYTICS_STATS_SOURCE == "materialized":
+            session_count = (
+                select(func.count())
+                .where(EventSession.eid == Event.eid)
+                .correlate(Event)
+                .scalar_subquery()
+            )
+            q = (
+                db.query(
+                    Event.eid,
+                    Event.title,
+                    session_count.label("session_count"),
+                    func.coalesce(
+                        EventStats.registered_count + EventStats.waiting_count + EventStats.cancelled_count, 0
+                    ).label("registrations"),
+                    func.coalesce(EventStats.checked_in_count, 0).label("checkins"),
+                )
+                .select_from(Event)
+                .join(EventTag, EventTag.eid == Event.eid)
+                .join(Tag, Tag.tag_id == EventTag.tag_id)
+                .outerjoin(EventStats, EventStats.eid == Event.eid)
+            )
+        else:
+            q = (
+                db.query(
+                    Event.eid,
+                    Event.title,
+                    func.count(func.distinct(EventSession.session_id)).label("session_count"),
+                    func.count(Registration.user_id).label("registrations"),
+                    func.count(Registration.checkin_time).label("checkins"),
+                )
+                .select_from(Event)
+                .join(EventTag, EventTag.eid == Event.eid)
+                .join(Tag, Tag.tag_id == EventTag.tag_id)
+                .outerjoin(EventSession, EventSession.eid == Event.eid)
+                .outerjoin(Registration, Registration.session_id == EventSession.session_id)
+                .group_by(Event.eid, Event.title)
+            )
+        rows = q.filter(Tag.tag_name == tag_name).all()
+        return [
+            {
+                "eid": r.eid,
+                "title": r.title,
+                "session_count": int(r.session_count),
+                "registrations": int(r.registrations),
+                "checkins": int(r.checkins),
+            }
+            for r in rows
+        ]
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
@@ -0,0 +1,117 @@
+# backend/api/calendar_api.py
+from datetime import datetime, timedelta, timezone
+
+from flask import Blueprint, jsonify, request
+
+from backend.services.calendar_service import (
+    sessions_overlapping,
+    sessions_within,
+    upcoming_sessions,
+    CalendarError,
+)
+
+calendar_bp = Blueprint("calendar_api", __name__)
+
+# 单次日历查询的最长时间窗（约一个季度），避免一次拉回全年场次
+MAX_WINDOW = timedelta(days=93)
+MAX_UPCOMING = 200
+
+
+def _parse_time(value: str) -> datetime:
+    """ISO 时间；带时区的转成 UTC 后去掉时区，与库中不带时区的 DATETIME 比较。"""
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def _bad_request(message_zh: str, message_en: str):
+    return (
+        jsonify(
+            {
+                "error": "invalid_request",
+                "message_zh": message_zh,
+                "message_en": message_en,
+            }
+        ),
+        400,
+    )
+
+
+@calendar_bp.get("/sessions")
+def calendar_sessions():
+    """
+    日历视图：时间窗内的已发布场次。
+
+    URL:
+      GET /api/calendar/sessions?start=2025-12-01T00:00:00&end=2025-12-08T00:00:00&mode=overlap
+
+    mode:
+      - overlap（默认）：与时间窗有交集的场次（跨越边界的也算）
+      - within：完全落在时间窗内的场次
+    """
+    mode = request.args.get("mode", "overlap")
+    if mode not in ("overlap", "within"):
+        return _bad_request("mode 只能是 overlap 或 within", "mode must be overlap or within")
+    try:
+        start = _parse_time(request.args.get("start", ""))
+        end = _parse_time(request.args.get("end", ""))
+        too_long = end - start > MAX_WINDOW
+    except ValueError:
+        return _bad_request("start / end 必须是 ISO 时间", "start and end must be ISO datetimes")
+    if too_long:
+        return _bad_request("时间窗不能超过 93 天", "window must not exceed 93 days")
+
+    try:
+        if mode == "within":
+            rows = sessions_within(start, end)
+        else:
+            rows = sessions_overlapping(start, end)
+        return jsonify(rows)
+    except CalendarError as e:
+        return _bad_request(str(e), str(e))
+    except Exception as e:
+        return (
+            jsonify(
+                {
+                    "error": "server_error",
+                    "message_zh": "服务器内部错误",
+                    "message_en": "Internal server error: " + str(e),
+                }
+            ),
+            500,
+        )
+
+
+@calendar_bp.get("/upcoming")
+def calendar_upcoming():
+    """
+    接下来即将开始的 N 个已发布场次。
+
+    URL:
+      GET /api/calendar/upcoming?limit=10&after=2025-12-01T08:00:00
+    after 省略时为当前 UTC 时间；limit 默认 10，最大 200。
+    """
+    try:
+        limit = int(request.args.get("limit", 10))
+        after_str = request.args.get("after")
+        after = _parse_time(after_str) if after_str else None
+    except ValueError:
+        return _bad_request("limit 必须为整数，after 必须是 ISO 时间", "limit must be an integer and after an ISO datetime")
+    limit = max(1, min(limit, MAX_UPCOMING))
+
+    try:
+        return jsonify(upcoming_sessions(limit, after=after))
+    except CalendarError as e:
+        return _bad_request(str(e), str(e))
+    except Exception as e:
+        return (
+            jsonify(
+                {
+                    "error": "server_error",
+                    "message_zh": "服务器内部错误",
+                    "message_en": "Internal server error: " + str(e),
+                }
+            ),
+            500,
+        )
@@ -6,6 +6,7 @@ from flask import Blueprint, jsonify, request
 from backend.auth_decorators import login_required, roles_required
 
 from backend.db import get_cursor
+from backend.services.stats_service import record_registration_change
 
 checkin_bp = Blueprint("checkin_api", __name__)
 
@@ -122,16 +123,31 @@ def checkin():
                 200,
             )
 
-        # 2) 执行签到：更新 REGISTRATION.checkin_time
+        # 2) 执行签到：先递增场次版本（供报名列表等接口的 ETag 判断，同时取得场次行锁，
+        #    与统计对账串行），再条件更新 REGISTRATION.checkin_time
         now = datetime.now()
+        cursor.execute(
+            "UPDATE EVENT_SESSION SET version = version + 1 WHERE session_id = %s",
+            (session_id,),
+        )
         cursor.execute(
             """
             UPDATE REGISTRATION
             SET checkin_time = %s
             WHERE user_id = %s AND session_id = %s
+              AND status = 'registered' AND checkin_time IS NULL
             """,
             (now, user_id, session_id),
         )
+        # 并发的重复签到只有一条会更新成功，签到数只加一次
+        if cursor.rowcount == 1:
+            record_registration_change(
+                cursor,
+                session_id,
+                "registered",
+                "registered",
+                new_checked_in=True,
+            )
 
     # 提示：如果 get_cursor 内部没有自动提交，可以在 db 层统一处理事务。
     # 这里假设 get_cursor 使用的连接为 autocommit。
@@ -2,21 +2,59 @@
 from flask import Blueprint, jsonify, request
 
 from backend.auth_decorators import login_required, roles_required
-from backend.db import get_cursor
 from backend.db_orm import SessionLocal
-from backend.models.models import Tag, Event, EventTag
+from backend.models.models import Tag
 from backend.services.event_service import (
     create_event_with_sessions,
     update_event_basic,
     delete_event,
     list_today_sessions,
+    list_published_events,
+    list_published_events_page,
+    list_all_events as load_all_events,
+    get_event_sessions,
+    get_event_detail as load_event_detail,
+    set_event_tags as update_event_tags,
     EventError,
 )
-from backend.services.search_service import search_events, SearchError
+from backend.services.search_service import search_events, get_search_facets, resolve_sort, SearchError
+from backend.utils.http_cache import conditional_json, make_etag
+from backend.utils.pagination import CursorError, decode_cursor, next_cursor, parse_limit
 
 events_bp = Blueprint("events_api", __name__)
 
 
+def _invalid_page_args_response(message_zh: str, message_en: str):
+    return (
+        jsonify(
+            {
+                "error": "invalid_request",
+                "message_zh": message_zh,
+                "message_en": message_en,
+            }
+        ),
+        400,
+    )
+
+
+def _page_args():
+    """
+    解析 ?limit=&cursor=；两者都没给时返回 None（保持旧行为：返回全部）。
+    非法参数抛 ValueError / CursorError，由调用方转成 400。
+    """
+    if "limit" not in request.args and "cursor" not in request.args:
+        return None
+    return parse_limit(request.args.get("limit")), decode_cursor(request.args.get("cursor"))
+
+
+def _with_next_cursor(response, rows, limit):
+    # 响应体仍是列表，下一页游标放在响应头里；末页不返回该头
+    cursor = next_cursor(rows, limit)
+    if cursor:
+        response.headers["X-Next-Cursor"] = cursor
+    return response
+
+
 @events_bp.get("/health")
 def events_health():
     # 健康检查接口：仅用于确认服务存活
@@ -93,26 +131,22 @@ def create_event():
 @login_required
 @roles_required("staff", "admin")
 def list_all_events():
-    """List all events for admin/staff management."""
-    sql = """
-    SELECT
-        e.eid,
-        e.title,
-        e.description,
-        e.location,
-        e.image_url,
-        e.allow_multi_session,
-        e.status,
-        e.type_id,
-        e.created_at,
-        e.updated_at
-    FROM EVENT e
-    ORDER BY e.created_at DESC
     """
-    with get_cursor() as cursor:
-        cursor.execute(sql)
-        rows = cursor.fetchall()
-    return jsonify(rows)
+    List all events for admin/staff management.
+
+    可选游标分页：GET /api/events/manage?limit=50&cursor=<X-Next-Cursor>
+    """
+    try:
+        page = _page_args()
+    except CursorError:
+        return _invalid_page_args_response("cursor 无效", "invalid cursor")
+    except ValueError:
+        return _invalid_page_args_response("limit 必须为整数", "limit must be an integer")
+    if page is None:
+        return jsonify(load_all_events())
+    limit, cursor = page
+    rows = load_all_events(limit, cursor)
+    return _with_next_cursor(jsonify(rows), rows, limit)
 
 
 @events_bp.get("/")
@@ -120,28 +154,35 @@ def list_events():
     """
     列出所有已发布的活动（不区分场次）。
     URL: GET /api/events/
+
+    数据来自 event_service 的读穿缓存，活动写操作会显式失效。
+    ETag 由所返回各活动的 (eid, updated_at) 生成，命中 If-None-Match 时返回 304。
+
+    带 limit / cursor 参数时按 (created_at, eid) 游标分页（直接查库，不走缓存），
+    下一页游标在 X-Next-Cursor 响应头中。
     """
-    sql = """
-    SELECT
-        e.eid,
-        e.title,
-        e.description,
-        e.location,
-        e.image_url,
-        e.allow_multi_session,
-        e.status,
-        e.created_at,
-        e.updated_at
-    FROM EVENT e
-    WHERE e.status = 'published'
-    ORDER BY e.created_at DESC
-    """
-    with get_cursor() as cursor:
-        cursor.execute(sql)
-        rows = cursor.fetchall()
+    try:
+        page = _page_args()
+    except CursorError:
+        return _invalid_page_args_response("cursor 无效", "invalid cursor")
+    except ValueError:
+        return _invalid_page_args_response("limit 必须为整数", "limit must be an integer")
+    if page is not None:
+        limit, cursor = page
+        rows = list_published_events_page(limit, cursor)
+        etag = make_etag("events-page", request.args.get("cursor"), *((r["eid"], r["updated_at"]) for r in rows))
+        return _with_next_cursor(conditional_json(etag, lambda: rows), rows, limit)
+
+    rows = list_published_events()
+    etag = make_etag("events", *((r["eid"], r["updated_at"]) for r in rows))
     # 这里返回的是列表数据，本身不需要 message_zh / message_en，
     # 前端一般直接展示数据就行，如有需要可以在外层再包一层。
-    return jsonify(rows)
+    return conditional_json(etag, lambda: rows)
+
+
+def _sessions_etag_parts(sessions):
+    # version 在任何报名 / 候补 / 签到 / 名额变化时递增
+    return [(s["session_id"], s["version"], s["status"]) for s in sessions]
 
 
 @events_bp.get("/today-sessions")
@@ -179,25 +220,13 @@ def list_event_sessions(eid: int):
     """
     列出某个活动的所有场次。
     URL: GET /api/events/<eid>/sessions
+
+    场次静态字段走活动缓存，capacity / current_registered / status 走短 TTL 的余量缓存。
+    ETag 由所返回场次的 version 生成（直接取自缓存数据，命中 304 时不查库）。
     """
-    sql = """
-    SELECT
-        s.session_id,
-        s.eid,
-        s.start_time,
-        s.end_time,
-        s.capacity,
-        s.current_registered,
-        s.waiting_list_limit,
-        s.status
-    FROM EVENT_SESSION s
-    WHERE s.eid = %s
-    ORDER BY s.start_time ASC
-    """
-    with get_cursor() as cursor:
-        cursor.execute(sql, (eid,))
-        rows = cursor.fetchall()
-    return jsonify(rows)
+    sessions = get_event_sessions(eid)
+    etag = make_etag("event-sessions", eid, *_sessions_etag_parts(sessions))
+    return conditional_json(etag, lambda: sessions)
 
 
 @events_bp.get("/<int:eid>/detail")
@@ -207,59 +236,22 @@ def get_event_detail(eid: int):
 
     URL: GET /api/events/<eid>/detail
     """
-    # 1. 查询活动基本信息
-    sql_event = """
-    SELECT
-        e.eid,
-        e.title,
-        e.description,
-        e.location,
-        e.allow_multi_session,
-        e.status,
-        e.type_id,
-        e.image_url,
-        e.created_at,
-        e.updated_at
-    FROM EVENT e
-    WHERE e.eid = %s
-    """
-    with get_cursor() as cursor:
-        cursor.execute(sql_event, (eid,))
-        event = cursor.fetchone()
-
-        if not event:
-            return (
-                jsonify(
-                    {
-                        "error": "not_found",
-                        "message_zh": "活动不存在",
-                        "message_en": "Event not found",
-                    }
-                ),
-                404,
-            )
-
-        # 2. 查询该活动的所有场次
-        sql_sessions = """
-        SELECT
-            s.session_id,
-            s.eid,
-            s.start_time,
-            s.end_time,
-            s.capacity,
-            s.current_registered,
-            s.waiting_list_limit,
-            s.status
-        FROM EVENT_SESSION s
-        WHERE s.eid = %s
-        ORDER BY s.start_time ASC
-        """
-        cursor.execute(sql_sessions, (eid,))
-        sessions = cursor.fetchall()
-
-    # 3. 拼出统一结构
-    event["sessions"] = sessions
-    return jsonify(event)
+    event = load_event_detail(eid)
+    if event is None:
+        return (
+            jsonify(
+                {
+                    "error": "not_found",
+                    "message_zh": "活动不存在",
+                    "message_en": "Event not found",
+                }
+            ),
+            404,
+        )
+    etag = make_etag(
+        "event-detail", eid, event["updated_at"], *_sessions_etag_parts(event["sessions"])
+    )
+    return conditional_json(etag, lambda: event, last_modified=event["updated_at"])
 
 
 @events_bp.put("/<int:eid>")
@@ -451,10 +443,20 @@ def set_event_tags(eid: int):
             400,
         )
 
-    db = SessionLocal()
     try:
-        event = db.query(Event).filter(Event.eid == eid).first()
-        if not event:
+        result = update_event_tags(eid, clean_names)
+        return (
+            jsonify(
+                {
+                    **result,
+                    "message_zh": "标签已更新",
+                    "message_en": "Tags updated",
+                }
+            ),
+            200,
+        )
+    except EventError as e:
+        if str(e) == "event not found":
             return (
                 jsonify(
                     {
@@ -465,37 +467,6 @@ def set_event_tags(eid: int):
                 ),
                 404,
             )
-
-        # 确保标签存在，不存在则创建
-        existing_tags = db.query(Tag).filter(Tag.tag_name.in_(clean_names)).all()
-        existing_map = {t.tag_name: t for t in existing_tags}
-
-        for name in clean_names:
-            if name not in existing_map:
-                t = Tag(tag_name=name)
-                db.add(t)
-                db.flush()  # 获取 tag_id
-                existing_map[name] = t
-
-        # 清空旧关系，写入新关系
-        db.query(EventTag).filter(EventTag.eid == eid).delete()
-        for tag in existing_map.values():
-            db.add(EventTag(eid=eid, tag_id=tag.tag_id))
-
-        db.commit()
-        return (
-            jsonify(
-                {
-                    "eid": eid,
-                    "tags": list(existing_map.keys()),
-                    "message_zh": "标签已更新",
-                    "message_en": "Tags updated",
-                }
-            ),
-            200,
-        )
-    except Exception as e:
-        db.rollback()
         return (
             jsonify(
                 {
@@ -506,19 +477,10 @@ def set_event_tags(eid: int):
             ),
             500,
         )
-    finally:
-        db.close()
 
 
-@events_bp.get("/search")
-def search_events_api():
-    """基于 ORM 的多表联查搜索。"""
-    tag_names = request.args.getlist("tag") or None
-    type_ids_raw = request.args.getlist("type_id")
-    status = request.args.getlist("status") or None
-    start_time = request.args.get("start")
-    end_time = request.args.get("end")
-    keyword = request.args.get("q")
+def _parse_search_filters():
+    """从 query string 解析搜索过滤条件（/search 与 /search/facets 共用）。"""
 
     def _parse_ints(vals):
         out = []
@@ -529,11 +491,41 @@ def search_events_api():
                 pass
         return out or None
 
-    type_ids = _parse_ints(type_ids_raw)
+    return {
+        "tag_names": request.args.getlist("tag") or None,
+        "type_ids": _parse_ints(request.args.getlist("type_id")),
+        "status": request.args.getlist("status") or None,
+        "start_time": request.args.get("start"),
+        "end_time": request.args.get("end"),
+        "keyword": request.args.get("q"),
+    }
+
+
+@events_bp.get("/search")
+def search_events_api():
+    """
+    基于 ORM 的多表联查搜索。
+
+    分页：推荐 ?cursor=<X-Next-Cursor>（游标分页，深翻页耗时不变）；
+    offset 仅为兼容旧调用保留，给了 cursor 时忽略 offset。
+
+    关键词 q 走 FULLTEXT（ngram）索引，匹配标题 / 地点 / 简介；
+    有关键词且未给 cursor 时默认按相关度排序（?sort=created_at 可改为按时间），
+    相关度排序用 limit/offset 翻页。
+
+    ?facets=1：响应体改为 {"results": [...], "total": n, "facets": {...}}，
+    分面计数同 /search/facets。
+    """
+    filters = _parse_search_filters()
+    sort = request.args.get("sort") or None
+    keyword = filters["keyword"]
 
     try:
         limit = int(request.args.get("limit", 50))
         offset = int(request.args.get("offset", 0))
+        cursor = decode_cursor(request.args.get("cursor"))
+    except CursorError:
+        return _invalid_page_args_response("cursor 无效", "invalid cursor")
     except ValueError:
         return (
             jsonify(
@@ -550,17 +542,65 @@ def search_events_api():
     offset = max(0, offset)
 
     try:
+        sort = resolve_sort(keyword, cursor, sort=sort)
         results = search_events(
-            tag_names=tag_names,
-            type_ids=type_ids,
-            status=status,
-            start_time=start_time,
-            end_time=end_time,
-            keyword=keyword,
+            **filters,
             limit=limit,
             offset=offset,
+            cursor=cursor,
+            sort=sort,
+        )
+        if request.args.get("facets") in ("1", "true"):
+            # 结果与分面计数一起返回，此时响应体为对象
+            facets = get_search_facets(**filters)
+            body = jsonify({"results": results, **facets})
+        else:
+            body = jsonify(results)
+        if sort == "relevance":
+            # 相关度排序只能用 limit/offset 翻页，不返回游标
+            return body, 200
+        return _with_next_cursor(body, results, limit), 200
+    except SearchError as e:
+        return (
+            jsonify(
+                {
+                    "error": "search_error",
+                    "message_zh": str(e),
+                    "message_en": str(e),
+                }
+            ),
+            400,
+        )
+    except Exception as e:
+        return (
+            jsonify(
+                {
+                    "error": "server_error",
+                    "message_zh": "服务器内部错误",
+                    "message_en": "Internal server error: " + str(e),
+                }
+            ),
+            500,
         )
-        return jsonify(results), 200
+
+@events_bp.get("/search/facets")
+def search_facets_api():
+    """
+    当前过滤条件下按标签 / 类型 / 状态的活动数，参数与 /search 相同（分页参数忽略）。
+
+    返回示例：
+      {
+        "total": 12,
+        "facets": {
+          "tags": {"Art": 5, "Tech": 8},
+          "type_id": {"1": 7, "2": 5},
+          "status": {"published": 12}
+        }
+      }
+    开启 SEARCH_FACET_INDEX 且不带关键词时查进程内分面索引，否则执行一条分组统计 SQL。
+    """
+    try:
+        return jsonify(get_search_facets(**_parse_search_filters())), 200
     except SearchError as e:
         return (
             jsonify(
@@ -582,4 +622,4 @@ def search_events_api():
                 }
             ),
             500,
-        )
\ No newline at end of file
+        )
@@ -2,12 +2,19 @@
 from flask import Blueprint, jsonify, request, g
 from datetime import datetime, timezone
 from backend.db import get_cursor, get_connection
-from backend.auth_decorators import login_required
+from backend.auth_decorators import login_required, roles_required
+from backend.config import load_config
+from backend.services.admission_service import admission_engine
 from backend.services.registration_service import (
-    register_for_session,
+    submit_registration,
+    register_batch,
     cancel_registration,
+    get_user_registration_version,
     RegistrationError,
+    WAITING_RANK_SQL,
 )
+from backend.services.event_service import get_session_version
+from backend.utils.http_cache import conditional_json, make_etag
 from backend.utils.qrcode_utils import (
     build_checkin_payload,
     generate_qr_png_bytes,
@@ -16,6 +23,7 @@ from backend.utils.qrcode_utils import (
 
 
 registration_bp = Blueprint("registration_api", __name__)
+config = load_config()
 
 
 @registration_bp.post("/")
@@ -80,7 +88,7 @@ def create_registration():
         )
 
     try:
-        result = register_for_session(user_id=user_id, session_id=session_id)
+        result = submit_registration(user_id=user_id, session_id=session_id)
         return jsonify(result), 200
     except RegistrationError as e:
         err_msg = str(e)
@@ -107,6 +115,101 @@ def create_registration():
         )
 
 
+@registration_bp.post("/batch")
+@login_required
+@roles_required("staff", "admin")
+def create_registrations_batch():
+    """
+    批量报名接口（团体 / 企业报名，staff / admin）
+
+    URL:
+      POST /api/registrations/batch
+
+    请求 JSON（三种写法任选其一）：
+      {"session_id": 3, "user_ids": [1, 2, 3]}           多人报同一场次
+      {"user_id": 5, "session_ids": [3, 4]}              一人报多个场次
+      {"items": [{"user_id": 1, "session_id": 3}, ...]}  任意组合
+
+    整批在一个事务内写入；返回与条目一一对应的 results，
+    单个条目失败时 status = "failed" 并附带中英文原因。
+    """
+    data = request.get_json(silent=True) or {}
+
+    items = []
+    if isinstance(data.get("items"), list):
+        for item in data["items"]:
+            if not isinstance(item, dict):
+                items = None
+                break
+            items.append((item.get("user_id"), item.get("session_id")))
+    elif isinstance(data.get("user_ids"), list):
+        items = [(uid, data.get("session_id")) for uid in data["user_ids"]]
+    elif isinstance(data.get("session_ids"), list):
+        items = [(data.get("user_id"), sid) for sid in data["session_ids"]]
+
+    if not items or not all(
+        type(u) is int and type(sid) is int for u, sid in items  # JSON true/false 是 bool，不算整数
+    ):
+        return (
+            jsonify(
+                {
+                    "error": "invalid_request",
+                    "message_zh": "请提供整数形式的 user_id / session_id 列表",
+                    "message_en": "Provide integer user_id / session_id lists",
+                }
+            ),
+            400,
+        )
+
+    if len(items) > config.REGISTRATION_BATCH_MAX_ITEMS:
+        return (
+            jsonify(
+                {
+                    "error": "invalid_request",
+                    "message_zh": f"单次最多 {config.REGISTRATION_BATCH_MAX_ITEMS} 条",
+                    "message_en": f"At most {config.REGISTRATION_BATCH_MAX_ITEMS} items per request",
+                }
+            ),
+            400,
+        )
+
+    try:
+        results = register_batch(items)
+    except RegistrationError as e:
+        err_msg = str(e)
+        return (
+            jsonify(
+                {
+                    "error": "registration_failed",
+                    "message_zh": err_msg,
+                    "message_en": "Registration failed: " + err_msg,
+                }
+            ),
+            400,
+        )
+    except Exception as e:
+        return (
+            jsonify(
+                {
+                    "error": "server_error",
+                    "message_zh": "服务器内部错误",
+                    "message_en": "Internal server error: " + str(e),
+                }
+            ),
+            500,
+        )
+
+    # 名额已变化，让本进程的批量准入计数重新加载
+    for sid in {sid for _, sid in items}:
+        admission_engine.invalidate(sid)
+
+    summary = {"registered": 0, "waiting": 0, "failed": 0}
+    for r in results:
+        if r["status"] in summary:
+            summary[r["status"]] += 1
+    return jsonify({"results": results, "summary": summary}), 200
+
+
 @registration_bp.post("/cancel")
 @login_required
 def cancel_registration_api():
@@ -175,7 +278,14 @@ def list_registrations_for_session(session_id: int):
     """
     （辅助查看）列出某个场次的所有报名记录。
     URL: GET /api/registrations/session/<session_id>
+
+    支持 If-None-Match：场次 version 未变时直接返回 304，不执行下面的列表查询。
     """
+    etag = make_etag("session-registrations", session_id, get_session_version(session_id))
+    return conditional_json(etag, lambda: _load_session_registrations(session_id))
+
+
+def _load_session_registrations(session_id: int):
     sql = """
     SELECT
         r.user_id,
@@ -201,7 +311,13 @@ def list_registrations_for_session(session_id: int):
     with get_cursor() as cursor:
         cursor.execute(sql, (session_id,))
         rows = cursor.fetchall()
-    return jsonify(rows)
+    # queue_position 存的是候补号；waiting 已按候补号排序，顺序编号即为名次
+    rank = 0
+    for row in rows:
+        if row["status"] == "waiting":
+            rank += 1
+            row["queue_position"] = rank
+    return rows
 
 
 @registration_bp.get("/user/<int:user_id>")
@@ -214,28 +330,7 @@ def list_user_registrations(user_id: int):
     未来如果只允许用户自己看自己的，可以下掉这个接口，
     或仅对管理员开放（配合 admin_required）。
     """
-    sql = """
-    SELECT
-        r.session_id,
-        s.eid,
-        e.title AS event_title,
-        e.location AS event_location,
-        s.start_time,
-        s.end_time,
-        r.status,
-        r.queue_position,
-        r.register_time,
-        r.checkin_time
-    FROM REGISTRATION r
-    JOIN EVENT_SESSION s ON r.session_id = s.session_id
-    JOIN EVENT e ON s.eid = e.eid
-    WHERE r.user_id = %s
-    ORDER BY s.start_time ASC, r.register_time ASC
-    """
-    with get_cursor() as cursor:
-        cursor.execute(sql, (user_id,))
-        rows = cursor.fetchall()
-    return jsonify(rows)
+    return jsonify(_load_user_registrations(user_id))
 
 
 @registration_bp.get("/me")
@@ -246,11 +341,25 @@ def list_my_registrations():
 
     URL:
       GET /api/registrations/me
+
+    支持 If-None-Match：报名条数、所涉场次 version、活动 updated_at 均未变时返回 304。
     """
     current_user = g.current_user
     user_id = current_user["user_id"]
 
-    sql = """
+    version = get_user_registration_version(user_id)
+    etag = make_etag(
+        "my-registrations",
+        user_id,
+        version["registration_count"],
+        version["version_sum"],
+        version["updated_at"],
+    )
+    return conditional_json(etag, lambda: _load_user_registrations(user_id))
+
+
+def _load_user_registrations(user_id: int):
+    sql = f"""
     SELECT
         r.session_id,
         s.eid,
@@ -259,7 +368,7 @@ def list_my_registrations():
         s.start_time,
         s.end_time,
         r.status,
-        r.queue_position,
+        {WAITING_RANK_SQL} AS queue_position,
         r.register_time,
         r.checkin_time
     FROM REGISTRATION r
@@ -271,7 +380,8 @@ def list_my_registrations():
     with get_cursor() as cursor:
         cursor.execute(sql, (user_id,))
         rows = cursor.fetchall()
-    return jsonify(rows)
+    return rows
+
 
 @registration_bp.get("/qrcode/<int:session_id>")
 @login_required
@@ -18,6 +18,9 @@ from backend.api.analytics_api import analytics_bp
 from backend.api.checkin_api import checkin_bp
 from backend.api.groups_api import groups_bp
 from backend.api.admin_api import admin_bp
+from backend.api.calendar_api import calendar_bp
+from backend.services.analytics_cube import warm_up as warm_up_analytics_cube
+from backend.services.facet_index import warm_up as warm_up_facet_index
 
 
 def create_app(config_name: str | None = None) -> Flask:
@@ -46,6 +49,18 @@ def create_app(config_name: str | None = None) -> Flask:
     # 4. 注册全局错误处理
     register_error_handlers(app)
 
+    # 4.1 预加载搜索分面索引（SEARCH_FACET_INDEX 开启时）；失败不影响启动，首次搜索时会重试
+    if app.config["ENV"] != "testing":
+        try:
+            warm_up_facet_index()
+        except Exception as e:
+            app.logger.warning("facet index warm-up failed: %s", e)
+        # 4.2 预加载报名立方体（ANALYTICS_CUBE 开启时）；失败时首个统计请求会重试
+        try:
+            warm_up_analytics_cube()
+        except Exception as e:
+            app.logger.warning("analytics cube warm-up failed: %s", e)
+
     # 5. 简单健康检查 / 根路由（可选）
     @app.get("/")
     def index():
@@ -65,6 +80,7 @@ def register_blueprints(app: Flask) -> None:
     app.register_blueprint(checkin_bp, url_prefix="/api/checkin")
     app.register_blueprint(groups_bp, url_prefix="/api")
     app.register_blueprint(admin_bp, url_prefix="/api")
+    app.register_blueprint(calendar_bp, url_prefix="/api/calendar")
 
 
 def register_error_handlers(app: Flask) -> None:
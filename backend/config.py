@@ -53,6 +53,22 @@ class BaseConfig:
         ),
     )
 
+    # ---------------- 连接池配置（每个进程 / gunicorn worker 各一份） ----------------
+    # 连接来源：
+    #   - sqlalchemy：raw SQL 与 ORM 共用 db_orm.engine 的连接池（默认）
+    #   - native：raw SQL 使用 backend/db/pool.py 的独立连接池
+    DB_POOL_PROVIDER: str = os.getenv("DB_POOL_PROVIDER", "sqlalchemy")
+    # 本进程最多同时打开的连接数
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", 10))
+    # 池满时等待空闲连接的最长秒数
+    DB_POOL_TIMEOUT_SECONDS: float = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", 10))
+    # 空闲超过该秒数的连接会被淘汰
+    DB_POOL_MAX_IDLE_SECONDS: float = float(os.getenv("DB_POOL_MAX_IDLE_SECONDS", 300))
+    # 连接最大存活秒数，需小于 MySQL 的 wait_timeout
+    DB_POOL_RECYCLE_SECONDS: float = float(os.getenv("DB_POOL_RECYCLE_SECONDS", 3600))
+    # 空闲超过该秒数的连接在借出前先 ping 一次
+    DB_POOL_PRE_PING_SECONDS: float = float(os.getenv("DB_POOL_PRE_PING_SECONDS", 30))
+
     # ---------------- JWT / Auth 配置 ----------------
     # JWT 签名密钥：优先使用 JWT_SECRET_KEY，否则退化为 SECRET_KEY
     JWT_SECRET_KEY: str = os.getenv("JWT_SECRET_KEY", os.getenv("SECRET_KEY", "dev-secret-key"))
@@ -63,6 +79,82 @@ class BaseConfig:
         os.getenv("JWT_ACCESS_TOKEN_EXPIRES_SECONDS", 7 * 24 * 60 * 60)
     )
 
+    # login_required 的用户信息缓存：TTL（秒）与最大条目数（每个进程）
+    AUTH_USER_CACHE_TTL_SECONDS: float = float(os.getenv("AUTH_USER_CACHE_TTL_SECONDS", 30))
+    AUTH_USER_CACHE_SIZE: int = int(os.getenv("AUTH_USER_CACHE_SIZE", 10000))
+
+    # 鉴权模式：
+    #   - db：每个请求按 user_id 读取 USER（走上面的缓存）
+    #   - claims：token_version 未变化时直接信任 JWT 中的 name/role/blocked_until，不查库
+    AUTH_MODE: str = os.getenv("AUTH_MODE", "db")
+    # claims 模式下每个用户 token_version 缓存的过期时间（秒），过期后按主键重读
+    AUTH_TOKEN_VERSION_REFRESH_SECONDS: float = float(
+        os.getenv("AUTH_TOKEN_VERSION_REFRESH_SECONDS", 5)
+    )
+
+    # ---------------- 报名 ----------------
+    # 报名路径：
+    #   - locking：register_for_session，锁定场次行后逐个处理（默认）
+    #   - conditional：register_for_session_fast，检查放到锁外，单条条件 UPDATE 抢名额
+    #   - batched：admission_service 进程内发放名额 + 批量落库
+    REGISTRATION_MODE: str = os.getenv("REGISTRATION_MODE", "locking")
+    # batched 模式：每批最多条数、凑批最长等待（毫秒）、名额计数的重新加载间隔（秒）
+    ADMISSION_BATCH_SIZE: int = int(os.getenv("ADMISSION_BATCH_SIZE", 100))
+    ADMISSION_BATCH_WAIT_MS: float = float(os.getenv("ADMISSION_BATCH_WAIT_MS", 5))
+    ADMISSION_COUNTER_TTL_SECONDS: float = float(os.getenv("ADMISSION_COUNTER_TTL_SECONDS", 5))
+    # 爽约次数来源：scan（报名时实时 JOIN 统计，默认）/ ledger（读 USER_NO_SHOW_STATS 台账）/
+    # off（报名时不再检查，封禁完全交给 sweep）；ledger / off 需要定期执行 run_no_show_sweep.py
+    NO_SHOW_COUNT_SOURCE: str = os.getenv("NO_SHOW_COUNT_SOURCE", "scan")
+    # POST /api/registrations/batch 单次最多条目数
+    REGISTRATION_BATCH_MAX_ITEMS: int = int(os.getenv("REGISTRATION_BATCH_MAX_ITEMS", 1000))
+
+    # ---------------- 公开活动接口缓存 ----------------
+    # 活动 / 场次静态信息：写路径显式失效，其它进程依赖 TTL 过期
+    EVENT_CACHE_TTL_SECONDS: float = float(os.getenv("EVENT_CACHE_TTL_SECONDS", 60))
+    EVENT_CACHE_SIZE: int = int(os.getenv("EVENT_CACHE_SIZE", 2048))
+    # 余量（capacity / current_registered / status）单独缓存，TTL 很短以保证新鲜
+    EVENT_SEAT_CACHE_TTL_SECONDS: float = float(os.getenv("EVENT_SEAT_CACHE_TTL_SECONDS", 2))
+
+    # ---------------- 统计分析 ----------------
+    # 活动概览：aggregated（场次 LEFT JOIN 报名一次条件聚合算出全部计数，默认）/
+    # legacy（旧实现，每个计数单独查询）
+    ANALYTICS_OVERVIEW_ENGINE: str = os.getenv("ANALYTICS_OVERVIEW_ENGINE", "aggregated")
+    # 报名计数来源：live（实时统计 REGISTRATION，默认）/ materialized（按主键读 SESSION_STATS /
+    # EVENT_STATS，由写路径增量维护）；已有数据的库切换前先执行 run_stats_reconcile.py 回填
+    ANALYTICS_STATS_SOURCE: str = os.getenv("ANALYTICS_STATS_SOURCE", "live")
+    # POST /api/analytics/events/overview:batch 单次最多活动数
+    ANALYTICS_BATCH_MAX_EVENTS: int = int(os.getenv("ANALYTICS_BATCH_MAX_EVENTS", 200))
+    # 报名趋势来源：live（REGISTRATION 上实时分组，默认）/ rollup（读小时汇总表
+    # REGISTRATION_HOURLY，由写路径增量维护）；切换前同样先执行 run_stats_reconcile.py 回填
+    ANALYTICS_TREND_SOURCE: str = os.getenv("ANALYTICS_TREND_SOURCE", "live")
+    # 单次趋势查询最多返回的桶数（小时桶约 83 天）
+    ANALYTICS_TREND_MAX_BUCKETS: int = int(os.getenv("ANALYTICS_TREND_MAX_BUCKETS", 2000))
+    # 进程内 NumPy 报名立方体（analytics_cube）：群体统计 / 标签概览 / 爽约率 / 报名趋势
+    # 改为在内存数组上向量化分组；查询只读已同步的数据，后台线程每 REFRESH 秒按场次 version
+    # 增量同步，每 RELOAD 秒整表重读一次（兜底不改 version 的变更）
+    ANALYTICS_CUBE: bool = os.getenv("ANALYTICS_CUBE", "false").lower() in ("1", "true", "yes")
+    ANALYTICS_CUBE_REFRESH_SECONDS: float = float(os.getenv("ANALYTICS_CUBE_REFRESH_SECONDS", 5))
+    ANALYTICS_CUBE_RELOAD_SECONDS: float = float(os.getenv("ANALYTICS_CUBE_RELOAD_SECONDS", 3600))
+
+    # ---------------- 活动搜索 ----------------
+    # two_phase：先用 EXISTS 子查询分页取出 eid，再 selectinload 批量加载场次 / 标签（默认）
+    # joined：旧实现，JOIN + joinedload 后对联表结果 DISTINCT 分页
+    SEARCH_STRATEGY: str = os.getenv("SEARCH_STRATEGY", "two_phase")
+    # 关键词匹配：fulltext（FULLTEXT ngram 索引 + 相关度排序，覆盖 description，默认）
+    # like：旧实现，title / location 上的 LIKE '%kw%'，全表扫描
+    SEARCH_KEYWORD_MODE: str = os.getenv("SEARCH_KEYWORD_MODE", "fulltext")
+    # 进程内分面索引（标签 / 类型 / 状态位图 + 场次时间索引）：不带关键词的搜索与分面计数走内存；
+    # 本进程写入增量更新，其它进程的写入靠每 FACET_INDEX_REFRESH_SECONDS 秒整体重建
+    SEARCH_FACET_INDEX: bool = os.getenv("SEARCH_FACET_INDEX", "false").lower() in ("1", "true", "yes")
+    FACET_INDEX_REFRESH_SECONDS: float = float(os.getenv("FACET_INDEX_REFRESH_SECONDS", 30))
+
+    # ---------------- 离线分析快照 ----------------
+    # run_snapshot_export.py 的默认输出目录（每次导出一个子目录）与保留份数
+    SNAPSHOT_DIR: str = os.getenv("SNAPSHOT_DIR", "snapshots")
+    SNAPSHOT_KEEP: int = int(os.getenv("SNAPSHOT_KEEP", 7))
+    # 服务端游标每批读取的行数，决定导出时的内存上限
+    SNAPSHOT_CHUNK_ROWS: int = int(os.getenv("SNAPSHOT_CHUNK_ROWS", 50000))
+
     @property
     def JWT_ACCESS_TOKEN_EXPIRES(self) -> timedelta:
         """
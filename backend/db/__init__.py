@@ -1,4 +1,4 @@
 # backend/db/__init__.py
-from .db import get_connection, get_cursor, init_db_from_schema
+from .db import get_connection, get_cursor, get_pool_stats, init_db_from_schema
 
-__all__ = ["get_connection", "get_cursor", "init_db_from_schema"]
\ No newline at end of file
+__all__ = ["get_connection", "get_cursor", "get_pool_stats", "init_db_from_schema"]
\ No newline at end of file
@@ -1,25 +1,33 @@
 # backend/db/db.py
 import os
 import re
+import threading
 from contextlib import contextmanager
+from typing import Any, Dict
 
 import pymysql
 
 from backend.config import load_config
+from backend.db.pool import ConnectionPool
+from backend.db_orm import engine, get_engine_pool_stats
 
 # 加载配置（内部会从项目根目录的 .env 读取）
 config = load_config()
 
+_pool: ConnectionPool | None = None
+_pool_pid: int | None = None
+_pool_lock = threading.Lock()
 
-def get_connection():
+
+def _connect_raw():
     """
-    获取一个数据库连接。
+    建立一条真实的 PyMySQL 连接。
 
     使用 backend/config.py 中的配置：
       - config.DB_HOST, config.DB_PORT, config.DB_USER,
         config.DB_PASSWORD, config.DB_NAME, config.DB_CHARSET
     """
-    conn = pymysql.connect(
+    return pymysql.connect(
         host=config.DB_HOST,
         port=config.DB_PORT,
         user=config.DB_USER,
@@ -29,7 +37,114 @@ def get_connection():
         cursorclass=pymysql.cursors.DictCursor,
         autocommit=False,
     )
-    return conn
+
+
+def _get_pool() -> ConnectionPool:
+    """
+    懒加载本进程的连接池。
+
+    gunicorn 等 fork 模型下，子进程不能复用父进程的 socket，
+    因此 pid 变化时直接丢弃旧池（不 close，避免影响父进程）。
+    """
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is not None and _pool_pid == pid:
+        return _pool
+    with _pool_lock:
+        if _pool is None or _pool_pid != pid:
+            _pool = ConnectionPool(
+                _connect_raw,
+                max_size=config.DB_POOL_SIZE,
+                timeout=config.DB_POOL_TIMEOUT_SECONDS,
+                max_idle=config.DB_POOL_MAX_IDLE_SECONDS,
+                recycle=config.DB_POOL_RECYCLE_SECONDS,
+                pre_ping_after=config.DB_POOL_PRE_PING_SECONDS,
+            )
+            _pool_pid = pid
+        return _pool
+
+
+class _EngineConnection:
+    """
+    对 engine.raw_connection() 的包装：
+      - cursor() 默认使用 DictCursor，与原先 get_connection() 的行为一致；
+      - close() 把连接还给 SQLAlchemy 连接池（池会自动 rollback），可重复调用；
+      - 其余属性透传给底层 PyMySQL 连接。
+    """
+
+    def __init__(self, proxied: Any):
+        self._proxied = proxied
+
+    def cursor(self, cursorclass: Any = None):
+        return self._proxied.cursor(cursorclass or pymysql.cursors.DictCursor)
+
+    def close(self) -> None:
+        proxied = self._proxied
+        if proxied is None:
+            return
+        self._proxied = None
+        proxied.close()
+
+    @property
+    def closed(self) -> bool:
+        return self._proxied is None
+
+    def __getattr__(self, name: str) -> Any:
+        proxied = self.__dict__.get("_proxied")
+        if proxied is None:
+            raise AttributeError(f"connection already returned to pool: {name}")
+        return getattr(proxied, name)
+
+    def __enter__(self) -> "_EngineConnection":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+_waiting = 0
+_waiting_lock = threading.Lock()
+
+
+def _borrow_from_engine() -> _EngineConnection:
+    global _waiting
+    with _waiting_lock:
+        _waiting += 1
+    try:
+        proxied = engine.raw_connection()
+    finally:
+        with _waiting_lock:
+            _waiting -= 1
+    return _EngineConnection(proxied)
+
+
+def get_connection():
+    """
+    从连接池借出一个数据库连接（DictCursor，autocommit=False）。
+
+    默认与 ORM 共用 db_orm.engine 的连接池；DB_POOL_PROVIDER=native 时
+    使用 backend/db/pool.py 的独立连接池。
+
+    返回对象的用法与原生 PyMySQL 连接一致；调用 close() 时连接归还到池中，
+    未提交的事务会被自动 rollback。
+    """
+    if config.DB_POOL_PROVIDER == "native":
+        return _get_pool().connect()
+    return _borrow_from_engine()
+
+
+def get_pool_stats() -> Dict[str, Any]:
+    """返回当前进程连接池的统计信息（checked_out / waiting / created / recycled 等）。"""
+    if config.DB_POOL_PROVIDER == "native":
+        return {"pid": os.getpid(), "provider": "native", **_get_pool().stats()}
+    with _waiting_lock:
+        waiting = _waiting
+    return {
+        "pid": os.getpid(),
+        "provider": "sqlalchemy",
+        **get_engine_pool_stats(),
+        "waiting": waiting,
+    }
 
 
 @contextmanager
@@ -39,7 +154,7 @@ def get_cursor():
     - 建立连接，生成 cursor
     - 正常结束时 commit
     - 出现异常时 rollback 并再次抛出
-    - 最后关闭 cursor 和连接
+    - 最后关闭 cursor，并把连接归还连接池
 
     用法示例：
         from backend.db import get_cursor
@@ -0,0 +1,262 @@
+# backend/db/pool.py
+"""
+线程安全的有界连接池（给 raw PyMySQL 路径使用）。
+
+特性：
+  - 每个进程一个池，大小由配置决定（gunicorn 每个 worker 各自一份）；
+  - 借出时做健康检查：超过最大存活时间的连接直接重建，
+    空闲超过一定时间的连接先 ping 一下，失败则重建；
+  - 空闲过久的连接在下次借用时被淘汰（max-idle eviction）；
+  - 归还时若连接上还有未结束的事务则 rollback，避免把脏事务/旧快照交给下一个使用者；
+  - 提供统计信息：checked_out / waiting / created / recycled 等。
+"""
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict
+
+
+class PoolTimeoutError(Exception):
+    """等待空闲连接超时（池已满且在 timeout 内没有连接归还）。"""
+    pass
+
+
+class _PoolEntry:
+    __slots__ = ("raw", "created_at", "last_used")
+
+    def __init__(self, raw: Any, now: float):
+        self.raw = raw
+        self.created_at = now
+        self.last_used = now
+
+
+class PooledConnection:
+    """
+    对真实连接的轻量包装：
+      - 其余属性/方法全部透传给底层 PyMySQL 连接；
+      - close() 不会真正断开，而是归还给连接池（可重复调用）。
+
+    因此现有代码里的 `conn = get_connection() ... finally: conn.close()`
+    写法无需任何修改。
+    """
+
+    def __init__(self, pool: "ConnectionPool", entry: _PoolEntry):
+        self._pool = pool
+        self._entry = entry
+        self._dirty = False
+
+    def cursor(self, *args: Any, **kwargs: Any):
+        self._dirty = True
+        return self._entry.raw.cursor(*args, **kwargs)
+
+    def commit(self) -> None:
+        self._entry.raw.commit()
+        self._dirty = False
+
+    def rollback(self) -> None:
+        self._entry.raw.rollback()
+        self._dirty = False
+
+    def close(self) -> None:
+        entry = self._entry
+        if entry is None:
+            return
+        self._entry = None
+        self._pool._release(entry, dirty=self._dirty)
+
+    @property
+    def closed(self) -> bool:
+        return self._entry is None
+
+    def __getattr__(self, name: str) -> Any:
+        entry = self.__dict__.get("_entry")
+        if entry is None:
+            raise AttributeError(f"connection already returned to pool: {name}")
+        return getattr(entry.raw, name)
+
+    def __enter__(self) -> "PooledConnection":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+class ConnectionPool:
+    """
+    有界连接池。
+
+    参数：
+      - creator: 无参函数，返回一个新的 DB-API 连接；
+      - max_size: 本进程内最多同时打开的连接数（空闲 + 借出）；
+      - timeout: 池满时等待归还的最长秒数，超时抛 PoolTimeoutError；
+      - max_idle: 空闲超过该秒数的连接会被淘汰（<= 0 表示不淘汰）；
+      - recycle: 连接最大存活秒数，超过后借出时重建（<= 0 表示不限制）；
+      - pre_ping_after: 空闲超过该秒数的连接在借出前先 ping（<= 0 表示每次都 ping）。
+    """
+
+    def __init__(
+        self,
+        creator: Callable[[], Any],
+        *,
+        max_size: int = 10,
+        timeout: float = 10.0,
+        max_idle: float = 300.0,
+        recycle: float = 3600.0,
+        pre_ping_after: float = 30.0,
+    ):
+        if max_size <= 0:
+            raise ValueError("max_size must be a positive integer")
+
+        self._creator = creator
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.recycle = recycle
+        self.pre_ping_after = pre_ping_after
+
+        self._cond = threading.Condition()
+        # 右端是最近归还的连接（LIFO 借出），左端是最久未用的（优先淘汰）
+        self._idle: deque[_PoolEntry] = deque()
+        self._size = 0
+
+        self._checked_out = 0
+        self._waiting = 0
+        self._created = 0
+        self._recycled = 0
+
+    # ---------------- 借出 / 归还 ----------------
+
+    def connect(self) -> PooledConnection:
+        deadline = time.monotonic() + self.timeout
+        stale: list[_PoolEntry] = []
+        entry = None
+
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                stale.extend(self._evict_idle_locked(now))
+                if self._idle:
+                    entry = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    break
+                remaining = deadline - now
+                if remaining <= 0:
+                    self._close_all(stale)
+                    raise PoolTimeoutError(
+                        f"timed out waiting for a database connection "
+                        f"(max_size={self.max_size}, timeout={self.timeout}s)"
+                    )
+                self._waiting += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+            self._checked_out += 1
+
+        self._close_all(stale)
+
+        try:
+            if entry is None:
+                entry = self._new_entry()
+            else:
+                entry = self._check_health(entry)
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._checked_out -= 1
+                self._cond.notify()
+            raise
+
+        return PooledConnection(self, entry)
+
+    def _release(self, entry: _PoolEntry, dirty: bool) -> None:
+        healthy = True
+        if dirty:
+            try:
+                entry.raw.rollback()
+            except Exception:
+                healthy = False
+
+        with self._cond:
+            self._checked_out -= 1
+            if healthy:
+                entry.last_used = time.monotonic()
+                self._idle.append(entry)
+            else:
+                self._size -= 1
+                self._recycled += 1
+            self._cond.notify()
+
+        if not healthy:
+            self._close_raw(entry.raw)
+
+    # ---------------- 内部工具 ----------------
+
+    def _new_entry(self) -> _PoolEntry:
+        raw = self._creator()
+        with self._cond:
+            self._created += 1
+        return _PoolEntry(raw, time.monotonic())
+
+    def _check_health(self, entry: _PoolEntry) -> _PoolEntry:
+        now = time.monotonic()
+        expired = self.recycle > 0 and now - entry.created_at >= self.recycle
+        if not expired and now - entry.last_used >= self.pre_ping_after:
+            try:
+                entry.raw.ping(reconnect=False)
+            except Exception:
+                expired = True
+
+        if not expired:
+            return entry
+
+        self._close_raw(entry.raw)
+        with self._cond:
+            self._recycled += 1
+        return self._new_entry()
+
+    def _evict_idle_locked(self, now: float) -> list[_PoolEntry]:
+        evicted: list[_PoolEntry] = []
+        if self.max_idle <= 0:
+            return evicted
+        while self._idle and now - self._idle[0].last_used >= self.max_idle:
+            evicted.append(self._idle.popleft())
+            self._size -= 1
+            self._recycled += 1
+        return evicted
+
+    def _close_all(self, entries: list[_PoolEntry]) -> None:
+        for e in entries:
+            self._close_raw(e.raw)
+        entries.clear()
+
+    @staticmethod
+    def _close_raw(raw: Any) -> None:
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+    # ---------------- 运维 ----------------
+
+    def dispose(self) -> None:
+        """关闭所有空闲连接（借出中的连接归还后仍会正常入池）。"""
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+        self._close_all(idle)
+
+    def stats(self) -> Dict[str, int]:
+        with self._cond:
+            return {
+                "max_size": self.max_size,
+                "size": self._size,
+                "idle": len(self._idle),
+                "checked_out": self._checked_out,
+                "waiting": self._waiting,
+                "created": self._created,
+                "recycled": self._recycled,
+            }
@@ -13,6 +13,11 @@
 -- Drop existing tables (for idempotent initialization in dev)
 -- Order: child tables first, then parent tables
 -- =========================================================
+DROP TABLE IF EXISTS REGISTRATION_HOURLY;
+DROP TABLE IF EXISTS EVENT_STATS;
+DROP TABLE IF EXISTS SESSION_STATS;
+DROP TABLE IF EXISTS JOB_STATE;
+DROP TABLE IF EXISTS USER_NO_SHOW_STATS;
 DROP TABLE IF EXISTS EVENT_USER_GROUP;
 DROP TABLE IF EXISTS REGISTRATION;
 DROP TABLE IF EXISTS EVENT_TAG;
@@ -34,6 +39,8 @@ CREATE TABLE `USER` (
     password       VARCHAR(255) NOT NULL,
     role           ENUM('visitor', 'staff', 'admin') NOT NULL,
     blocked_until  DATETIME NULL,
+    -- bumped whenever role / blocked_until / profile changes; invalidates JWT claims
+    token_version  INT NOT NULL DEFAULT 0,
 
     INDEX idx_user_role (role),
     INDEX idx_user_blocked_until (blocked_until)
@@ -81,8 +88,12 @@ CREATE TABLE EVENT (
         ON UPDATE CASCADE ON DELETE RESTRICT,
 
     INDEX idx_event_type_status (type_id, status),
+    -- 列表 / 管理页按 (created_at, eid) 做游标分页；InnoDB 二级索引隐含主键 eid
     INDEX idx_event_created_at (created_at),
-    INDEX idx_event_updated_at (updated_at)
+    INDEX idx_event_status_created_at (status, created_at),
+    INDEX idx_event_updated_at (updated_at),
+    -- 关键词搜索：ngram 分词（默认 ngram_token_size=2），中文标题无需空格分词
+    FULLTEXT INDEX ftx_event_text (title, location, description) WITH PARSER ngram
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 
 -- =========================================================
@@ -96,7 +107,16 @@ CREATE TABLE EVENT_SESSION (
     capacity            INT NOT NULL,
     current_registered  INT NOT NULL DEFAULT 0,
     waiting_list_limit  INT NOT NULL DEFAULT 0,
+    -- 候补号发放器：最近一次发出的候补号（单调递增，不回收）
+    waiting_seq         INT NOT NULL DEFAULT 0,
+    -- 当前 waiting 人数（与 REGISTRATION 同步维护，替代 COUNT(*)）
+    current_waiting     INT NOT NULL DEFAULT 0,
+    -- 每次报名 / 取消 / 签到 / 容量变化时 +1，用于 ETag 等变更检测
+    version             INT NOT NULL DEFAULT 0,
     status              ENUM('open', 'closed') NOT NULL,
+    -- 场次时长（分钟，生成列）：MAX(duration_minutes) 走索引，
+    -- 时间重叠查询据此把 start_time 限定在 [from - 最长时长, to) 内做范围扫描
+    duration_minutes    INT AS (TIMESTAMPDIFF(MINUTE, start_time, end_time)) STORED,
 
     CONSTRAINT fk_session_event
         FOREIGN KEY (eid) REFERENCES EVENT(eid)
@@ -108,10 +128,14 @@ CREATE TABLE EVENT_SESSION (
         CHECK (current_registered >= 0),
     CONSTRAINT chk_session_waiting_list
         CHECK (waiting_list_limit >= 0),
+    CONSTRAINT chk_session_current_waiting
+        CHECK (current_waiting >= 0),
 
     INDEX idx_session_eid (eid),
-    INDEX idx_session_start_time (start_time),
+    -- 日历查询：按 start_time 范围扫描，end_time 在索引内过滤（无需回表判断）
+    INDEX idx_session_start_end (start_time, end_time),
     INDEX idx_session_end_time (end_time),
+    INDEX idx_session_duration (duration_minutes),
     INDEX idx_session_status (status)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 
@@ -171,6 +195,7 @@ CREATE TABLE REGISTRATION (
     INDEX idx_registration_user (user_id),
     INDEX idx_registration_session (session_id),
     INDEX idx_registration_session_status (session_id, status),
+    INDEX idx_registration_session_queue (session_id, status, queue_position),
     INDEX idx_registration_user_status (user_id, status),
     INDEX idx_registration_checkin_time (checkin_time)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
@@ -178,6 +203,8 @@ CREATE TABLE REGISTRATION (
 -- Business semantics (handled in application layer):
 --   - status = 'registered'  -> counts into EVENT_SESSION.current_registered
 --   - status = 'waiting'     -> waiting list (ordered by queue_position)
+--   - queue_position is a monotonic ticket from EVENT_SESSION.waiting_seq;
+--     the user-facing rank is computed on read (count of waiting tickets <= own)
 --   - status = 'cancelled'   -> not counted
 --   - checkin_time IS NOT NULL: checked-in
 --   - no-show: session finished AND status='registered' AND checkin_time IS NULL
@@ -231,6 +258,105 @@ CREATE TABLE EVENT_USER_GROUP (
 --   - On first registration to an event, if no group specified,
 --     assign the default group from AUDIENCE_GROUP (is_default = TRUE).
 
+-- =========================================================
+-- 11. USER_NO_SHOW_STATS (per-user no-show ledger)
+-- =========================================================
+CREATE TABLE USER_NO_SHOW_STATS (
+    user_id          INT PRIMARY KEY,
+    -- 最近 NO_SHOW_WINDOW_DAYS 天内的爽约次数（由定期任务维护）
+    no_show_count    INT NOT NULL DEFAULT 0,
+    last_no_show_at  DATETIME NULL,
+    refreshed_at     DATETIME NOT NULL,
+
+    CONSTRAINT fk_no_show_stats_user
+        FOREIGN KEY (user_id) REFERENCES `USER`(user_id)
+        ON UPDATE CASCADE ON DELETE CASCADE,
+
+    INDEX idx_no_show_stats_count (no_show_count)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- Business semantics (handled in application layer):
+--   - Refreshed by user_penalty_service.run_no_show_sweep (set-based);
+--   - With NO_SHOW_COUNT_SOURCE=ledger, registration reads this row by PK
+--     instead of scanning REGISTRATION JOIN EVENT_SESSION.
+
+-- =========================================================
+-- 12. JOB_STATE (watermarks / last-run metrics of periodic jobs)
+-- =========================================================
+CREATE TABLE JOB_STATE (
+    job_name          VARCHAR(64) PRIMARY KEY,
+    -- 增量任务的水位：上次处理到的时间点
+    watermark         DATETIME NULL,
+    last_run_at       DATETIME NULL,
+    last_duration_ms  INT NULL,
+    last_rows         INT NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- =========================================================
+-- 13. SESSION_STATS / EVENT_STATS (materialized registration counts)
+-- =========================================================
+CREATE TABLE SESSION_STATS (
+    session_id        INT PRIMARY KEY,
+    eid               INT NOT NULL,
+    registered_count  INT NOT NULL DEFAULT 0,
+    waiting_count     INT NOT NULL DEFAULT 0,
+    cancelled_count   INT NOT NULL DEFAULT 0,
+    -- checkin_time 不为空的报名数（含签到后取消的记录）
+    checked_in_count  INT NOT NULL DEFAULT 0,
+    updated_at        DATETIME NOT NULL,
+
+    CONSTRAINT fk_session_stats_session
+        FOREIGN KEY (session_id) REFERENCES EVENT_SESSION(session_id)
+        ON UPDATE CASCADE ON DELETE CASCADE,
+
+    INDEX idx_session_stats_eid (eid)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE EVENT_STATS (
+    eid               INT PRIMARY KEY,
+    registered_count  INT NOT NULL DEFAULT 0,
+    waiting_count     INT NOT NULL DEFAULT 0,
+    cancelled_count   INT NOT NULL DEFAULT 0,
+    checked_in_count  INT NOT NULL DEFAULT 0,
+    updated_at        DATETIME NOT NULL,
+
+    CONSTRAINT fk_event_stats_event
+        FOREIGN KEY (eid) REFERENCES EVENT(eid)
+        ON UPDATE CASCADE ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- Business semantics (handled in application layer):
+--   - Updated incrementally in the same transaction as every REGISTRATION
+--     write (stats_service.record_registration_changes); a missing row means 0;
+--   - Verified / repaired by stats_service.reconcile_registration_stats
+--     (run_stats_reconcile.py);
+--   - With ANALYTICS_STATS_SOURCE=materialized, analytics read these rows by PK.
+
+-- =========================================================
+-- 14. REGISTRATION_HOURLY (registration trend rollup)
+-- =========================================================
+CREATE TABLE REGISTRATION_HOURLY (
+    eid                 INT NOT NULL,
+    -- register_time 截到整点
+    bucket_start        DATETIME NOT NULL,
+    registration_count  INT NOT NULL DEFAULT 0,
+    updated_at          DATETIME NOT NULL,
+
+    PRIMARY KEY (eid, bucket_start),
+
+    CONSTRAINT fk_registration_hourly_event
+        FOREIGN KEY (eid) REFERENCES EVENT(eid)
+        ON UPDATE CASCADE ON DELETE CASCADE,
+
+    INDEX idx_registration_hourly_bucket (bucket_start)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- Business semantics (handled in application layer):
+--   - One row per event and hour: registrations (any status) whose current
+--     register_time falls in that hour; maintained by the same incremental
+--     path as SESSION_STATS and rebuilt per event by the reconcile job;
+--   - Day / week trends sum these rows, so a trend query reads O(buckets) rows.
+
 -- =========================================================
 -- End of schema.sql
 -- =========================================================
\ No newline at end of file
@@ -10,9 +10,18 @@ SQLAlchemy ORM 的数据库连接与 Session 工厂。
         ...  # ORM 查询
     finally:
         db.close()
+
+说明：
+    这里的 engine 连接池也是 raw SQL 路径（backend.db.get_connection）
+    的默认连接来源，整个进程只维护这一组 MySQL 连接，
+    池大小等参数统一由 DB_POOL_* 配置控制。
 """
+import os
+import threading
+import time
+from typing import Any, Dict
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, exc
 from sqlalchemy.orm import sessionmaker, scoped_session
 
 from backend.config import load_config
@@ -23,10 +32,79 @@ _config = load_config()
 engine = create_engine(
     _config.DATABASE_URL,
     echo=False,          # 如果想看 SQL，在开发阶段可以改成 True
-    pool_pre_ping=True,
+    pool_size=_config.DB_POOL_SIZE,
+    max_overflow=0,
+    pool_timeout=_config.DB_POOL_TIMEOUT_SECONDS,
+    pool_recycle=int(_config.DB_POOL_RECYCLE_SECONDS),
 )
 
 # 全局 Session 工厂（线程安全）
 SessionLocal = scoped_session(
     sessionmaker(bind=engine, autocommit=False, autoflush=False)
-)
\ No newline at end of file
+)
+
+
+# ---------------- 连接池健康检查与统计 ----------------
+
+_pool_counters = {"created": 0, "recycled": 0}
+_pool_counters_lock = threading.Lock()
+
+
+def _bump(name: str) -> None:
+    with _pool_counters_lock:
+        _pool_counters[name] += 1
+
+
+@event.listens_for(engine, "connect")
+def _on_connect(dbapi_connection, connection_record):
+    _bump("created")
+
+
+@event.listens_for(engine, "close")
+def _on_close(dbapi_connection, connection_record):
+    _bump("recycled")
+
+
+@event.listens_for(engine, "checkin")
+def _on_checkin(dbapi_connection, connection_record):
+    if connection_record is not None:
+        connection_record.info["last_used"] = time.monotonic()
+
+
+@event.listens_for(engine, "checkout")
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    """
+    借出前的健康检查（替代每次都 ping 的 pool_pre_ping）：
+      - 空闲超过 DB_POOL_MAX_IDLE_SECONDS：直接淘汰，重建连接；
+      - 空闲超过 DB_POOL_PRE_PING_SECONDS：ping 一次，失败则重建。
+    抛出 DisconnectionError 后 SQLAlchemy 会作废该连接并重试。
+    """
+    last_used = connection_record.info.get("last_used")
+    if last_used is None:
+        return
+    idle = time.monotonic() - last_used
+    if 0 < _config.DB_POOL_MAX_IDLE_SECONDS <= idle:
+        raise exc.DisconnectionError("connection idle too long, evicting")
+    if idle >= _config.DB_POOL_PRE_PING_SECONDS:
+        try:
+            dbapi_connection.ping(reconnect=False)
+        except Exception as e:
+            raise exc.DisconnectionError(str(e))
+
+
+# fork 出来的子进程（gunicorn worker）不能复用父进程的 socket
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=lambda: engine.dispose(close=False))
+
+
+def get_engine_pool_stats() -> Dict[str, Any]:
+    """返回 engine 连接池统计：size / idle / checked_out / created / recycled。"""
+    pool = engine.pool
+    with _pool_counters_lock:
+        counters = dict(_pool_counters)
+    return {
+        "max_size": pool.size(),
+        "idle": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        **counters,
+    }
@@ -11,6 +11,7 @@ from sqlalchemy import (
     Boolean,
     CheckConstraint,
     PrimaryKeyConstraint,
+    Computed,
 )
 from sqlalchemy.orm import declarative_base, relationship
 
@@ -26,6 +27,7 @@ class User(Base):
     password = Column(String(255), nullable=False)
     role = Column(Enum("visitor", "staff", "admin", name="user_role"), nullable=False)
     blocked_until = Column(DateTime, nullable=True)
+    token_version = Column(Integer, nullable=False, default=0)
 
     registrations = relationship("Registration", back_populates="user")
     event_user_groups = relationship("EventUserGroup", back_populates="user")
@@ -84,12 +86,19 @@ class EventSession(Base):
     capacity = Column(Integer, nullable=False)
     current_registered = Column(Integer, nullable=False, default=0)
     waiting_list_limit = Column(Integer, nullable=False, default=0)
+    waiting_seq = Column(Integer, nullable=False, default=0)
+    current_waiting = Column(Integer, nullable=False, default=0)
+    version = Column(Integer, nullable=False, default=0)
     status = Column(Enum("open", "closed", name="session_status"), nullable=False)
+    duration_minutes = Column(
+        Integer, Computed("TIMESTAMPDIFF(MINUTE, start_time, end_time)", persisted=True)
+    )
 
     __table_args__ = (
         CheckConstraint("capacity > 0", name="chk_session_capacity"),
         CheckConstraint("current_registered >= 0", name="chk_session_current_registered"),
         CheckConstraint("waiting_list_limit >= 0", name="chk_session_waiting_list"),
+        CheckConstraint("current_waiting >= 0", name="chk_session_current_waiting"),
     )
 
     event = relationship("Event", back_populates="sessions")
@@ -160,4 +169,55 @@ class EventUserGroup(Base):
 
     user = relationship("User", back_populates="event_user_groups")
     event = relationship("Event", back_populates="event_user_groups")
-    group = relationship("AudienceGroup", back_populates="event_user_groups")
\ No newline at end of file
+    group = relationship("AudienceGroup", back_populates="event_user_groups")
+
+
+class UserNoShowStats(Base):
+    __tablename__ = "USER_NO_SHOW_STATS"
+
+    user_id = Column(Integer, ForeignKey("USER.user_id"), primary_key=True)
+    no_show_count = Column(Integer, nullable=False, default=0)
+    last_no_show_at = Column(DateTime, nullable=True)
+    refreshed_at = Column(DateTime, nullable=False)
+
+
+class JobState(Base):
+    __tablename__ = "JOB_STATE"
+
+    job_name = Column(String(64), primary_key=True)
+    watermark = Column(DateTime, nullable=True)
+    last_run_at = Column(DateTime, nullable=True)
+    last_duration_ms = Column(Integer, nullable=True)
+    last_rows = Column(Integer, nullable=True)
+
+
+class SessionStats(Base):
+    __tablename__ = "SESSION_STATS"
+
+    session_id = Column(Integer, ForeignKey("EVENT_SESSION.session_id"), primary_key=True)
+    eid = Column(Integer, nullable=False, index=True)
+    registered_count = Column(Integer, nullable=False, default=0)
+    waiting_count = Column(Integer, nullable=False, default=0)
+    cancelled_count = Column(Integer, nullable=False, default=0)
+    checked_in_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=False)
+
+
+class EventStats(Base):
+    __tablename__ = "EVENT_STATS"
+
+    eid = Column(Integer, ForeignKey("EVENT.eid"), primary_key=True)
+    registered_count = Column(Integer, nullable=False, default=0)
+    waiting_count = Column(Integer, nullable=False, default=0)
+    cancelled_count = Column(Integer, nullable=False, default=0)
+    checked_in_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=False)
+
+
+class RegistrationHourly(Base):
+    __tablename__ = "REGISTRATION_HOURLY"
+
+    eid = Column(Integer, ForeignKey("EVENT.eid"), primary_key=True)
+    bucket_start = Column(DateTime, primary_key=True, index=True)
+    registration_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=False)
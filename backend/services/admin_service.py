@@ -4,6 +4,15 @@ import csv
 import io
 
 from backend.db import get_connection
+from backend.services.analytics_cube import mark_dimensions_stale as mark_analytics_cube_stale
+from backend.services.auth_service import invalidate_cached_user
+from backend.services.facet_index import mark_stale as mark_facet_index_stale
+from backend.services.stats_service import RegistrationChange, record_registration_change, record_registration_changes
+from backend.services.registration_service import (
+    WAITING_RANK_SQL,
+    _leave_waiting_list,
+    _take_waiting_ticket,
+)
 
 
 ALLOWED_ROLES = {"visitor", "staff", "admin"}
@@ -125,6 +134,9 @@ def update_user(
     if not updates:
         raise AdminError("no fields to update")
 
+    # 让已签发 token 中的声明（角色、封禁时间等）失效，见 auth_service AUTH_MODE=claims
+    updates.append("token_version = token_version + 1")
+
     conn = get_connection()
     try:
         with conn.cursor() as cursor:
@@ -142,6 +154,8 @@ def update_user(
     finally:
         conn.close()
 
+    invalidate_cached_user(user_id)
+
     # return updated info
     users = list_users()
     for user in users:
@@ -154,6 +168,43 @@ def delete_user(user_id: int) -> None:
     conn = get_connection()
     try:
         with conn.cursor() as cursor:
+            # 报名记录随用户级联删除：先锁定涉及的场次，从报名统计中扣除这些记录
+            cursor.execute(
+                """
+                SELECT s.session_id
+                FROM EVENT_SESSION s
+                JOIN REGISTRATION r ON r.session_id = s.session_id
+                WHERE r.user_id = %s
+                ORDER BY s.session_id
+                FOR UPDATE
+                """,
+                (user_id,),
+            )
+            session_ids = [r["session_id"] for r in cursor.fetchall()]
+            if session_ids:
+                # 报名记录的级联删除不会改 version：手动递增，让 ETag 与分析立方体感知变化
+                placeholders = ", ".join(["%s"] * len(session_ids))
+                cursor.execute(
+                    f"UPDATE EVENT_SESSION SET version = version + 1 WHERE session_id IN ({placeholders})",
+                    session_ids,
+                )
+                cursor.execute(
+                    "SELECT session_id, status, checkin_time, register_time FROM REGISTRATION WHERE user_id = %s",
+                    (user_id,),
+                )
+                record_registration_changes(
+                    cursor,
+                    [
+                        RegistrationChange(
+                            r["session_id"],
+                            r["status"],
+                            None,
+                            old_checked_in=r["checkin_time"] is not None,
+                            old_register_time=r["register_time"],
+                        )
+                        for r in cursor.fetchall()
+                    ],
+                )
             cursor.execute("DELETE FROM `USER` WHERE user_id = %s", (user_id,))
         conn.commit()
     except Exception:
@@ -162,6 +213,8 @@ def delete_user(user_id: int) -> None:
     finally:
         conn.close()
 
+    invalidate_cached_user(user_id)
+
 
 def list_tags() -> List[Dict[str, Any]]:
     conn = get_connection()
@@ -218,6 +271,8 @@ def update_tag(tag_id: int, tag_name: str) -> Dict[str, Any]:
                 (tag_name, tag_id),
             )
         conn.commit()
+        mark_facet_index_stale()
+        mark_analytics_cube_stale()
         return {"tag_id": tag_id, "tag_name": tag_name}
     except Exception:
         conn.rollback()
@@ -232,6 +287,8 @@ def delete_tag(tag_id: int) -> None:
         with conn.cursor() as cursor:
             cursor.execute("DELETE FROM TAG WHERE tag_id = %s", (tag_id,))
         conn.commit()
+        mark_facet_index_stale()
+        mark_analytics_cube_stale()
     except Exception:
         conn.rollback()
         raise
@@ -243,7 +300,8 @@ def force_set_registration(user_id: int, session_id: int, status: Literal["regis
     if status not in ALLOWED_REG_STATUS:
         raise AdminError("invalid registration status")
 
-    now = datetime.now()
+    # 截到整秒，与库中 DATETIME(0) 的 register_time 一致（小时汇总按它分桶）
+    now = datetime.now().replace(microsecond=0)
     conn = get_connection()
     try:
         with conn.cursor() as cursor:
@@ -262,7 +320,7 @@ def force_set_registration(user_id: int, session_id: int, status: Literal["regis
 
             cursor.execute(
                 """
-                SELECT status
+                SELECT status, queue_position, checkin_time, register_time
                 FROM REGISTRATION
                 WHERE user_id = %s AND session_id = %s
                 FOR UPDATE
@@ -270,6 +328,7 @@ def force_set_registration(user_id: int, session_id: int, status: Literal["regis
                 (user_id, session_id),
             )
             existing = cursor.fetchone()
+            was_waiting = bool(existing and existing["status"] == "waiting")
 
             delta_registered = 0
             queue_position = None
@@ -301,11 +360,11 @@ def force_set_registration(user_id: int, session_id: int, status: Literal["regis
                         (user_id, session_id, now),
                     )
             elif status == "waiting":
-                cursor.execute(
-                    "SELECT COUNT(*) AS cnt FROM REGISTRATION WHERE session_id = %s AND status = 'waiting'",
-                    (session_id,),
-                )
-                queue_position = (cursor.fetchone()["cnt"] or 0) + 1
+                # 已在候补中则保留原候补号，否则排到队尾
+                if was_waiting:
+                    ticket = existing["queue_position"]
+                else:
+                    ticket = _take_waiting_ticket(cursor, session_id)
                 if existing:
                     if existing["status"] == "registered":
                         delta_registered = -1
@@ -318,7 +377,7 @@ def force_set_registration(user_id: int, session_id: int, status: Literal["regis
                             queue_position = %s
                         WHERE user_id = %s AND session_id = %s
                         """,
-                        (now, queue_position, user_id, session_id),
+                        (now, ticket, user_id, session_id),
                     )
                 else:
                     cursor.execute(
@@ -327,8 +386,17 @@ def force_set_registration(user_id: int, session_id: int, status: Literal["regis
                             user_id, session_id, register_time, status, checkin_time, queue_position
                         ) VALUES (%s, %s, %s, 'waiting', NULL, %s)
                         """,
-                        (user_id, session_id, now, queue_position),
+                        (user_id, session_id, now, ticket),
                     )
+                cursor.execute(
+                    f"""
+                    SELECT {WAITING_RANK_SQL} AS queue_position
+                    FROM REGISTRATION r
+                    WHERE r.user_id = %s AND r.session_id = %s
+                    """,
+                    (user_id, session_id),
+                )
+                queue_position = cursor.fetchone()["queue_position"]
             else:  # cancelled
                 if existing:
                     if existing["status"] == "registered":
@@ -344,16 +412,34 @@ def force_set_registration(user_id: int, session_id: int, status: Literal["regis
                         (user_id, session_id),
                     )
 
-            if delta_registered != 0:
-                cursor.execute(
-                    """
-                    UPDATE EVENT_SESSION
-                    SET current_registered = GREATEST(0, current_registered + %s)
-                    WHERE session_id = %s
-                    """,
-                    (delta_registered, session_id),
+            if was_waiting and status != "waiting":
+                _leave_waiting_list(cursor, session_id)
+
+            # 三种目标状态都会清空 checkin_time；不存在的记录设为 cancelled 时不写入；
+            # registered / waiting 会把 register_time 改为当前时间，cancelled 保留原值
+            if existing or status != "cancelled":
+                moved = status != "cancelled"
+                record_registration_change(
+                    cursor,
+                    session_id,
+                    existing["status"] if existing else None,
+                    status,
+                    old_checked_in=bool(existing and existing["checkin_time"] is not None),
+                    old_register_time=existing["register_time"] if existing and moved else None,
+                    new_register_time=now if moved else None,
                 )
 
+            # 无论名额是否变化都递增 version（报名记录本身已改变）
+            cursor.execute(
+                """
+                UPDATE EVENT_SESSION
+                SET current_registered = GREATEST(0, current_registered + %s),
+                    version = version + 1
+                WHERE session_id = %s
+                """,
+                (delta_registered, session_id),
+            )
+
         conn.commit()
         return {
             "user_id": user_id,
@@ -477,6 +563,11 @@ def assign_event_user_group(eid: int, user_id: int, group_id: int) -> Dict[str,
                 """,
                 (user_id, eid, group_id),
             )
+            # 分组变化会影响按群体的统计，递增该活动各场次的 version 让 ETag 失效
+            cursor.execute(
+                "UPDATE EVENT_SESSION SET version = version + 1 WHERE eid = %s",
+                (eid,),
+            )
         conn.commit()
         return {
             "eid": eid,
@@ -506,7 +597,7 @@ def export_event_registrations_csv(eid: int) -> tuple[str, bytes]:
                 raise AdminError("event not found")
 
             cursor.execute(
-                """
+                f"""
                 SELECT
                     s.session_id,
                     s.start_time,
@@ -516,7 +607,7 @@ def export_event_registrations_csv(eid: int) -> tuple[str, bytes]:
                     u.email,
                     u.role,
                     r.status,
-                    r.queue_position,
+                    {WAITING_RANK_SQL} AS queue_position,
                     r.checkin_time,
                     r.register_time,
                     g.group_name
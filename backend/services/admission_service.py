@@ -0,0 +1,486 @@
+# backend/services/admission_service.py
+"""
+报名准入引擎（REGISTRATION_MODE=batched）。
+
+与 register_for_session 的区别：
+  - 每个场次在进程内维护一个“剩余名额”计数，名额在内存里原子地发放，
+    热门场次的并发报名不再逐个排队等待 EVENT_SESSION 的行锁；
+  - 拿到名额的请求进入该场次的待写批次，由第一个到达的线程（leader）
+    等待最多 ADMISSION_BATCH_WAIT_MS 毫秒或凑满 ADMISSION_BATCH_SIZE 条后，
+    在一个事务里批量完成校验并写入 REGISTRATION（group commit）；
+    leader 只写一批，之后把 leader 身份交给队首仍在等待的请求线程，
+    持续高并发时也不会有某个请求一直替别人写批次而迟迟不返回；
+  - 调用方在自己的批次提交后才返回，因此返回 registered 时数据已落库。
+
+防超卖：
+  内存计数只是“提示”。批次最终通过一条条件 UPDATE
+      current_registered = current_registered + k
+      WHERE current_registered + k <= capacity
+  占用名额；多个 worker 进程同时发放导致条件不满足时，整批回滚，
+  批内请求逐个回退到 register_for_session（行锁路径），并重新加载计数。
+
+计数为 0（场次已满）、场次关闭或不存在时，同样直接走 register_for_session，
+由它处理候补队列与错误提示。
+"""
+import threading
+import time
+from datetime import timedelta
+from typing import Any, Dict, List, Optional
+
+from backend.config import load_config
+from backend.db import get_connection
+from backend.services.auth_service import invalidate_cached_user
+from backend.services.stats_service import RegistrationChange, record_registration_changes
+from backend.services.registration_service import (
+    BLOCK_DAYS,
+    NO_SHOW_WINDOW_DAYS,
+    WAITING_RANK_SQL,
+    RegistrationError,
+    _build_bilingual_message_for_register,
+    _find_no_show_offenders,
+    _get_utc_now,
+    register_for_session,
+)
+
+config = load_config()
+
+
+class _CapacityConflict(Exception):
+    """条件 UPDATE 未命中：其它进程已占用了名额，内存计数已过时。"""
+    pass
+
+
+class _Ticket:
+    """一次报名请求在批次中的占位，leader 写完批次后填入结果并唤醒调用线程。"""
+
+    __slots__ = ("user_id", "done", "result", "error", "fallback", "promoted")
+
+    def __init__(self, user_id: int):
+        self.user_id = user_id
+        self.done = threading.Event()
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[Exception] = None
+        self.fallback = False
+        self.promoted = False
+
+    def resolve(self, result: Dict[str, Any]) -> None:
+        self.result = result
+        self.done.set()
+
+    def fail(self, error: Exception) -> None:
+        self.error = error
+        self.done.set()
+
+    def fall_back(self) -> None:
+        self.fallback = True
+        self.done.set()
+
+    def promote(self) -> None:
+        """唤醒调用线程，让它接任该场次的 leader（结果尚未产生）。"""
+        self.promoted = True
+        self.done.set()
+
+
+class _SessionSlot:
+    """单个场次的进程内状态：剩余名额提示、待写批次、leader 标记。"""
+
+    def __init__(self, session_id: int):
+        self.session_id = session_id
+        self.cond = threading.Condition()
+        self.remaining = 0
+        self.inflight = 0          # 已发放、尚未落库/归还的名额
+        self.is_open = False
+        self.eid: Optional[int] = None
+        self.allow_multi_session = False
+        self.loaded_at: Optional[float] = None
+        self.pending: List[_Ticket] = []
+        self.leader_active = False
+
+
+class AdmissionEngine:
+    def __init__(self, batch_size: int = 100, batch_wait: float = 0.005, counter_ttl: float = 5.0):
+        self.batch_size = max(1, batch_size)
+        self.batch_wait = batch_wait
+        self.counter_ttl = counter_ttl
+        self._slots: Dict[int, _SessionSlot] = {}
+        self._slots_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {"admitted": 0, "batches": 0, "fallbacks": 0, "conflicts": 0}
+
+    # ---------------- 对外入口 ----------------
+
+    def submit(self, user_id: int, session_id: int) -> Dict[str, Any]:
+        """与 register_for_session 相同的入参与返回结构。"""
+        slot = self._get_slot(session_id)
+
+        ticket = None
+        leader = False
+        with slot.cond:
+            if slot.is_open and slot.remaining > 0:
+                slot.remaining -= 1
+                slot.inflight += 1
+                ticket = _Ticket(user_id)
+                slot.pending.append(ticket)
+                if not slot.leader_active:
+                    slot.leader_active = True
+                    leader = True
+                elif len(slot.pending) >= self.batch_size:
+                    slot.cond.notify_all()
+
+        if ticket is None:
+            return self._fallback(user_id, session_id)
+
+        if leader:
+            self._lead(slot)
+        ticket.done.wait()
+        while ticket.promoted:
+            # 前任 leader 写完一批后把身份交给了本请求；本请求仍在待写队列里，由自己写入
+            ticket.promoted = False
+            ticket.done.clear()
+            self._lead(slot)
+            ticket.done.wait()
+
+        if ticket.fallback:
+            return self._fallback(user_id, session_id)
+        if ticket.error is not None:
+            raise ticket.error
+        return ticket.result  # type: ignore[return-value]
+
+    def invalidate(self, session_id: int | None = None) -> None:
+        """场次容量/状态在其它路径被修改后调用，下次报名时重新加载计数。"""
+        with self._slots_lock:
+            slots = list(self._slots.values()) if session_id is None else [self._slots.get(session_id)]
+        for slot in slots:
+            if slot is not None:
+                with slot.cond:
+                    slot.loaded_at = None
+
+    def stats(self) -> Dict[str, int]:
+        with self._stats_lock:
+            return dict(self._stats)
+
+    # ---------------- 计数加载 ----------------
+
+    def _get_slot(self, session_id: int) -> _SessionSlot:
+        with self._slots_lock:
+            slot = self._slots.get(session_id)
+            if slot is None:
+                slot = self._slots[session_id] = _SessionSlot(session_id)
+
+        now = time.monotonic()
+        with slot.cond:
+            if slot.loaded_at is not None and now - slot.loaded_at < self.counter_ttl:
+                return slot
+
+        row = self._load_session(session_id)
+        with slot.cond:
+            if row is None:
+                slot.is_open = False
+                slot.remaining = 0
+            else:
+                slot.is_open = row["status"] == "open"
+                slot.eid = row["eid"]
+                slot.allow_multi_session = bool(row["allow_multi_session"])
+                free = row["capacity"] - row["current_registered"] - slot.inflight
+                slot.remaining = max(0, free)
+            slot.loaded_at = time.monotonic()
+        return slot
+
+    def _load_session(self, session_id: int) -> Optional[Dict[str, Any]]:
+        conn = get_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    """
+                    SELECT
+                        s.eid,
+                        s.capacity,
+                        s.current_registered,
+                        s.status,
+                        e.allow_multi_session
+                    FROM EVENT_SESSION s
+                    JOIN EVENT e ON e.eid = s.eid
+                    WHERE s.session_id = %s
+                    """,
+                    (session_id,),
+                )
+                return cursor.fetchone()
+        finally:
+            conn.close()
+
+    # ---------------- 批次写入 ----------------
+
+    def _lead(self, slot: _SessionSlot) -> None:
+        """
+        leader：先等一小段时间凑批，写入一批后交出 leader 身份：
+        队列里还有请求时唤醒队首请求的线程接任，否则清除 leader 标记。
+        """
+        deadline = time.monotonic() + self.batch_wait
+        with slot.cond:
+            while len(slot.pending) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                slot.cond.wait(remaining)
+            batch = slot.pending[: self.batch_size]
+            del slot.pending[: self.batch_size]
+        if batch:
+            self._flush(slot, batch)
+        with slot.cond:
+            if slot.pending:
+                slot.pending[0].promote()
+            else:
+                slot.leader_active = False
+
+    def _flush(self, slot: _SessionSlot, batch: List[_Ticket]) -> None:
+        # 同一批里重复的 user_id：只处理第一条，其余在本批提交 / 回滚之后才回退到行锁路径，
+        # 否则它们的行锁路径（先锁场次行、再锁报名行）会与本批（先锁报名行、再改场次行）交叉死锁
+        unique: List[_Ticket] = []
+        duplicates: List[_Ticket] = []
+        seen = set()
+        for t in batch:
+            (duplicates if t.user_id in seen else unique).append(t)
+            seen.add(t.user_id)
+
+        admitted = 0
+        try:
+            admitted = self._write_batch(slot, unique)
+        except _CapacityConflict:
+            self._bump("conflicts")
+            for t in unique:
+                t.fall_back()
+        except Exception:
+            # 未知错误：整批已回滚，逐个回退到行锁路径，由其给出准确的错误信息
+            for t in unique:
+                t.fall_back()
+        finally:
+            with slot.cond:
+                slot.inflight -= len(batch)
+                if admitted < len(batch):
+                    # 未使用的名额归还
+                    slot.remaining += len(batch) - admitted
+                if admitted == 0 and any(t.fallback for t in unique):
+                    slot.loaded_at = None  # 计数可能已过时，下次报名时重新加载
+            self._bump("batches")
+            self._bump("admitted", admitted)
+            for t in duplicates:
+                t.fall_back()
+
+    def _write_batch(self, slot: _SessionSlot, batch: List[_Ticket]) -> int:
+        """
+        在一个事务里处理整批请求，返回成功占用名额的人数。
+        batch 中的 user_id 互不相同（重复的由 _flush 剔除）。
+        单个请求的业务错误只影响自己，不影响同批其他人；
+        所有结果在事务提交后才回填给 ticket，回滚时由 _flush 统一回退。
+        """
+        session_id = slot.session_id
+        now = _get_utc_now()
+        now_naive = now.replace(tzinfo=None)
+
+        by_user: Dict[int, _Ticket] = {t.user_id: t for t in batch}
+
+        # user_id -> 结果 dict 或 RegistrationError（提交后再回填）
+        outcomes: Dict[int, Any] = {}
+        newly_blocked: List[int] = []
+
+        conn = get_connection()
+        try:
+            with conn.cursor() as cursor:
+                candidates = dict(by_user)
+
+                def _in(ids) -> str:
+                    return ", ".join(["%s"] * len(ids))
+
+                # 1) 用户是否存在 / 是否已封禁
+                ids = list(candidates)
+                cursor.execute(
+                    f"SELECT user_id, blocked_until FROM `USER` WHERE user_id IN ({_in(ids)})",
+                    ids,
+                )
+                users = {r["user_id"]: r for r in cursor.fetchall()}
+                for uid in ids:
+                    row = users.get(uid)
+                    if row is None:
+                        candidates.pop(uid)
+                        outcomes[uid] = RegistrationError("用户不存在")
+                    elif row["blocked_until"] is not None and row["blocked_until"] > now_naive:
+                        candidates.pop(uid)
+                        outcomes[uid] = RegistrationError(
+                            f"账号已被封禁，解封时间：{row['blocked_until']}"
+                        )
+
+                # 2) 最近 30 天爽约次数达到阈值者批量封禁（一条集合查询）
+                ids = list(candidates)
+                if ids:
+                    to_block = _find_no_show_offenders(cursor, ids, now)
+                    if to_block:
+                        blocked_until = now + timedelta(days=BLOCK_DAYS)
+                        cursor.execute(
+                            f"""
+                            UPDATE `USER`
+                            SET blocked_until = %s,
+                                token_version = token_version + 1
+                            WHERE user_id IN ({_in(to_block)})
+                            """,
+                            [blocked_until] + to_block,
+                        )
+                        newly_blocked = to_block
+                        for uid in to_block:
+                            candidates.pop(uid)
+                            outcomes[uid] = RegistrationError(
+                                f"最近 {NO_SHOW_WINDOW_DAYS} 天内爽约次数过多，"
+                                f"账号已被封禁至 {blocked_until}"
+                            )
+
+                # 3) 不允许多场次报名的活动：排除已在其他场次报名/候补的用户
+                ids = list(candidates)
+                if ids and not slot.allow_multi_session:
+                    cursor.execute(
+                        f"""
+                        SELECT DISTINCT r.user_id
+                        FROM REGISTRATION r
+                        JOIN EVENT_SESSION es ON r.session_id = es.session_id
+                        WHERE r.user_id IN ({_in(ids)})
+                          AND es.eid = %s
+                          AND r.status IN ('registered', 'waiting')
+                          AND r.session_id <> %s
+                        """,
+                        ids + [slot.eid, session_id],
+                    )
+                    for r in cursor.fetchall():
+                        candidates.pop(r["user_id"])
+                        outcomes[r["user_id"]] = RegistrationError(
+                            "You are already registered for another session of this event"
+                        )
+
+                # 4) 已有报名记录：registered / waiting 不重复报名，直接返回现状；
+                #    cancelled 记录留待复用，统计增量需要它原来的签到状态与报名时间
+                cancelled: Dict[int, Dict[str, Any]] = {}
+                ids = list(candidates)
+                if ids:
+                    cursor.execute(
+                        f"""
+                        SELECT r.user_id, r.status, r.checkin_time, r.register_time, {WAITING_RANK_SQL} AS queue_position
+                        FROM REGISTRATION r
+                        WHERE r.session_id = %s AND r.user_id IN ({_in(ids)})
+                        FOR UPDATE
+                        """,
+                        [session_id] + ids,
+                    )
+                    for r in cursor.fetchall():
+                        if r["status"] not in ("registered", "waiting"):
+                            cancelled[r["user_id"]] = r
+                            continue
+                        base_message_zh = "你已报名该场次（当前状态：%s）" % r["status"]
+                        candidates.pop(r["user_id"])
+                        outcomes[r["user_id"]] = {
+                                "session_id": session_id,
+                                "user_id": r["user_id"],
+                                "status": r["status"],
+                                "queue_position": r["queue_position"],
+                                **_build_bilingual_message_for_register(
+                                    status=r["status"],
+                                    base_message_zh=base_message_zh,
+                                    queue_position=r["queue_position"],
+                                ),
+                            }
+
+                admitted = list(candidates)
+                k = len(admitted)
+
+                # 5) 一次性占用 k 个名额；条件不满足说明计数已过时
+                if k:
+                    cursor.execute(
+                        """
+                        UPDATE EVENT_SESSION
+                        SET current_registered = current_registered + %s,
+                            version = version + 1
+                        WHERE session_id = %s
+                          AND status = 'open'
+                          AND current_registered + %s <= capacity
+                        """,
+                        (k, session_id, k),
+                    )
+                    if cursor.rowcount == 0:
+                        raise _CapacityConflict()
+
+                    # 6) 批量写 REGISTRATION；已取消的旧记录通过 ON DUPLICATE KEY 复用
+                    values_sql = ", ".join(["(%s, %s, %s, 'registered', NULL, NULL)"] * k)
+                    params: List[Any] = []
+                    for uid in admitted:
+                        params.extend([uid, session_id, now])
+                    cursor.execute(
+                        f"""
+                        INSERT INTO REGISTRATION (
+                            user_id, session_id, register_time, status, checkin_time, queue_position
+                        ) VALUES {values_sql}
+                        ON DUPLICATE KEY UPDATE
+                            status = 'registered',
+                            register_time = VALUES(register_time),
+                            checkin_time = NULL,
+                            queue_position = NULL
+                        """,
+                        params,
+                    )
+                    record_registration_changes(
+                        cursor,
+                        [
+                            RegistrationChange(
+                                session_id,
+                                "cancelled" if uid in cancelled else None,
+                                "registered",
+                                old_checked_in=uid in cancelled and cancelled[uid]["checkin_time"] is not None,
+                                old_register_time=cancelled[uid]["register_time"] if uid in cancelled else None,
+                                new_register_time=now,
+                            )
+                            for uid in admitted
+                        ],
+                    )
+
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+        for uid in newly_blocked:
+            invalidate_cached_user(uid)
+
+        bilingual = _build_bilingual_message_for_register(
+            status="registered",
+            base_message_zh="报名成功",
+        )
+        for uid in admitted:
+            outcomes[uid] = {
+                "session_id": session_id,
+                "user_id": uid,
+                "status": "registered",
+                "queue_position": None,
+                **bilingual,
+            }
+
+        for uid, ticket in by_user.items():
+            outcome = outcomes[uid]
+            if isinstance(outcome, Exception):
+                ticket.fail(outcome)
+            else:
+                ticket.resolve(outcome)
+        return k
+
+    # ---------------- 其它 ----------------
+
+    def _fallback(self, user_id: int, session_id: int) -> Dict[str, Any]:
+        self._bump("fallbacks")
+        return register_for_session(user_id=user_id, session_id=session_id)
+
+    def _bump(self, name: str, n: int = 1) -> None:
+        with self._stats_lock:
+            self._stats[name] += n
+
+
+admission_engine = AdmissionEngine(
+    batch_size=config.ADMISSION_BATCH_SIZE,
+    batch_wait=config.ADMISSION_BATCH_WAIT_MS / 1000.0,
+    counter_ttl=config.ADMISSION_COUNTER_TTL_SECONDS,
+)
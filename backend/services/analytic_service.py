@@ -1,10 +1,11 @@
 # backend/services/analytic_service.py
-from datetime import datetime
-from typing import Dict, Any
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
 
-from sqlalchemy import func
+from sqlalchemy import and_, case, func, tuple_
 from sqlalchemy.orm import Session
 
+from backend.config import load_config
 from backend.db_orm import SessionLocal
 from backend.models.models import (
     Event,
@@ -17,7 +18,13 @@ from backend.models.models import (
     Tag,
     EventType,
     Organization,
+    SessionStats,
+    RegistrationHourly,
 )
+from backend.services.analytics_cube import get_analytics_cube
+from backend.utils.pagination import RegistrationCursor, encode_registration_cursor
+
+config = load_config()
 
 
 class AnalyticError(Exception):
@@ -28,156 +35,325 @@ def _get_db() -> Session:
     return SessionLocal()
 
 
-def get_event_overview(eid: int, start: datetime | None = None, end: datetime | None = None) -> Dict[str, Any]:
-    db = _get_db()
-    try:
-        event = db.query(Event).filter(Event.eid == eid).first()
-        if not event:
-            raise AnalyticError("活动不存在")
-
-        session_filter = [EventSession.eid == eid]
-        if start:
-            session_filter.append(EventSession.start_time >= start)
-        if end:
-            session_filter.append(EventSession.start_time < end)
-
-        # 场次数
-        session_count = (
-            db.query(func.count(EventSession.session_id))
-            .filter(*session_filter)
-            .scalar()
-        )
+OVERVIEW_ENGINES = ("aggregated", "legacy")
 
-        # 总报名数：从 Registration 出发，显式 select_from
-        total_reg = (
-            db.query(func.count(Registration.user_id))
-            .select_from(Registration)
-            .join(
-                EventSession,
-                Registration.session_id == EventSession.session_id,
-            )
-            .filter(*session_filter)
-            .scalar()
-        )
 
-        # 各状态人数
-        status_counts = (
-            db.query(
-                Registration.status,
-                func.count("*").label("cnt"),
-            )
-            .select_from(Registration)
-            .join(
-                EventSession,
-                Registration.session_id == EventSession.session_id,
-            )
-            .filter(*session_filter)
-            .group_by(Registration.status)
-            .all()
-        )
+def _use_materialized_stats() -> bool:
+    """报名计数是否读物化表 SESSION_STATS / EVENT_STATS（见 stats_service）。"""
+    return config.ANALYTICS_STATS_SOURCE == "materialized"
 
-        registered_count = 0
-        waiting_count = 0
-        cancelled_count = 0
-        for status, cnt in status_counts:
-            if status == "registered":
-                registered_count = cnt
-            elif status == "waiting":
-                waiting_count = cnt
-            elif status == "cancelled":
-                cancelled_count = cnt
-
-        # 已签到人数
-        checked_in_count = (
-            db.query(func.count("*"))
-            .select_from(Registration)
-            .join(
-                EventSession,
-                Registration.session_id == EventSession.session_id,
-            )
-            .filter(
-                *session_filter,
-                Registration.checkin_time.isnot(None),
-            )
-            .scalar()
-        )
 
-        tags = (
-            db.query(Tag.tag_name)
-            .select_from(EventTag)
-            .join(Tag, Tag.tag_id == EventTag.tag_id)
-            .filter(EventTag.eid == eid)
-            .all()
-        )
+def _count_status(status: str):
+    return func.coalesce(func.sum(case((Registration.status == status, 1), else_=0)), 0)
 
-        sessions = (
-            db.query(EventSession)
-            .filter(*session_filter)
-            .order_by(EventSession.start_time.asc())
-            .all()
-        )
 
-        registrations = (
-            db.query(
-                Registration.user_id,
-                User.name.label("user_name"),
-                User.role.label("user_role"),
-                Registration.status,
-                Registration.register_time,
-                Registration.checkin_time,
-                Registration.session_id,
-                EventSession.start_time.label("session_start"),
-                EventSession.end_time.label("session_end"),
-                EventUserGroup.group_id,
-                AudienceGroup.group_name,
-            )
-            .join(EventSession, Registration.session_id == EventSession.session_id)
-            .join(User, User.user_id == Registration.user_id)
-            .outerjoin(
-                EventUserGroup,
-                (EventUserGroup.user_id == Registration.user_id)
-                & (EventUserGroup.eid == EventSession.eid),
-            )
-            .outerjoin(AudienceGroup, AudienceGroup.group_id == EventUserGroup.group_id)
-            .filter(*session_filter)
-            .all()
+def _registration_counters(materialized: bool) -> List[Any]:
+    """
+    报名计数列：live 为 REGISTRATION 上的条件聚合（需 GROUP BY），
+    materialized 为 SESSION_STATS 的列（按主键外连接，缺行视为 0）。
+    """
+    if materialized:
+        registered = func.coalesce(SessionStats.registered_count, 0)
+        waiting = func.coalesce(SessionStats.waiting_count, 0)
+        cancelled = func.coalesce(SessionStats.cancelled_count, 0)
+        return [
+            (registered + waiting + cancelled).label("total_registrations"),
+            registered.label("registered_count"),
+            waiting.label("waiting_count"),
+            cancelled.label("cancelled_count"),
+            func.coalesce(SessionStats.checked_in_count, 0).label("checked_in_count"),
+        ]
+    return [
+        func.count(Registration.user_id).label("total_registrations"),
+        _count_status("registered").label("registered_count"),
+        _count_status("waiting").label("waiting_count"),
+        _count_status("cancelled").label("cancelled_count"),
+        func.count(Registration.checkin_time).label("checked_in_count"),
+    ]
+
+
+def _session_filter(eid: int, start: datetime | None, end: datetime | None) -> List[Any]:
+    conds = [EventSession.eid == eid]
+    if start:
+        conds.append(EventSession.start_time >= start)
+    if end:
+        conds.append(EventSession.start_time < end)
+    return conds
+
+
+def _session_to_dict(s) -> Dict[str, Any]:
+    return {
+        "session_id": s.session_id,
+        "start_time": s.start_time.isoformat() if s.start_time else None,
+        "end_time": s.end_time.isoformat() if s.end_time else None,
+        "capacity": s.capacity,
+        "current_registered": s.current_registered,
+        "waiting_list_limit": s.waiting_list_limit,
+        "status": s.status,
+    }
+
+
+def _overview_legacy(db: Session, eid: int, session_filter: List[Any]) -> Dict[str, Any]:
+    """旧实现：每个计数各查一次，REGISTRATION⋈EVENT_SESSION 被重复扫描。"""
+    event = db.query(Event).filter(Event.eid == eid).first()
+    if not event:
+        raise AnalyticError("活动不存在")
+
+    # 场次数
+    session_count = (
+        db.query(func.count(EventSession.session_id))
+        .filter(*session_filter)
+        .scalar()
+    )
+
+    # 总报名数：从 Registration 出发，显式 select_from
+    total_reg = (
+        db.query(func.count(Registration.user_id))
+        .select_from(Registration)
+        .join(
+            EventSession,
+            Registration.session_id == EventSession.session_id,
+        )
+        .filter(*session_filter)
+        .scalar()
+    )
+
+    # 各状态人数
+    status_counts = (
+        db.query(
+            Registration.status,
+            func.count("*").label("cnt"),
+        )
+        .select_from(Registration)
+        .join(
+            EventSession,
+            Registration.session_id == EventSession.session_id,
+        )
+        .filter(*session_filter)
+        .group_by(Registration.status)
+        .all()
+    )
+
+    registered_count = 0
+    waiting_count = 0
+    cancelled_count = 0
+    for status, cnt in status_counts:
+        if status == "registered":
+            registered_count = cnt
+        elif status == "waiting":
+            waiting_count = cnt
+        elif status == "cancelled":
+            cancelled_count = cnt
+
+    # 已签到人数
+    checked_in_count = (
+        db.query(func.count("*"))
+        .select_from(Registration)
+        .join(
+            EventSession,
+            Registration.session_id == EventSession.session_id,
+        )
+        .filter(
+            *session_filter,
+            Registration.checkin_time.isnot(None),
         )
+        .scalar()
+    )
+
+    tags = (
+        db.query(Tag.tag_name)
+        .select_from(EventTag)
+        .join(Tag, Tag.tag_id == EventTag.tag_id)
+        .filter(EventTag.eid == eid)
+        .all()
+    )
+
+    sessions = (
+        db.query(EventSession)
+        .filter(*session_filter)
+        .order_by(EventSession.start_time.asc())
+        .all()
+    )
+
+    return {
+        "eid": event.eid,
+        "title": event.title,
+        "location": event.location,
+        "status": event.status,
+        "type_id": event.type_id,
+        "type_name": event.event_type.type_name if event.event_type else None,
+        "org_id": event.org_id,
+        "org_name": event.organization.org_name if event.organization else None,
+        "created_at": event.created_at.isoformat() if event.created_at else None,
+        "updated_at": event.updated_at.isoformat() if event.updated_at else None,
+        "session_count": session_count,
+        "total_registrations": total_reg,
+        "registered_count": registered_count,
+        "waiting_count": waiting_count,
+        "cancelled_count": cancelled_count,
+        "checked_in_count": checked_in_count,
+        "tags": [t.tag_name for t in tags],
+        "sessions": [_session_to_dict(s) for s in sessions],
+    }
+
+
+def _overview_aggregated(db: Session, eid: int, session_filter: List[Any]) -> Dict[str, Any]:
+    """
+    优化实现，固定三条查询：
+    1. 活动 + 类型名 + 组织名（两个外连接，一次取回）；
+    2. 场次 LEFT JOIN 报名，按场次分组，用条件聚合一次算出各状态人数与签到人数；
+       活动级计数由各场次的计数在内存里相加，REGISTRATION 只扫描一遍；
+       ANALYTICS_STATS_SOURCE=materialized 时改为按主键外连接 SESSION_STATS，不再读 REGISTRATION；
+    3. 标签。
+    """
+    event = (
+        db.query(
+            Event.eid,
+            Event.title,
+            Event.location,
+            Event.status,
+            Event.type_id,
+            EventType.type_name,
+            Event.org_id,
+            Organization.org_name,
+            Event.created_at,
+            Event.updated_at,
+        )
+        .outerjoin(EventType, EventType.type_id == Event.type_id)
+        .outerjoin(Organization, Organization.org_id == Event.org_id)
+        .filter(Event.eid == eid)
+        .first()
+    )
+    if not event:
+        raise AnalyticError("活动不存在")
+
+    materialized = _use_materialized_stats()
+    q = db.query(
+        EventSession.session_id,
+        EventSession.start_time,
+        EventSession.end_time,
+        EventSession.capacity,
+        EventSession.current_registered,
+        EventSession.waiting_list_limit,
+        EventSession.status,
+        *_registration_counters(materialized),
+    )
+    if materialized:
+        q = q.outerjoin(SessionStats, SessionStats.session_id == EventSession.session_id)
+    else:
+        q = q.outerjoin(
+            Registration, Registration.session_id == EventSession.session_id
+        ).group_by(EventSession.session_id)
+    sessions = q.filter(*session_filter).order_by(EventSession.start_time.asc()).all()
+
+    tags = (
+        db.query(Tag.tag_name)
+        .select_from(EventTag)
+        .join(Tag, Tag.tag_id == EventTag.tag_id)
+        .filter(EventTag.eid == eid)
+        .all()
+    )
+
+    def _total(field: str) -> int:
+        return sum(int(getattr(s, field)) for s in sessions)
+
+    return {
+        "eid": event.eid,
+        "title": event.title,
+        "location": event.location,
+        "status": event.status,
+        "type_id": event.type_id,
+        "type_name": event.type_name,
+        "org_id": event.org_id,
+        "org_name": event.org_name,
+        "created_at": event.created_at.isoformat() if event.created_at else None,
+        "updated_at": event.updated_at.isoformat() if event.updated_at else None,
+        "session_count": len(sessions),
+        "total_registrations": _total("total_registrations"),
+        "registered_count": _total("registered_count"),
+        "waiting_count": _total("waiting_count"),
+        "cancelled_count": _total("cancelled_count"),
+        "checked_in_count": _total("checked_in_count"),
+        "tags": [t.tag_name for t in tags],
+        "sessions": [_session_to_dict(s) for s in sessions],
+    }
+
+
+def _overview_registrations(
+    db: Session,
+    session_filter: List[Any],
+    limit: Optional[int],
+    cursor: Optional[RegistrationCursor],
+) -> List[Any]:
+    """
+    活动报名明细，按 (session_id, user_id) 排序（idx_registration_session 的索引顺序），
+    limit 为 None 时返回全部；cursor 为上一页最后一行的 (session_id, user_id)。
+    """
+    q = (
+        db.query(
+            Registration.user_id,
+            User.name.label("user_name"),
+            User.role.label("user_role"),
+            Registration.status,
+            Registration.register_time,
+            Registration.checkin_time,
+            Registration.session_id,
+            EventSession.start_time.label("session_start"),
+            EventSession.end_time.label("session_end"),
+            EventUserGroup.group_id,
+            AudienceGroup.group_name,
+        )
+        .join(EventSession, Registration.session_id == EventSession.session_id)
+        .join(User, User.user_id == Registration.user_id)
+        .outerjoin(
+            EventUserGroup,
+            (EventUserGroup.user_id == Registration.user_id)
+            & (EventUserGroup.eid == EventSession.eid),
+        )
+        .outerjoin(AudienceGroup, AudienceGroup.group_id == EventUserGroup.group_id)
+        .filter(*session_filter)
+    )
+    if cursor is not None:
+        q = q.filter(tuple_(Registration.session_id, Registration.user_id) > tuple_(*cursor))
+    q = q.order_by(Registration.session_id.asc(), Registration.user_id.asc())
+    if limit is not None:
+        q = q.limit(limit)
+    return q.all()
+
+
+def get_event_overview(
+    eid: int,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    *,
+    include_registrations: bool = True,
+    registrations_limit: Optional[int] = None,
+    registrations_cursor: Optional[RegistrationCursor] = None,
+    engine: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    活动概览：基本信息、场次、标签与报名计数，可选附带报名明细。
 
-        return {
-            "eid": event.eid,
-            "title": event.title,
-            "location": event.location,
-            "status": event.status,
-            "type_id": event.type_id,
-            "type_name": event.event_type.type_name if event.event_type else None,
-            "org_id": event.org_id,
-            "org_name": event.organization.org_name if event.organization else None,
-            "created_at": event.created_at.isoformat()
-            if event.created_at
-            else None,
-            "updated_at": event.updated_at.isoformat()
-            if event.updated_at
-            else None,
-            "session_count": session_count,
-            "total_registrations": total_reg,
-            "registered_count": registered_count,
-            "waiting_count": waiting_count,
-            "cancelled_count": cancelled_count,
-            "checked_in_count": checked_in_count,
-            "tags": [t.tag_name for t in tags],
-            "sessions": [
-                {
-                    "session_id": s.session_id,
-                    "start_time": s.start_time.isoformat() if s.start_time else None,
-                    "end_time": s.end_time.isoformat() if s.end_time else None,
-                    "capacity": s.capacity,
-                    "current_registered": s.current_registered,
-                    "waiting_list_limit": s.waiting_list_limit,
-                    "status": s.status,
-                }
-                for s in sessions
-            ],
-            "registrations": [
+    include_registrations=False 时不返回 registrations（计数照常）；
+    registrations_limit 不为空时明细按 (session_id, user_id) 分页，
+    并返回 registrations_next_cursor（末页为 None）。
+    engine：aggregated（默认，见 config.ANALYTICS_OVERVIEW_ENGINE）/ legacy。
+    """
+    engine = engine or config.ANALYTICS_OVERVIEW_ENGINE
+    if engine not in OVERVIEW_ENGINES:
+        raise AnalyticError("engine must be one of: " + ", ".join(OVERVIEW_ENGINES))
+
+    db = _get_db()
+    try:
+        session_filter = _session_filter(eid, start, end)
+        build = _overview_aggregated if engine == "aggregated" else _overview_legacy
+        overview = build(db, eid, session_filter)
+
+        if include_registrations:
+            registrations = _overview_registrations(
+                db, session_filter, registrations_limit, registrations_cursor
+            )
+            overview["registrations"] = [
                 {
                     "user_id": r.user_id,
                     "user_name": r.user_name,
@@ -192,71 +368,182 @@ def get_event_overview(eid: int, start: datetime | None = None, end: datetime |
                     "group_name": r.group_name,
                 }
                 for r in registrations
-            ],
-        }
+            ]
+            if registrations_limit is not None:
+                last = registrations[-1] if len(registrations) >= registrations_limit else None
+                overview["registrations_next_cursor"] = (
+                    encode_registration_cursor(last.session_id, last.user_id) if last else None
+                )
+        return overview
     finally:
         db.close()
 
 
-def get_session_stats(session_id: int) -> Dict[str, Any]:
+def get_event_overview_counters(
+    eids: List[int],
+    start: datetime | None = None,
+    end: datetime | None = None,
+) -> Dict[int, Dict[str, Any]]:
+    """
+    多个活动的概览计数（与 get_event_overview 的计数字段一致），一条分组查询：
+    EVENT LEFT JOIN 场次（时间条件放在 ON 里，没有场次的活动也返回）
+    LEFT JOIN 报名（live）或 SESSION_STATS（materialized），按 eid 分组。
+    返回 {eid: {...}}，不存在的 eid 不出现在结果中。
+    """
+    if not eids:
+        return {}
+    session_on = [EventSession.eid == Event.eid]
+    if start:
+        session_on.append(EventSession.start_time >= start)
+    if end:
+        session_on.append(EventSession.start_time < end)
+
     db = _get_db()
     try:
-        # 这里从 EventSession 出发，再 join Event
-        session = (
-            db.query(EventSession)
-            .join(Event, EventSession.eid == Event.eid)
-            .filter(EventSession.session_id == session_id)
-            .first()
-        )
-        if not session:
-            raise AnalyticError("场次不存在")
+        if _use_materialized_stats():
+            registered = func.coalesce(func.sum(SessionStats.registered_count), 0)
+            waiting = func.coalesce(func.sum(SessionStats.waiting_count), 0)
+            cancelled = func.coalesce(func.sum(SessionStats.cancelled_count), 0)
+            counters = [
+                func.count(EventSession.session_id).label("session_count"),
+                (registered + waiting + cancelled).label("total_registrations"),
+                registered.label("registered_count"),
+                waiting.label("waiting_count"),
+                cancelled.label("cancelled_count"),
+                func.coalesce(func.sum(SessionStats.checked_in_count), 0).label("checked_in_count"),
+            ]
+            joined = SessionStats
+            join_on = SessionStats.session_id == EventSession.session_id
+        else:
+            counters = [
+                func.count(func.distinct(EventSession.session_id)).label("session_count"),
+                *_registration_counters(False),
+            ]
+            joined = Registration
+            join_on = Registration.session_id == EventSession.session_id
 
-        # 总报名数
-        total_reg = (
-            db.query(func.count("*"))
-            .select_from(Registration)
-            .filter(Registration.session_id == session_id)
-            .scalar()
+        rows = (
+            db.query(Event.eid, Event.title, Event.status, *counters)
+            .select_from(Event)
+            .outerjoin(EventSession, and_(*session_on))
+            .outerjoin(joined, join_on)
+            .filter(Event.eid.in_(eids))
+            .group_by(Event.eid)
+            .all()
         )
+        return {
+            r.eid: {
+                "eid": r.eid,
+                "title": r.title,
+                "status": r.status,
+                "session_count": int(r.session_count),
+                "total_registrations": int(r.total_registrations),
+                "registered_count": int(r.registered_count),
+                "waiting_count": int(r.waiting_count),
+                "cancelled_count": int(r.cancelled_count),
+                "checked_in_count": int(r.checked_in_count),
+            }
+            for r in rows
+        }
+    finally:
+        db.close()
 
-        # 各状态人数
-        status_counts = (
+
+def get_event_no_show_rates(
+    eids: List[int], now: datetime | None = None
+) -> Dict[int, Dict[str, Any]]:
+    """
+    各活动已结束场次（end_time < now）的爽约率，口径与爽约封禁一致：状态 registered 且未签到。
+    ended_registrations 为已结束场次中 registered 的报名数（含已签到），
+    no_show_rate = no_show_count / ended_registrations（保留 4 位小数，无报名时为 0）。
+    返回 {eid: {...}}，不存在的 eid 不出现在结果中。ANALYTICS_CUBE 开启时由进程内立方体计算。
+    """
+    if not eids:
+        return {}
+    now = now or datetime.now(timezone.utc)
+    if now.tzinfo:
+        now = now.astimezone(timezone.utc).replace(tzinfo=None)
+
+    cube = get_analytics_cube()
+    if cube is not None:
+        return cube.event_no_show_rates(list(eids), now)
+
+    db = _get_db()
+    try:
+        no_show = func.coalesce(
+            func.sum(
+                case(
+                    (and_(Registration.status == "registered", Registration.checkin_time.is_(None)), 1),
+                    else_=0,
+                )
+            ),
+            0,
+        )
+        rows = (
             db.query(
-                Registration.status,
-                func.count("*").label("cnt"),
+                Event.eid,
+                _count_status("registered").label("ended_registrations"),
+                no_show.label("no_show_count"),
             )
-            .select_from(Registration)
-            .filter(Registration.session_id == session_id)
-            .group_by(Registration.status)
+            .select_from(Event)
+            .outerjoin(EventSession, and_(EventSession.eid == Event.eid, EventSession.end_time < now))
+            .outerjoin(Registration, Registration.session_id == EventSession.session_id)
+            .filter(Event.eid.in_(eids))
+            .group_by(Event.eid)
             .all()
         )
+        result = {}
+        for r in rows:
+            total, missed = int(r.ended_registrations), int(r.no_show_count)
+            result[r.eid] = {
+                "eid": r.eid,
+                "ended_registrations": total,
+                "no_show_count": missed,
+                "no_show_rate": round(missed / total, 4) if total else 0.0,
+            }
+        return result
+    finally:
+        db.close()
 
-        registered_count = 0
-        waiting_count = 0
-        cancelled_count = 0
-        for status, cnt in status_counts:
-            if status == "registered":
-                registered_count = cnt
-            elif status == "waiting":
-                waiting_count = cnt
-            elif status == "cancelled":
-                cancelled_count = cnt
-
-        # 已签到人数
-        checked_in_count = (
-            db.query(func.count("*"))
-            .select_from(Registration)
-            .filter(
-                Registration.session_id == session_id,
-                Registration.checkin_time.isnot(None),
+
+def get_session_stats(session_id: int) -> Dict[str, Any]:
+    """
+    场次统计：一条查询取回场次、活动标题与报名计数
+    （live 为 REGISTRATION 上的条件聚合，materialized 为 SESSION_STATS 主键读取）。
+    """
+    db = _get_db()
+    try:
+        materialized = _use_materialized_stats()
+        q = (
+            db.query(
+                EventSession.session_id,
+                EventSession.eid,
+                Event.title.label("event_title"),
+                EventSession.start_time,
+                EventSession.end_time,
+                EventSession.capacity,
+                EventSession.current_registered,
+                EventSession.status,
+                EventSession.waiting_list_limit,
+                *_registration_counters(materialized),
             )
-            .scalar()
+            .join(Event, EventSession.eid == Event.eid)
+            .filter(EventSession.session_id == session_id)
         )
+        if materialized:
+            q = q.outerjoin(SessionStats, SessionStats.session_id == EventSession.session_id)
+        else:
+            q = q.outerjoin(
+                Registration, Registration.session_id == EventSession.session_id
+            ).group_by(EventSession.session_id)
+        session = q.first()
+        if not session:
+            raise AnalyticError("场次不存在")
 
         return {
             "session_id": session.session_id,
             "eid": session.eid,
-            "event_title": session.event.title if session.event else None,
+            "event_title": session.event_title,
             "start_time": session.start_time.isoformat()
             if session.start_time
             else None,
@@ -267,130 +554,206 @@ def get_session_stats(session_id: int) -> Dict[str, Any]:
             "current_registered": session.current_registered,
             "status": session.status,
             "waiting_list_limit": session.waiting_list_limit,
-            "total_registrations": total_reg,
-            "registered_count": registered_count,
-            "waiting_count": waiting_count,
-            "cancelled_count": cancelled_count,
-            "checked_in_count": checked_in_count,
+            "total_registrations": int(session.total_registrations),
+            "registered_count": int(session.registered_count),
+            "waiting_count": int(session.waiting_count),
+            "cancelled_count": int(session.cancelled_count),
+            "checked_in_count": int(session.checked_in_count),
         }
     finally:
         db.close()
 
 
 def get_user_stats(user_id: int) -> Dict[str, Any]:
+    """
+    用户统计：计数是按用户维度的，物化表（按场次 / 活动）覆盖不到；
+    改为在 idx_registration_user 上做一次条件聚合，一条查询算出全部计数。
+    """
     db = _get_db()
     try:
         user = db.query(User).filter(User.user_id == user_id).first()
         if not user:
             raise AnalyticError("用户不存在")
 
-        # 总报名数
-        total_reg = (
-            db.query(func.count("*"))
-            .select_from(Registration)
-            .filter(Registration.user_id == user_id)
-            .scalar()
+        # no-show：报了名 + 未签到 + 场次已结束
+        now = datetime.now()
+        no_show = case(
+            (
+                (Registration.status == "registered")
+                & Registration.checkin_time.is_(None)
+                & (EventSession.end_time < now),
+                1,
+            ),
+            else_=0,
         )
-
-        # 各状态人数
-        status_counts = (
+        counts = (
             db.query(
-                Registration.status,
-                func.count("*").label("cnt"),
+                func.count(Registration.session_id).label("total_registrations"),
+                _count_status("registered").label("registered_count"),
+                _count_status("waiting").label("waiting_count"),
+                _count_status("cancelled").label("cancelled_count"),
+                func.count(Registration.checkin_time).label("checked_in_count"),
+                func.coalesce(func.sum(no_show), 0).label("no_show_count"),
             )
             .select_from(Registration)
+            .join(EventSession, Registration.session_id == EventSession.session_id)
             .filter(Registration.user_id == user_id)
-            .group_by(Registration.status)
-            .all()
-        )
-
-        registered_count = 0
-        waiting_count = 0
-        cancelled_count = 0
-        for status, cnt in status_counts:
-            if status == "registered":
-                registered_count = cnt
-            elif status == "waiting":
-                waiting_count = cnt
-            elif status == "cancelled":
-                cancelled_count = cnt
-
-        # 已签到次数
-        checked_in_count = (
-            db.query(func.count("*"))
-            .select_from(Registration)
-            .filter(
-                Registration.user_id == user_id,
-                Registration.checkin_time.isnot(None),
-            )
-            .scalar()
-        )
-
-        # no-show 次数：报了名 + 未签到 + 场次已结束
-        now = datetime.now()
-        no_show_count = (
-            db.query(func.count("*"))
-            .select_from(Registration)
-            .join(
-                EventSession,
-                Registration.session_id == EventSession.session_id,
-            )
-            .filter(
-                Registration.user_id == user_id,
-                Registration.status == "registered",
-                Registration.checkin_time.is_(None),
-                EventSession.end_time < now,
-            )
-            .scalar()
+            .one()
         )
 
         return {
             "user_id": user.user_id,
             "name": user.name,
             "email": user.email,
-            "total_registrations": total_reg,
-            "registered_count": registered_count,
-            "waiting_count": waiting_count,
-            "cancelled_count": cancelled_count,
-            "checked_in_count": checked_in_count,
-            "no_show_count": no_show_count,
+            "total_registrations": int(counts.total_registrations),
+            "registered_count": int(counts.registered_count),
+            "waiting_count": int(counts.waiting_count),
+            "cancelled_count": int(counts.cancelled_count),
+            "checked_in_count": int(counts.checked_in_count),
+            "no_show_count": int(counts.no_show_count),
         }
     finally:
         db.close()
 
 
-def get_event_registration_trend(
-    eid: int, start: datetime, end: datetime
-) -> list[dict[str, Any]]:
+TREND_BUCKETS = {"hour": timedelta(hours=1), "day": timedelta(days=1), "week": timedelta(weeks=1)}
+TREND_DIMENSIONS = ("event", "tag", "type", "org")
+# 未给出 start 时默认回看的桶数
+_TREND_DEFAULT_BUCKETS = {"hour": 48, "day": 30, "week": 26}
+
+
+def _use_trend_rollup() -> bool:
+    """报名趋势是否读小时汇总表 REGISTRATION_HOURLY（见 stats_service）。"""
+    return config.ANALYTICS_TREND_SOURCE == "rollup"
+
+
+def _floor_bucket(value: datetime, bucket: str) -> datetime:
+    """所在桶的起点；周以周一为起点，与 MySQL WEEKDAY 一致。"""
+    value = value.replace(minute=0, second=0, microsecond=0, tzinfo=None)
+    if bucket == "hour":
+        return value
+    value = value.replace(hour=0)
+    if bucket == "week":
+        value -= timedelta(days=value.weekday())
+    return value
+
+
+def _bucket_expr(col, bucket: str):
+    if bucket == "hour":
+        return func.timestamp(func.date(col), func.maketime(func.hour(col), 0, 0))
+    if bucket == "day":
+        return func.date(col)
+    return func.subdate(func.date(col), func.weekday(col))
+
+
+def _trend_window(bucket: str, start: datetime | None, end: datetime | None):
+    """把 [start, end) 扩展到整桶边界；缺省 end 为当前 UTC 时间，缺省 start 往前若干桶。"""
+    step = TREND_BUCKETS[bucket]
+    end = end or datetime.now(timezone.utc)
+    floor_end = _floor_bucket(end, bucket)
+    end = floor_end if floor_end == end.replace(tzinfo=None) else floor_end + step
+    start = _floor_bucket(start, bucket) if start else end - step * _TREND_DEFAULT_BUCKETS[bucket]
+    if start >= end:
+        raise AnalyticError("start must be earlier than end")
+    if (end - start) / step > config.ANALYTICS_TREND_MAX_BUCKETS:
+        raise AnalyticError(
+            f"too many buckets, at most {config.ANALYTICS_TREND_MAX_BUCKETS} per query"
+        )
+    return start, end
+
+
+def get_registration_trend(
+    dimension: str,
+    key: int,
+    bucket: str = "day",
+    start: datetime | None = None,
+    end: datetime | None = None,
+) -> Dict[str, Any]:
     """
-    示例：按日统计某活动的报名数量变化趋势
+    报名趋势：按小时 / 日 / 周统计某活动、标签、类型或主办组织下的报名数。
+    key 依次为 eid / tag_id / type_id / org_id；报名记录（任何状态）按 register_time 计入。
+
+    ANALYTICS_TREND_SOURCE=rollup 时读 REGISTRATION_HOURLY：每个活动每小时一行，
+    日 / 周桶由小时行求和，代价与 桶数 × 活动数 成正比；标签 / 类型 / 组织在查询时
+    通过 EVENT / EVENT_TAG 关联，活动改类型或改标签后无需重建汇总。
+    live 时直接在 REGISTRATION 上分组（旧实现的做法，需扫描区间内全部报名）。
+    ANALYTICS_CUBE 开启时改由进程内立方体计算（见 analytics_cube），优先于上述两种来源。
+    只返回有报名的桶，按时间升序。
     """
+    if bucket not in TREND_BUCKETS:
+        raise AnalyticError("bucket must be one of: " + ", ".join(TREND_BUCKETS))
+    if dimension not in TREND_DIMENSIONS:
+        raise AnalyticError("dimension must be one of: " + ", ".join(TREND_DIMENSIONS))
+    start, end = _trend_window(bucket, start, end)
+
+    cube = get_analytics_cube()
+    if cube is not None:
+        points = cube.registration_trend(dimension, key, bucket, start, end)
+    else:
+        points = _trend_points_sql(dimension, key, bucket, start, end)
+    return {
+        "dimension": dimension,
+        "key": key,
+        "bucket": bucket,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "series": [{"bucket_start": b.isoformat(), "count": n} for b, n in points],
+    }
+
+
+def _trend_points_sql(
+    dimension: str, key: int, bucket: str, start: datetime, end: datetime
+) -> List[tuple]:
+    """get_registration_trend 的 SQL 实现，返回 [(桶起点, 报名数)]。"""
+    rollup = _use_trend_rollup()
     db = _get_db()
     try:
-        # 基于 Registration + EventSession，并显式 select_from
-        rows = (
-            db.query(
-                func.date(Registration.register_time).label("day"),
-                func.count("*").label("cnt"),
-            )
-            .select_from(Registration)
-            .join(
-                EventSession,
-                Registration.session_id == EventSession.session_id,
+        if rollup:
+            eid_col = RegistrationHourly.eid
+            time_col = RegistrationHourly.bucket_start
+            count = func.sum(RegistrationHourly.registration_count)
+            query = db.query().select_from(RegistrationHourly)
+        else:
+            eid_col = EventSession.eid
+            time_col = Registration.register_time
+            count = func.count()
+            query = (
+                db.query()
+                .select_from(Registration)
+                .join(EventSession, Registration.session_id == EventSession.session_id)
             )
-            .filter(
-                EventSession.eid == eid,
-                Registration.register_time >= start,
-                Registration.register_time < end,
-            )
-            .group_by(func.date(Registration.register_time))
-            .order_by("day")
+
+        if dimension == "event":
+            query = query.filter(eid_col == key)
+        elif dimension == "tag":
+            query = query.join(EventTag, EventTag.eid == eid_col).filter(EventTag.tag_id == key)
+        else:
+            column = Event.type_id if dimension == "type" else Event.org_id
+            query = query.join(Event, Event.eid == eid_col).filter(column == key)
+
+        # 汇总表的 bucket_start 本身就是小时桶
+        if rollup and bucket == "hour":
+            bucket_col = time_col
+        else:
+            bucket_col = _bucket_expr(time_col, bucket)
+        rows = (
+            query.add_columns(bucket_col.label("bucket_start"), count.label("cnt"))
+            .filter(time_col >= start, time_col < end)
+            .group_by(bucket_col)
+            .having(count != 0)
+            .order_by(bucket_col)
             .all()
         )
-
-        return [
-            {"date": r.day.isoformat(), "count": r.cnt}
-            for r in rows
-        ]
+        return [(r.bucket_start, int(r.cnt)) for r in rows]
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+def get_event_registration_trend(
+    eid: int, start: datetime | None = None, end: datetime | None = None
+) -> list[dict[str, Any]]:
+    """
+    按日统计某活动的报名数量变化趋势（旧接口的返回格式），见 get_registration_trend。
+    """
+    trend = get_registration_trend("event", eid, "day", start, end)
+    return [{"date": p["bucket_start"], "count": p["count"]} for p in trend["series"]]
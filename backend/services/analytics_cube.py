@@ -0,0 +1,694 @@
+# backend/services/analytics_cube.py
+"""
+进程内的报名事实立方体（每个 gunicorn worker 一份，ANALYTICS_CUBE=true 时启用）。
+
+事实表：每条报名一行，按列存为 NumPy 数组：
+    user_id, session_id, eid, status（0 registered / 1 waiting / 2 cancelled），
+    register_ts, checkin_ts（datetime64[s]，未签到为 NaT），group_id（EVENT_USER_GROUP，无分组为 -1）
+维度：场次（eid / version / end_time）、活动（updated_at / title / type_id / org_id / 标签）、观众群体。
+
+视图（CubeView）：一次刷新的只读结果，创建后不再修改。
+  - 基础数组 base 按 (eid, session_id) 排序；
+  - 覆盖层 overrides：{session_id: 该场次当前的全部报名行}，空数组表示场次已删除或报名已清空；
+    查询某活动时取 base 中该活动的切片，去掉被覆盖的场次，再拼上覆盖层的行。
+  - 覆盖层超过 base 的 _COMPACT_RATIO（且不少于 _COMPACT_MIN_ROWS 行）时合并回 base（O(报名总数)）。
+查询（返回格式与对应的 SQL 版本一致）只读当前视图的引用，不加锁、不访问数据库：
+  - group_stats(eid) / tag_overview(tag_name) / event_no_show_rates(eids)：
+    在每个活动的行上做掩码计数 / bincount，不再做多表 JOIN；
+  - registration_trend(...)：时间戳截到小时 / 日 / 周后 np.unique 计数；
+  - event_version(eid) / tag_version(tag_name)：按视图里的 version 计算，供 ETag 使用，
+    与响应数据出自同一套已同步的状态。
+
+刷新（由 _ManagedCube 的后台线程执行，请求线程不刷新）：
+  - sync()：一条 EVENT LEFT JOIN EVENT_SESSION 查询取出全部 updated_at / version，与视图比对；
+    只按 IN 列表分批重读 version 变化的场次的报名行（放进覆盖层），
+    只重读 updated_at 变化（改资料 / 改标签）或新建的活动的维度；组装新视图后整体替换引用。
+    每 ANALYTICS_CUBE_REFRESH_SECONDS 秒一次；
+  - reload()：一致性快照内整表重读（服务端游标分批），每 ANALYTICS_CUBE_RELOAD_SECONDS 秒一次，
+    兜底不改 version 的变更（如级联删除）以及其它 worker 上的标签改名。
+  本进程内标签改名 / 删除后调用 mark_dimensions_stale()，下一次 sync 重读全部活动维度。
+"""
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pymysql
+
+from backend.config import load_config
+from backend.db import get_connection
+
+config = load_config()
+
+STATUS_CODES = {"registered": 0, "waiting": 1, "cancelled": 2}
+
+_FACT_DTYPES = {
+    "user_id": np.int32,
+    "session_id": np.int32,
+    "eid": np.int32,
+    "status": np.int8,
+    "register_ts": "datetime64[s]",
+    "checkin_ts": "datetime64[s]",
+    "group_id": np.int32,
+}
+_FETCH_CHUNK_ROWS = 50000
+# IN 列表每批的 id 数
+_ID_BATCH = 1000
+# 覆盖层合并回基础数组的阈值：行数超过 max(基础行数 × 比例, 最少行数)，或被覆盖的场次过多
+_COMPACT_RATIO = 0.05
+_COMPACT_MIN_ROWS = 50000
+_COMPACT_MAX_SESSIONS = 20000
+
+
+def _in(values: Sequence[Any]) -> str:
+    return ", ".join(["%s"] * len(values))
+
+
+def _empty_facts() -> Dict[str, np.ndarray]:
+    return {name: np.empty(0, dtype=dtype) for name, dtype in _FACT_DTYPES.items()}
+
+
+def _facts_from_rows(rows: List[tuple]) -> Dict[str, np.ndarray]:
+    """rows: (user_id, session_id, eid, status, register_time, checkin_time, group_id)。"""
+    if not rows:
+        return _empty_facts()
+    user_ids, session_ids, eids, statuses, registered, checked, groups = zip(*rows)
+    return {
+        "user_id": np.asarray(user_ids, dtype=np.int32),
+        "session_id": np.asarray(session_ids, dtype=np.int32),
+        "eid": np.asarray(eids, dtype=np.int32),
+        "status": np.array([STATUS_CODES[s] for s in statuses], dtype=np.int8),
+        "register_ts": np.array(registered, dtype="datetime64[s]"),
+        "checkin_ts": np.array(checked, dtype="datetime64[s]"),
+        "group_id": np.asarray(groups, dtype=np.int32),
+    }
+
+
+def _concat(parts: List[Dict[str, np.ndarray]]) -> Dict[str, np.ndarray]:
+    if not parts:
+        return _empty_facts()
+    return {name: np.concatenate([p[name] for p in parts]) for name in _FACT_DTYPES}
+
+
+def _sort_key(facts: Dict[str, np.ndarray]) -> np.ndarray:
+    return (facts["eid"].astype(np.int64) << 32) | facts["session_id"].astype(np.int64)
+
+
+def _order(facts: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    order = np.argsort(_sort_key(facts), kind="stable")
+    return {name: col[order] for name, col in facts.items()}
+
+
+_FACT_SQL = """
+    SELECT r.user_id, r.session_id, s.eid, r.status, r.register_time, r.checkin_time,
+           COALESCE(g.group_id, -1)
+    FROM REGISTRATION r
+    JOIN EVENT_SESSION s ON s.session_id = r.session_id
+    LEFT JOIN EVENT_USER_GROUP g ON g.user_id = r.user_id AND g.eid = s.eid
+"""
+
+
+def _fetch_facts(conn, session_ids: Optional[List[int]]) -> Dict[str, np.ndarray]:
+    """读取报名事实；session_ids=None 表示全部（服务端游标分批读取，内存只多出一批行）。"""
+    parts = []
+    if session_ids is None:
+        with conn.cursor(pymysql.cursors.SSCursor) as cursor:
+            cursor.execute(_FACT_SQL)
+            while True:
+                rows = cursor.fetchmany(_FETCH_CHUNK_ROWS)
+                if not rows:
+                    break
+                parts.append(_facts_from_rows(rows))
+        return _order(_concat(parts))
+
+    with conn.cursor(pymysql.cursors.Cursor) as cursor:
+        for i in range(0, len(session_ids), _ID_BATCH):
+            batch = session_ids[i:i + _ID_BATCH]
+            cursor.execute(_FACT_SQL + f" WHERE r.session_id IN ({_in(batch)})", batch)
+            parts.append(_facts_from_rows(list(cursor.fetchall())))
+    return _order(_concat(parts))
+
+
+_VERSION_SQL = """
+    SELECT e.eid, e.updated_at, s.session_id, s.version, s.end_time
+    FROM EVENT e
+    LEFT JOIN EVENT_SESSION s ON s.eid = e.eid
+"""
+
+
+def _fetch_versions(conn) -> Tuple[Dict[int, datetime], Dict[int, Tuple[int, int, datetime]]]:
+    """全部活动的 updated_at 与全部场次的 (eid, version, end_time)；行数等于场次数，不碰报名表。"""
+    events: Dict[int, datetime] = {}
+    sessions: Dict[int, Tuple[int, int, datetime]] = {}
+    with conn.cursor(pymysql.cursors.Cursor) as cursor:
+        cursor.execute(_VERSION_SQL)
+        for eid, updated_at, session_id, version, end_time in cursor.fetchall():
+            events[eid] = updated_at
+            if session_id is not None:
+                sessions[session_id] = (eid, version, end_time)
+    return events, sessions
+
+
+def _fetch_dimensions(conn, eids: Optional[List[int]]) -> Dict[str, List[Dict[str, Any]]]:
+    """活动、活动标签（分批 IN 列表）与观众群体；eids=None 表示全部活动。"""
+    events: List[Dict[str, Any]] = []
+    tags: List[Dict[str, Any]] = []
+    batches = [None] if eids is None else [eids[i:i + _ID_BATCH] for i in range(0, len(eids), _ID_BATCH)]
+    with conn.cursor() as cursor:
+        for batch in batches:
+            where = "" if batch is None else f"WHERE {{col}} IN ({_in(batch)})"
+            params = [] if batch is None else list(batch)
+            cursor.execute(
+                "SELECT e.eid, e.title, e.type_id, e.org_id FROM EVENT e " + where.format(col="e.eid"),
+                params,
+            )
+            events.extend(cursor.fetchall())
+            cursor.execute(
+                "SELECT et.eid, et.tag_id, t.tag_name FROM EVENT_TAG et JOIN TAG t ON t.tag_id = et.tag_id "
+                + where.format(col="et.eid"),
+                params,
+            )
+            tags.extend(cursor.fetchall())
+        cursor.execute("SELECT group_id, group_name FROM AUDIENCE_GROUP")
+        groups = list(cursor.fetchall())
+    return {"events": events, "tags": tags, "groups": groups}
+
+
+def _split_by_session(facts: Dict[str, np.ndarray]) -> Dict[int, Dict[str, np.ndarray]]:
+    """已排序的事实按场次切开：{session_id: 该场次的行}。"""
+    sid_col = facts["session_id"]
+    if not len(sid_col):
+        return {}
+    bounds = np.flatnonzero(np.diff(sid_col)) + 1
+    starts = np.concatenate(([0], bounds))
+    ends = np.concatenate((bounds, [len(sid_col)]))
+    return {
+        int(sid_col[lo]): {name: col[lo:hi] for name, col in facts.items()}
+        for lo, hi in zip(starts, ends)
+    }
+
+
+def _week_start(days: np.ndarray) -> np.ndarray:
+    """datetime64[D] -> 所在周的周一（1970-01-01 是周四）。"""
+    return days - ((days.astype(np.int64) + 3) % 7).astype("timedelta64[D]")
+
+
+class CubeView:
+    """某次刷新的只读视图；字段在创建后不再修改，刷新时整体换成新对象。"""
+
+    def __init__(
+        self,
+        base: Dict[str, np.ndarray],
+        overrides: Dict[int, Dict[str, np.ndarray]],
+        event_overrides: Dict[int, FrozenSet[int]],
+        event_versions: Dict[int, datetime],
+        sessions: Dict[int, Tuple[int, int, datetime]],
+        events: Dict[int, Dict[str, Any]],
+        tag_ids: Dict[str, int],
+        groups: Dict[int, str],
+    ) -> None:
+        self.base = base
+        self.overrides = overrides
+        # eid -> 该活动被覆盖的场次（含已删除的场次）
+        self.event_overrides = event_overrides
+        # eid -> updated_at；活动集合以它为准
+        self.event_versions = event_versions
+        # session_id -> (eid, version, end_time)
+        self.sessions = sessions
+        # eid -> {"title", "type_id", "org_id", "tag_ids"}
+        self.events = events
+        self.tag_ids = tag_ids
+        self.groups = groups
+
+        self.event_sessions: Dict[int, List[int]] = {}
+        for sid, (eid, _, _) in sessions.items():
+            self.event_sessions.setdefault(eid, []).append(sid)
+        self.tag_events: Dict[int, List[int]] = {}
+        for eid, event in events.items():
+            for tag_id in event["tag_ids"]:
+                self.tag_events.setdefault(tag_id, []).append(eid)
+        self.overlay_rows = sum(len(o["eid"]) for o in overrides.values())
+
+    @classmethod
+    def empty(cls) -> "CubeView":
+        return cls(_empty_facts(), {}, {}, {}, {}, {}, {}, {})
+
+    # ---------------- 覆盖层 ----------------
+
+    def needs_compaction(self) -> bool:
+        limit = max(len(self.base["eid"]) * _COMPACT_RATIO, _COMPACT_MIN_ROWS)
+        return self.overlay_rows > limit or len(self.overrides) > _COMPACT_MAX_SESSIONS
+
+    def compacted(self) -> "CubeView":
+        """覆盖层合并回基础数组：删去被覆盖场次的旧行，新行按 (eid, session_id) 位置插入。"""
+        if not self.overrides:
+            return self
+        sids = np.fromiter(self.overrides, dtype=np.int32, count=len(self.overrides))
+        keep = ~np.isin(self.base["session_id"], sids)
+        kept = {name: col[keep] for name, col in self.base.items()}
+        extra = _order(_concat(list(self.overrides.values())))
+        positions = np.searchsorted(_sort_key(kept), _sort_key(extra))
+        base = {name: np.insert(kept[name], positions, extra[name]) for name in _FACT_DTYPES}
+        return CubeView(
+            base, {}, {}, self.event_versions, self.sessions, self.events, self.tag_ids, self.groups
+        )
+
+    def _span(self, eid: int) -> slice:
+        col = self.base["eid"]
+        return slice(int(np.searchsorted(col, eid, "left")), int(np.searchsorted(col, eid, "right")))
+
+    def row_count(self) -> int:
+        """当前报名行数：基础行数 - 被覆盖场次在基础数组里的旧行 + 覆盖层行数。"""
+        masked = 0
+        sid_col = self.base["session_id"]
+        for eid, overridden in self.event_overrides.items():
+            span = self._span(eid)
+            masked += int(np.count_nonzero(
+                np.isin(sid_col[span], np.fromiter(overridden, dtype=np.int32, count=len(overridden)))
+            ))
+        return int(len(sid_col)) - masked + self.overlay_rows
+
+    def memory_bytes(self) -> int:
+        arrays = list(self.base.values()) + [col for o in self.overrides.values() for col in o.values()]
+        return int(sum(col.nbytes for col in arrays))
+
+    def _event_facts(self, eid: int, names: Sequence[str]) -> Dict[str, np.ndarray]:
+        """某活动当前的全部报名行（只取 names 这些列）；行序不保证。"""
+        span = self._span(eid)
+        overridden = self.event_overrides.get(eid)
+        if not overridden:
+            return {name: self.base[name][span] for name in names}
+        keep = ~np.isin(
+            self.base["session_id"][span], np.fromiter(overridden, dtype=np.int32, count=len(overridden))
+        )
+        return {
+            name: np.concatenate(
+                [self.base[name][span][keep]] + [self.overrides[sid][name] for sid in overridden]
+            )
+            for name in names
+        }
+
+    # ---------------- 查询 ----------------
+
+    def group_stats(self, eid: int) -> List[Dict[str, Any]]:
+        """与 analytics_api._load_event_group_stats 一致：只统计有分组的报名，按群体名称排序。"""
+        groups = self.groups
+        facts = self._event_facts(eid, ("group_id", "checkin_ts"))
+        group_ids = facts["group_id"]
+        checked = ~np.isnat(facts["checkin_ts"])
+        known = np.isin(group_ids, np.fromiter(groups, dtype=np.int32, count=len(groups)))
+        values, inverse, counts = np.unique(group_ids[known], return_inverse=True, return_counts=True)
+        checkins = np.bincount(inverse, weights=checked[known], minlength=len(values))
+        rows = [
+            {"group_name": groups[int(g)], "registrations": int(n), "checkins": int(c)}
+            for g, n, c in zip(values, counts, checkins)
+        ]
+        return sorted(rows, key=lambda r: r["group_name"])
+
+    def tag_overview(self, tag_name: str) -> List[Dict[str, Any]]:
+        """与 analytics_api._load_tag_overview（live）一致，按 eid 排序。"""
+        tag_id = self.tag_ids.get(tag_name)
+        rows = []
+        for eid in sorted(self.tag_events.get(tag_id, ())):
+            checkin_ts = self._event_facts(eid, ("checkin_ts",))["checkin_ts"]
+            rows.append(
+                {
+                    "eid": eid,
+                    "title": self.events[eid]["title"],
+                    "session_count": len(self.event_sessions.get(eid, ())),
+                    "registrations": len(checkin_ts),
+                    "checkins": int(np.count_nonzero(~np.isnat(checkin_ts))),
+                }
+            )
+        return rows
+
+    def event_no_show_rates(self, eids: List[int], now: datetime) -> Dict[int, Dict[str, Any]]:
+        """与 analytic_service.get_event_no_show_rates 一致；now 为不带时区的 UTC 时间。"""
+        result = {}
+        for eid in eids:
+            if eid not in self.events:
+                continue
+            facts = self._event_facts(eid, ("session_id", "status", "checkin_ts"))
+            ended = [sid for sid in self.event_sessions.get(eid, ()) if self.sessions[sid][2] < now]
+            in_ended = np.isin(facts["session_id"], np.asarray(ended, dtype=np.int32))
+            registered = in_ended & (facts["status"] == STATUS_CODES["registered"])
+            total = int(np.count_nonzero(registered))
+            no_show = int(np.count_nonzero(registered & np.isnat(facts["checkin_ts"])))
+            result[eid] = {
+                "eid": eid,
+                "ended_registrations": total,
+                "no_show_count": no_show,
+                "no_show_rate": round(no_show / total, 4) if total else 0.0,
+            }
+        return result
+
+    def registration_trend(
+        self, dimension: str, key: int, bucket: str, start: datetime, end: datetime
+    ) -> List[Tuple[Any, int]]:
+        """[(桶起点, 报名数)]，按时间升序、只含非零桶；start / end 已按桶对齐（不带时区）。"""
+        if dimension == "event":
+            eids: Iterable[int] = [key] if key in self.events else []
+        elif dimension == "tag":
+            eids = self.tag_events.get(key, ())
+        else:
+            field = "type_id" if dimension == "type" else "org_id"
+            eids = [eid for eid, e in self.events.items() if e[field] == key]
+        parts = [self._event_facts(eid, ("register_ts",))["register_ts"] for eid in eids]
+        ts = np.concatenate(parts) if parts else self.base["register_ts"][:0]
+        ts = ts[(ts >= np.datetime64(start, "s")) & (ts < np.datetime64(end, "s"))]
+        if bucket == "hour":
+            buckets = ts.astype("datetime64[h]")
+        elif bucket == "day":
+            buckets = ts.astype("datetime64[D]")
+        else:
+            buckets = _week_start(ts.astype("datetime64[D]"))
+        values, counts = np.unique(buckets, return_counts=True)
+        return [(v.item(), int(n)) for v, n in zip(values, counts)]
+
+    def event_version(self, eid: int) -> Optional[Dict[str, Any]]:
+        """与 event_service.get_event_version 同样的字段，取自本视图；活动不在视图中返回 None。"""
+        if eid not in self.event_versions:
+            return None
+        sids = self.event_sessions.get(eid, ())
+        return {
+            "updated_at": self.event_versions[eid],
+            "session_count": len(sids),
+            "version_sum": sum(self.sessions[sid][1] for sid in sids),
+        }
+
+    def tag_version(self, tag_name: str) -> Dict[str, Any]:
+        """与 event_service.get_tag_version 同样的字段，取自本视图。"""
+        eids = self.tag_events.get(self.tag_ids.get(tag_name), ())
+        sids = [sid for eid in eids for sid in self.event_sessions.get(eid, ())]
+        return {
+            "event_count": len(eids),
+            "updated_at": max((self.event_versions[eid] for eid in eids), default=None),
+            "session_count": len(sids),
+            "version_sum": sum(self.sessions[sid][1] for sid in sids),
+        }
+
+
+class AnalyticsCube:
+    """持有当前视图；刷新串行执行（_refresh_lock），查询只读 self._view 的引用。"""
+
+    def __init__(self) -> None:
+        self._view = CubeView.empty()
+        self._loaded = False
+        self._refresh_lock = threading.Lock()
+        # mark_dimensions_stale 递增 _dims_marked；刷新成功后记下已处理到的值
+        self._dims_marked = 0
+        self._dims_seen = 0
+        self._last_sync: Dict[str, Any] = {}
+        self._last_error: Optional[Dict[str, Any]] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def view(self) -> CubeView:
+        return self._view
+
+    # ---------------- 刷新 ----------------
+
+    def mark_dimensions_stale(self) -> None:
+        """标签改名 / 删除不改活动 updated_at：下一次 sync 重读全部活动维度。"""
+        self._dims_marked += 1
+
+    def record_error(self, exc: Exception) -> None:
+        self._last_error = {"error": str(exc), "at": datetime.now().isoformat()}
+
+    def reload(self) -> Dict[str, Any]:
+        """在一致性快照内整表重读，替换当前视图（覆盖层清空）。返回本次刷新的统计。"""
+        with self._refresh_lock:
+            started = time.perf_counter()
+            marked = self._dims_marked
+            conn = get_connection()
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute("START TRANSACTION WITH CONSISTENT SNAPSHOT")
+                event_versions, sessions = _fetch_versions(conn)
+                facts = _fetch_facts(conn, None)
+                dims = _fetch_dimensions(conn, None)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                conn.close()
+
+            events, tag_ids = self._merge_events({}, {}, event_versions, dims["events"], dims["tags"], True)
+            groups = {r["group_id"]: r["group_name"] for r in dims["groups"]}
+            self._view = CubeView(facts, {}, {}, event_versions, sessions, events, tag_ids, groups)
+            self._loaded = True
+            self._dims_seen = marked
+            return self._finish(started, "reload", len(sessions), 0, int(len(facts["eid"])), False)
+
+    def sync(self) -> Dict[str, Any]:
+        """
+        增量刷新：version 变化 / 新增 / 删除的场次放进覆盖层，updated_at 变化的活动重读维度；
+        尚未加载时等同 reload()。返回本次刷新的统计。
+        """
+        if not self._loaded:
+            return self.reload()
+        with self._refresh_lock:
+            started = time.perf_counter()
+            view = self._view
+            marked = self._dims_marked
+            dims_stale = marked != self._dims_seen
+            conn = get_connection()
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute("START TRANSACTION WITH CONSISTENT SNAPSHOT")
+                event_versions, sessions = _fetch_versions(conn)
+                changed = sorted(
+                    sid for sid, s in sessions.items()
+                    if sid not in view.sessions or view.sessions[sid][1] != s[1]
+                )
+                removed = [sid for sid in view.sessions if sid not in sessions]
+                if dims_stale:
+                    stale_eids = sorted(event_versions)
+                else:
+                    stale_eids = sorted(
+                        eid for eid, updated_at in event_versions.items()
+                        if view.event_versions.get(eid) != updated_at
+                    )
+                facts = _fetch_facts(conn, changed) if changed else _empty_facts()
+                dims = _fetch_dimensions(conn, stale_eids) if stale_eids or dims_stale else None
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                conn.close()
+
+            self._dims_seen = marked
+            if not changed and not removed and dims is None and event_versions == view.event_versions:
+                return self._finish(started, "sync", 0, 0, 0, False)
+
+            overrides = dict(view.overrides)
+            touched: Dict[int, set] = {}
+            fetched = _split_by_session(facts)
+            for sid in changed:
+                overrides[sid] = fetched.get(sid) or _empty_facts()
+                touched.setdefault(sessions[sid][0], set()).add(sid)
+            for sid in removed:
+                overrides[sid] = _empty_facts()
+                touched.setdefault(view.sessions[sid][0], set()).add(sid)
+            event_overrides = dict(view.event_overrides)
+            for eid, sids in touched.items():
+                event_overrides[eid] = event_overrides.get(eid, frozenset()) | frozenset(sids)
+
+            if dims is None:
+                events = {eid: e for eid, e in view.events.items() if eid in event_versions}
+                tag_ids, groups = view.tag_ids, view.groups
+            else:
+                events, tag_ids = self._merge_events(
+                    view.events, view.tag_ids, event_versions, dims["events"], dims["tags"], dims_stale
+                )
+                groups = {r["group_id"]: r["group_name"] for r in dims["groups"]}
+
+            new_view = CubeView(
+                view.base, overrides, event_overrides, event_versions, sessions, events, tag_ids, groups
+            )
+            compacted = new_view.needs_compaction()
+            if compacted:
+                new_view = new_view.compacted()
+            self._view = new_view
+            return self._finish(
+                started, "sync", len(changed), len(removed), int(len(facts["eid"])), compacted
+            )
+
+    @staticmethod
+    def _merge_events(
+        old_events: Dict[int, Dict[str, Any]],
+        old_tag_ids: Dict[str, int],
+        event_versions: Dict[int, datetime],
+        event_rows: List[Dict[str, Any]],
+        tag_rows: List[Dict[str, Any]],
+        full: bool,
+    ) -> Tuple[Dict[int, Dict[str, Any]], Dict[str, int]]:
+        """用重读的活动 / 标签行更新维度；full=True 时这些行就是全部（标签名映射整体重建）。"""
+        events = {} if full else {eid: e for eid, e in old_events.items() if eid in event_versions}
+        tag_ids = {} if full else dict(old_tag_ids)
+        event_tags: Dict[int, set] = {}
+        for r in tag_rows:
+            event_tags.setdefault(r["eid"], set()).add(r["tag_id"])
+            tag_ids[r["tag_name"]] = r["tag_id"]
+        for r in event_rows:
+            if r["eid"] not in event_versions:
+                continue
+            events[r["eid"]] = {
+                "title": r["title"],
+                "type_id": r["type_id"],
+                "org_id": r["org_id"],
+                "tag_ids": frozenset(event_tags.get(r["eid"], ())),
+            }
+        return events, tag_ids
+
+    def _finish(
+        self, started: float, mode: str, changed: int, removed: int, loaded_rows: int, compacted: bool
+    ) -> Dict[str, Any]:
+        self._last_sync = {
+            "mode": mode,
+            "changed_sessions": changed,
+            "removed_sessions": removed,
+            "loaded_rows": loaded_rows,
+            "compacted": compacted,
+            "duration_ms": int((time.perf_counter() - started) * 1000),
+            "at": datetime.now().isoformat(),
+        }
+        self._last_error = None
+        return dict(self._last_sync)
+
+    # ---------------- 查询（读当前视图） ----------------
+
+    def group_stats(self, eid: int) -> List[Dict[str, Any]]:
+        return self._view.group_stats(eid)
+
+    def tag_overview(self, tag_name: str) -> List[Dict[str, Any]]:
+        return self._view.tag_overview(tag_name)
+
+    def event_no_show_rates(self, eids: List[int], now: datetime) -> Dict[int, Dict[str, Any]]:
+        return self._view.event_no_show_rates(eids, now)
+
+    def registration_trend(
+        self, dimension: str, key: int, bucket: str, start: datetime, end: datetime
+    ) -> List[Tuple[Any, int]]:
+        return self._view.registration_trend(dimension, key, bucket, start, end)
+
+    def event_version(self, eid: int) -> Optional[Dict[str, Any]]:
+        return self._view.event_version(eid)
+
+    def tag_version(self, tag_name: str) -> Dict[str, Any]:
+        return self._view.tag_version(tag_name)
+
+    def stats(self) -> Dict[str, Any]:
+        view = self._view
+        return {
+            "rows": view.row_count(),
+            "overlay_rows": view.overlay_rows,
+            "overridden_sessions": len(view.overrides),
+            "sessions": len(view.sessions),
+            "events": len(view.events),
+            "memory_bytes": view.memory_bytes(),
+            "last_sync": dict(self._last_sync),
+            "last_error": self._last_error,
+        }
+
+
+# ===== 进程内单例：首次使用时全量加载，之后由后台线程刷新 =====
+
+
+class _ManagedCube:
+    """
+    AnalyticsCube + 后台刷新线程：首次使用时在调用线程全量加载，之后守护线程每 refresh_seconds 秒
+    sync 一次、距上次 reload 满 reload_seconds 秒时改为 reload；请求线程只读视图。
+    线程按需（重新）启动，gunicorn --preload 在 fork 后的 worker 里同样可用。
+    """
+
+    def __init__(self, refresh_seconds: float, reload_seconds: float):
+        self.refresh_seconds = refresh_seconds
+        self.reload_seconds = reload_seconds
+        self.cube = AnalyticsCube()
+        self._reloaded_at: float | None = None
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self.cube.loaded
+
+    def get(self) -> AnalyticsCube:
+        if not self.cube.loaded:
+            with self._lock:
+                if not self.cube.loaded:
+                    self._reload()
+        self._ensure_refresher()
+        return self.cube
+
+    def reload(self) -> None:
+        self._reload()
+        self._ensure_refresher()
+
+    def refresh_once(self) -> None:
+        """后台线程的一轮：到了全量重载间隔就 reload，否则 sync；出错只记录，下一轮重试。"""
+        try:
+            reloaded_at = self._reloaded_at
+            if reloaded_at is None or time.monotonic() - reloaded_at >= self.reload_seconds:
+                self._reload()
+            else:
+                self.cube.sync()
+        except Exception as e:
+            self.cube.record_error(e)
+
+    def _reload(self) -> None:
+        self.cube.reload()
+        self._reloaded_at = time.monotonic()
+
+    def _ensure_refresher(self) -> None:
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="analytics-cube-refresh", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.refresh_seconds)
+            self.refresh_once()
+
+
+_managed = _ManagedCube(config.ANALYTICS_CUBE_REFRESH_SECONDS, config.ANALYTICS_CUBE_RELOAD_SECONDS)
+
+
+def analytics_cube_enabled() -> bool:
+    return bool(config.ANALYTICS_CUBE)
+
+
+def get_analytics_cube() -> Optional[AnalyticsCube]:
+    """ANALYTICS_CUBE 关闭时返回 None；否则返回立方体（首次调用时全量加载，之后不在请求中刷新）。"""
+    if not analytics_cube_enabled():
+        return None
+    return _managed.get()
+
+
+def warm_up() -> None:
+    """启动时预先全量加载并启动刷新线程，避免第一个统计请求承担整表读取。"""
+    if analytics_cube_enabled():
+        _managed.reload()
+
+
+def mark_dimensions_stale() -> None:
+    """标签改名 / 删除提交后调用；只影响本进程，其它 worker 在下一次 reload 时跟上。"""
+    if analytics_cube_enabled():
+        _managed.cube.mark_dimensions_stale()
+
+
+def get_analytics_cube_stats() -> Dict[str, Any]:
+    if not analytics_cube_enabled():
+        return {"enabled": False}
+    return {"enabled": True, "loaded": _managed.loaded, **_managed.cube.stats()}
@@ -6,9 +6,16 @@ import jwt
 
 from backend.db import get_connection
 from backend.config import load_config
+from backend.utils.cache import TTLCache
 
 config = load_config()
 
+# user_id -> 用户信息 dict；login_required 每个请求都会查，缓存后省掉一次 DB 往返
+_user_cache = TTLCache(
+    maxsize=config.AUTH_USER_CACHE_SIZE,
+    ttl=config.AUTH_USER_CACHE_TTL_SECONDS,
+)
+
 
 class AuthError(Exception):
     """认证/授权相关业务错误（登录失败、token 无效等）"""
@@ -56,7 +63,7 @@ def register(name: str, email: str, password: str) -> Dict[str, Any]:
 
         conn.commit()
 
-        token_data = _create_access_token(user_id, "visitor")
+        token_data = _create_access_token(user_id, "visitor", name=name, email=email)
 
         return {
             "user": {
@@ -85,13 +92,31 @@ def verify_password(plain_password: str, stored_password: str) -> bool:
     return plain_password == stored_password
 
 
-def _create_access_token(user_id: int, role: str) -> Dict[str, Any]:
+def _create_access_token(
+    user_id: int,
+    role: str,
+    *,
+    name: Optional[str] = None,
+    email: Optional[str] = None,
+    blocked_until: Optional[datetime] = None,
+    token_version: int = 0,
+) -> Dict[str, Any]:
+    """
+    签发访问 token。
+
+    除 sub / role 外还带上 name、email、blocked_until 与 token_version（tv），
+    AUTH_MODE=claims 时 get_user_by_token 可以直接信任这些声明而不查库。
+    """
     now = datetime.now(timezone.utc)
     expire = now + config.JWT_ACCESS_TOKEN_EXPIRES
 
     payload = {
         "sub": str(user_id),
         "role": role,
+        "name": name,
+        "email": email,
+        "blocked_until": blocked_until.isoformat() if blocked_until else None,
+        "tv": token_version,
         "iat": int(now.timestamp()),
         "exp": int(expire.timestamp()),
     }
@@ -116,7 +141,8 @@ def login(email: str, password: str) -> Dict[str, Any]:
                     email,
                     password,
                     role,
-                    blocked_until
+                    blocked_until,
+                    token_version
                 FROM `USER`
                 WHERE email = %s
                 """,
@@ -138,7 +164,14 @@ def login(email: str, password: str) -> Dict[str, Any]:
 
         # 注意：不在这里拦 blocked_until，blocked_until 只限制报名等业务
 
-        token_data = _create_access_token(user["user_id"], user["role"])
+        token_data = _create_access_token(
+            user["user_id"],
+            user["role"],
+            name=user["name"],
+            email=user["email"],
+            blocked_until=user.get("blocked_until"),
+            token_version=user.get("token_version") or 0,
+        )
 
         return {
             "user": {
@@ -156,22 +189,50 @@ def login(email: str, password: str) -> Dict[str, Any]:
         conn.close()
 
 
-def get_user_by_token(token: str) -> Optional[Dict[str, Any]]:
+def _load_token_version(user_id: int) -> Optional[int]:
+    conn = get_connection()
     try:
-        payload = jwt.decode(
-            token,
-            config.JWT_SECRET_KEY,
-            algorithms=[config.JWT_ALGORITHM],
-        )
-    except jwt.ExpiredSignatureError:
-        return None
-    except jwt.InvalidTokenError:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT token_version FROM `USER` WHERE user_id = %s", (user_id,))
+            row = cursor.fetchone()
+    finally:
+        conn.close()
+    return row["token_version"] if row else None
+
+
+# user_id -> token_version，AUTH_MODE=claims 下判断 token 中的声明是否已过时；
+# 只缓存出现在 token 里的用户，每条 AUTH_TOKEN_VERSION_REFRESH_SECONDS 秒后按主键重读
+_token_versions = TTLCache(
+    maxsize=config.AUTH_USER_CACHE_SIZE,
+    ttl=config.AUTH_TOKEN_VERSION_REFRESH_SECONDS,
+)
+
+
+def _user_from_claims(payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    AUTH_MODE=claims：token_version 与当前版本一致时直接用 token 声明构造用户，
+    不一致（角色被修改、被封禁、被删除等）或无法判断时返回 None，由调用方回退查库。
+    """
+    token_version = payload.get("tv")
+    if token_version is None:
         return None
 
-    user_id = payload.get("sub")
-    if not user_id:
+    user_id = int(payload["sub"])
+    current = _token_versions.get_or_load(user_id, lambda: _load_token_version(user_id))
+    if current != token_version:
         return None
 
+    blocked_until = payload.get("blocked_until")
+    return {
+        "user_id": user_id,
+        "name": payload.get("name"),
+        "email": payload.get("email"),
+        "role": payload.get("role"),
+        "blocked_until": datetime.fromisoformat(blocked_until) if blocked_until else None,
+    }
+
+
+def _load_user(user_id: int) -> Optional[Dict[str, Any]]:
     conn = get_connection()
     try:
         with conn.cursor() as cursor:
@@ -186,7 +247,7 @@ def get_user_by_token(token: str) -> Optional[Dict[str, Any]]:
                 FROM `USER`
                 WHERE user_id = %s
                 """,
-                (int(user_id),),
+                (user_id,),
             )
             user = cursor.fetchone()
     finally:
@@ -204,6 +265,50 @@ def get_user_by_token(token: str) -> Optional[Dict[str, Any]]:
     }
 
 
+def get_user_by_token(token: str) -> Optional[Dict[str, Any]]:
+    try:
+        payload = jwt.decode(
+            token,
+            config.JWT_SECRET_KEY,
+            algorithms=[config.JWT_ALGORITHM],
+        )
+    except jwt.ExpiredSignatureError:
+        return None
+    except jwt.InvalidTokenError:
+        return None
+
+    user_id = payload.get("sub")
+    if not user_id:
+        return None
+
+    if config.AUTH_MODE == "claims":
+        user = _user_from_claims(payload)
+        if user is not None:
+            return user
+
+    user_id = int(user_id)
+    user = _user_cache.get_or_load(user_id, lambda: _load_user(user_id))
+    if not user:
+        return None
+
+    # 返回副本，避免调用方修改缓存里的对象
+    return dict(user)
+
+
+def invalidate_cached_user(user_id: int) -> None:
+    """
+    用户信息（角色、封禁时间等）被修改或删除后调用，
+    让本进程缓存的副本立即失效；其它进程在 TTL 内自然过期。
+    """
+    _user_cache.invalidate(int(user_id))
+    _token_versions.invalidate(int(user_id))
+
+
+def get_user_cache_stats() -> Dict[str, Any]:
+    """token -> user 缓存的命中统计。"""
+    return _user_cache.stats()
+
+
 def logout(token: str) -> None:
     """
     JWT 无状态，这里是幂等空操作。
@@ -0,0 +1,148 @@
+# backend/services/calendar_service.py
+"""
+日历视图的场次时间窗查询。
+
+三种查询：
+- overlapping(from, to)：与 [from, to) 有交集的场次（start_time < to AND end_time > from）；
+- within(from, to)：完全落在 [from, to] 内的场次（start_time >= from AND end_time <= to）；
+- upcoming(after, limit)：after 之后开始的前 N 个场次。
+
+索引策略：
+- 重叠条件里 start_time / end_time 各有一个不等式，单列索引只能用上其中一个，
+  另一侧往往要扫大半张表。这里利用场次时长有上限：
+      end_time > from  且  end_time = start_time + duration  =>  start_time > from - 最长时长
+  于是重叠查询变成 start_time 上的一个窄区间 [from - 最长时长, to)，
+  在 (start_time, end_time) 组合索引上范围扫描，end_time 条件在索引内过滤；
+- 最长时长来自生成列 duration_minutes 上的索引（MAX 只读索引一端），随写入自动更新；
+- within 与 upcoming 本身就是 start_time 上的范围 / 有序扫描。
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Sequence
+
+from backend.db import get_connection
+
+
+class CalendarError(Exception):
+    """Calendar query error"""
+    pass
+
+
+# 公开日历只展示已发布活动；签到页等内部页面可以传入更多状态
+PUBLIC_EVENT_STATUSES = ("published",)
+
+_SESSION_COLUMNS = """
+    s.session_id,
+    s.eid,
+    s.start_time,
+    s.end_time,
+    s.capacity,
+    s.current_registered,
+    s.waiting_list_limit,
+    s.status,
+    e.title AS event_title,
+    e.location AS event_location
+"""
+
+
+def _status_clause(event_statuses: Sequence[str]) -> str:
+    return "e.status IN (" + ", ".join(["%s"] * len(event_statuses)) + ")"
+
+
+def _check_window(start: datetime, end: datetime) -> None:
+    if start >= end:
+        raise CalendarError("start must be earlier than end")
+
+
+def _max_duration(cursor) -> timedelta:
+    """当前最长场次时长（走 idx_session_duration）；多留 1 分钟抵消 TIMESTAMPDIFF 的取整。"""
+    cursor.execute("SELECT MAX(duration_minutes) AS m FROM EVENT_SESSION")
+    row = cursor.fetchone()
+    minutes = row["m"] if row and row["m"] is not None else 0
+    return timedelta(minutes=max(0, minutes) + 1)
+
+
+def sessions_overlapping(
+    start: datetime,
+    end: datetime,
+    event_statuses: Sequence[str] = PUBLIC_EVENT_STATUSES,
+) -> List[Dict[str, Any]]:
+    """与 [start, end) 有交集的场次，按 start_time 升序。"""
+    _check_window(start, end)
+    conn = get_connection()
+    try:
+        with conn.cursor() as cursor:
+            floor = start - _max_duration(cursor)
+            cursor.execute(
+                f"""
+                SELECT {_SESSION_COLUMNS}
+                FROM EVENT_SESSION s
+                JOIN EVENT e ON e.eid = s.eid
+                WHERE s.start_time > %s
+                  AND s.start_time < %s
+                  AND s.end_time > %s
+                  AND {_status_clause(event_statuses)}
+                ORDER BY s.start_time ASC, s.session_id ASC
+                """,
+                (floor, end, start, *event_statuses),
+            )
+            return list(cursor.fetchall())
+    finally:
+        conn.close()
+
+
+def sessions_within(
+    start: datetime,
+    end: datetime,
+    event_statuses: Sequence[str] = PUBLIC_EVENT_STATUSES,
+) -> List[Dict[str, Any]]:
+    """完全落在 [start, end] 内的场次，按 start_time 升序。"""
+    _check_window(start, end)
+    conn = get_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                f"""
+                SELECT {_SESSION_COLUMNS}
+                FROM EVENT_SESSION s
+                JOIN EVENT e ON e.eid = s.eid
+                WHERE s.start_time >= %s
+                  AND s.start_time <= %s
+                  AND s.end_time <= %s
+                  AND {_status_clause(event_statuses)}
+                ORDER BY s.start_time ASC, s.session_id ASC
+                """,
+                (start, end, end, *event_statuses),
+            )
+            return list(cursor.fetchall())
+    finally:
+        conn.close()
+
+
+def upcoming_sessions(
+    limit: int,
+    after: Optional[datetime] = None,
+    event_statuses: Sequence[str] = PUBLIC_EVENT_STATUSES,
+) -> List[Dict[str, Any]]:
+    """after（默认当前 UTC 时间）之后开始的前 limit 个场次，按 start_time 顺序读索引，读够即停。"""
+    if limit <= 0:
+        raise CalendarError("limit must be a positive integer")
+    # 库中 DATETIME 按 UTC 存储，与 API 层把显式 after 转成的 naive UTC 一致
+    after = after or datetime.now(timezone.utc).replace(tzinfo=None)
+    conn = get_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                f"""
+                SELECT {_SESSION_COLUMNS}
+                FROM EVENT_SESSION s
+                JOIN EVENT e ON e.eid = s.eid
+                WHERE s.start_time >= %s
+                  AND {_status_clause(event_statuses)}
+                ORDER BY s.start_time ASC, s.session_id ASC
+                LIMIT %s
+                """,
+                (after, *event_statuses, limit),
+            )
+            return list(cursor.fetchall())
+    finally:
+        conn.close()
@@ -1,7 +1,16 @@
 from datetime import datetime, timedelta
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
+from backend.config import load_config
 from backend.db import get_connection
+from backend.db_orm import SessionLocal
+from backend.models.models import Event, EventTag, Tag
+from backend.services.calendar_service import sessions_overlapping
+from backend.services.facet_index import refresh_event as refresh_facet_index
+from backend.utils.cache import TTLCache
+from backend.utils.pagination import Cursor
+
+config = load_config()
 
 
 class EventError(Exception):
@@ -11,6 +20,285 @@ class EventError(Exception):
 
 ALLOWED_STATUS = ("draft", "published", "closed", "archived")
 
+# ===== 公开活动接口的响应缓存（每个进程一份）=====
+#   - _event_cache：已发布活动列表、活动基本信息 + 场次静态字段，
+#     由本模块的写函数显式失效，其它进程依赖 TTL 过期；
+#   - _seat_cache：每个活动下场次的 capacity / current_registered / status，
+#     TTL 很短，报名写路径不需要逐个失效也能保证余量基本实时。
+_event_cache = TTLCache(maxsize=config.EVENT_CACHE_SIZE, ttl=config.EVENT_CACHE_TTL_SECONDS)
+_seat_cache = TTLCache(maxsize=config.EVENT_CACHE_SIZE, ttl=config.EVENT_SEAT_CACHE_TTL_SECONDS)
+
+_PUBLISHED_KEY = ("published",)
+
+
+def invalidate_event_cache(eid: Optional[int] = None) -> None:
+    """活动写操作后调用：列表总是失效；给定 eid 时只失效该活动，否则全部清空。"""
+    if eid is None:
+        _event_cache.clear()
+        _seat_cache.clear()
+        return
+    _event_cache.invalidate(_PUBLISHED_KEY)
+    _event_cache.invalidate(("event", eid))
+    _seat_cache.invalidate(eid)
+
+
+def get_event_cache_stats() -> Dict[str, Any]:
+    return {"events": _event_cache.stats(), "seats": _seat_cache.stats()}
+
+
+def _fetch_published_events() -> List[Dict[str, Any]]:
+    sql = """
+    SELECT
+        e.eid,
+        e.title,
+        e.description,
+        e.location,
+        e.image_url,
+        e.allow_multi_session,
+        e.status,
+        e.created_at,
+        e.updated_at
+    FROM EVENT e
+    WHERE e.status = 'published'
+    ORDER BY e.created_at DESC, e.eid DESC
+    """
+    conn = get_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(sql)
+            return list(cursor.fetchall())
+    finally:
+        conn.close()
+
+
+def _fetch_event_static(eid: int) -> Optional[Dict[str, Any]]:
+    """活动基本信息 + 场次中不随报名变化的字段；活动不存在返回 None（不缓存）。"""
+    conn = get_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT
+                    e.eid,
+                    e.title,
+                    e.description,
+                    e.location,
+                    e.allow_multi_session,
+                    e.status,
+                    e.type_id,
+                    e.image_url,
+                    e.created_at,
+                    e.updated_at
+                FROM EVENT e
+                WHERE e.eid = %s
+                """,
+                (eid,),
+            )
+            event = cursor.fetchone()
+            if not event:
+                return None
+            cursor.execute(
+                """
+                SELECT
+                    s.session_id,
+                    s.eid,
+                    s.start_time,
+                    s.end_time,
+                    s.waiting_list_limit
+                FROM EVENT_SESSION s
+                WHERE s.eid = %s
+                ORDER BY s.start_time ASC
+                """,
+                (eid,),
+            )
+            sessions = list(cursor.fetchall())
+        return {"event": event, "sessions": sessions}
+    finally:
+        conn.close()
+
+
+def _fetch_session_seats(eid: int) -> Dict[int, Dict[str, Any]]:
+    conn = get_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT session_id, capacity, current_registered, status, version
+                FROM EVENT_SESSION
+                WHERE eid = %s
+                """,
+                (eid,),
+            )
+            return {
+                r["session_id"]: {
+                    "capacity": r["capacity"],
+                    "current_registered": r["current_registered"],
+                    "status": r["status"],
+                    "version": r["version"],
+                }
+                for r in cursor.fetchall()
+            }
+    finally:
+        conn.close()
+
+
+def _sessions_with_seats(eid: int, static_sessions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """把短 TTL 的余量信息叠加到静态场次字段上；余量中已不存在的场次直接略过。"""
+    seats = _seat_cache.get_or_load(eid, lambda: _fetch_session_seats(eid))
+    merged = []
+    for s in static_sessions:
+        seat = seats.get(s["session_id"])
+        if seat is None:
+            continue
+        merged.append({**s, **seat})
+    return merged
+
+
+def list_published_events() -> List[Dict[str, Any]]:
+    """GET /api/events/ 的数据：所有已发布活动（读穿缓存）。"""
+    rows = _event_cache.get_or_load(_PUBLISHED_KEY, _fetch_published_events)
+    return [dict(r) for r in rows]
+
+
+# 游标分页：排在游标 (created_at, eid) 之后的行，与 ORDER BY created_at DESC, eid DESC 对应
+_KEYSET_CONDITION = "(e.created_at < %s OR (e.created_at = %s AND e.eid < %s))"
+
+_EVENT_LIST_COLUMNS = """
+        e.eid,
+        e.title,
+        e.description,
+        e.location,
+        e.image_url,
+        e.allow_multi_session,
+        e.status,
+        e.type_id,
+        e.created_at,
+        e.updated_at
+"""
+
+
+def _fetch_event_page(
+    published_only: bool, limit: Optional[int], cursor: Optional[Cursor]
+) -> List[Dict[str, Any]]:
+    where, params = [], []
+    if published_only:
+        where.append("e.status = 'published'")
+    if cursor is not None:
+        created_at, eid = cursor
+        where.append(_KEYSET_CONDITION)
+        params.extend([created_at, created_at, eid])
+    sql = f"""
+    SELECT {_EVENT_LIST_COLUMNS}
+    FROM EVENT e
+    {"WHERE " + " AND ".join(where) if where else ""}
+    ORDER BY e.created_at DESC, e.eid DESC
+    """
+    if limit is not None:
+        sql += " LIMIT %s"
+        params.append(limit)
+    conn = get_connection()
+    try:
+        with conn.cursor() as c:
+            c.execute(sql, params)
+            return list(c.fetchall())
+    finally:
+        conn.close()
+
+
+def list_published_events_page(limit: int, cursor: Optional[Cursor] = None) -> List[Dict[str, Any]]:
+    """已发布活动的一页（游标分页，走 idx_event_status_created_at；分页结果不缓存）。"""
+    return _fetch_event_page(True, limit, cursor)
+
+
+def list_all_events(limit: Optional[int] = None, cursor: Optional[Cursor] = None) -> List[Dict[str, Any]]:
+    """管理页：所有状态的活动，按创建时间倒序；limit 为 None 时返回全部。"""
+    return _fetch_event_page(False, limit, cursor)
+
+
+def get_event_sessions(eid: int) -> List[Dict[str, Any]]:
+    """GET /api/events/<eid>/sessions 的数据；活动不存在时返回空列表。"""
+    static = _event_cache.get_or_load(("event", eid), lambda: _fetch_event_static(eid))
+    if static is None:
+        return []
+    return _sessions_with_seats(eid, static["sessions"])
+
+
+def get_event_detail(eid: int) -> Optional[Dict[str, Any]]:
+    """GET /api/events/<eid>/detail 的数据：活动基本信息 + sessions；不存在返回 None。"""
+    static = _event_cache.get_or_load(("event", eid), lambda: _fetch_event_static(eid))
+    if static is None:
+        return None
+    return {**static["event"], "sessions": _sessions_with_seats(eid, static["sessions"])}
+
+
+# ===== 条件 GET 的版本信息（只查索引列，不取完整数据）=====
+
+
+def get_event_version(eid: int) -> Optional[Dict[str, Any]]:
+    """
+    活动级版本：EVENT.updated_at + 场次数 + 各场次 version 之和；活动不存在返回 None。
+    version 只增不减，任一场次的报名 / 候补 / 签到 / 名额变化都会使总和变化。
+    """
+    conn = get_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT
+                    e.updated_at,
+                    COUNT(s.session_id) AS session_count,
+                    COALESCE(SUM(s.version), 0) AS version_sum
+                FROM EVENT e
+                LEFT JOIN EVENT_SESSION s ON s.eid = e.eid
+                WHERE e.eid = %s
+                GROUP BY e.eid, e.updated_at
+                """,
+                (eid,),
+            )
+            return cursor.fetchone()
+    finally:
+        conn.close()
+
+
+def get_session_version(session_id: int) -> Optional[int]:
+    """单个场次的 version；场次不存在返回 None。"""
+    conn = get_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT version FROM EVENT_SESSION WHERE session_id = %s",
+                (session_id,),
+            )
+            row = cursor.fetchone()
+            return row["version"] if row else None
+    finally:
+        conn.close()
+
+
+def get_tag_version(tag_name: str) -> Dict[str, Any]:
+    """某标签下所有活动的版本：活动数 + 最近 updated_at + 场次数 + 场次 version 之和。"""
+    conn = get_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT
+                    COUNT(DISTINCT e.eid) AS event_count,
+                    MAX(e.updated_at) AS updated_at,
+                    COUNT(s.session_id) AS session_count,
+                    COALESCE(SUM(s.version), 0) AS version_sum
+                FROM TAG t
+                JOIN EVENT_TAG et ON et.tag_id = t.tag_id
+                JOIN EVENT e ON e.eid = et.eid
+                LEFT JOIN EVENT_SESSION s ON s.eid = e.eid
+                WHERE t.tag_name = %s
+                """,
+                (tag_name,),
+            )
+            return cursor.fetchone()
+    finally:
+        conn.close()
+
 
 def create_event_with_sessions(payload: Dict[str, Any]) -> Dict[str, Any]:
     """
@@ -121,6 +409,8 @@ def create_event_with_sessions(payload: Dict[str, Any]) -> Dict[str, Any]:
                 )
 
         conn.commit()
+        invalidate_event_cache(eid)
+        refresh_facet_index(eid)
 
         return {
             "eid": eid,
@@ -178,6 +468,8 @@ def update_event_basic(eid: int, payload: Dict[str, Any]) -> Dict[str, Any]:
             if cursor.rowcount == 0:
                 raise EventError("event not found")
         conn.commit()
+        invalidate_event_cache(eid)
+        refresh_facet_index(eid)
         return {
             "eid": eid,
             "title": title,
@@ -206,6 +498,8 @@ def delete_event(eid: int) -> Dict[str, Any]:
             if cursor.rowcount == 0:
                 raise EventError("event not found")
         conn.commit()
+        invalidate_event_cache(eid)
+        refresh_facet_index(eid)
         return {"eid": eid, "deleted": True}
     except EventError:
         conn.rollback()
@@ -217,35 +511,55 @@ def delete_event(eid: int) -> Dict[str, Any]:
         conn.close()
 
 
+def set_event_tags(eid: int, tag_names: List[str]) -> Dict[str, Any]:
+    """
+    为活动设置标签（覆盖式）：不存在的标签自动创建，旧关系整体替换。
+    活动不存在时抛 EventError("event not found")。
+    """
+    db = SessionLocal()
+    try:
+        event = db.query(Event).filter(Event.eid == eid).first()
+        if not event:
+            raise EventError("event not found")
+
+        # 确保标签存在，不存在则创建
+        existing_tags = db.query(Tag).filter(Tag.tag_name.in_(tag_names)).all()
+        existing_map = {t.tag_name: t for t in existing_tags}
+
+        for name in tag_names:
+            if name not in existing_map:
+                t = Tag(tag_name=name)
+                db.add(t)
+                db.flush()  # 获取 tag_id
+                existing_map[name] = t
+
+        # 清空旧关系，写入新关系
+        db.query(EventTag).filter(EventTag.eid == eid).delete()
+        for tag in existing_map.values():
+            db.add(EventTag(eid=eid, tag_id=tag.tag_id))
+        # 标签变化也算活动更新，让按标签统计的 ETag 随之变化
+        event.updated_at = datetime.now()
+
+        db.commit()
+        invalidate_event_cache(eid)
+        refresh_facet_index(eid)
+        return {"eid": eid, "tags": list(existing_map.keys())}
+    except EventError:
+        db.rollback()
+        raise
+    except Exception as e:
+        db.rollback()
+        raise EventError("Error occurred while setting event tags: %s" % str(e))
+    finally:
+        db.close()
+
+
 def list_today_sessions() -> List[Dict[str, Any]]:
     """Return sessions happening today with event info."""
     today = datetime.now()
     start_of_day = today.replace(hour=0, minute=0, second=0, microsecond=0)
     end_of_day = start_of_day + timedelta(days=1)
-
-    sql = """
-    SELECT
-        s.session_id,
-        s.eid,
-        s.start_time,
-        s.end_time,
-        s.capacity,
-        s.current_registered,
-        s.waiting_list_limit,
-        s.status,
-        e.title AS event_title
-    FROM EVENT_SESSION s
-    JOIN EVENT e ON e.eid = s.eid
-    WHERE s.start_time < %s
-      AND s.end_time >= %s
-      AND e.status IN ('published', 'draft', 'closed')
-    ORDER BY s.start_time ASC
-    """
-
-    conn = get_connection()
-    try:
-        with conn.cursor() as cursor:
-            cursor.execute(sql, (end_of_day, start_of_day))
-            return cursor.fetchall()
-    finally:
-        conn.close()
\ No newline at end of file
+    # 与当天有交集的场次；走 calendar_service 的 start_time 窄区间扫描
+    return sessions_overlapping(
+        start_of_day, end_of_day, event_statuses=("published", "draft", "closed")
+    )
@@ -0,0 +1,379 @@
+# backend/services/facet_index.py
+"""
+进程内的活动分面索引（每个 gunicorn worker 一份）。
+
+- 每个标签 / type_id / status 一个位图（Python int，第 eid 位为 1 表示命中），
+  search_events 的 tag_names / type_ids / status 过滤就是位图的 OR / AND；
+- 场次按 (start_time, end_time) 排序，时间窗过滤用二分定位后顺序扫描；
+- 活动按 (created_at, eid) 排序，用于分页（与数据库路径的排序一致）；
+- 分面计数 = 结果位图与各个值位图求交后的 popcount。
+
+一致性：
+- 本进程内 event_service 的写操作调用 refresh_event(eid) 增量更新；
+  标签改名 / 删除会影响多个活动，admin_service 调用 mark_stale() 让下次查询时整体重建；
+- 其它进程的写入依赖每 FACET_INDEX_REFRESH_SECONDS 秒一次的整体重建。
+关键词过滤不在索引内，带关键词的搜索仍走数据库。
+"""
+import bisect
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from backend.config import load_config
+from backend.db import get_connection
+from backend.utils.pagination import Cursor
+
+config = load_config()
+
+
+def _bitmap_from_ids(ids: Iterable[int]) -> int:
+    """一次性构造位图：逐个 |= (1 << eid) 每次都会复制整个大整数。"""
+    ids = list(ids)
+    if not ids:
+        return 0
+    buf = bytearray(max(ids) // 8 + 1)
+    for i in ids:
+        buf[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(buf, "little")
+
+
+def _bitmap_bytes(bits: int) -> bytes:
+    return bits.to_bytes(bits.bit_length() // 8 + 1, "little")
+
+
+class FacetIndex:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._clear()
+
+    def _clear(self) -> None:
+        self._events: Dict[int, Dict[str, Any]] = {}
+        self._tags: Dict[str, int] = {}
+        self._types: Dict[int, int] = {}
+        self._statuses: Dict[str, int] = {}
+        self._has_session = 0
+        self._order: List[Tuple[datetime, int]] = []
+        self._sessions: List[Tuple[datetime, datetime, int, int]] = []
+
+    # ---------------- 构建与增量更新 ----------------
+
+    def load(
+        self,
+        events: List[Dict[str, Any]],
+        event_tags: List[Dict[str, Any]],
+        sessions: List[Dict[str, Any]],
+    ) -> None:
+        """
+        用三组查询结果整体重建：
+          events: eid, type_id, status, created_at
+          event_tags: eid, tag_name
+          sessions: session_id, eid, start_time, end_time
+        """
+        entries = {
+            e["eid"]: {
+                "created_at": e["created_at"],
+                "type_id": e["type_id"],
+                "status": e["status"],
+                "tags": [],
+                "sessions": [],
+            }
+            for e in events
+        }
+        for t in event_tags:
+            if t["eid"] in entries:
+                entries[t["eid"]]["tags"].append(t["tag_name"])
+        for s in sessions:
+            if s["eid"] in entries:
+                entries[s["eid"]]["sessions"].append((s["start_time"], s["end_time"], s["session_id"]))
+
+        groups: Dict[str, Dict[Any, List[int]]] = {"tags": {}, "types": {}, "statuses": {}}
+        for eid, entry in entries.items():
+            for name in entry["tags"]:
+                groups["tags"].setdefault(name, []).append(eid)
+            groups["types"].setdefault(entry["type_id"], []).append(eid)
+            groups["statuses"].setdefault(entry["status"], []).append(eid)
+
+        with self._lock:
+            self._events = entries
+            self._tags = {k: _bitmap_from_ids(v) for k, v in groups["tags"].items()}
+            self._types = {k: _bitmap_from_ids(v) for k, v in groups["types"].items()}
+            self._statuses = {k: _bitmap_from_ids(v) for k, v in groups["statuses"].items()}
+            self._has_session = _bitmap_from_ids(eid for eid, e in entries.items() if e["sessions"])
+            self._order = sorted((e["created_at"], eid) for eid, e in entries.items())
+            self._sessions = sorted(
+                (start, end, eid, sid)
+                for eid, e in entries.items()
+                for start, end, sid in e["sessions"]
+            )
+
+    def replace_event(self, eid: int, entry: Optional[Dict[str, Any]]) -> None:
+        """增量更新单个活动；entry 为 None 表示活动已删除。entry 结构同 load 中的条目。"""
+        with self._lock:
+            self._remove(eid)
+            if entry is not None:
+                self._add(eid, entry)
+
+    def _remove(self, eid: int) -> None:
+        old = self._events.pop(eid, None)
+        if old is None:
+            return
+        mask = ~(1 << eid)
+        for name in old["tags"]:
+            self._tags[name] &= mask
+        self._types[old["type_id"]] &= mask
+        self._statuses[old["status"]] &= mask
+        self._has_session &= mask
+        key = (old["created_at"], eid)
+        i = bisect.bisect_left(self._order, key)
+        if i < len(self._order) and self._order[i] == key:
+            del self._order[i]
+        for start, end, sid in old["sessions"]:
+            item = (start, end, eid, sid)
+            j = bisect.bisect_left(self._sessions, item)
+            if j < len(self._sessions) and self._sessions[j] == item:
+                del self._sessions[j]
+
+    def _add(self, eid: int, entry: Dict[str, Any]) -> None:
+        self._events[eid] = entry
+        bit = 1 << eid
+        for name in entry["tags"]:
+            self._tags[name] = self._tags.get(name, 0) | bit
+        self._types[entry["type_id"]] = self._types.get(entry["type_id"], 0) | bit
+        self._statuses[entry["status"]] = self._statuses.get(entry["status"], 0) | bit
+        if entry["sessions"]:
+            self._has_session |= bit
+        bisect.insort(self._order, (entry["created_at"], eid))
+        for start, end, sid in entry["sessions"]:
+            bisect.insort(self._sessions, (start, end, eid, sid))
+
+    # ---------------- 查询 ----------------
+
+    def match(
+        self,
+        *,
+        tag_names: Optional[List[str]] = None,
+        type_ids: Optional[List[int]] = None,
+        status: Optional[List[str]] = None,
+        start_dt: Optional[datetime] = None,
+        end_dt: Optional[datetime] = None,
+    ) -> int:
+        """
+        返回命中的活动位图，语义与 search_service 的数据库路径一致：
+        同一维度内取 OR，维度之间取 AND；活动至少要有一个场次，
+        给定时间窗时至少一个场次满足 start_time >= start_dt 且 end_time <= end_dt。
+        """
+        with self._lock:
+            bits = self._has_session
+            if start_dt or end_dt:
+                bits &= self._window_bitmap(start_dt, end_dt)
+            for values, bitmaps in ((tag_names, self._tags), (type_ids, self._types), (status, self._statuses)):
+                if values:
+                    union = 0
+                    for v in values:
+                        union |= bitmaps.get(v, 0)
+                    bits &= union
+            return bits
+
+    def _window_bitmap(self, start_dt: Optional[datetime], end_dt: Optional[datetime]) -> int:
+        sessions = self._sessions
+        i = bisect.bisect_left(sessions, (start_dt,)) if start_dt else 0
+        hits = []
+        while i < len(sessions):
+            start, end, eid, _sid = sessions[i]
+            # start_time <= end_time <= end_dt，start_time 超过 end_dt 后可以停止扫描
+            if end_dt is not None and start > end_dt:
+                break
+            if end_dt is None or end <= end_dt:
+                hits.append(eid)
+            i += 1
+        return _bitmap_from_ids(hits)
+
+    def page(
+        self,
+        bits: int,
+        limit: int,
+        offset: int = 0,
+        cursor: Optional[Cursor] = None,
+    ) -> List[int]:
+        """按 (created_at DESC, eid DESC) 取一页 eid；给定 cursor 时从游标之后开始，忽略 offset。"""
+        if not bits:
+            return []
+        raw = _bitmap_bytes(bits)
+        size = len(raw)
+        out: List[int] = []
+        with self._lock:
+            i = len(self._order) if cursor is None else bisect.bisect_left(self._order, cursor)
+            skip = 0 if cursor is not None else offset
+            while i > 0 and len(out) < limit:
+                i -= 1
+                eid = self._order[i][1]
+                if (eid >> 3) < size and raw[eid >> 3] >> (eid & 7) & 1:
+                    if skip:
+                        skip -= 1
+                        continue
+                    out.append(eid)
+        return out
+
+    def facets(self, bits: int) -> Dict[str, Dict[str, int]]:
+        """结果集中每个标签 / type_id / status 的活动数（只返回计数 > 0 的值）。"""
+        with self._lock:
+            def counts(bitmaps):
+                out = {}
+                for value, bm in bitmaps.items():
+                    n = (bits & bm).bit_count()
+                    if n:
+                        out[str(value)] = n
+                return out
+
+            return {
+                "tags": counts(self._tags),
+                "type_id": counts(self._types),
+                "status": counts(self._statuses),
+            }
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "events": len(self._events),
+                "sessions": len(self._sessions),
+                "tags": len(self._tags),
+            }
+
+
+# ===== 进程内单例：首次使用时加载，之后按间隔整体重建 =====
+
+
+def _fetch_rows(eid: Optional[int] = None):
+    where = "" if eid is None else "WHERE e.eid = %s"
+    params = () if eid is None else (eid,)
+    conn = get_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(f"SELECT e.eid, e.type_id, e.status, e.created_at FROM EVENT e {where}", params)
+            events = list(cursor.fetchall())
+            cursor.execute(
+                f"""
+                SELECT et.eid, t.tag_name
+                FROM EVENT_TAG et
+                JOIN TAG t ON t.tag_id = et.tag_id
+                JOIN EVENT e ON e.eid = et.eid
+                {where}
+                """,
+                params,
+            )
+            event_tags = list(cursor.fetchall())
+            cursor.execute(
+                f"""
+                SELECT s.session_id, s.eid, s.start_time, s.end_time
+                FROM EVENT_SESSION s
+                JOIN EVENT e ON e.eid = s.eid
+                {where}
+                """,
+                params,
+            )
+            sessions = list(cursor.fetchall())
+        return events, event_tags, sessions
+    finally:
+        conn.close()
+
+
+class _ManagedIndex:
+    """FacetIndex + 加载时间；过期后只让一个线程重建，其余线程继续使用旧索引。"""
+
+    def __init__(self, refresh_seconds: float):
+        self.refresh_seconds = refresh_seconds
+        self.index = FacetIndex()
+        self._loaded_at: float | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded_at is not None
+
+    def get(self) -> FacetIndex:
+        self._refresh_if_stale()
+        return self.index
+
+    def mark_stale(self) -> None:
+        """下一次 get() 时整体重建（增量更新失败时使用）。"""
+        if self._loaded_at is not None:
+            self._loaded_at = float("-inf")
+
+    def reload(self) -> None:
+        with self._lock:
+            self.index.load(*_fetch_rows())
+            self._loaded_at = time.monotonic()
+
+    def _refresh_if_stale(self) -> None:
+        now = time.monotonic()
+        loaded_at = self._loaded_at
+        if loaded_at is not None and now - loaded_at < self.refresh_seconds:
+            return
+        if not self._lock.acquire(blocking=loaded_at is None):
+            return
+        try:
+            if self._loaded_at is not None and now - self._loaded_at < self.refresh_seconds:
+                return
+            self.index.load(*_fetch_rows())
+            self._loaded_at = time.monotonic()
+        finally:
+            self._lock.release()
+
+
+_managed = _ManagedIndex(config.FACET_INDEX_REFRESH_SECONDS)
+
+
+def facet_index_enabled() -> bool:
+    return bool(config.SEARCH_FACET_INDEX)
+
+
+def get_facet_index() -> Optional[FacetIndex]:
+    """SEARCH_FACET_INDEX 关闭时返回 None；否则返回（必要时先加载 / 重建的）索引。"""
+    if not facet_index_enabled():
+        return None
+    return _managed.get()
+
+
+def warm_up() -> None:
+    """启动时预先加载，避免第一个搜索请求承担整表加载。"""
+    if facet_index_enabled():
+        _managed.reload()
+
+
+def refresh_event(eid: int) -> None:
+    """活动写操作提交后调用：从数据库重新读取该活动并增量更新本进程的索引。"""
+    if not facet_index_enabled() or not _managed.loaded:
+        return
+    try:
+        events, event_tags, sessions = _fetch_rows(eid)
+    except Exception:
+        # 写操作已经提交，这里不能让它失败；改为下次查询时整体重建
+        _managed.mark_stale()
+        return
+    if not events:
+        _managed.index.replace_event(eid, None)
+        return
+    e = events[0]
+    _managed.index.replace_event(
+        eid,
+        {
+            "created_at": e["created_at"],
+            "type_id": e["type_id"],
+            "status": e["status"],
+            "tags": [t["tag_name"] for t in event_tags],
+            "sessions": [(s["start_time"], s["end_time"], s["session_id"]) for s in sessions],
+        },
+    )
+
+
+def mark_stale() -> None:
+    """影响多个活动的写操作（标签改名 / 删除）提交后调用：下次查询时整体重建本进程的索引。"""
+    if facet_index_enabled():
+        _managed.mark_stale()
+
+
+def get_facet_index_stats() -> Dict[str, Any]:
+    if not facet_index_enabled():
+        return {"enabled": False}
+    return {"enabled": True, "loaded": _managed.loaded, **_managed.index.stats()}
@@ -1,7 +1,14 @@
 from datetime import datetime, timedelta, timezone
-from typing import Literal, Dict, Any
+from typing import Literal, Dict, Any, List, Tuple
 
+import pymysql
+
+from backend.config import load_config
 from backend.db import get_connection
+from backend.services.auth_service import invalidate_cached_user
+from backend.services.stats_service import RegistrationChange, record_registration_change, record_registration_changes
+
+config = load_config()
 
 RegistrationStatus = Literal["registered", "waiting", "cancelled"]
 
@@ -19,44 +26,72 @@ class RegistrationError(Exception):
 def _get_utc_now() -> datetime:
     """
     使用带时区的 UTC 时间，避免 datetime.utcnow 的弃用警告。
+    截到整秒：register_time 等列是 DATETIME(0)，MySQL 会四舍五入微秒，
+    截断后写入的值与内存中的值一致（小时汇总按它分桶）。
     """
-    return datetime.now(timezone.utc)
+    return datetime.now(timezone.utc).replace(microsecond=0)
+
+
+def _find_no_show_offenders(cursor, user_ids: List[int], now: datetime) -> List[int]:
+    """
+    返回 user_ids 中最近 NO_SHOW_WINDOW_DAYS 天爽约次数 >= NO_SHOW_THRESHOLD 的用户。
+
+    数据来源由 NO_SHOW_COUNT_SOURCE 决定：
+      - scan（默认）：REGISTRATION JOIN EVENT_SESSION 实时分组统计；
+      - ledger：按主键读取 USER_NO_SHOW_STATS 台账（由定期 sweep 维护），
+        不再在报名路径上做 JOIN；两次 sweep 之间新增的爽约要等下次刷新才计入；
+      - off：报名路径不检查，封禁完全由 run_no_show_sweep 写入 blocked_until。
+    """
+    if not user_ids or config.NO_SHOW_COUNT_SOURCE == "off":
+        return []
+    placeholders = ", ".join(["%s"] * len(user_ids))
+    if config.NO_SHOW_COUNT_SOURCE == "ledger":
+        cursor.execute(
+            f"""
+            SELECT user_id
+            FROM USER_NO_SHOW_STATS
+            WHERE user_id IN ({placeholders})
+              AND no_show_count >= %s
+            """,
+            list(user_ids) + [NO_SHOW_THRESHOLD],
+        )
+    else:
+        cursor.execute(
+            f"""
+            SELECT r.user_id
+            FROM REGISTRATION r
+            JOIN EVENT_SESSION s ON r.session_id = s.session_id
+            WHERE r.user_id IN ({placeholders})
+              AND r.status = 'registered'
+              AND r.checkin_time IS NULL
+              AND s.end_time < %s
+              AND s.end_time >= %s
+            GROUP BY r.user_id
+            HAVING COUNT(*) >= %s
+            """,
+            list(user_ids)
+            + [now, now - timedelta(days=NO_SHOW_WINDOW_DAYS), NO_SHOW_THRESHOLD],
+        )
+    return [r["user_id"] for r in cursor.fetchall()]
 
 
 def _maybe_block_user_for_no_show(cursor, user_id: int) -> datetime | None:
     """
-    使用给定 cursor，在数据库中统计该用户“最近 30 天”的爽约次数：
+    使用给定 cursor 判断该用户“最近 30 天”的爽约次数是否达到阈值
+    （统计口径与数据来源见 _find_no_show_offenders）：
       - REGISTRATION.status = 'registered'
       - REGISTRATION.checkin_time IS NULL
-      - 对应 EVENT_SESSION.end_time < now
-      - 且 end_time 在 [now - NO_SHOW_WINDOW_DAYS, now) 之间
+      - 对应 EVENT_SESSION.end_time 在 [now - NO_SHOW_WINDOW_DAYS, now) 之间
 
     如果次数 >= NO_SHOW_THRESHOLD，则将 USER.blocked_until 设置为 now + BLOCK_DAYS，
     返回 blocked_until；否则返回 None。
 
-    注意：这里只执行 UPDATE，不做 commit；由上层事务统一提交。
+    注意：这里只执行 UPDATE，不做 commit；调用方需在拒绝报名前先 commit，
+    否则封禁会随报名事务一起回滚。鉴权缓存也要在 commit 之后再失效，
+    否则并发请求可能在提交前重新读到旧行并缓存。
     """
     now = _get_utc_now()
-    start_window = now - timedelta(days=NO_SHOW_WINDOW_DAYS)
-
-    # 统计爽约次数
-    cursor.execute(
-        """
-        SELECT COUNT(*) AS cnt
-        FROM REGISTRATION r
-        JOIN EVENT_SESSION s ON r.session_id = s.session_id
-        WHERE r.user_id = %s
-          AND r.status = 'registered'
-          AND r.checkin_time IS NULL
-          AND s.end_time < %s
-          AND s.end_time >= %s
-        """,
-        (user_id, now, start_window),
-    )
-    row = cursor.fetchone()
-    no_show_count = row["cnt"] or 0
-
-    if no_show_count < NO_SHOW_THRESHOLD:
+    if not _find_no_show_offenders(cursor, [user_id], now):
         return None
 
     # 达到阈值 -> 计算封禁截止时间并写入 USER.blocked_until
@@ -65,7 +100,8 @@ def _maybe_block_user_for_no_show(cursor, user_id: int) -> datetime | None:
     cursor.execute(
         """
         UPDATE `USER`
-        SET blocked_until = %s
+        SET blocked_until = %s,
+            token_version = token_version + 1
         WHERE user_id = %s
         """,
         (blocked_until, user_id),
@@ -74,6 +110,88 @@ def _maybe_block_user_for_no_show(cursor, user_id: int) -> datetime | None:
     return blocked_until
 
 
+# 候补队列的表示：
+#   - REGISTRATION.queue_position 存的是候补号，由 EVENT_SESSION.waiting_seq 单调发放，
+#     取消 / 转正时不再整体重排；
+#   - EVENT_SESSION.current_waiting 维护当前 waiting 人数，替代 COUNT(*)；
+#   - 对外展示的“第几位” = 同场次中候补号 <= 自己的 waiting 人数，读时计算
+#     （走 idx_registration_session_queue 索引范围扫描）。
+# 查询中以别名 r 引用 REGISTRATION，直接作为 SELECT 列使用：
+#   SELECT ..., {WAITING_RANK_SQL} AS queue_position FROM REGISTRATION r ...
+WAITING_RANK_SQL = """
+    CASE WHEN r.status = 'waiting' THEN (
+        SELECT COUNT(*)
+        FROM REGISTRATION w
+        WHERE w.session_id = r.session_id
+          AND w.status = 'waiting'
+          AND w.queue_position <= r.queue_position
+    ) END
+"""
+
+
+def _take_waiting_ticket(cursor, session_id: int) -> int:
+    """
+    发放一个候补号：waiting_seq + 1，current_waiting + 1。
+    调用方需已锁定该场次行；不做 commit。返回新的候补号。
+    """
+    cursor.execute(
+        """
+        UPDATE EVENT_SESSION
+        SET waiting_seq = waiting_seq + 1,
+            current_waiting = current_waiting + 1,
+            version = version + 1
+        WHERE session_id = %s
+        """,
+        (session_id,),
+    )
+    cursor.execute(
+        "SELECT waiting_seq FROM EVENT_SESSION WHERE session_id = %s",
+        (session_id,),
+    )
+    return int(cursor.fetchone()["waiting_seq"])
+
+
+def _leave_waiting_list(cursor, session_id: int) -> None:
+    """一条 waiting 记录离开候补队列（取消或转正）时调用，只改计数，不重排。"""
+    cursor.execute(
+        """
+        UPDATE EVENT_SESSION
+        SET current_waiting = GREATEST(0, current_waiting - 1),
+            version = version + 1
+        WHERE session_id = %s
+        """,
+        (session_id,),
+    )
+
+
+def get_user_registration_version(user_id: int) -> Dict[str, Any]:
+    """
+    条件 GET 用：某用户报名列表的版本（报名条数 + 所涉场次 version 之和 + 活动最近 updated_at）。
+    本人或他人的报名变化都会递增场次 version，因此候补名次变化也会反映出来；
+    ended_count（已结束场次数）随时间变化，供 no-show 等依赖当前时间的统计使用。
+    """
+    conn = get_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT
+                    COUNT(*) AS registration_count,
+                    COALESCE(SUM(s.version), 0) AS version_sum,
+                    MAX(e.updated_at) AS updated_at,
+                    COALESCE(SUM(s.end_time < %s), 0) AS ended_count
+                FROM REGISTRATION r
+                JOIN EVENT_SESSION s ON r.session_id = s.session_id
+                JOIN EVENT e ON s.eid = e.eid
+                WHERE r.user_id = %s
+                """,
+                (_get_utc_now().replace(tzinfo=None), user_id),
+            )
+            return cursor.fetchone()
+    finally:
+        conn.close()
+
+
 def _build_bilingual_message_for_register(
     status: RegistrationStatus,
     base_message_zh: str,
@@ -102,6 +220,25 @@ def _build_bilingual_message_for_register(
     }
 
 
+def _already_registered_response(
+    existing: Dict[str, Any], user_id: int, session_id: int
+) -> Dict[str, Any]:
+    """已有 registered / waiting 记录时的统一返回（不重复报名）。"""
+    base_message_zh = "你已报名该场次（当前状态：%s）" % existing["status"]
+    bilingual = _build_bilingual_message_for_register(
+        status=existing["status"],
+        base_message_zh=base_message_zh,
+        queue_position=existing.get("queue_position"),
+    )
+    return {
+        "session_id": session_id,
+        "user_id": user_id,
+        "status": existing["status"],
+        "queue_position": existing.get("queue_position"),
+        **bilingual,
+    }
+
+
 def register_for_session(user_id: int, session_id: int) -> Dict[str, Any]:
     """
     报名一个场次的核心逻辑：
@@ -162,6 +299,9 @@ def register_for_session(user_id: int, session_id: int) -> Dict[str, Any]:
             # 1) 统计最近 30 天爽约次数，如超标则立刻封禁并拒绝当前报名
             newly_blocked_until = _maybe_block_user_for_no_show(cursor, user_id)
             if newly_blocked_until is not None:
+                # 封禁本身需要生效，先提交再拒绝本次报名（否则会被下面的 rollback 撤销）
+                conn.commit()
+                invalidate_cached_user(user_id)
                 raise RegistrationError(
                     f"最近 {NO_SHOW_WINDOW_DAYS} 天内爽约次数过多，"
                     f"账号已被封禁至 {newly_blocked_until}"
@@ -178,6 +318,7 @@ def register_for_session(user_id: int, session_id: int) -> Dict[str, Any]:
                     capacity,
                     current_registered,
                     waiting_list_limit,
+                    current_waiting,
                     status
                 FROM EVENT_SESSION
                 WHERE session_id = %s
@@ -224,10 +365,10 @@ def register_for_session(user_id: int, session_id: int) -> Dict[str, Any]:
 
             # 3) 查询是否已经有报名记录（包括 cancelled）
             cursor.execute(
-                """
-                SELECT status, queue_position
-                FROM REGISTRATION
-                WHERE user_id = %s AND session_id = %s
+                f"""
+                SELECT r.status, r.checkin_time, r.register_time, {WAITING_RANK_SQL} AS queue_position
+                FROM REGISTRATION r
+                WHERE r.user_id = %s AND r.session_id = %s
                 FOR UPDATE
                 """,
                 (user_id, session_id),
@@ -236,19 +377,7 @@ def register_for_session(user_id: int, session_id: int) -> Dict[str, Any]:
 
             # 3.1 已经是 registered / waiting：不重复报名
             if existing and existing["status"] in ("registered", "waiting"):
-                base_message_zh = "你已报名该场次（当前状态：%s）" % existing["status"]
-                bilingual = _build_bilingual_message_for_register(
-                    status=existing["status"],
-                    base_message_zh=base_message_zh,
-                    queue_position=existing.get("queue_position"),
-                )
-                return {
-                    "session_id": session_id,
-                    "user_id": user_id,
-                    "status": existing["status"],
-                    "queue_position": existing.get("queue_position"),
-                    **bilingual,
-                }
+                return _already_registered_response(existing, user_id, session_id)
 
             # 3.2 cancelled -> 允许重新报名，后面统一当“复用旧记录”处理
             has_old_cancelled = bool(
@@ -260,37 +389,30 @@ def register_for_session(user_id: int, session_id: int) -> Dict[str, Any]:
                 # 还有名额 -> registered
                 new_status: RegistrationStatus = "registered"
                 queue_position = None
+                ticket = None
                 base_message_zh = "报名成功"
 
                 # EVENT_SESSION.current_registered + 1
                 cursor.execute(
                     """
                     UPDATE EVENT_SESSION
-                    SET current_registered = current_registered + 1
+                    SET current_registered = current_registered + 1,
+                        version = version + 1
                     WHERE session_id = %s
                     """,
                     (session_id,),
                 )
             else:
-                # 已满 -> 进入 waiting
-                # 检查当前已在 waiting 的人数
-                cursor.execute(
-                    """
-                    SELECT COUNT(*) AS cnt
-                    FROM REGISTRATION
-                    WHERE session_id = %s AND status = 'waiting'
-                    """,
-                    (session_id,),
-                )
-                wait_row = cursor.fetchone()
-                current_waiting = wait_row["cnt"] or 0
+                # 已满 -> 进入 waiting（当前 waiting 人数直接取计数列）
+                current_waiting = session_row["current_waiting"] or 0
 
                 # 如果有 waiting_list_limit，就判断一下
                 if waiting_list_limit is not None and waiting_list_limit > 0:
                     if current_waiting >= waiting_list_limit:
                         raise RegistrationError("场次已满且候补队列也已满")
 
-                # 新的候补位次
+                # 领取候补号；新号最大，因此名次 = 原 waiting 人数 + 1
+                ticket = _take_waiting_ticket(cursor, session_id)
                 queue_position = current_waiting + 1
                 new_status = "waiting"
                 base_message_zh = (
@@ -308,7 +430,7 @@ def register_for_session(user_id: int, session_id: int) -> Dict[str, Any]:
                         queue_position = %s
                     WHERE user_id = %s AND session_id = %s
                     """,
-                    (new_status, now, queue_position, user_id, session_id),
+                    (new_status, now, ticket, user_id, session_id),
                 )
             else:
                 cursor.execute(
@@ -317,9 +439,19 @@ def register_for_session(user_id: int, session_id: int) -> Dict[str, Any]:
                         user_id, session_id, register_time, status, checkin_time, queue_position
                     ) VALUES (%s, %s, %s, %s, NULL, %s)
                     """,
-                    (user_id, session_id, now, new_status, queue_position),
+                    (user_id, session_id, now, new_status, ticket),
                 )
 
+            record_registration_change(
+                cursor,
+                session_id,
+                "cancelled" if has_old_cancelled else None,
+                new_status,
+                old_checked_in=has_old_cancelled and existing["checkin_time"] is not None,
+                old_register_time=existing["register_time"] if has_old_cancelled else None,
+                new_register_time=now,
+            )
+
         conn.commit()
 
         bilingual = _build_bilingual_message_for_register(
@@ -347,6 +479,649 @@ def register_for_session(user_id: int, session_id: int) -> Dict[str, Any]:
         conn.close()
 
 
+def register_for_session_fast(user_id: int, session_id: int) -> Dict[str, Any]:
+    """
+    报名的“短临界区”实现，返回结构与 register_for_session 一致。
+
+    阶段 1（不加锁）：用户是否存在 / 是否封禁、爽约统计、场次是否开放、
+      多场次限制、是否已有报名记录。这些检查只读，结束后立即 commit，
+      不再持有场次行锁。
+    阶段 2（短事务）：
+      UPDATE EVENT_SESSION
+      SET current_registered = current_registered + 1
+      WHERE session_id = ? AND status = 'open' AND current_registered < capacity
+      - 影响 1 行：占到名额，写 REGISTRATION 为 registered；
+      - 影响 0 行：才锁定场次行重新读取；此时若有名额（期间有人取消）仍直接报名，
+        否则按原逻辑进入候补队列。
+
+    与 register_for_session 的差异：多场次限制的检查不再加锁，
+    同一用户同时报名同一活动的两个场次时，极端情况下两条都可能成功。
+    """
+    now = _get_utc_now()
+    conn = get_connection()
+    try:
+        with conn.cursor() as cursor:
+            # ===== 阶段 1：锁外检查 =====
+            cursor.execute(
+                "SELECT blocked_until FROM `USER` WHERE user_id = %s",
+                (user_id,),
+            )
+            user_row = cursor.fetchone()
+            if not user_row:
+                raise RegistrationError("用户不存在")
+
+            blocked_until = user_row["blocked_until"]
+            if isinstance(blocked_until, datetime) and blocked_until > now.replace(tzinfo=None):
+                raise RegistrationError(f"账号已被封禁，解封时间：{blocked_until}")
+
+            newly_blocked_until = _maybe_block_user_for_no_show(cursor, user_id)
+            if newly_blocked_until is not None:
+                # 封禁本身需要生效，先提交再拒绝本次报名
+                conn.commit()
+                invalidate_cached_user(user_id)
+                raise RegistrationError(
+                    f"最近 {NO_SHOW_WINDOW_DAYS} 天内爽约次数过多，"
+                    f"账号已被封禁至 {newly_blocked_until}"
+                )
+
+            cursor.execute(
+                """
+                SELECT s.eid, s.status, e.allow_multi_session
+                FROM EVENT_SESSION s
+                JOIN EVENT e ON e.eid = s.eid
+                WHERE s.session_id = %s
+                """,
+                (session_id,),
+            )
+            session_row = cursor.fetchone()
+            if not session_row:
+                raise RegistrationError("该场次不存在")
+            if session_row["status"] != "open":
+                raise RegistrationError("该场次已关闭报名")
+
+            if not session_row["allow_multi_session"]:
+                cursor.execute(
+                    """
+                    SELECT 1
+                    FROM REGISTRATION r
+                    JOIN EVENT_SESSION es ON r.session_id = es.session_id
+                    WHERE r.user_id = %s
+                      AND es.eid = %s
+                      AND r.status IN ('registered', 'waiting')
+                      AND r.session_id <> %s
+                    LIMIT 1
+                    """,
+                    (user_id, session_row["eid"], session_id),
+                )
+                if cursor.fetchone():
+                    raise RegistrationError("You are already registered for another session of this event")
+
+            cursor.execute(
+                f"""
+                SELECT r.status, r.checkin_time, r.register_time, {WAITING_RANK_SQL} AS queue_position
+                FROM REGISTRATION r
+                WHERE r.user_id = %s AND r.session_id = %s
+                """,
+                (user_id, session_id),
+            )
+            existing = cursor.fetchone()
+            if existing and existing["status"] in ("registered", "waiting"):
+                return _already_registered_response(existing, user_id, session_id)
+            has_old_cancelled = existing is not None
+            # cancelled 记录不能签到，其 checkin_time 在阶段 2 的条件 UPDATE 成功前不会变化
+            old_checked_in = has_old_cancelled and existing["checkin_time"] is not None
+            old_register_time = existing["register_time"] if has_old_cancelled else None
+        conn.commit()
+
+        # ===== 阶段 2：单条条件 UPDATE 抢名额 =====
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                UPDATE EVENT_SESSION
+                SET current_registered = current_registered + 1,
+                    version = version + 1
+                WHERE session_id = %s
+                  AND status = 'open'
+                  AND current_registered < capacity
+                """,
+                (session_id,),
+            )
+            if cursor.rowcount == 1:
+                new_status: RegistrationStatus = "registered"
+                queue_position = None
+                ticket = None
+                base_message_zh = "报名成功"
+            else:
+                # 没抢到名额（或场次刚被关闭）：锁定场次行后重新判断
+                cursor.execute(
+                    """
+                    SELECT capacity, current_registered, waiting_list_limit, current_waiting, status
+                    FROM EVENT_SESSION
+                    WHERE session_id = %s
+                    FOR UPDATE
+                    """,
+                    (session_id,),
+                )
+                locked = cursor.fetchone()
+                if not locked or locked["status"] != "open":
+                    raise RegistrationError("该场次已关闭报名")
+
+                if (locked["current_registered"] or 0) < locked["capacity"]:
+                    # 条件 UPDATE 之后有人取消释放了名额：与慢路径一致，直接占座
+                    cursor.execute(
+                        """
+                        UPDATE EVENT_SESSION
+                        SET current_registered = current_registered + 1,
+                            version = version + 1
+                        WHERE session_id = %s
+                        """,
+                        (session_id,),
+                    )
+                    new_status = "registered"
+                    queue_position = None
+                    ticket = None
+                    base_message_zh = "报名成功"
+                else:
+                    current_waiting = locked["current_waiting"] or 0
+                    waiting_list_limit = locked["waiting_list_limit"]
+                    if waiting_list_limit is not None and waiting_list_limit > 0:
+                        if current_waiting >= waiting_list_limit:
+                            raise RegistrationError("场次已满且候补队列也已满")
+
+                    ticket = _take_waiting_ticket(cursor, session_id)
+                    queue_position = current_waiting + 1
+                    new_status = "waiting"
+                    base_message_zh = (
+                        "场次已满，已进入候补队列（排在第 %d 位）" % queue_position
+                    )
+
+            # 写 REGISTRATION；若并发的同一用户请求已抢先写入，则整体回滚
+            if has_old_cancelled:
+                cursor.execute(
+                    """
+                    UPDATE REGISTRATION
+                    SET status = %s,
+                        register_time = %s,
+                        checkin_time = NULL,
+                        queue_position = %s
+                    WHERE user_id = %s AND session_id = %s AND status = 'cancelled'
+                    """,
+                    (new_status, now, ticket, user_id, session_id),
+                )
+                written = cursor.rowcount == 1
+            else:
+                try:
+                    cursor.execute(
+                        """
+                        INSERT INTO REGISTRATION (
+                            user_id, session_id, register_time, status, checkin_time, queue_position
+                        ) VALUES (%s, %s, %s, %s, NULL, %s)
+                        """,
+                        (user_id, session_id, now, new_status, ticket),
+                    )
+                    written = True
+                except pymysql.err.IntegrityError:
+                    written = False
+
+            if not written:
+                conn.rollback()
+                cursor.execute(
+                    f"""
+                    SELECT r.status, {WAITING_RANK_SQL} AS queue_position
+                    FROM REGISTRATION r
+                    WHERE r.user_id = %s AND r.session_id = %s
+                    """,
+                    (user_id, session_id),
+                )
+                existing = cursor.fetchone()
+                if existing and existing["status"] in ("registered", "waiting"):
+                    return _already_registered_response(existing, user_id, session_id)
+                raise RegistrationError("报名冲突，请重试")
+
+            record_registration_change(
+                cursor,
+                session_id,
+                "cancelled" if has_old_cancelled else None,
+                new_status,
+                old_checked_in=old_checked_in,
+                old_register_time=old_register_time,
+                new_register_time=now,
+            )
+
+        conn.commit()
+
+        bilingual = _build_bilingual_message_for_register(
+            status=new_status,
+            base_message_zh=base_message_zh,
+            queue_position=queue_position,
+        )
+        return {
+            "session_id": session_id,
+            "user_id": user_id,
+            "status": new_status,
+            "queue_position": queue_position,
+            **bilingual,
+        }
+
+    except RegistrationError:
+        conn.rollback()
+        raise
+    except Exception as e:
+        conn.rollback()
+        raise RegistrationError("报名过程中发生错误：%s" % str(e))
+    finally:
+        conn.close()
+
+
+def submit_registration(user_id: int, session_id: int) -> Dict[str, Any]:
+    """
+    API 层统一使用的报名入口，按 REGISTRATION_MODE 选择实现：
+      - locking（默认）：register_for_session
+      - conditional：register_for_session_fast（锁外检查 + 单条条件 UPDATE）
+      - batched：admission_service.admission_engine（进程内名额计数 + 批量落库）
+    返回结构与 register_for_session 一致。
+    """
+    if config.REGISTRATION_MODE == "batched":
+        # 延迟导入：admission_service 依赖本模块
+        from backend.services.admission_service import admission_engine
+
+        return admission_engine.submit(user_id, session_id)
+    if config.REGISTRATION_MODE == "conditional":
+        return register_for_session_fast(user_id, session_id)
+    return register_for_session(user_id, session_id)
+
+
+def register_batch(items: List[Tuple[int, int]]) -> List[Dict[str, Any]]:
+    """
+    批量报名（团体 / 企业报名）：items 为 (user_id, session_id) 列表，
+    可以是多人报同一场次，也可以是一人报多个场次。
+
+    整批在一个事务内完成：
+      - 按 session_id 升序一次性锁定涉及的场次行（避免与其它批次互相死锁）；
+      - 用户存在 / 封禁、爽约统计、多场次限制、已有报名记录均为集合查询；
+      - 每个场次只执行一条 UPDATE（current_registered / waiting_seq / current_waiting）；
+      - REGISTRATION 用一条多行 INSERT ... ON DUPLICATE KEY UPDATE 写入
+        （复用 cancelled 旧记录）。
+
+    单个条目的业务失败不影响其它条目，返回与 items 一一对应的结果列表：
+      - 成功：与 register_for_session 返回结构相同；
+      - 失败：{"session_id", "user_id", "status": "failed", "message_zh", "message_en"}
+    """
+    if not items:
+        return []
+
+    now = _get_utc_now()
+    now_naive = now.replace(tzinfo=None)
+    pairs = list(dict.fromkeys((int(u), int(sid)) for u, sid in items))
+    user_ids = sorted({u for u, _ in pairs})
+    session_ids = sorted({sid for _, sid in pairs})
+    outcomes: Dict[Tuple[int, int], Any] = {}
+    newly_blocked: List[int] = []
+
+    def _in(values) -> str:
+        return ", ".join(["%s"] * len(values))
+
+    def _fail(pair: Tuple[int, int], message_zh: str) -> None:
+        outcomes[pair] = RegistrationError(message_zh)
+
+    conn = get_connection()
+    try:
+        with conn.cursor() as cursor:
+            # 1) 锁定场次（固定顺序）
+            cursor.execute(
+                f"""
+                SELECT session_id, eid, capacity, current_registered,
+                       waiting_list_limit, waiting_seq, current_waiting, status
+                FROM EVENT_SESSION
+                WHERE session_id IN ({_in(session_ids)})
+                ORDER BY session_id
+                FOR UPDATE
+                """,
+                session_ids,
+            )
+            sessions = {r["session_id"]: dict(r) for r in cursor.fetchall()}
+            eids = sorted({r["eid"] for r in sessions.values()})
+            single_session_eids: set[int] = set()
+            if eids:
+                cursor.execute(
+                    f"SELECT eid, allow_multi_session FROM EVENT WHERE eid IN ({_in(eids)})",
+                    eids,
+                )
+                single_session_eids = {
+                    r["eid"] for r in cursor.fetchall() if not r["allow_multi_session"]
+                }
+
+            # 2) 用户是否存在 / 是否已封禁
+            cursor.execute(
+                f"SELECT user_id, blocked_until FROM `USER` WHERE user_id IN ({_in(user_ids)})",
+                user_ids,
+            )
+            users = {r["user_id"]: r for r in cursor.fetchall()}
+
+            # 3) 爽约统计：一条分组查询，超标者批量封禁
+            to_block: List[int] = []
+            candidates_users = [
+                u for u in user_ids
+                if u in users and not (
+                    users[u]["blocked_until"] is not None
+                    and users[u]["blocked_until"] > now_naive
+                )
+            ]
+            if candidates_users:
+                to_block = _find_no_show_offenders(cursor, candidates_users, now)
+            block_until = now + timedelta(days=BLOCK_DAYS)
+            if to_block:
+                cursor.execute(
+                    f"""
+                    UPDATE `USER`
+                    SET blocked_until = %s,
+                        token_version = token_version + 1
+                    WHERE user_id IN ({_in(to_block)})
+                    """,
+                    [block_until] + to_block,
+                )
+                newly_blocked = to_block
+
+            # 4) 已有报名记录（含 cancelled），以及同一活动其它场次的占用情况
+            cursor.execute(
+                f"""
+                SELECT r.user_id, r.session_id, r.status, r.checkin_time, r.register_time, es.eid,
+                       {WAITING_RANK_SQL} AS queue_position
+                FROM REGISTRATION r
+                JOIN EVENT_SESSION es ON r.session_id = es.session_id
+                WHERE r.user_id IN ({_in(user_ids)})
+                  AND (r.session_id IN ({_in(session_ids)}) OR es.eid IN ({_in(eids or [0])}))
+                FOR UPDATE
+                """,
+                user_ids + session_ids + (eids or [0]),
+            )
+            existing: Dict[Tuple[int, int], Dict[str, Any]] = {}
+            occupied: Dict[Tuple[int, int], set] = {}  # (user_id, eid) -> {session_id}
+            for r in cursor.fetchall():
+                existing[(r["user_id"], r["session_id"])] = r
+                if r["status"] in ("registered", "waiting"):
+                    occupied.setdefault((r["user_id"], r["eid"]), set()).add(r["session_id"])
+
+            # 5) 逐条判定（只在内存中进行），按场次累计名额与候补号
+            to_write: List[Tuple[int, int, str, int | None, int | None]] = []
+            per_session: Dict[int, Dict[str, int]] = {}
+            blocked_set = set(to_block)
+            for pair in pairs:
+                uid, sid = pair
+                session_row = sessions.get(sid)
+                user_row = users.get(uid)
+                if user_row is None:
+                    _fail(pair, "用户不存在")
+                    continue
+                if user_row["blocked_until"] is not None and user_row["blocked_until"] > now_naive:
+                    _fail(pair, f"账号已被封禁，解封时间：{user_row['blocked_until']}")
+                    continue
+                if uid in blocked_set:
+                    _fail(
+                        pair,
+                        f"最近 {NO_SHOW_WINDOW_DAYS} 天内爽约次数过多，账号已被封禁至 {block_until}",
+                    )
+                    continue
+                if session_row is None:
+                    _fail(pair, "该场次不存在")
+                    continue
+                if session_row["status"] != "open":
+                    _fail(pair, "该场次已关闭报名")
+                    continue
+
+                old = existing.get(pair)
+                if old and old["status"] in ("registered", "waiting"):
+                    outcomes[pair] = _already_registered_response(old, uid, sid)
+                    continue
+
+                eid = session_row["eid"]
+                if eid in single_session_eids and occupied.get((uid, eid), set()) - {sid}:
+                    _fail(pair, "You are already registered for another session of this event")
+                    continue
+
+                counters = per_session.setdefault(sid, {"registered": 0, "waiting": 0})
+                if session_row["current_registered"] < session_row["capacity"]:
+                    session_row["current_registered"] += 1
+                    counters["registered"] += 1
+                    new_status, ticket, queue_position = "registered", None, None
+                else:
+                    limit = session_row["waiting_list_limit"]
+                    if limit is not None and limit > 0 and session_row["current_waiting"] >= limit:
+                        _fail(pair, "场次已满且候补队列也已满")
+                        continue
+                    session_row["waiting_seq"] += 1
+                    session_row["current_waiting"] += 1
+                    counters["waiting"] += 1
+                    new_status = "waiting"
+                    ticket = session_row["waiting_seq"]
+                    queue_position = session_row["current_waiting"]
+
+                occupied.setdefault((uid, eid), set()).add(sid)
+                to_write.append((uid, sid, new_status, ticket, queue_position))
+
+            # 6) 每个场次一条计数 UPDATE
+            for sid, counters in per_session.items():
+                cursor.execute(
+                    """
+                    UPDATE EVENT_SESSION
+                    SET current_registered = current_registered + %s,
+                        waiting_seq = waiting_seq + %s,
+                        current_waiting = current_waiting + %s,
+                        version = version + 1
+                    WHERE session_id = %s
+                    """,
+                    (counters["registered"], counters["waiting"], counters["waiting"], sid),
+                )
+
+            # 7) 一条多行 INSERT 写入全部报名记录
+            if to_write:
+                values_sql = ", ".join(["(%s, %s, %s, %s, NULL, %s)"] * len(to_write))
+                params: List[Any] = []
+                for uid, sid, new_status, ticket, _ in to_write:
+                    params.extend([uid, sid, now, new_status, ticket])
+                cursor.execute(
+                    f"""
+                    INSERT INTO REGISTRATION (
+                        user_id, session_id, register_time, status, checkin_time, queue_position
+                    ) VALUES {values_sql}
+                    ON DUPLICATE KEY UPDATE
+                        status = VALUES(status),
+                        register_time = VALUES(register_time),
+                        checkin_time = NULL,
+                        queue_position = VALUES(queue_position)
+                    """,
+                    params,
+                )
+
+                changes = []
+                for uid, sid, new_status, _, _ in to_write:
+                    old = existing.get((uid, sid))
+                    changes.append(
+                        RegistrationChange(
+                            sid,
+                            old["status"] if old else None,
+                            new_status,
+                            old_checked_in=bool(old and old["checkin_time"] is not None),
+                            old_register_time=old["register_time"] if old else None,
+                            new_register_time=now,
+                        )
+                    )
+                record_registration_changes(cursor, changes)
+
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        raise RegistrationError("批量报名过程中发生错误：%s" % str(e))
+    finally:
+        conn.close()
+
+    for uid in newly_blocked:
+        invalidate_cached_user(uid)
+
+    for uid, sid, new_status, _, queue_position in to_write:
+        if new_status == "registered":
+            base_message_zh = "报名成功"
+        else:
+            base_message_zh = "场次已满，已进入候补队列（排在第 %d 位）" % queue_position
+        outcomes[(uid, sid)] = {
+            "session_id": sid,
+            "user_id": uid,
+            "status": new_status,
+            "queue_position": queue_position,
+            **_build_bilingual_message_for_register(
+                status=new_status,
+                base_message_zh=base_message_zh,
+                queue_position=queue_position,
+            ),
+        }
+
+    results: List[Dict[str, Any]] = []
+    for u, sid in items:
+        pair = (int(u), int(sid))
+        outcome = outcomes[pair]
+        if isinstance(outcome, RegistrationError):
+            err_msg = str(outcome)
+            results.append(
+                {
+                    "session_id": pair[1],
+                    "user_id": pair[0],
+                    "status": "failed",
+                    "message_zh": err_msg,
+                    "message_en": "Registration failed: " + err_msg,
+                }
+            )
+        else:
+            results.append(outcome)
+    return results
+
+
+def promote_waiting_list(
+    session_id: int,
+    limit: int | None = None,
+    new_capacity: int | None = None,
+) -> Dict[str, Any]:
+    """
+    批量候补转正（管理员扩容或一次空出多个名额时使用）：
+
+      - 可选地先把 capacity 调整为 new_capacity（不能低于当前已报名人数）；
+      - 空余名额 = capacity - current_registered，再与 limit 取较小值得到 n；
+      - 按候补号顺序一次性把前 n 个 waiting 转为 registered，
+        并在同一事务内更新 current_registered / current_waiting。
+
+    只锁一次场次行，转正本身是一条 UPDATE ... ORDER BY queue_position LIMIT n，
+    不会像逐个 cancel_registration 那样循环加锁。
+
+    返回：
+      {
+        "session_id": 3,
+        "capacity": 120,
+        "promoted": 20,
+        "promoted_user_ids": [...],
+        "current_registered": 120,
+        "current_waiting": 5
+      }
+    """
+    if limit is not None and limit < 0:
+        raise RegistrationError("limit 不能为负数")
+
+    conn = get_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT capacity, current_registered, current_waiting
+                FROM EVENT_SESSION
+                WHERE session_id = %s
+                FOR UPDATE
+                """,
+                (session_id,),
+            )
+            session_row = cursor.fetchone()
+            if not session_row:
+                raise RegistrationError("场次不存在")
+
+            capacity = session_row["capacity"]
+            current_registered = session_row["current_registered"]
+            current_waiting = session_row["current_waiting"]
+
+            if new_capacity is not None:
+                if new_capacity <= 0 or new_capacity < current_registered:
+                    raise RegistrationError("新的容量必须为正数且不小于当前已报名人数")
+                if new_capacity != capacity:
+                    cursor.execute(
+                        "UPDATE EVENT_SESSION SET capacity = %s, version = version + 1 WHERE session_id = %s",
+                        (new_capacity, session_id),
+                    )
+                    capacity = new_capacity
+
+            n = max(0, capacity - current_registered)
+            if limit is not None:
+                n = min(n, limit)
+
+            promoted_ids: list[int] = []
+            if n > 0:
+                # 先取出将被转正的用户（同时加锁），再用一条 UPDATE 完成转正
+                cursor.execute(
+                    """
+                    SELECT user_id
+                    FROM REGISTRATION
+                    WHERE session_id = %s AND status = 'waiting'
+                    ORDER BY queue_position ASC
+                    LIMIT %s
+                    FOR UPDATE
+                    """,
+                    (session_id, n),
+                )
+                promoted_ids = [r["user_id"] for r in cursor.fetchall()]
+
+            if promoted_ids:
+                k = len(promoted_ids)
+                cursor.execute(
+                    """
+                    UPDATE REGISTRATION
+                    SET status = 'registered', queue_position = NULL
+                    WHERE session_id = %s AND status = 'waiting'
+                    ORDER BY queue_position ASC
+                    LIMIT %s
+                    """,
+                    (session_id, k),
+                )
+                cursor.execute(
+                    """
+                    UPDATE EVENT_SESSION
+                    SET current_registered = current_registered + %s,
+                        current_waiting = GREATEST(0, current_waiting - %s),
+                        version = version + 1
+                    WHERE session_id = %s
+                    """,
+                    (k, k, session_id),
+                )
+                record_registration_changes(
+                    cursor, [RegistrationChange(session_id, "waiting", "registered")] * k
+                )
+                current_registered += k
+                current_waiting = max(0, current_waiting - k)
+
+        conn.commit()
+        return {
+            "session_id": session_id,
+            "capacity": capacity,
+            "promoted": len(promoted_ids),
+            "promoted_user_ids": promoted_ids,
+            "current_registered": current_registered,
+            "current_waiting": current_waiting,
+        }
+
+    except RegistrationError:
+        conn.rollback()
+        raise
+    except Exception as e:
+        conn.rollback()
+        raise RegistrationError("候补转正过程中发生错误：%s" % str(e))
+    finally:
+        conn.close()
+
+
 def _build_bilingual_message_for_cancel(
     current_status: RegistrationStatus,
 ) -> Dict[str, str]:
@@ -377,13 +1152,15 @@ def cancel_registration(user_id: int, session_id: int) -> Dict[str, Any]:
         - 当前记录 -> 'cancelled'
         - EVENT_SESSION.current_registered - 1
         - 若有 waiting：
-            - 选 queue_position 最小的一条，转为 'registered'
-            - EVENT_SESSION.current_registered + 1
-            - 其他 waiting queue_position 依次 -1
+            - 选候补号最小的一条，转为 'registered'
+            - EVENT_SESSION.current_registered + 1，current_waiting - 1
 
       情况 2：当前是 waiting
         - 当前记录 -> 'cancelled'
-        - 之后的 waiting 记录 queue_position 依次 -1
+        - EVENT_SESSION.current_waiting - 1
+
+      候补号单调递增，名次在读取时计算，因此取消 / 转正只改动 O(1) 行，
+      不再对其余 waiting 记录整体重排。
 
       情况 3：当前是 cancelled 或不存在
         - 抛业务错误
@@ -442,20 +1219,22 @@ def cancel_registration(user_id: int, session_id: int) -> Dict[str, Any]:
                 cursor.execute(
                     """
                     UPDATE EVENT_SESSION
-                    SET current_registered = current_registered - 1
-                    WHERE session_id = %s AND current_registered > 0
+                    SET current_registered = GREATEST(0, current_registered - 1),
+                        version = version + 1
+                    WHERE session_id = %s
                     """,
                     (session_id,),
                 )
 
-                # 找 waiting 队列里 queue_position 最小的一条
+                # 找 waiting 队列里候补号最小的一条（idx_registration_session_queue）
                 cursor.execute(
                     """
                     SELECT *
                     FROM REGISTRATION
                     WHERE session_id = %s AND status = 'waiting'
-                    ORDER BY queue_position ASC, register_time ASC
+                    ORDER BY queue_position ASC
                     LIMIT 1
+                    FOR UPDATE
                     """,
                     (session_id,),
                 )
@@ -481,27 +1260,15 @@ def cancel_registration(user_id: int, session_id: int) -> Dict[str, Any]:
                         (session_id,),
                     )
 
+                    _leave_waiting_list(cursor, session_id)
+
                     promoted_user = {
                         "user_id": wait_top["user_id"],
                         "session_id": wait_top["session_id"],
                     }
 
-                    # 其余 waiting 的 queue_position 前移
-                    cursor.execute(
-                        """
-                        UPDATE REGISTRATION
-                        SET queue_position = queue_position - 1
-                        WHERE session_id = %s
-                          AND status = 'waiting'
-                          AND queue_position > %s
-                        """,
-                        (session_id, wait_top["queue_position"]),
-                    )
-
             elif current_status == "waiting":
                 # 情况 2：waiting -> cancelled
-                old_pos = reg["queue_position"]
-
                 cursor.execute(
                     """
                     UPDATE REGISTRATION
@@ -511,17 +1278,16 @@ def cancel_registration(user_id: int, session_id: int) -> Dict[str, Any]:
                     (user_id, session_id),
                 )
 
-                # 后面的人 queue_position -1
-                cursor.execute(
-                    """
-                    UPDATE REGISTRATION
-                    SET queue_position = queue_position - 1
-                    WHERE session_id = %s
-                      AND status = 'waiting'
-                      AND queue_position > %s
-                    """,
-                    (session_id, old_pos),
-                )
+                _leave_waiting_list(cursor, session_id)
+
+            # 取消保留 checkin_time，签到数不变
+            checked_in = reg["checkin_time"] is not None
+            changes = [
+                RegistrationChange(session_id, current_status, "cancelled", checked_in, checked_in)
+            ]
+            if promoted_user:
+                changes.append(RegistrationChange(session_id, "waiting", "registered"))
+            record_registration_changes(cursor, changes)
 
         conn.commit()
 
@@ -1,12 +1,45 @@
 """Event search service using SQLAlchemy multi-table joins.
+
+Two strategies (config.SEARCH_STRATEGY, overridable per call):
+  - two_phase: phase 1 selects one page of distinct eids, expressing the
+    session / tag filters as EXISTS subqueries so LIMIT counts events, not
+    joined rows; phase 2 loads just those events and batch-loads their
+    sessions and tags with selectinload (one extra query each).
+  - joined: the original query (JOIN sessions/tags + joinedload + DISTINCT),
+    kept for comparison and as a fallback.
+  - index: phase 1 is answered by the in-process facet index
+    (backend.services.facet_index, SEARCH_FACET_INDEX=true); phase 2 is the
+    same selectinload as two_phase. Used automatically for keyword-less
+    searches when the index is enabled.
+
+Keyword matching (config.SEARCH_KEYWORD_MODE):
+  - fulltext: MATCH ... AGAINST on the ngram FULLTEXT index over title,
+    location and description. Every whitespace-separated term must appear as
+    a phrase (boolean mode); results can be ranked by natural-language
+    relevance. Keywords shorter than the ngram token size fall back to LIKE.
+  - like: the original LIKE '%kw%' on title / location.
 """
 from datetime import datetime
 from typing import List, Optional, Dict, Any
 
-from sqlalchemy.orm import joinedload
+from sqlalchemy import String, and_, cast, exists, func, literal, select, union_all
+from sqlalchemy.dialects.mysql import match
+from sqlalchemy.orm import joinedload, selectinload
 
+from backend.config import load_config
 from backend.db_orm import SessionLocal
 from backend.models.models import Event, EventSession, EventTag, Tag
+from backend.services.facet_index import get_facet_index
+from backend.utils.pagination import Cursor
+
+config = load_config()
+
+SEARCH_STRATEGIES = ("two_phase", "joined", "index")
+SEARCH_SORTS = ("created_at", "relevance")
+
+# ngram_token_size 默认为 2：更短的关键词在 ngram 索引里查不到
+NGRAM_TOKEN_SIZE = 2
+_BOOLEAN_OPERATORS = '"+-<>()~*@'
 
 
 class SearchError(Exception):
@@ -24,6 +57,274 @@ def _parse_dt(value: str | datetime | None) -> Optional[datetime]:
         return None
 
 
+def _event_to_dict(ev: Event) -> Dict[str, Any]:
+    tags = [et.tag.tag_name for et in ev.tags if et.tag]
+    sessions = [
+        {
+            "session_id": s.session_id,
+            "start_time": s.start_time.isoformat() if s.start_time else None,
+            "end_time": s.end_time.isoformat() if s.end_time else None,
+            "capacity": s.capacity,
+            "current_registered": s.current_registered,
+            "waiting_list_limit": s.waiting_list_limit,
+            "status": s.status,
+        }
+        for s in ev.sessions
+    ]
+    return {
+        "eid": ev.eid,
+        "title": ev.title,
+        "description": ev.description,
+        "location": ev.location,
+        "status": ev.status,
+        "type_id": ev.type_id,
+        "created_at": ev.created_at.isoformat() if ev.created_at else None, # type: ignore
+        "updated_at": ev.updated_at.isoformat() if ev.updated_at else None, # type: ignore
+        "tags": tags,
+        "sessions": sessions,
+    }
+
+
+def _fulltext_terms(keyword: str) -> List[str]:
+    table = str.maketrans({ch: " " for ch in _BOOLEAN_OPERATORS})
+    return [t for t in keyword.translate(table).split() if t]
+
+
+def _uses_fulltext(keyword: Optional[str]) -> bool:
+    if not keyword or config.SEARCH_KEYWORD_MODE != "fulltext":
+        return False
+    terms = _fulltext_terms(keyword)
+    return bool(terms) and all(len(t) >= NGRAM_TOKEN_SIZE for t in terms)
+
+
+def _keyword_filter(keyword: str):
+    if not _uses_fulltext(keyword):
+        like_expr = f"%{keyword}%"
+        return (Event.title.ilike(like_expr)) | (Event.location.ilike(like_expr))
+    # +"term" 要求每个词都以短语形式出现（ngram 下相当于子串匹配）
+    against = " ".join(f'+"{t}"' for t in _fulltext_terms(keyword))
+    return match(Event.title, Event.location, Event.description, against=against).in_boolean_mode()
+
+
+def _relevance(keyword: str):
+    against = " ".join(_fulltext_terms(keyword))
+    return match(Event.title, Event.location, Event.description, against=against).in_natural_language_mode()
+
+
+def _cursor_filter(cursor: Cursor):
+    cursor_created_at, cursor_eid = cursor
+    return (Event.created_at < cursor_created_at) | (
+        (Event.created_at == cursor_created_at) & (Event.eid < cursor_eid)
+    )
+
+
+def _search_joined(
+    db,
+    *,
+    tag_names,
+    type_ids,
+    status,
+    start_dt,
+    end_dt,
+    keyword,
+    limit,
+    offset,
+    cursor,
+    sort="created_at",
+) -> List[Event]:
+    q = (
+        db.query(Event)
+        .join(Event.sessions)
+        .options(
+            joinedload(Event.sessions),
+            joinedload(Event.tags).joinedload(EventTag.tag),
+        )
+    )
+
+    if status:
+        q = q.filter(Event.status.in_(status))
+
+    if type_ids:
+        q = q.filter(Event.type_id.in_(type_ids))
+
+    # Session time window filter
+    if start_dt:
+        q = q.filter(EventSession.start_time >= start_dt)
+    if end_dt:
+        q = q.filter(EventSession.end_time <= end_dt)
+
+    if keyword:
+        q = q.filter(_keyword_filter(keyword))
+
+    if tag_names:
+        q = q.join(EventTag, EventTag.eid == Event.eid).join(Tag, Tag.tag_id == EventTag.tag_id)
+        q = q.filter(Tag.tag_name.in_(tag_names))
+
+    if cursor is not None:
+        q = q.filter(_cursor_filter(cursor))
+
+    # Deduplicate events because of joins; eid breaks created_at ties so pages never overlap
+    q = q.distinct(Event.eid).order_by(Event.created_at.desc(), Event.eid.desc())
+
+    if cursor is None and offset:
+        q = q.offset(offset)
+    return q.limit(limit).all()
+
+
+def _filtered_events(q, *, tag_names, type_ids, status, start_dt, end_dt, keyword):
+    """Apply the search filters to a query over Event, one row per event."""
+    if status:
+        q = q.filter(Event.status.in_(status))
+
+    if type_ids:
+        q = q.filter(Event.type_id.in_(type_ids))
+
+    # Same semantics as the joined strategy: the event needs at least one
+    # session, and with a time window at least one session inside it
+    session_conds = [EventSession.eid == Event.eid]
+    if start_dt:
+        session_conds.append(EventSession.start_time >= start_dt)
+    if end_dt:
+        session_conds.append(EventSession.end_time <= end_dt)
+    q = q.filter(exists().where(and_(*session_conds)))
+
+    if keyword:
+        q = q.filter(_keyword_filter(keyword))
+
+    if tag_names:
+        q = q.filter(
+            exists().where(
+                and_(
+                    EventTag.eid == Event.eid,
+                    EventTag.tag_id == Tag.tag_id,
+                    Tag.tag_name.in_(tag_names),
+                )
+            )
+        )
+    return q
+
+
+def _search_two_phase(
+    db,
+    *,
+    tag_names,
+    type_ids,
+    status,
+    start_dt,
+    end_dt,
+    keyword,
+    limit,
+    offset,
+    cursor,
+    sort="created_at",
+) -> List[Event]:
+    # Phase 1: one row per event, so LIMIT/OFFSET and the cursor count events
+    q = _filtered_events(
+        db.query(Event.eid),
+        tag_names=tag_names,
+        type_ids=type_ids,
+        status=status,
+        start_dt=start_dt,
+        end_dt=end_dt,
+        keyword=keyword,
+    )
+
+    if cursor is not None:
+        q = q.filter(_cursor_filter(cursor))
+
+    if sort == "relevance":
+        q = q.order_by(_relevance(keyword).desc(), Event.created_at.desc(), Event.eid.desc())
+    else:
+        q = q.order_by(Event.created_at.desc(), Event.eid.desc())
+    if cursor is None and offset:
+        q = q.offset(offset)
+    eids = [row.eid for row in q.limit(limit).all()]
+    return _load_events_in_order(db, eids)
+
+
+def _load_events_in_order(db, eids: List[int]) -> List[Event]:
+    if not eids:
+        return []
+
+    # Phase 2: load the page, sessions and tags with one IN query each
+    events = (
+        db.query(Event)
+        .options(
+            selectinload(Event.sessions),
+            selectinload(Event.tags).selectinload(EventTag.tag),
+        )
+        .filter(Event.eid.in_(eids))
+        .all()
+    )
+    by_eid = {ev.eid: ev for ev in events}
+    return [by_eid[eid] for eid in eids if eid in by_eid]
+
+
+def _search_index(
+    db,
+    *,
+    tag_names,
+    type_ids,
+    status,
+    start_dt,
+    end_dt,
+    keyword,
+    limit,
+    offset,
+    cursor,
+    sort="created_at",
+) -> List[Event]:
+    index = get_facet_index()
+    bits = index.match(
+        tag_names=tag_names, type_ids=type_ids, status=status, start_dt=start_dt, end_dt=end_dt
+    )
+    return _load_events_in_order(db, index.page(bits, limit, offset=offset, cursor=cursor))
+
+
+def resolve_strategy(keyword: Optional[str], strategy: Optional[str] = None) -> str:
+    """
+    Without an explicit strategy: keyword-less searches use the facet index when
+    it is enabled, everything else uses config.SEARCH_STRATEGY.
+    """
+    if strategy is None:
+        if not keyword and get_facet_index() is not None:
+            return "index"
+        strategy = config.SEARCH_STRATEGY
+    if strategy not in SEARCH_STRATEGIES:
+        raise SearchError("strategy must be one of: " + ", ".join(SEARCH_STRATEGIES))
+    if strategy == "index":
+        if keyword:
+            raise SearchError("the facet index does not support keyword search")
+        if get_facet_index() is None:
+            raise SearchError("the facet index is disabled (SEARCH_FACET_INDEX)")
+    return strategy
+
+
+def resolve_sort(
+    keyword: Optional[str],
+    cursor: Optional[Cursor],
+    sort: Optional[str] = None,
+    strategy: Optional[str] = None,
+) -> str:
+    """
+    Effective sort order. Without an explicit sort, a full-text keyword on the
+    two_phase strategy without a cursor is ranked by relevance; everything else
+    is newest first (and keyset-paginable). Raises SearchError on invalid combos.
+    """
+    strategy = strategy or config.SEARCH_STRATEGY
+    if sort is None:
+        relevance_ok = _uses_fulltext(keyword) and cursor is None and strategy == "two_phase"
+        return "relevance" if relevance_ok else "created_at"
+    if sort not in SEARCH_SORTS:
+        raise SearchError("sort must be one of: " + ", ".join(SEARCH_SORTS))
+    if sort == "relevance":
+        if not _uses_fulltext(keyword):
+            raise SearchError("sort=relevance requires a full-text keyword")
+        if cursor is not None or strategy != "two_phase":
+            raise SearchError("sort=relevance only supports limit/offset with the two_phase strategy")
+    return sort
+
+
 def search_events(
     *,
     tag_names: Optional[List[str]] = None,
@@ -34,6 +335,9 @@ def search_events(
     keyword: Optional[str] = None,
     limit: int = 50,
     offset: int = 0,
+    cursor: Optional[Cursor] = None,
+    strategy: Optional[str] = None,
+    sort: Optional[str] = None,
 ) -> List[Dict[str, Any]]:
     """
     Multi-table search across Event / EventSession / EventTag / Tag using ORM.
@@ -42,77 +346,99 @@ def search_events(
       - type_ids: list of EVENTTYPE ids
       - status: list of event status
       - start_time / end_time: filter sessions overlapping the window
-      - keyword: fuzzy match on title or location
-    Pagination via limit/offset.
+      - keyword: full-text match on title / location / description
+        (or LIKE on title / location, see SEARCH_KEYWORD_MODE)
+    Pagination: keyset on (created_at, eid) via `cursor` (the last row of the
+    previous page); limit/offset is kept for old callers and ignored when a
+    cursor is given.
+    strategy: "two_phase" / "joined" / "index"; see resolve_strategy.
+    sort: "created_at" (newest first) or "relevance" (full-text score, then
+    newest; two_phase only, paginated with limit/offset). Defaults to
+    relevance when a full-text keyword is given without a cursor.
     Returns list of dicts with sessions and tags embedded.
     """
+    strategy = resolve_strategy(keyword, strategy)
+    search = {"two_phase": _search_two_phase, "joined": _search_joined, "index": _search_index}[strategy]
+    sort = resolve_sort(keyword, cursor, sort=sort, strategy=strategy)
+
     db = SessionLocal()
     try:
-        q = (
-            db.query(Event)
-            .join(Event.sessions)
-            .options(
-                joinedload(Event.sessions),
-                joinedload(Event.tags).joinedload(EventTag.tag),
-            )
+        events = search(
+            db,
+            tag_names=tag_names,
+            type_ids=type_ids,
+            status=status,
+            start_dt=_parse_dt(start_time),
+            end_dt=_parse_dt(end_time),
+            keyword=keyword,
+            limit=limit,
+            offset=offset,
+            cursor=cursor,
+            sort=sort,
         )
+        return [_event_to_dict(ev) for ev in events]
 
-        if status:
-            q = q.filter(Event.status.in_(status))
+    except Exception as e:
+        raise SearchError(str(e))
+    finally:
+        db.close()
 
-        if type_ids:
-            q = q.filter(Event.type_id.in_(type_ids))
 
-        # Session time window filter
-        start_dt = _parse_dt(start_time)
-        end_dt = _parse_dt(end_time)
-        if start_dt:
-            q = q.filter(EventSession.start_time >= start_dt)
-        if end_dt:
-            q = q.filter(EventSession.end_time <= end_dt)
+def _facets_from_db(db, **filters) -> Dict[str, Any]:
+    """
+    One grouped query: the filtered events as a CTE (evaluated once), then
+    UNION ALL of the per-status, per-type and per-tag counts.
+    """
+    matched = _filtered_events(db.query(Event.eid, Event.status, Event.type_id), **filters).cte("matched")
+    by_status = select(
+        literal("status").label("facet"), matched.c.status.label("value"), func.count().label("n")
+    ).group_by(matched.c.status)
+    by_type = select(
+        literal("type_id").label("facet"), cast(matched.c.type_id, String(255)).label("value"), func.count().label("n")
+    ).group_by(matched.c.type_id)
+    by_tag = (
+        select(literal("tags").label("facet"), Tag.tag_name.label("value"), func.count().label("n"))
+        .select_from(matched)
+        .join(EventTag, EventTag.eid == matched.c.eid)
+        .join(Tag, Tag.tag_id == EventTag.tag_id)
+        .group_by(Tag.tag_name)
+    )
+    facets: Dict[str, Dict[str, int]] = {"tags": {}, "type_id": {}, "status": {}}
+    for row in db.execute(union_all(by_status, by_type, by_tag)):
+        if row.value is not None:
+            facets[row.facet][str(row.value)] = int(row.n)
+    return {"total": sum(facets["status"].values()), "facets": facets}
 
-        if keyword:
-            like_expr = f"%{keyword}%"
-            q = q.filter((Event.title.ilike(like_expr)) | (Event.location.ilike(like_expr)))
-
-        if tag_names:
-            q = q.join(EventTag, EventTag.eid == Event.eid).join(Tag, Tag.tag_id == EventTag.tag_id)
-            q = q.filter(Tag.tag_name.in_(tag_names))
-
-        # Deduplicate events because of joins
-        q = q.distinct(Event.eid).order_by(Event.created_at.desc())
-
-        events = q.offset(offset).limit(limit).all()
-
-        def _event_to_dict(ev: Event) -> Dict[str, Any]:
-            tags = [et.tag.tag_name for et in ev.tags if et.tag]
-            sessions = [
-                {
-                    "session_id": s.session_id,
-                    "start_time": s.start_time.isoformat() if s.start_time else None,
-                    "end_time": s.end_time.isoformat() if s.end_time else None,
-                    "capacity": s.capacity,
-                    "current_registered": s.current_registered,
-                    "waiting_list_limit": s.waiting_list_limit,
-                    "status": s.status,
-                }
-                for s in ev.sessions
-            ]
-            return {
-                "eid": ev.eid,
-                "title": ev.title,
-                "description": ev.description,
-                "location": ev.location,
-                "status": ev.status,
-                "type_id": ev.type_id,
-                "created_at": ev.created_at.isoformat() if ev.created_at else None, # type: ignore
-                "updated_at": ev.updated_at.isoformat() if ev.updated_at else None, # type: ignore
-                "tags": tags,
-                "sessions": sessions,
-            }
 
-        return [_event_to_dict(ev) for ev in events]
+def get_search_facets(
+    *,
+    tag_names: Optional[List[str]] = None,
+    type_ids: Optional[List[int]] = None,
+    status: Optional[List[str]] = None,
+    start_time: str | datetime | None = None,
+    end_time: str | datetime | None = None,
+    keyword: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Facet counts for the filter set: number of matching events per tag,
+    type_id and status, plus the total. Answered from the facet index when it
+    is enabled and there is no keyword, otherwise by one grouped SQL query.
+    """
+    filters = {
+        "tag_names": tag_names,
+        "type_ids": type_ids,
+        "status": status,
+        "start_dt": _parse_dt(start_time),
+        "end_dt": _parse_dt(end_time),
+    }
+    index = get_facet_index() if not keyword else None
+    if index is not None:
+        bits = index.match(**filters)
+        return {"total": bits.bit_count(), "facets": index.facets(bits)}
 
+    db = SessionLocal()
+    try:
+        return _facets_from_db(db, keyword=keyword, **filters)
     except Exception as e:
         raise SearchError(str(e))
     finally:
@@ -0,0 +1,392 @@
+# backend/services/snapshot_service.py
+"""
+离线分析快照：把 REGISTRATION / EVENT_SESSION / EVENT / EVENT_USER_GROUP 按列导出为 NumPy 文件，
+报表在快照上计算，不再通过 get_event_overview / CSV 导出把整表读成 Python dict。
+
+目录结构（一次导出一个目录）：
+    <snapshot>/manifest.json                 导出时间、各表行数、每列的文件 / dtype / 编码 / 空值表示
+    <snapshot>/<TABLE>/<column>.npy          定长列：int32 / datetime64[s] / 字典编码后的 int32 码
+    <snapshot>/<TABLE>/<column>.dict.json    字符串列的字典，码 i 对应第 i 个值
+
+导出方式：
+  - 同一连接上 START TRANSACTION WITH CONSISTENT SNAPSHOT，几张表是同一时刻的一致视图；
+  - 每张表先 COUNT(*) 确定行数，用 np.lib.format.open_memmap 预分配 .npy 文件，
+    再用服务端游标（SSCursor）按主键顺序 fetchmany(chunk_rows)，逐批写入文件切片；
+    内存占用 = 一批行 + 字符串字典，与表的大小无关；
+  - 可空整数列用 -1 表示 NULL（各列取值均为正），可空时间列用 NaT；
+  - 先写到 <snapshot>.tmp，完成后整体 rename，读者不会看到半成品；
+    默认目录 SNAPSHOT_DIR 下只保留最近 SNAPSHOT_KEEP 份。
+
+读取：load_snapshot 以 mmap 只读方式打开各列，按需分页进内存。
+"""
+import json
+import os
+import shutil
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pymysql
+
+from backend.config import load_config
+from backend.db import get_connection
+
+config = load_config()
+
+SNAPSHOT_FORMAT = 1
+SNAPSHOT_EXPORT_JOB = "analytics_snapshot_export"
+MANIFEST_FILE = "manifest.json"
+
+# 列类型 -> .npy dtype；dict 列存字典码
+_DTYPES = {
+    "int": "int32",
+    "nullable_int": "int32",
+    "datetime": "datetime64[s]",
+    "dict": "int32",
+}
+NULL_CODE = -1
+
+# 表 -> (主键排序, [(列名, 类型), ...])；只导出报表用得到的列（不含 description 等大字段）
+SNAPSHOT_TABLES: Dict[str, Tuple[str, Tuple[Tuple[str, str], ...]]] = {
+    "EVENT": (
+        "eid",
+        (
+            ("eid", "int"),
+            ("org_id", "nullable_int"),
+            ("type_id", "int"),
+            ("title", "dict"),
+            ("location", "dict"),
+            ("status", "dict"),
+            ("created_at", "datetime"),
+        ),
+    ),
+    "EVENT_SESSION": (
+        "session_id",
+        (
+            ("session_id", "int"),
+            ("eid", "int"),
+            ("start_time", "datetime"),
+            ("end_time", "datetime"),
+            ("capacity", "int"),
+            ("current_registered", "int"),
+            ("current_waiting", "int"),
+            ("waiting_list_limit", "int"),
+            ("status", "dict"),
+        ),
+    ),
+    "REGISTRATION": (
+        "user_id, session_id",
+        (
+            ("user_id", "int"),
+            ("session_id", "int"),
+            ("register_time", "datetime"),
+            ("status", "dict"),
+            ("checkin_time", "datetime"),
+            ("queue_position", "nullable_int"),
+        ),
+    ),
+    "EVENT_USER_GROUP": (
+        "user_id, eid",
+        (
+            ("user_id", "int"),
+            ("eid", "int"),
+            ("group_id", "int"),
+        ),
+    ),
+}
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def _encode_column(kind: str, values: Sequence[Any], dictionary: Optional[Dict[str, int]]) -> np.ndarray:
+    if kind == "int":
+        return np.asarray(values, dtype=np.int32)
+    if kind == "nullable_int":
+        return np.array([NULL_CODE if v is None else v for v in values], dtype=np.int32)
+    if kind == "datetime":
+        return np.array(values, dtype="datetime64[s]")
+    return np.array(
+        [NULL_CODE if v is None else dictionary.setdefault(v, len(dictionary)) for v in values],
+        dtype=np.int32,
+    )
+
+
+def _export_table(conn, table: str, table_dir: str, chunk_rows: int) -> Dict[str, Any]:
+    """流式导出一张表，返回该表的 manifest 条目。需在调用方开启的一致性快照事务内执行。"""
+    order_by, columns = SNAPSHOT_TABLES[table]
+    os.makedirs(table_dir, exist_ok=True)
+
+    with conn.cursor() as cursor:
+        cursor.execute(f"SELECT COUNT(*) AS n FROM {table}")
+        total = int(cursor.fetchone()["n"])
+
+    arrays = {
+        name: np.lib.format.open_memmap(
+            os.path.join(table_dir, f"{name}.npy"), mode="w+", dtype=_DTYPES[kind], shape=(total,)
+        )
+        for name, kind in columns
+    }
+    dictionaries = {name: {} for name, kind in columns if kind == "dict"}
+
+    offset = 0
+    with conn.cursor(pymysql.cursors.SSCursor) as cursor:
+        cursor.execute(
+            f"SELECT {', '.join(name for name, _ in columns)} FROM {table} ORDER BY {order_by}"
+        )
+        while True:
+            rows = cursor.fetchmany(chunk_rows)
+            if not rows:
+                break
+            end = offset + len(rows)
+            if end > total:
+                raise SnapshotError(f"{table}: more rows than counted ({total})")
+            for (name, kind), values in zip(columns, zip(*rows)):
+                arrays[name][offset:end] = _encode_column(kind, values, dictionaries.get(name))
+            offset = end
+    if offset != total:
+        raise SnapshotError(f"{table}: exported {offset} rows, counted {total}")
+
+    entry: Dict[str, Any] = {"rows": total, "order_by": order_by, "columns": {}}
+    for name, kind in columns:
+        arrays[name].flush()
+        column = {"file": f"{table}/{name}.npy", "dtype": _DTYPES[kind], "encoding": "plain", "null": None}
+        if kind == "nullable_int":
+            column["null"] = NULL_CODE
+        elif kind == "datetime":
+            column["null"] = "NaT"
+        elif kind == "dict":
+            # 字典按码的顺序写出（dict 保持插入顺序，码即插入序号）
+            with open(os.path.join(table_dir, f"{name}.dict.json"), "w", encoding="utf-8") as f:
+                json.dump(list(dictionaries[name]), f, ensure_ascii=False)
+            column.update(
+                encoding="dictionary",
+                dictionary=f"{table}/{name}.dict.json",
+                null=NULL_CODE,
+            )
+        entry["columns"][name] = column
+    del arrays
+    return entry
+
+
+def _prune_snapshots(root: str, keep: int) -> None:
+    """只保留 root 下最近 keep 份完整快照（目录名即导出时间，按名称排序）。"""
+    if keep <= 0 or not os.path.isdir(root):
+        return
+    done = sorted(
+        d for d in os.listdir(root)
+        if not d.endswith(".tmp") and os.path.isfile(os.path.join(root, d, MANIFEST_FILE))
+    )
+    for name in done[:-keep]:
+        shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+
+def _record_job(now: datetime, duration_ms: int, rows: int) -> None:
+    conn = get_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                INSERT INTO JOB_STATE (job_name, last_run_at, last_duration_ms, last_rows)
+                VALUES (%s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE
+                    last_run_at = VALUES(last_run_at),
+                    last_duration_ms = VALUES(last_duration_ms),
+                    last_rows = VALUES(last_rows)
+                """,
+                (SNAPSHOT_EXPORT_JOB, now, duration_ms, rows),
+            )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def export_snapshot(
+    out_dir: Optional[str] = None,
+    chunk_rows: Optional[int] = None,
+    tables: Iterable[str] = tuple(SNAPSHOT_TABLES),
+) -> Dict[str, Any]:
+    """
+    导出一份快照。out_dir 缺省为 SNAPSHOT_DIR/<导出时间>，此时顺带清理旧快照。
+    运行结果记录到 JOB_STATE(job_name='analytics_snapshot_export')。
+    """
+    tables = list(tables)
+    unknown = [t for t in tables if t not in SNAPSHOT_TABLES]
+    if unknown:
+        raise SnapshotError("unknown tables: " + ", ".join(unknown))
+    chunk_rows = chunk_rows or config.SNAPSHOT_CHUNK_ROWS
+    if chunk_rows <= 0:
+        raise SnapshotError("chunk_rows must be a positive integer")
+
+    started = time.perf_counter()
+    now = datetime.now()
+    default_dir = out_dir is None
+    if default_dir:
+        out_dir = os.path.join(config.SNAPSHOT_DIR, now.strftime("%Y%m%dT%H%M%S"))
+    if os.path.exists(out_dir):
+        raise SnapshotError(f"snapshot directory already exists: {out_dir}")
+    tmp_dir = out_dir + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    conn = get_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("START TRANSACTION WITH CONSISTENT SNAPSHOT")
+        entries = {
+            table: _export_table(conn, table, os.path.join(tmp_dir, table), chunk_rows)
+            for table in tables
+        }
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    finally:
+        conn.close()
+
+    manifest = {
+        "format": SNAPSHOT_FORMAT,
+        "created_at": now.isoformat(),
+        "chunk_rows": chunk_rows,
+        "tables": entries,
+    }
+    with open(os.path.join(tmp_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.rename(tmp_dir, out_dir)
+    if default_dir:
+        _prune_snapshots(config.SNAPSHOT_DIR, config.SNAPSHOT_KEEP)
+
+    duration_ms = int((time.perf_counter() - started) * 1000)
+    rows = {table: entry["rows"] for table, entry in entries.items()}
+    _record_job(now, duration_ms, sum(rows.values()))
+    return {"path": out_dir, "rows": rows, "duration_ms": duration_ms}
+
+
+# ===== 读取与报表 =====
+
+class Snapshot:
+    """一份已导出的快照：列为只读 memmap，字符串列按需解码。"""
+
+    def __init__(self, path: str) -> None:
+        manifest_path = os.path.join(path, MANIFEST_FILE)
+        if not os.path.isfile(manifest_path):
+            raise SnapshotError(f"not a snapshot directory: {path}")
+        with open(manifest_path, encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        if self.manifest.get("format") != SNAPSHOT_FORMAT:
+            raise SnapshotError(f"unsupported snapshot format: {self.manifest.get('format')}")
+        self.path = path
+        self._dictionaries: Dict[Tuple[str, str], List[str]] = {}
+
+    def rows(self, table: str) -> int:
+        return self._table(table)["rows"]
+
+    def column(self, table: str, name: str) -> np.ndarray:
+        spec = self._column_spec(table, name)
+        return np.load(os.path.join(self.path, spec["file"]), mmap_mode="r")
+
+    def dictionary(self, table: str, name: str) -> List[str]:
+        key = (table, name)
+        if key not in self._dictionaries:
+            spec = self._column_spec(table, name)
+            if spec["encoding"] != "dictionary":
+                raise SnapshotError(f"{table}.{name} is not dictionary-encoded")
+            with open(os.path.join(self.path, spec["dictionary"]), encoding="utf-8") as f:
+                self._dictionaries[key] = json.load(f)
+        return self._dictionaries[key]
+
+    def code(self, table: str, name: str, value: str) -> int:
+        """字符串值对应的字典码；快照中没有该值时返回 NULL_CODE（不会与任何行匹配）。"""
+        try:
+            return self.dictionary(table, name).index(value)
+        except ValueError:
+            return NULL_CODE
+
+    def decode(self, table: str, name: str, codes: Iterable[int]) -> List[Optional[str]]:
+        values = self.dictionary(table, name)
+        return [None if c == NULL_CODE else values[c] for c in codes]
+
+    def _table(self, table: str) -> Dict[str, Any]:
+        try:
+            return self.manifest["tables"][table]
+        except KeyError:
+            raise SnapshotError(f"table not in snapshot: {table}") from None
+
+    def _column_spec(self, table: str, name: str) -> Dict[str, Any]:
+        try:
+            return self._table(table)["columns"][name]
+        except KeyError:
+            raise SnapshotError(f"column not in snapshot: {table}.{name}") from None
+
+
+def load_snapshot(path: Optional[str] = None) -> Snapshot:
+    """打开一份快照；path 缺省为 SNAPSHOT_DIR 下最近的一份。"""
+    if path is None:
+        root = config.SNAPSHOT_DIR
+        done = sorted(
+            d for d in (os.listdir(root) if os.path.isdir(root) else [])
+            if not d.endswith(".tmp") and os.path.isfile(os.path.join(root, d, MANIFEST_FILE))
+        )
+        if not done:
+            raise SnapshotError(f"no snapshot under {root}")
+        path = os.path.join(root, done[-1])
+    return Snapshot(path)
+
+
+def _positions(sorted_keys: np.ndarray, keys: np.ndarray) -> np.ndarray:
+    """keys 在已排序主键列中的下标；不存在的键返回 -1。"""
+    if len(sorted_keys) == 0:
+        return np.full(len(keys), -1, dtype=np.int64)
+    pos = np.searchsorted(sorted_keys, keys)
+    pos = np.minimum(pos, len(sorted_keys) - 1)
+    return np.where(sorted_keys[pos] == keys, pos, -1)
+
+
+def event_registration_report(snapshot: Snapshot) -> List[Dict[str, Any]]:
+    """
+    每个活动的场次数与报名 / 签到计数（字段与 get_event_overview_counters 一致），在快照上向量化计算：
+    EVENT / EVENT_SESSION 按主键有序导出，报名 -> 场次 -> 活动用二分查找映射，再按活动 bincount。
+    """
+    eids = np.asarray(snapshot.column("EVENT", "eid"))
+    session_ids = np.asarray(snapshot.column("EVENT_SESSION", "session_id"))
+    session_event = _positions(eids, np.asarray(snapshot.column("EVENT_SESSION", "eid")))
+
+    reg_session = _positions(session_ids, np.asarray(snapshot.column("REGISTRATION", "session_id")))
+    reg_event = np.where(reg_session >= 0, session_event[np.maximum(reg_session, 0)], -1)
+    known = reg_event >= 0
+    reg_event = reg_event[known]
+    status = np.asarray(snapshot.column("REGISTRATION", "status"))[known]
+    checked_in = ~np.isnat(np.asarray(snapshot.column("REGISTRATION", "checkin_time"))[known])
+
+    n = len(eids)
+
+    def _count(mask: Optional[np.ndarray] = None) -> np.ndarray:
+        return np.bincount(reg_event if mask is None else reg_event[mask], minlength=n)
+
+    sessions = np.bincount(session_event[session_event >= 0], minlength=n)
+    total = _count()
+    by_status = {
+        s: _count(status == snapshot.code("REGISTRATION", "status", s))
+        for s in ("registered", "waiting", "cancelled")
+    }
+    checked = _count(checked_in)
+
+    titles = snapshot.decode("EVENT", "title", snapshot.column("EVENT", "title"))
+    statuses = snapshot.decode("EVENT", "status", snapshot.column("EVENT", "status"))
+    return [
+        {
+            "eid": int(eids[i]),
+            "title": titles[i],
+            "status": statuses[i],
+            "session_count": int(sessions[i]),
+            "total_registrations": int(total[i]),
+            "registered_count": int(by_status["registered"][i]),
+            "waiting_count": int(by_status["waiting"][i]),
+            "cancelled_count": int(by_status["cancelled"][i]),
+            "checked_in_count": int(checked[i]),
+        }
+        for i in range(n)
+    ]
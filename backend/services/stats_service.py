@@ -0,0 +1,405 @@
+# backend/services/stats_service.py
+"""
+报名统计物化表：SESSION_STATS（每场次）与 EVENT_STATS（每活动）。
+
+两张表存各状态报名数与签到数，统计接口在 ANALYTICS_STATS_SOURCE=materialized 时
+按主键读取，不再对 REGISTRATION 做 COUNT / GROUP BY。
+
+维护方式：
+  - 写路径（报名 / 取消 / 候补转正 / 签到 / force_set_registration / 删除用户）在
+    同一事务内调用 record_registration_changes，把状态变化折算成计数增量后
+    INSERT ... ON DUPLICATE KEY UPDATE col = col + delta；
+    写入始终进行，与读取来源无关，因此切换 ANALYTICS_STATS_SOURCE 不需要停机；
+  - 调用方已持有场次行锁（或刚 UPDATE 过场次行），同一场次的增量天然串行；
+    EVENT_STATS 行按 eid 升序更新，批量写入之间不会互相死锁；
+  - 定期任务 reconcile_registration_stats（见根目录 run_stats_reconcile.py）
+    用一条分组查询重新统计并与物化表比对，发现偏差时在锁定相关场次后按实际值修正。
+    已有数据的库上线时先执行一次 `python run_stats_reconcile.py` 完成回填。
+
+签到数与旧统计口径一致：checkin_time 不为空即计入（取消后的记录也保留签到时间）。
+
+报名趋势小时汇总表 REGISTRATION_HOURLY（每活动每小时一行）：
+  - 口径与旧的按日趋势一致：报名记录（任何状态）按当前 register_time 计入所在小时；
+  - 同样由 record_registration_changes 维护：变化带 old_register_time / new_register_time 时，
+    在旧时间所在小时减 1、新时间所在小时加 1（只有新增、删除、重新报名会改动 register_time）；
+  - 趋势查询（analytic_service.get_registration_trend）按小时行求和得到日 / 周粒度，
+    代价与桶数成正比，与报名记录数无关；
+  - 对账时比较每个活动的小时汇总之和与报名记录数，不一致的活动整体重建。
+"""
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from backend.db import get_connection
+
+STATS_COLUMNS = ("registered_count", "waiting_count", "cancelled_count", "checked_in_count")
+_STATUS_COLUMNS = {
+    "registered": "registered_count",
+    "waiting": "waiting_count",
+    "cancelled": "cancelled_count",
+}
+
+STATS_RECONCILE_JOB = "registration_stats_reconcile"
+
+
+class RegistrationChange(NamedTuple):
+    """
+    一条报名记录的变化：old_status 为 None 表示新增，new_status 为 None 表示删除；
+    *_checked_in 表示变化前后 checkin_time 是否不为空；
+    *_register_time 只在 register_time 改变（新增 / 删除 / 重新报名）时传入，用于维护小时汇总。
+    """
+    session_id: int
+    old_status: Optional[str]
+    new_status: Optional[str]
+    old_checked_in: bool = False
+    new_checked_in: bool = False
+    old_register_time: Optional[datetime] = None
+    new_register_time: Optional[datetime] = None
+
+
+def hour_bucket(value: datetime) -> datetime:
+    """register_time 所在小时的起点；带时区的值按库里存储的字面时间处理（写入时同样去掉时区）。"""
+    return value.replace(minute=0, second=0, microsecond=0, tzinfo=None)
+
+
+def _change_delta(change: RegistrationChange) -> Dict[str, int]:
+    delta = dict.fromkeys(STATS_COLUMNS, 0)
+    if change.old_status is not None:
+        delta[_STATUS_COLUMNS[change.old_status]] -= 1
+    if change.new_status is not None:
+        delta[_STATUS_COLUMNS[change.new_status]] += 1
+    delta["checked_in_count"] += int(change.new_checked_in) - int(change.old_checked_in)
+    return delta
+
+
+def _upsert_deltas(cursor, table: str, keys: tuple, rows: List[tuple], now: datetime) -> None:
+    """rows: (*keys, *delta)；一条多行 upsert，已有行累加增量，新行直接写入增量。"""
+    columns = ", ".join(keys + STATS_COLUMNS + ("updated_at",))
+    row_sql = "(" + ", ".join(["%s"] * (len(keys) + len(STATS_COLUMNS) + 1)) + ")"
+    updates = ", ".join(f"{c} = {c} + VALUES({c})" for c in STATS_COLUMNS)
+    params: List[Any] = []
+    for row in rows:
+        params.extend(row)
+        params.append(now)
+    cursor.execute(
+        f"""
+        INSERT INTO {table} ({columns})
+        VALUES {", ".join([row_sql] * len(rows))}
+        ON DUPLICATE KEY UPDATE {updates}, updated_at = VALUES(updated_at)
+        """,
+        params,
+    )
+
+
+def record_registration_changes(cursor, changes: Iterable[RegistrationChange]) -> None:
+    """
+    把一批报名变化折算成增量写入 SESSION_STATS / EVENT_STATS / REGISTRATION_HOURLY。
+    在调用方的事务内执行，不做 commit；无净变化时不写库。
+    """
+    per_session: Dict[int, Dict[str, int]] = {}
+    per_hour: Dict[Tuple[int, datetime], int] = {}
+    for change in changes:
+        sid = int(change.session_id)
+        totals = per_session.setdefault(sid, dict.fromkeys(STATS_COLUMNS, 0))
+        for col, value in _change_delta(change).items():
+            totals[col] += value
+        if change.old_register_time is not None:
+            key = (sid, hour_bucket(change.old_register_time))
+            per_hour[key] = per_hour.get(key, 0) - 1
+        if change.new_register_time is not None:
+            key = (sid, hour_bucket(change.new_register_time))
+            per_hour[key] = per_hour.get(key, 0) + 1
+    per_session = {sid: d for sid, d in per_session.items() if any(d.values())}
+    per_hour = {key: n for key, n in per_hour.items() if n}
+    if not per_session and not per_hour:
+        return
+
+    session_ids = sorted(set(per_session) | {sid for sid, _ in per_hour})
+    cursor.execute(
+        "SELECT session_id, eid FROM EVENT_SESSION WHERE session_id IN ("
+        + ", ".join(["%s"] * len(session_ids))
+        + ")",
+        session_ids,
+    )
+    eids = {r["session_id"]: r["eid"] for r in cursor.fetchall()}
+
+    per_event: Dict[int, Dict[str, int]] = {}
+    session_rows = []
+    for sid in session_ids:
+        if sid not in eids or sid not in per_session:
+            continue
+        delta = per_session[sid]
+        session_rows.append((sid, eids[sid], *(delta[c] for c in STATS_COLUMNS)))
+        totals = per_event.setdefault(eids[sid], dict.fromkeys(STATS_COLUMNS, 0))
+        for col in STATS_COLUMNS:
+            totals[col] += delta[col]
+
+    now = datetime.now()
+    if session_rows:
+        _upsert_deltas(cursor, "SESSION_STATS", ("session_id", "eid"), session_rows, now)
+        _upsert_deltas(
+            cursor,
+            "EVENT_STATS",
+            ("eid",),
+            [(eid, *(per_event[eid][c] for c in STATS_COLUMNS)) for eid in sorted(per_event)],
+            now,
+        )
+
+    hourly: Dict[Tuple[int, datetime], int] = {}
+    for (sid, bucket), n in per_hour.items():
+        if sid in eids:
+            key = (eids[sid], bucket)
+            hourly[key] = hourly.get(key, 0) + n
+    hourly_rows = [(eid, bucket, n) for (eid, bucket), n in sorted(hourly.items()) if n]
+    if hourly_rows:
+        _upsert_hourly(cursor, hourly_rows, now)
+
+
+def _upsert_hourly(cursor, rows: List[Tuple[int, datetime, int]], now: datetime) -> None:
+    """rows: (eid, bucket_start, delta)，按 (eid, bucket_start) 升序写入。"""
+    params: List[Any] = []
+    for row in rows:
+        params.extend(row)
+        params.append(now)
+    cursor.execute(
+        f"""
+        INSERT INTO REGISTRATION_HOURLY (eid, bucket_start, registration_count, updated_at)
+        VALUES {", ".join(["(%s, %s, %s, %s)"] * len(rows))}
+        ON DUPLICATE KEY UPDATE
+            registration_count = registration_count + VALUES(registration_count),
+            updated_at = VALUES(updated_at)
+        """,
+        params,
+    )
+
+
+def record_registration_change(
+    cursor,
+    session_id: int,
+    old_status: Optional[str],
+    new_status: Optional[str],
+    *,
+    old_checked_in: bool = False,
+    new_checked_in: bool = False,
+    old_register_time: Optional[datetime] = None,
+    new_register_time: Optional[datetime] = None,
+) -> None:
+    """单条变化的便捷写法，见 record_registration_changes。"""
+    record_registration_changes(
+        cursor,
+        [
+            RegistrationChange(
+                session_id,
+                old_status,
+                new_status,
+                old_checked_in,
+                new_checked_in,
+                old_register_time,
+                new_register_time,
+            )
+        ],
+    )
+
+
+# ===== 对账 =====
+
+_COMPUTED_SESSION_STATS = """
+    SELECT
+        s.session_id,
+        s.eid,
+        COALESCE(SUM(r.status = 'registered'), 0) AS registered_count,
+        COALESCE(SUM(r.status = 'waiting'), 0) AS waiting_count,
+        COALESCE(SUM(r.status = 'cancelled'), 0) AS cancelled_count,
+        COUNT(r.checkin_time) AS checked_in_count
+    FROM EVENT_SESSION s
+    LEFT JOIN REGISTRATION r ON r.session_id = s.session_id
+    {where}
+    GROUP BY s.session_id, s.eid
+"""
+
+
+# register_time 截到小时；不用 DATE_FORMAT，避免与参数占位符的 % 冲突
+_HOUR_BUCKET_SQL = "TIMESTAMP(DATE({col}), MAKETIME(HOUR({col}), 0, 0))"
+
+
+def _mismatch_condition(alias: str) -> str:
+    return " OR ".join(f"COALESCE({alias}.{c}, 0) <> c.{c}" for c in STATS_COLUMNS)
+
+
+def find_stats_mismatches(cursor) -> Dict[str, List[int]]:
+    """
+    重新统计全部场次 / 活动并与物化表比对（物化行缺失视为 0），
+    返回 {"session_ids": [...], "eids": [...], "rollup_eids": [...]}，只含计数不一致的键。
+    rollup_eids 为存在某个 (eid, 小时) 桶与报名记录数不符的活动（含负数桶、总数相同但错桶的情况）。
+    """
+    computed = _COMPUTED_SESSION_STATS.format(where="")
+    cursor.execute(
+        f"""
+        SELECT c.session_id
+        FROM ({computed}) c
+        LEFT JOIN SESSION_STATS st ON st.session_id = c.session_id
+        WHERE {_mismatch_condition("st")}
+        ORDER BY c.session_id
+        """
+    )
+    session_ids = [r["session_id"] for r in cursor.fetchall()]
+
+    sums = ", ".join(f"SUM(x.{c}) AS {c}" for c in STATS_COLUMNS)
+    cursor.execute(
+        f"""
+        SELECT c.eid
+        FROM (SELECT x.eid, {sums} FROM ({computed}) x GROUP BY x.eid) c
+        LEFT JOIN EVENT_STATS st ON st.eid = c.eid
+        WHERE {_mismatch_condition("st")}
+        ORDER BY c.eid
+        """
+    )
+    eids = [r["eid"] for r in cursor.fetchall()]
+
+    # 实际计数与汇总取负后按桶相加，不为 0 的桶即不一致（MySQL 没有 FULL JOIN）
+    bucket = _HOUR_BUCKET_SQL.format(col="r.register_time")
+    cursor.execute(
+        f"""
+        SELECT DISTINCT m.eid
+        FROM (
+            SELECT d.eid
+            FROM (
+                SELECT s.eid, {bucket} AS bucket_start, COUNT(*) AS n
+                FROM REGISTRATION r
+                JOIN EVENT_SESSION s ON s.session_id = r.session_id
+                GROUP BY s.eid, {bucket}
+                UNION ALL
+                SELECT eid, bucket_start, -registration_count
+                FROM REGISTRATION_HOURLY
+            ) d
+            GROUP BY d.eid, d.bucket_start
+            HAVING SUM(d.n) <> 0
+        ) m
+        ORDER BY m.eid
+        """
+    )
+    rollup_eids = [r["eid"] for r in cursor.fetchall()]
+    return {"session_ids": session_ids, "eids": eids, "rollup_eids": rollup_eids}
+
+
+def rebuild_stats(cursor, eids: List[int]) -> int:
+    """
+    按实际值重写给定活动的 SESSION_STATS / EVENT_STATS / REGISTRATION_HOURLY。
+    先按 session_id 顺序锁定这些活动的全部场次行，与写路径串行，
+    锁定后的读取能看到最新提交的报名。不做 commit，返回写入的场次数。
+    """
+    if not eids:
+        return 0
+    placeholders = ", ".join(["%s"] * len(eids))
+    cursor.execute(
+        f"""
+        SELECT session_id FROM EVENT_SESSION
+        WHERE eid IN ({placeholders})
+        ORDER BY session_id
+        FOR UPDATE
+        """,
+        eids,
+    )
+    locked = len(cursor.fetchall())
+
+    now = datetime.now()
+    computed = _COMPUTED_SESSION_STATS.format(where=f"WHERE s.eid IN ({placeholders})")
+    cols = ", ".join(STATS_COLUMNS)
+    assign = ", ".join(f"{c} = VALUES({c})" for c in STATS_COLUMNS)
+    cursor.execute(
+        f"""
+        INSERT INTO SESSION_STATS (session_id, eid, {cols}, updated_at)
+        SELECT c.session_id, c.eid, {", ".join("c." + c for c in STATS_COLUMNS)}, %s
+        FROM ({computed}) c
+        ON DUPLICATE KEY UPDATE {assign}, updated_at = VALUES(updated_at)
+        """,
+        [now] + list(eids),
+    )
+    sums = ", ".join(f"COALESCE(SUM(st.{c}), 0)" for c in STATS_COLUMNS)
+    cursor.execute(
+        f"""
+        INSERT INTO EVENT_STATS (eid, {cols}, updated_at)
+        SELECT e.eid, {sums}, %s
+        FROM EVENT e
+        LEFT JOIN SESSION_STATS st ON st.eid = e.eid
+        WHERE e.eid IN ({placeholders})
+        GROUP BY e.eid
+        ON DUPLICATE KEY UPDATE {assign}, updated_at = VALUES(updated_at)
+        """,
+        [now] + list(eids),
+    )
+
+    cursor.execute(f"DELETE FROM REGISTRATION_HOURLY WHERE eid IN ({placeholders})", eids)
+    bucket = _HOUR_BUCKET_SQL.format(col="r.register_time")
+    cursor.execute(
+        f"""
+        INSERT INTO REGISTRATION_HOURLY (eid, bucket_start, registration_count, updated_at)
+        SELECT s.eid, {bucket}, COUNT(*), %s
+        FROM REGISTRATION r
+        JOIN EVENT_SESSION s ON s.session_id = r.session_id
+        WHERE s.eid IN ({placeholders})
+        GROUP BY s.eid, {bucket}
+        """,
+        [now] + list(eids),
+    )
+    return locked
+
+
+def reconcile_registration_stats(fix: bool = True) -> Dict[str, Any]:
+    """
+    定期任务入口：比对物化统计与 REGISTRATION，fix=True 时修正不一致的活动。
+    比对是一致性读，不阻塞写路径；只有需要修正的活动才会锁定其场次行。
+    运行结果记录到 JOB_STATE(job_name='registration_stats_reconcile')。
+    """
+    started = time.perf_counter()
+    now = datetime.now()
+    conn = get_connection()
+    try:
+        with conn.cursor() as cursor:
+            mismatches = find_stats_mismatches(cursor)
+        conn.commit()
+
+        rebuilt = 0
+        if fix and (mismatches["session_ids"] or mismatches["eids"] or mismatches["rollup_eids"]):
+            with conn.cursor() as cursor:
+                eids = set(mismatches["eids"]) | set(mismatches["rollup_eids"])
+                if mismatches["session_ids"]:
+                    placeholders = ", ".join(["%s"] * len(mismatches["session_ids"]))
+                    cursor.execute(
+                        f"SELECT DISTINCT eid FROM EVENT_SESSION WHERE session_id IN ({placeholders})",
+                        mismatches["session_ids"],
+                    )
+                    eids.update(r["eid"] for r in cursor.fetchall())
+                rebuilt = rebuild_stats(cursor, sorted(eids))
+
+        duration_ms = int((time.perf_counter() - started) * 1000)
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                INSERT INTO JOB_STATE (job_name, last_run_at, last_duration_ms, last_rows)
+                VALUES (%s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE
+                    last_run_at = VALUES(last_run_at),
+                    last_duration_ms = VALUES(last_duration_ms),
+                    last_rows = VALUES(last_rows)
+                """,
+                (STATS_RECONCILE_JOB, now, duration_ms, rebuilt),
+            )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    return {
+        "mode": "fix" if fix else "check",
+        "session_mismatches": len(mismatches["session_ids"]),
+        "event_mismatches": len(mismatches["eids"]),
+        "rollup_mismatches": len(mismatches["rollup_eids"]),
+        "mismatched_session_ids": mismatches["session_ids"][:100],
+        "mismatched_eids": mismatches["eids"][:100],
+        "mismatched_rollup_eids": mismatches["rollup_eids"][:100],
+        "rebuilt_sessions": rebuilt,
+        "duration_ms": duration_ms,
+    }
@@ -1,12 +1,18 @@
 # backend/services/user_penalty_service.py
+import time
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import Any, Dict, List, Optional
 
-from sqlalchemy import func
+from sqlalchemy import func, literal, or_, select, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
 from sqlalchemy.orm import Session
 
+from backend.config import load_config
 from backend.db_orm import SessionLocal
-from backend.models.models import User, Registration, EventSession
+from backend.models.models import JobState, User, Registration, EventSession, UserNoShowStats
+from backend.services.auth_service import invalidate_cached_user
+
+config = load_config()
 
 
 NO_SHOW_WINDOW_DAYS = 30          # 统计时间窗口：最近 30 天
@@ -27,7 +33,13 @@ def get_recent_no_show_count(db: Session, user_id: int) -> int:
       - Registration.checkin_time IS NULL
       - 对应 EventSession.end_time 已经结束
       - 且 end_time 在最近 N 天窗口内
+
+    NO_SHOW_COUNT_SOURCE=ledger 时直接按主键读取 USER_NO_SHOW_STATS 台账。
     """
+    if config.NO_SHOW_COUNT_SOURCE == "ledger":
+        stats = db.get(UserNoShowStats, user_id)
+        return int(stats.no_show_count) if stats else 0
+
     now = _utcnow()
     start_window = now - timedelta(days=NO_SHOW_WINDOW_DAYS)
 
@@ -57,7 +69,8 @@ def apply_no_show_penalty_if_needed(db: Session, user: User) -> Optional[datetim
         - 设置 user.blocked_until 为 now + BLOCK_DAYS
         - 返回 blocked_until
       - 否则返回 None
-    注意：此函数内部不提交事务，由调用者 commit。
+    注意：此函数内部不提交事务，由调用者 commit；
+    调用者需在 commit 之后调用 invalidate_cached_user(user.user_id)。
     """
     no_show_count = get_recent_no_show_count(db, user.user_id)
     if no_show_count < NO_SHOW_THRESHOLD:
@@ -67,5 +80,206 @@ def apply_no_show_penalty_if_needed(db: Session, user: User) -> Optional[datetim
     blocked_until = now + timedelta(days=BLOCK_DAYS)
 
     user.blocked_until = blocked_until
+    user.token_version = User.token_version + 1
     # 不 commit，由外部事务统一提交
-    return blocked_until
\ No newline at end of file
+    return blocked_until
+
+
+# ===== 爽约台账（USER_NO_SHOW_STATS）=====
+# 报名路径在 NO_SHOW_COUNT_SOURCE=ledger 时只按主键读取台账；
+# 台账由 run_no_show_sweep 定期刷新（默认增量），并在同一事务内批量封禁。
+
+NO_SHOW_SWEEP_JOB = "no_show_sweep"
+
+
+def _naive(dt: datetime) -> datetime:
+    # 数据库中的 DATETIME 不带时区，统一按 UTC naive 比较
+    return dt.astimezone(timezone.utc).replace(tzinfo=None) if dt.tzinfo else dt
+
+
+def find_affected_users(db: Session, since: datetime, now: datetime) -> List[int]:
+    """
+    增量 sweep 需要重新统计的用户：
+      - 在 [since, now) 之间结束、且报名后未签到的场次的用户（新增爽约）；
+      - 台账中计数 > 0 的用户（旧爽约可能已滑出窗口）。
+    """
+    since, now = _naive(since), _naive(now)
+    new_no_shows = db.execute(
+        select(Registration.user_id)
+        .join(EventSession, Registration.session_id == EventSession.session_id)
+        .where(
+            Registration.status == "registered",
+            Registration.checkin_time.is_(None),
+            EventSession.end_time >= since,
+            EventSession.end_time < now,
+        )
+        .distinct()
+    ).scalars()
+    counted = db.execute(
+        select(UserNoShowStats.user_id).where(UserNoShowStats.no_show_count > 0)
+    ).scalars()
+    return sorted(set(new_no_shows) | set(counted))
+
+
+def refresh_no_show_stats(
+    db: Session,
+    now: Optional[datetime] = None,
+    user_ids: Optional[List[int]] = None,
+) -> int:
+    """
+    用一条分组查询重新计算窗口内的爽约次数，upsert 到 USER_NO_SHOW_STATS；
+    本次没有出现的用户（爽约已滑出窗口）计数清零。
+    user_ids 为 None 时全量刷新，否则只刷新给定用户。
+    返回受影响的台账行数。不提交事务。
+    """
+    # refreshed_at 是 DATETIME(0)，MySQL 会把微秒四舍五入；先截到整秒，
+    # 保证刚 upsert 的行 refreshed_at == now，不会被下面的清零条件误伤
+    now = _naive(now or _utcnow()).replace(microsecond=0)
+    start_window = now - timedelta(days=NO_SHOW_WINDOW_DAYS)
+    if user_ids is not None and not user_ids:
+        return 0
+
+    conditions = [
+        Registration.status == "registered",
+        Registration.checkin_time.is_(None),
+        EventSession.end_time < now,
+        EventSession.end_time >= start_window,
+    ]
+    if user_ids is not None:
+        conditions.append(Registration.user_id.in_(user_ids))
+
+    counts = (
+        select(
+            Registration.user_id,
+            func.count().label("no_show_count"),
+            func.max(EventSession.end_time).label("last_no_show_at"),
+            literal(now).label("refreshed_at"),
+        )
+        .join(EventSession, Registration.session_id == EventSession.session_id)
+        .where(*conditions)
+        .group_by(Registration.user_id)
+    )
+    stmt = mysql_insert(UserNoShowStats).from_select(
+        ["user_id", "no_show_count", "last_no_show_at", "refreshed_at"], counts
+    )
+    stmt = stmt.on_duplicate_key_update(
+        no_show_count=stmt.inserted.no_show_count,
+        last_no_show_at=stmt.inserted.last_no_show_at,
+        refreshed_at=stmt.inserted.refreshed_at,
+    )
+    touched = db.execute(stmt).rowcount or 0
+
+    stale = [
+        UserNoShowStats.refreshed_at < now,
+        UserNoShowStats.no_show_count > 0,
+    ]
+    if user_ids is not None:
+        stale.append(UserNoShowStats.user_id.in_(user_ids))
+    cleared = db.execute(
+        update(UserNoShowStats)
+        .where(*stale)
+        .values(no_show_count=0, refreshed_at=now)
+        .execution_options(synchronize_session=False)
+    ).rowcount or 0
+    return touched + cleared
+
+
+def apply_no_show_blocks(
+    db: Session,
+    now: Optional[datetime] = None,
+    user_ids: Optional[List[int]] = None,
+) -> List[int]:
+    """
+    根据台账批量封禁：爽约次数达到阈值且当前未处于封禁期的用户，
+    一条 UPDATE 写入 blocked_until = now + BLOCK_DAYS 并递增 token_version。
+    user_ids 不为 None 时只在给定用户中查找。
+    返回被封禁的 user_id 列表。不提交事务。
+    """
+    now = _naive(now or _utcnow())
+    if user_ids is not None and not user_ids:
+        return []
+
+    conditions = [
+        UserNoShowStats.no_show_count >= NO_SHOW_THRESHOLD,
+        or_(User.blocked_until.is_(None), User.blocked_until <= now),
+    ]
+    if user_ids is not None:
+        conditions.append(UserNoShowStats.user_id.in_(user_ids))
+    offenders = list(
+        db.execute(
+            select(UserNoShowStats.user_id)
+            .join(User, User.user_id == UserNoShowStats.user_id)
+            .where(*conditions)
+        ).scalars()
+    )
+    if offenders:
+        db.execute(
+            update(User)
+            .where(User.user_id.in_(offenders))
+            .values(
+                blocked_until=now + timedelta(days=BLOCK_DAYS),
+                token_version=User.token_version + 1,
+            )
+            .execution_options(synchronize_session=False)
+        )
+    return offenders
+
+
+def run_no_show_sweep(now: Optional[datetime] = None, full: bool = False) -> Dict[str, Any]:
+    """
+    定期任务入口（见根目录 run_no_show_sweep.py）：刷新爽约台账并批量封禁，一个事务提交。
+
+      - 增量（默认）：只重新统计 find_affected_users 返回的用户，
+        水位保存在 JOB_STATE(job_name='no_show_sweep').watermark；
+      - 全量：full=True 或首次运行（尚无水位）时统计窗口内所有用户。
+
+    JOB_STATE 行以 FOR UPDATE 读取，多个实例同时运行时会串行执行。
+    提交后让被封禁用户在本进程的鉴权缓存失效，返回本次耗时与影响行数。
+    """
+    started = time.perf_counter()
+    # 水位存为 DATETIME(0)：截到整秒后同一个值用于本次窗口、写入的水位和返回值，
+    # 下一次增量的 [since, now) 与本次首尾相接，不漏不重
+    now = _naive(now or _utcnow()).replace(microsecond=0)
+    db = SessionLocal()
+    try:
+        # 首次运行时两个实例可能同时建行：先 upsert 占位，再 FOR UPDATE 读取
+        seed = mysql_insert(JobState).values(job_name=NO_SHOW_SWEEP_JOB)
+        db.execute(seed.on_duplicate_key_update(job_name=seed.inserted.job_name))
+        state = db.execute(
+            select(JobState).where(JobState.job_name == NO_SHOW_SWEEP_JOB).with_for_update()
+        ).scalar_one()
+
+        incremental = not full and state.watermark is not None
+        since = state.watermark if incremental else None
+        if incremental:
+            user_ids: Optional[List[int]] = find_affected_users(db, since, now)
+        else:
+            user_ids = None
+
+        refreshed = refresh_no_show_stats(db, now, user_ids)
+        blocked = apply_no_show_blocks(db, now, user_ids)
+        duration_ms = int((time.perf_counter() - started) * 1000)
+
+        state.watermark = now
+        state.last_run_at = now
+        state.last_duration_ms = duration_ms
+        state.last_rows = refreshed + len(blocked)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    for user_id in blocked:
+        invalidate_cached_user(user_id)
+    return {
+        "mode": "incremental" if incremental else "full",
+        "since": since.isoformat() if since else None,
+        "watermark": now.isoformat(),
+        "affected_users": len(user_ids) if user_ids is not None else None,
+        "refreshed": refreshed,
+        "blocked": len(blocked),
+        "blocked_user_ids": blocked,
+        "duration_ms": duration_ms,
+    }
@@ -0,0 +1,70 @@
+# backend/utils/http_cache.py
+"""
+条件 GET（ETag / Last-Modified）辅助函数。
+
+用法：先用一条很便宜的查询拿到“版本信息”（如 EVENT.updated_at、
+EVENT_SESSION.version 之和、记录条数），据此生成 ETag；
+若客户端 If-None-Match 命中则直接返回 304，不再查询 / 序列化完整数据：
+
+    etag = make_etag("event-detail", eid, updated_at, version_sum)
+    return conditional_json(etag, lambda: load_payload(), last_modified=updated_at)
+
+304 的判断只依据 If-None-Match（ETag 覆盖所有变化）；
+Last-Modified 仅作为附加信息返回，并在客户端未发送 If-None-Match 时才参与判断，
+因此只有当 last_modified 能反映全部变化时才应传入 honor_if_modified_since=True。
+"""
+import hashlib
+from datetime import datetime, timezone
+from typing import Any, Callable, Optional
+
+from flask import Response, jsonify, request
+
+
+def make_etag(*parts: Any) -> str:
+    """由若干版本信息生成弱 ETag（不含 W/ 前缀与引号，由 werkzeug 负责格式化）。"""
+    raw = "|".join("" if p is None else str(p) for p in parts)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:20]
+
+
+def _as_utc(value: datetime) -> datetime:
+    # 数据库中的 DATETIME 不带时区，按 UTC 处理；HTTP 日期精度为秒
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).replace(microsecond=0)
+
+
+def is_not_modified(
+    etag: str,
+    last_modified: Optional[datetime] = None,
+    honor_if_modified_since: bool = False,
+) -> bool:
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if honor_if_modified_since and last_modified is not None and request.if_modified_since:
+        return _as_utc(last_modified) <= request.if_modified_since
+    return False
+
+
+def _apply_headers(response: Response, etag: str, last_modified: Optional[datetime]) -> Response:
+    response.set_etag(etag, weak=True)
+    if last_modified is not None:
+        response.last_modified = _as_utc(last_modified)
+    # 允许缓存，但每次使用前必须带条件请求重新验证
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+def not_modified_response(etag: str, last_modified: Optional[datetime] = None) -> Response:
+    return _apply_headers(Response(status=304), etag, last_modified)
+
+
+def conditional_json(
+    etag: str,
+    build: Callable[[], Any],
+    last_modified: Optional[datetime] = None,
+    honor_if_modified_since: bool = False,
+) -> Response:
+    """命中则返回 304；否则调用 build() 生成数据并 jsonify，附带 ETag / Last-Modified。"""
+    if is_not_modified(etag, last_modified, honor_if_modified_since):
+        return not_modified_response(etag, last_modified)
+    return _apply_headers(jsonify(build()), etag, last_modified)
@@ -0,0 +1,88 @@
+# backend/utils/pagination.py
+"""
+游标（keyset）分页辅助函数。
+
+列表按 (created_at DESC, eid DESC) 排序，游标记录上一页最后一行的 (created_at, eid)，
+下一页查询条件为 “排在它之后” 的行：
+
+    created_at < :c OR (created_at = :c AND eid < :e)
+
+走 (created_at) / (status, created_at) 索引范围扫描，耗时与页码无关；
+OFFSET 分页则需要先扫过并丢弃前面所有行。
+
+游标对前端是不透明字符串（urlsafe base64 编码的 JSON），前端只需原样回传。
+
+活动概览里的报名明细按 (session_id, user_id) 升序分页，游标为
+RegistrationCursor，编码方式相同。
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+Cursor = Tuple[datetime, int]
+RegistrationCursor = Tuple[int, int]
+
+DEFAULT_PAGE_LIMIT = 50
+MAX_PAGE_LIMIT = 100
+
+
+class CursorError(ValueError):
+    """游标无法解析。"""
+    pass
+
+
+def _encode(data: Dict[str, Any]) -> str:
+    raw = json.dumps(data, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _decode(token: str) -> Dict[str, Any]:
+    padded = token + "=" * (-len(token) % 4)
+    return json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+
+
+def encode_cursor(created_at: datetime | str, eid: int) -> str:
+    if isinstance(created_at, datetime):
+        created_at = created_at.isoformat()
+    return _encode({"c": created_at, "e": int(eid)})
+
+
+def decode_cursor(token: Optional[str]) -> Optional[Cursor]:
+    """空字符串 / None 表示第一页，返回 None；格式非法抛 CursorError。"""
+    if not token:
+        return None
+    try:
+        data = _decode(token)
+        return datetime.fromisoformat(data["c"]), int(data["e"])
+    except Exception:
+        raise CursorError("invalid cursor")
+
+
+def encode_registration_cursor(session_id: int, user_id: int) -> str:
+    return _encode({"s": int(session_id), "u": int(user_id)})
+
+
+def decode_registration_cursor(token: Optional[str]) -> Optional[RegistrationCursor]:
+    """同 decode_cursor：空值返回 None，格式非法抛 CursorError。"""
+    if not token:
+        return None
+    try:
+        data = _decode(token)
+        return int(data["s"]), int(data["u"])
+    except Exception:
+        raise CursorError("invalid cursor")
+
+
+def parse_limit(value: Optional[str], default: int = DEFAULT_PAGE_LIMIT) -> int:
+    """解析 limit 参数并夹在 [1, MAX_PAGE_LIMIT]；非整数抛 ValueError。"""
+    limit = default if value in (None, "") else int(value)
+    return max(1, min(limit, MAX_PAGE_LIMIT))
+
+
+def next_cursor(rows: List[Dict[str, Any]], limit: int) -> Optional[str]:
+    """本页取满 limit 行时返回下一页游标，否则说明已到末页，返回 None。"""
+    if len(rows) < limit:
+        return None
+    last = rows[-1]
+    return encode_cursor(last["created_at"], last["eid"])
@@ -0,0 +1,55 @@
+# run_no_show_sweep.py
+"""
+爽约统计与批量封禁的定期任务。
+
+用途：
+  - 刷新 USER_NO_SHOW_STATS 爽约台账（默认增量：只处理上次运行后结束的场次涉及的用户）
+  - 对达到阈值的用户一次性写入 USER.blocked_until
+  - 输出本次耗时与影响行数
+
+用法（在项目根目录执行）：
+    python run_no_show_sweep.py                 # 执行一次（适合 cron / systemd timer）
+    python run_no_show_sweep.py --full          # 全量重建台账
+    python run_no_show_sweep.py --interval 300  # 常驻 worker，每 300 秒执行一次
+"""
+
+import argparse
+import json
+import time
+
+from backend.services.user_penalty_service import run_no_show_sweep
+
+
+def _run_once(full: bool) -> None:
+    result = run_no_show_sweep(full=full)
+    result.pop("blocked_user_ids", None)
+    print(json.dumps(result, ensure_ascii=False))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="No-show ledger sweep")
+    parser.add_argument("--full", action="store_true", help="rebuild the whole ledger")
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=0,
+        help="run forever, sleeping this many seconds between sweeps",
+    )
+    args = parser.parse_args()
+
+    if args.interval <= 0:
+        _run_once(args.full)
+        return
+
+    full = args.full
+    while True:
+        try:
+            _run_once(full)
+            full = False
+        except Exception as e:  # 常驻模式下单次失败不退出，下个周期重试
+            print(json.dumps({"error": str(e)}, ensure_ascii=False))
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
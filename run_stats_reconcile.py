@@ -0,0 +1,53 @@
+# run_stats_reconcile.py
+"""
+报名统计物化表（SESSION_STATS / EVENT_STATS）与趋势小时汇总（REGISTRATION_HOURLY）的对账任务。
+
+用途：
+  - 用 REGISTRATION 重新统计各场次 / 活动的报名数与签到数，与物化表比对；
+    每个活动的小时汇总之和与报名记录数比对
+  - 发现偏差时锁定相关场次并按实际值修正（--check 只报告不修正）
+  - 已有数据的库首次启用时执行一次即完成回填
+  - 输出本次耗时与不一致的条数
+
+用法（在项目根目录执行）：
+    python run_stats_reconcile.py                 # 执行一次（适合 cron / systemd timer）
+    python run_stats_reconcile.py --check         # 只比对，不修改数据
+    python run_stats_reconcile.py --interval 3600 # 常驻 worker，每小时执行一次
+"""
+
+import argparse
+import json
+import time
+
+from backend.services.stats_service import reconcile_registration_stats
+
+
+def _run_once(fix: bool) -> None:
+    print(json.dumps(reconcile_registration_stats(fix=fix), ensure_ascii=False))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Registration stats reconcile")
+    parser.add_argument("--check", action="store_true", help="report mismatches without fixing them")
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=0,
+        help="run forever, sleeping this many seconds between runs",
+    )
+    args = parser.parse_args()
+
+    if args.interval <= 0:
+        _run_once(not args.check)
+        return
+
+    while True:
+        try:
+            _run_once(not args.check)
+        except Exception as e:  # 常驻模式下单次失败不退出，下个周期重试
+            print(json.dumps({"error": str(e)}, ensure_ascii=False))
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
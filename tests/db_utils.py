@@ -63,6 +63,109 @@ def insert_users(total: int) -> list[int]:
     return user_ids
 
 
+def insert_users_bulk(total: int, *, prefix: str = "bench_user") -> list[int]:
+    """用 executemany 批量插入大量用户（压测用），返回 user_id 列表。"""
+    rows = [
+        (f"{prefix}{i}", f"{prefix}_{i}@example.com", "password", "visitor")
+        for i in range(total)
+    ]
+    with get_cursor() as cursor:
+        for start in range(0, total, 5000):
+            cursor.executemany(
+                """
+                INSERT IGNORE INTO `USER` (name, email, password, role)
+                VALUES (%s, %s, %s, %s)
+                """,
+                rows[start:start + 5000],
+            )
+        cursor.execute(
+            "SELECT user_id FROM `USER` WHERE email LIKE %s ORDER BY user_id",
+            (f"{prefix}\\_%@example.com",),
+        )
+        return [int(r["user_id"]) for r in cursor.fetchall()]
+
+
+def insert_events_bulk(
+    total: int,
+    *,
+    prefix: str = "BenchEvent",
+    sessions_per_event: int = 0,
+    tag_name: str | None = None,
+) -> None:
+    """
+    批量插入大量已发布活动（分页 / 搜索压测用），created_at 逐条递增，部分相同以覆盖并列情况。
+    可选为每个活动生成 sessions_per_event 个场次，并统一打上 tag_name 标签（INSERT ... SELECT）。
+    """
+    base = datetime(2024, 1, 1)
+    rows = [
+        (1, f"{prefix}-{i}", "Bench Hall", "published", base + timedelta(seconds=i // 2), base)
+        for i in range(total)
+    ]
+    title_like = f"{prefix}-%"
+    with get_cursor() as cursor:
+        for start in range(0, total, 5000):
+            cursor.executemany(
+                """
+                INSERT INTO EVENT (type_id, title, location, status, created_at, updated_at)
+                VALUES (%s, %s, %s, %s, %s, %s)
+                """,
+                rows[start:start + 5000],
+            )
+        for n in range(sessions_per_event):
+            cursor.execute(
+                """
+                INSERT INTO EVENT_SESSION (eid, start_time, end_time, capacity, waiting_list_limit, status)
+                SELECT eid, created_at + INTERVAL %s DAY, created_at + INTERVAL %s DAY + INTERVAL 2 HOUR, 50, 0, 'open'
+                FROM EVENT WHERE title LIKE %s
+                """,
+                (n + 1, n + 1, title_like),
+            )
+        if tag_name:
+            cursor.execute("INSERT IGNORE INTO TAG (tag_name) VALUES (%s)", (tag_name,))
+            cursor.execute(
+                """
+                INSERT IGNORE INTO EVENT_TAG (eid, tag_id)
+                SELECT e.eid, t.tag_id FROM EVENT e JOIN TAG t ON t.tag_name = %s
+                WHERE e.title LIKE %s
+                """,
+                (tag_name, title_like),
+            )
+
+
+def insert_dense_sessions(days: int, per_day: int, *, start: datetime | None = None) -> int:
+    """
+    为日历压测插入 days 天、每天 per_day 个场次（挂在一个已发布活动下），
+    时长 30 分钟到 4 小时不等，返回活动 eid。
+    """
+    start = start or datetime(2025, 1, 1)
+    rnd = random.Random(2025)
+    now = datetime.now()
+    with get_cursor() as cursor:
+        cursor.execute(
+            """
+            INSERT INTO EVENT (type_id, title, location, status, created_at, updated_at)
+            VALUES (1, 'CalendarBench', 'Bench Hall', 'published', %s, %s)
+            """,
+            (now, now),
+        )
+        eid = cursor.lastrowid
+        rows = []
+        for d in range(days):
+            day = start + timedelta(days=d)
+            for _ in range(per_day):
+                begin = day + timedelta(minutes=rnd.randrange(0, 24 * 60, 5))
+                rows.append((eid, begin, begin + timedelta(minutes=rnd.randrange(30, 241, 15)), 50, 0, "open"))
+        for i in range(0, len(rows), 5000):
+            cursor.executemany(
+                """
+                INSERT INTO EVENT_SESSION (eid, start_time, end_time, capacity, waiting_list_limit, status)
+                VALUES (%s, %s, %s, %s, %s, %s)
+                """,
+                rows[i:i + 5000],
+            )
+    return eid
+
+
 def create_event_with_session(*, capacity: int, waiting: int | None = None) -> dict:
     """创建一个独立的 Event + Session，便于测试注册与并发。"""
     now = datetime.now(timezone.utc)
@@ -105,6 +208,34 @@ def create_event_with_session(*, capacity: int, waiting: int | None = None) -> d
     return {"eid": eid, "session_id": session_id}
 
 
+def insert_registrations_bulk(session_id: int, user_ids: list[int], step_minutes: int = 0) -> None:
+    """
+    给一个场次批量写入报名记录（压测用），状态与签到按下标轮换；
+    step_minutes > 0 时第 i 条的报名时间往前推 i * step_minutes 分钟（趋势压测用）。
+    """
+    now = datetime.now()
+    statuses = ("registered", "registered", "waiting", "cancelled")
+    rows = [
+        (
+            user_id,
+            session_id,
+            now - timedelta(minutes=i * step_minutes),
+            statuses[i % len(statuses)],
+            now if i % len(statuses) == 0 else None,
+        )
+        for i, user_id in enumerate(user_ids)
+    ]
+    with get_cursor() as cursor:
+        for start in range(0, len(rows), 5000):
+            cursor.executemany(
+                """
+                INSERT IGNORE INTO REGISTRATION (user_id, session_id, register_time, status, checkin_time)
+                VALUES (%s, %s, %s, %s, %s)
+                """,
+                rows[start:start + 5000],
+            )
+
+
 def check_db_connection() -> None:
     """如果无法连接数据库则抛出异常，便于在测试中 skip。"""
     cfg = load_config()
@@ -0,0 +1,139 @@
+"""报名准入引擎的单元测试：打桩数据库访问，只验证名额发放与批处理逻辑。"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.services import admission_service
+from backend.services.admission_service import AdmissionEngine
+
+
+class FakeEngine(AdmissionEngine):
+    """_load_session / _write_batch 改为内存实现，模拟一个容量为 capacity 的场次。"""
+
+    def __init__(self, capacity: int, **kwargs):
+        super().__init__(**kwargs)
+        self.capacity = capacity
+        self.current = 0
+        self.batches = []
+        self._db_lock = threading.Lock()
+
+    def _load_session(self, session_id):
+        with self._db_lock:
+            return {
+                "eid": 1,
+                "capacity": self.capacity,
+                "current_registered": self.current,
+                "status": "open",
+                "allow_multi_session": False,
+            }
+
+    def _write_batch(self, slot, batch):
+        with self._db_lock:
+            assert self.current + len(batch) <= self.capacity
+            self.current += len(batch)
+            self.batches.append(len(batch))
+        for t in batch:
+            t.resolve({"user_id": t.user_id, "status": "registered"})
+        return len(batch)
+
+
+def test_engine_never_oversells_and_batches(monkeypatch):
+    """并发 200 个请求抢 30 个名额：恰好 30 个走批量写入，其余回退到行锁路径。"""
+    fallbacks = []
+
+    def fake_register(user_id, session_id):
+        fallbacks.append(user_id)
+        return {"user_id": user_id, "status": "waiting"}
+
+    monkeypatch.setattr(admission_service, "register_for_session", fake_register)
+    engine = FakeEngine(capacity=30, batch_size=8, batch_wait=0.01, counter_ttl=60)
+
+    with ThreadPoolExecutor(max_workers=32) as pool:
+        results = list(pool.map(lambda uid: engine.submit(uid, 1), range(200)))
+
+    statuses = [r["status"] for r in results]
+    assert statuses.count("registered") == 30
+    assert statuses.count("waiting") == 170
+    assert engine.current == 30
+    assert all(size <= 8 for size in engine.batches)
+    assert engine.stats()["admitted"] == 30
+    assert engine.stats()["fallbacks"] == 170
+
+
+def test_capacity_conflict_falls_back(monkeypatch):
+    """条件 UPDATE 冲突时整批回退到行锁路径，并在下次重新加载计数。"""
+    monkeypatch.setattr(
+        admission_service,
+        "register_for_session",
+        lambda user_id, session_id: {"user_id": user_id, "status": "registered", "via": "lock"},
+    )
+
+    class ConflictEngine(FakeEngine):
+        def _write_batch(self, slot, batch):
+            raise admission_service._CapacityConflict()
+
+    engine = ConflictEngine(capacity=5, batch_size=4, batch_wait=0, counter_ttl=60)
+    result = engine.submit(7, 1)
+    assert result["via"] == "lock"
+    assert engine.stats()["conflicts"] == 1
+    assert engine._slots[1].loaded_at is None
+    assert engine._slots[1].remaining == 5
+
+
+def _wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+def test_leader_hands_off_after_one_batch(monkeypatch):
+    """leader 只写自己那一批就返回，后到的请求由各自线程接任 leader 写入。"""
+    gate = threading.Event()
+    writers = {}
+
+    class GatedEngine(FakeEngine):
+        def _write_batch(self, slot, batch):
+            gate.wait()
+            for t in batch:
+                writers[t.user_id] = threading.current_thread().name
+            return super()._write_batch(slot, batch)
+
+    engine = GatedEngine(capacity=10, batch_size=1, batch_wait=0, counter_ttl=60)
+    threads = [threading.Thread(target=engine.submit, args=(uid, 1), name=f"req-{uid}") for uid in (1, 2, 3)]
+    threads[0].start()
+    _wait_for(lambda: 1 in engine._slots and engine._slots[1].leader_active)
+    for t in threads[1:]:
+        t.start()
+    _wait_for(lambda: len(engine._slots[1].pending) == 2)
+    gate.set()
+    for t in threads:
+        t.join(timeout=5)
+
+    assert writers == {1: "req-1", 2: "req-2", 3: "req-3"}
+    assert engine.batches == [1, 1, 1]
+    assert not engine._slots[1].leader_active
+
+
+def test_duplicate_user_falls_back_after_batch_commits(monkeypatch):
+    """同一批内重复的 user_id 在本批写完之后才回退到行锁路径，且不进入批量写入。"""
+    events = []
+
+    def fake_register(user_id, session_id):
+        events.append(("fallback", user_id))
+        return {"user_id": user_id, "status": "registered", "via": "lock"}
+
+    monkeypatch.setattr(admission_service, "register_for_session", fake_register)
+
+    class RecordingEngine(FakeEngine):
+        def _write_batch(self, slot, batch):
+            events.append(("batch", sorted(t.user_id for t in batch)))
+            return super()._write_batch(slot, batch)
+
+    engine = RecordingEngine(capacity=10, batch_size=3, batch_wait=1.0, counter_ttl=60)
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        results = list(pool.map(lambda uid: engine.submit(uid, 1), [5, 5, 6]))
+
+    assert events == [("batch", [5, 6]), ("fallback", 5)]
+    assert sorted(r.get("via", "batch") for r in results) == ["batch", "batch", "lock"]
+    assert engine._slots[1].remaining == 10 - 2
@@ -0,0 +1,261 @@
+"""analytics_cube 向量化统计与增量刷新的单元测试（打桩连接，不依赖数据库）。"""
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from backend.services import analytics_cube
+from backend.services.analytics_cube import AnalyticsCube
+
+T0 = datetime(2025, 12, 1, 9, 30)
+NOW = datetime(2025, 12, 10)
+
+
+class FakeDB:
+    def __init__(self):
+        self.sessions = {
+            10: {"session_id": 10, "eid": 1, "version": 1, "end_time": NOW - timedelta(days=1)},
+            11: {"session_id": 11, "eid": 1, "version": 1, "end_time": NOW + timedelta(days=1)},
+            20: {"session_id": 20, "eid": 2, "version": 1, "end_time": NOW - timedelta(days=1)},
+        }
+        self.events = {
+            1: {"eid": 1, "title": "讲座", "type_id": 3, "org_id": None, "updated_at": T0},
+            2: {"eid": 2, "title": "工作坊", "type_id": 3, "org_id": 5, "updated_at": T0},
+        }
+        self.event_tags = [{"eid": 1, "tag_id": 7, "tag_name": "AI"}, {"eid": 2, "tag_id": 7, "tag_name": "AI"}]
+        self.groups = [{"group_id": 1, "group_name": "本科生"}, {"group_id": 2, "group_name": "教职工"}]
+        self.user_groups = {(100, 1): 1, (101, 1): 2, (102, 1): 1}
+        # (user_id, session_id) -> [status, register_time, checkin_time]
+        self.registrations = {
+            (100, 10): ["registered", T0, T0 + timedelta(hours=1)],
+            (101, 10): ["registered", T0 + timedelta(hours=2), None],
+            (102, 11): ["waiting", T0 + timedelta(days=1), None],
+            (103, 20): ["registered", T0 + timedelta(days=7), None],
+        }
+        self.fact_fetches = []
+        self.dimension_reads = []
+        self.version_reads = 0
+
+
+class FakeCursor:
+    def __init__(self, db, tuples):
+        self.db = db
+        self.tuples = tuples
+        self._rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        params = list(params or [])
+        db = self.db
+        if "LEFT JOIN EVENT_SESSION s" in sql:
+            db.version_reads += 1
+            self._rows = []
+            for e in db.events.values():
+                sessions = [s for s in db.sessions.values() if s["eid"] == e["eid"]]
+                self._rows += [(e["eid"], e["updated_at"], s["session_id"], s["version"], s["end_time"]) for s in sessions]
+                if not sessions:
+                    self._rows.append((e["eid"], e["updated_at"], None, None, None))
+        elif "FROM REGISTRATION r" in sql:
+            wanted = set(params) if params else set(db.sessions)
+            db.fact_fetches.append(sorted(wanted))
+            self._rows = [
+                (uid, sid, db.sessions[sid]["eid"], st, reg, chk, db.user_groups.get((uid, db.sessions[sid]["eid"]), -1))
+                for (uid, sid), (st, reg, chk) in sorted(db.registrations.items())
+                if sid in wanted
+            ]
+        elif "FROM EVENT_TAG et" in sql:
+            self._rows = [dict(t) for t in db.event_tags if not params or t["eid"] in params]
+        elif "FROM EVENT e" in sql:
+            db.dimension_reads.append(sorted(params))
+            self._rows = [
+                {k: e[k] for k in ("eid", "title", "type_id", "org_id")}
+                for e in db.events.values()
+                if not params or e["eid"] in params
+            ]
+        elif "FROM AUDIENCE_GROUP" in sql:
+            self._rows = [dict(g) for g in db.groups]
+        else:
+            self._rows = []
+
+    def fetchall(self):
+        return self._rows
+
+    def fetchmany(self, size):
+        chunk, self._rows = self._rows[:size], self._rows[size:]
+        return chunk
+
+
+class FakeConnection:
+    def __init__(self, db):
+        self.db = db
+
+    def cursor(self, cursorclass=None):
+        return FakeCursor(self.db, tuples=cursorclass is not None)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    db = FakeDB()
+    monkeypatch.setattr(analytics_cube, "get_connection", lambda: FakeConnection(db))
+    return db
+
+
+def test_vectorized_queries_match_sql_semantics(fake_db):
+    """群体统计 / 标签概览 / 爽约率 / 趋势与 SQL 版本的口径一致。"""
+    cube = AnalyticsCube()
+    cube.reload()
+
+    assert cube.group_stats(1) == [
+        {"group_name": "教职工", "registrations": 1, "checkins": 0},
+        {"group_name": "本科生", "registrations": 2, "checkins": 1},
+    ]
+    assert cube.tag_overview("AI") == [
+        {"eid": 1, "title": "讲座", "session_count": 2, "registrations": 3, "checkins": 1},
+        {"eid": 2, "title": "工作坊", "session_count": 1, "registrations": 1, "checkins": 0},
+    ]
+    # 场次 11 尚未结束，其中的报名不计入
+    assert cube.event_no_show_rates([1, 2, 99], NOW) == {
+        1: {"eid": 1, "ended_registrations": 2, "no_show_count": 1, "no_show_rate": 0.5},
+        2: {"eid": 2, "ended_registrations": 1, "no_show_count": 1, "no_show_rate": 1.0},
+    }
+
+    start, end = datetime(2025, 11, 24), datetime(2025, 12, 15)
+    assert cube.registration_trend("type", 3, "day", start, end) == [
+        (date(2025, 12, 1), 2),
+        (date(2025, 12, 2), 1),
+        (date(2025, 12, 8), 1),
+    ]
+    # 2025-12-01 是周一
+    assert cube.registration_trend("tag", 7, "week", start, end) == [(date(2025, 12, 1), 3), (date(2025, 12, 8), 1)]
+    assert cube.registration_trend("event", 1, "hour", datetime(2025, 12, 1), datetime(2025, 12, 2)) == [
+        (datetime(2025, 12, 1, 9), 1),
+        (datetime(2025, 12, 1, 11), 1),
+    ]
+    assert cube.registration_trend("org", 5, "day", start, end) == [(date(2025, 12, 8), 1)]
+
+    assert cube.event_version(1) == {"updated_at": T0, "session_count": 2, "version_sum": 2}
+    assert cube.event_version(99) is None
+    assert cube.tag_version("AI") == {"event_count": 2, "updated_at": T0, "session_count": 3, "version_sum": 3}
+
+
+def test_queries_serve_last_synced_view_without_db_access(fake_db):
+    """查询只读已同步的视图：数据库变化后、sync 之前结果不变，也不发任何查询。"""
+    cube = AnalyticsCube()
+    cube.reload()
+    reads = fake_db.version_reads
+
+    fake_db.registrations[(104, 10)] = ["registered", T0, None]
+    fake_db.user_groups[(104, 1)] = 2
+    fake_db.sessions[10]["version"] += 1
+
+    assert cube.group_stats(1)[0] == {"group_name": "教职工", "registrations": 1, "checkins": 0}
+    assert cube.event_version(1)["version_sum"] == 2
+    assert fake_db.version_reads == reads
+    assert fake_db.fact_fetches == [sorted(fake_db.sessions)]
+
+
+def test_sync_reloads_only_sessions_whose_version_changed(fake_db):
+    """只有 version 变化的场次重新读取报名、只有 updated_at 变化的活动重读维度；旧视图保持不变。"""
+    cube = AnalyticsCube()
+    cube.reload()
+    fake_db.fact_fetches.clear()
+    fake_db.dimension_reads.clear()
+    before = cube.view()
+
+    # 场次 10：一人签到、一人新报名；场次 20 不变
+    fake_db.registrations[(101, 10)][2] = T0 + timedelta(hours=3)
+    fake_db.registrations[(104, 10)] = ["registered", T0, None]
+    fake_db.user_groups[(104, 1)] = 2
+    fake_db.sessions[10]["version"] += 2
+    cube.sync()
+
+    assert fake_db.fact_fetches == [[10]]
+    assert fake_db.dimension_reads == []
+    assert cube.group_stats(1) == [
+        {"group_name": "教职工", "registrations": 2, "checkins": 1},
+        {"group_name": "本科生", "registrations": 2, "checkins": 1},
+    ]
+    assert cube.group_stats(2) == []
+    assert cube.stats()["rows"] == 5
+    assert cube.stats()["overridden_sessions"] == 1
+    assert before.group_stats(1)[0] == {"group_name": "教职工", "registrations": 1, "checkins": 0}
+
+    # 活动 1 改标题：只重读活动 1 的维度
+    fake_db.events[1]["title"] = "讲座（加场）"
+    fake_db.events[1]["updated_at"] = T0 + timedelta(days=1)
+    cube.sync()
+    assert fake_db.dimension_reads == [[1]]
+    assert cube.tag_overview("AI")[0]["title"] == "讲座（加场）"
+
+    # 活动 2 被删除：场次与报名随之移除
+    del fake_db.events[2], fake_db.sessions[20], fake_db.registrations[(103, 20)]
+    fake_db.event_tags = [t for t in fake_db.event_tags if t["eid"] != 2]
+    cube.sync()
+    assert [r["eid"] for r in cube.tag_overview("AI")] == [1]
+    assert cube.event_no_show_rates([2], NOW) == {}
+    assert cube.stats()["rows"] == 4
+
+
+def test_overlay_is_compacted_into_base(fake_db, monkeypatch):
+    """覆盖层超过阈值后合并回基础数组，结果不变。"""
+    monkeypatch.setattr(analytics_cube, "_COMPACT_MIN_ROWS", 0)
+    monkeypatch.setattr(analytics_cube, "_COMPACT_RATIO", 0)
+    cube = AnalyticsCube()
+    cube.reload()
+
+    fake_db.registrations[(104, 20)] = ["registered", T0, None]
+    fake_db.sessions[20]["version"] += 1
+    del fake_db.sessions[11], fake_db.registrations[(102, 11)]
+    stats = cube.sync()
+
+    assert stats["compacted"] is True
+    assert cube.stats()["overridden_sessions"] == 0
+    assert cube.stats()["rows"] == 4
+    assert [(r["eid"], r["session_count"], r["registrations"]) for r in cube.tag_overview("AI")] == [(1, 1, 2), (2, 1, 2)]
+    eids = cube.view().base["eid"]
+    assert list(eids) == sorted(eids)
+
+
+def test_reload_catches_deletes_without_version_bump(fake_db):
+    """级联删除不改 version：sync 看不到，整表 reload 后恢复一致。"""
+    cube = AnalyticsCube()
+    cube.reload()
+    fake_db.fact_fetches.clear()
+
+    del fake_db.registrations[(101, 10)]
+    cube.sync()
+    assert fake_db.fact_fetches == []
+    assert cube.stats()["rows"] == 4
+
+    cube.reload()
+    assert cube.group_stats(1) == [{"group_name": "本科生", "registrations": 2, "checkins": 1}]
+    assert cube.stats()["rows"] == 3
+
+
+def test_tag_rename_reaches_cube_after_mark(fake_db):
+    """标签改名不改活动 updated_at：mark_dimensions_stale 之后的 sync 重读全部活动维度。"""
+    cube = AnalyticsCube()
+    cube.reload()
+
+    for t in fake_db.event_tags:
+        t["tag_name"] = "人工智能"
+    cube.sync()
+    assert cube.tag_overview("人工智能") == []
+
+    cube.mark_dimensions_stale()
+    cube.sync()
+    assert [r["eid"] for r in cube.tag_overview("人工智能")] == [1, 2]
+    assert cube.tag_overview("AI") == []
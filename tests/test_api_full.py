@@ -47,3 +47,46 @@ def test_analytics_overview_api(client, db_ready, real_auth_header):
     assert resp.status_code == HTTPStatus.OK
     body = resp.get_json()
     assert body.get("eid") == 1
+
+
+@pytest.mark.requires_db
+@pytest.mark.real_auth
+def test_analytics_overview_batch_api(client, db_ready, real_auth_header):
+    """批量概览的计数与单个活动 overview 一致，不存在的 eid 列入 missing。"""
+    single = client.get("/api/analytics/events/1/overview?registrations=0", headers=real_auth_header).get_json()
+    resp = client.post(
+        "/api/analytics/events/overview:batch",
+        headers=real_auth_header,
+        json={"eids": [999999, 1, 1]},
+    )
+    assert resp.status_code == HTTPStatus.OK
+    body = resp.get_json()
+    assert body["missing"] == [999999]
+    assert [r["eid"] for r in body["results"]] == [1]
+    for key in ("session_count", "total_registrations", "registered_count", "waiting_count", "checked_in_count"):
+        assert body["results"][0][key] == single[key]
+
+
+@pytest.mark.requires_db
+@pytest.mark.real_auth
+def test_admin_promote_waiting_list_api(client, db_ready, real_auth_header):
+    """扩容后一次性把候补按顺序转正，current_registered 同步更新。"""
+    from backend.services.registration_service import register_for_session
+    from tests.db_utils import create_event_with_session, insert_users
+
+    user_ids = insert_users(12)
+    sid = create_event_with_session(capacity=2, waiting=20)["session_id"]
+    for uid in user_ids[:10]:
+        register_for_session(user_id=uid, session_id=sid)
+
+    resp = client.post(
+        f"/api/admin/sessions/{sid}/promote",
+        headers=real_auth_header,
+        json={"capacity": 8},
+    )
+    assert resp.status_code == HTTPStatus.OK
+    body = resp.get_json()
+    assert body["promoted"] == 6
+    assert body["promoted_user_ids"] == user_ids[2:8]
+    assert body["current_registered"] == 8
+    assert body["current_waiting"] == 2
@@ -17,3 +17,59 @@ def test_events_health_endpoint(client):
     data = resp.get_json()
     assert data.get("status") == "ok"
     assert "events api" in (data.get("message_en") or "")
+
+
+def test_batch_registration_rejects_invalid_payload(client, auth_header):
+    """批量报名：条目不是整数（含布尔值）时直接返回 400，不访问数据库。"""
+    resp = client.post(
+        "/api/registrations/batch",
+        headers=auth_header,
+        json={"session_id": "3", "user_ids": [1, 2]},
+    )
+    assert resp.status_code == HTTPStatus.BAD_REQUEST
+    assert resp.get_json()["error"] == "invalid_request"
+    # JSON 布尔值不能当作 user_id 1 / 0
+    resp = client.post(
+        "/api/registrations/batch",
+        headers=auth_header,
+        json={"items": [{"user_id": True, "session_id": 3}]},
+    )
+    assert resp.status_code == HTTPStatus.BAD_REQUEST
+
+
+def test_calendar_rejects_bad_window(client):
+    """日历查询：缺少时间、mode 非法或时间窗过长（含混用带时区的时间）时返回 400，不访问数据库。"""
+    assert client.get("/api/calendar/sessions").status_code == HTTPStatus.BAD_REQUEST
+    assert client.get(
+        "/api/calendar/sessions?start=2025-12-01T00:00:00&end=2025-12-02T00:00:00&mode=bogus"
+    ).status_code == HTTPStatus.BAD_REQUEST
+    resp = client.get("/api/calendar/sessions?start=2025-01-01T00:00:00&end=2025-12-31T00:00:00")
+    assert resp.status_code == HTTPStatus.BAD_REQUEST
+    assert resp.get_json()["error"] == "invalid_request"
+    # 一端带时区、一端不带：统一按 UTC 比较，仍是 400 而不是 500
+    resp = client.get("/api/calendar/sessions?start=2025-01-01T00:00:00%2B08:00&end=2025-12-31T00:00:00")
+    assert resp.status_code == HTTPStatus.BAD_REQUEST
+    assert resp.get_json()["error"] == "invalid_request"
+
+
+def test_overview_batch_rejects_invalid_payload(client, auth_header):
+    """批量概览：eids 缺失、非整数或时间格式错误时返回 400，不访问数据库。"""
+    for payload in ({}, {"eids": []}, {"eids": ["1"]}, {"eids": [1], "start": "not-a-date"}):
+        resp = client.post("/api/analytics/events/overview:batch", headers=auth_header, json=payload)
+        assert resp.status_code == HTTPStatus.BAD_REQUEST
+        assert resp.get_json()["error"] == "invalid_request"
+
+
+def test_registration_trend_rejects_invalid_params(client, auth_header):
+    """报名趋势：粒度 / 维度非法、时间格式错误或桶数超限时返回 400，不访问数据库。"""
+    cases = (
+        ("/api/analytics/trends/event/1?bucket=minute", "analytic_error"),
+        ("/api/analytics/trends/venue/1", "analytic_error"),
+        ("/api/analytics/trends/event/1?start=yesterday", "invalid_request"),
+        ("/api/analytics/trends/tag/1?bucket=hour&start=2020-01-01&end=2025-01-01", "analytic_error"),
+        ("/api/analytics/trends/org/1?start=2025-02-01&end=2025-01-01", "analytic_error"),
+    )
+    for url, error in cases:
+        resp = client.get(url, headers=auth_header)
+        assert resp.status_code == HTTPStatus.BAD_REQUEST
+        assert resp.get_json()["error"] == error
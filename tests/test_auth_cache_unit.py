@@ -0,0 +1,103 @@
+"""TTLCache 与 token -> user 缓存的单元测试（不依赖数据库）。"""
+import time
+from datetime import datetime
+
+from backend.services import auth_service
+from backend.utils.cache import TTLCache
+
+
+def test_ttl_cache_expires_and_evicts_lru():
+    """超过 ttl 的条目失效；超过 maxsize 时淘汰最久未访问的条目。"""
+    cache = TTLCache(maxsize=2, ttl=0.05)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # a 变为最近访问
+    cache.set("c", 3)           # 淘汰 b
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+    time.sleep(0.06)
+    assert cache.get("a") is None
+
+    stats = cache.stats()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 2
+    assert stats["evictions"] == 1
+
+
+def test_get_user_by_token_uses_cache(monkeypatch):
+    """同一用户的多次请求只查一次数据库；失效后重新加载。"""
+    calls = []
+
+    def fake_load(user_id):
+        calls.append(user_id)
+        return {
+            "user_id": user_id,
+            "name": "Cached",
+            "email": "cached@example.com",
+            "role": "visitor",
+            "blocked_until": None,
+        }
+
+    monkeypatch.setattr(auth_service, "_load_user", fake_load)
+    monkeypatch.setattr(auth_service, "_user_cache", TTLCache(maxsize=10, ttl=60))
+
+    token = auth_service._create_access_token(42, "visitor")["token"]
+    first = auth_service.get_user_by_token(token)
+    first["role"] = "admin"  # 修改返回值不应污染缓存
+    second = auth_service.get_user_by_token(token)
+    assert calls == [42]
+    assert second["role"] == "visitor"
+
+    auth_service.invalidate_cached_user(42)
+    auth_service.get_user_by_token(token)
+    assert calls == [42, 42]
+
+    stats = auth_service.get_user_cache_stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 2
+
+
+def test_get_user_by_token_rejects_invalid_token(monkeypatch):
+    """签名无效的 token 不应触发数据库查询。"""
+    monkeypatch.setattr(auth_service, "_load_user", lambda _uid: 1 / 0)
+    assert auth_service.get_user_by_token("not-a-jwt") is None
+
+
+def test_claims_mode_skips_db_until_version_changes(monkeypatch):
+    """claims 模式：版本一致时不查库；版本变化后回退到查库路径。"""
+    versions = {7: 3}
+    loads = []
+
+    monkeypatch.setattr(auth_service.config, "AUTH_MODE", "claims")
+    monkeypatch.setattr(auth_service, "_load_token_version", lambda uid: versions.get(uid))
+    monkeypatch.setattr(auth_service, "_token_versions", TTLCache(maxsize=10, ttl=0))
+    monkeypatch.setattr(auth_service, "_user_cache", TTLCache(maxsize=10, ttl=60))
+
+    def fake_load(user_id):
+        loads.append(user_id)
+        return {
+            "user_id": user_id,
+            "name": "From DB",
+            "email": "db@example.com",
+            "role": "visitor",
+            "blocked_until": None,
+        }
+
+    monkeypatch.setattr(auth_service, "_load_user", fake_load)
+
+    blocked = datetime(2030, 1, 1, 12, 0, 0)
+    token = auth_service._create_access_token(
+        7, "staff", name="Claims", email="c@example.com",
+        blocked_until=blocked, token_version=3,
+    )["token"]
+
+    user = auth_service.get_user_by_token(token)
+    assert loads == []
+    assert user["role"] == "staff"
+    assert user["blocked_until"] == blocked
+
+    versions[7] = 4  # 例如管理员修改了角色
+    user = auth_service.get_user_by_token(token)
+    assert loads == [7]
+    assert user["role"] == "visitor"
@@ -1,13 +1,19 @@
 """并发报名压力测试：500 人抢 25 个名额。
 中文注释描述测试意图。
 """
+import os
+import time
 from concurrent.futures import ThreadPoolExecutor
 
 import pytest
 
 from backend.db import get_cursor
-from backend.services.registration_service import register_for_session
-from tests.db_utils import create_event_with_session, insert_users
+from backend.services.registration_service import (
+    register_for_session,
+    register_for_session_fast,
+)
+from backend.services.admission_service import AdmissionEngine
+from tests.db_utils import create_event_with_session, insert_users, insert_users_bulk
 
 
 @pytest.mark.requires_db
@@ -49,3 +55,89 @@ def test_concurrent_registration_capacity(db_ready):
     assert registered == 25
     assert waiting == 475
     # 队列可能有空洞，此处不强制校验 max_qp，只验证等待人数正确
+
+
+@pytest.mark.requires_db
+@pytest.mark.perf
+def test_batched_admission_under_burst(db_ready):
+    """批量准入：N 个请求（默认 5 万）抢 N/20 个名额，不超卖、其余全部进入候补。"""
+    total = int(os.getenv("ADMISSION_BENCH_REQUESTS", "50000"))
+    capacity = max(1, total // 20)
+    user_ids = insert_users_bulk(total)
+    info = create_event_with_session(capacity=capacity, waiting=total)
+    sid = info["session_id"]
+    engine = AdmissionEngine(batch_size=200, batch_wait=0.005, counter_ttl=5)
+
+    def worker(uid: int):
+        try:
+            engine.submit(uid, sid)
+        except Exception:
+            return "error"
+        return "ok"
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=64) as executor:
+        list(executor.map(worker, user_ids))
+    elapsed = time.perf_counter() - started
+
+    with get_cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT status, COUNT(*) AS cnt
+            FROM REGISTRATION
+            WHERE session_id = %s
+            GROUP BY status
+            """,
+            (sid,),
+        )
+        rows = {row["status"]: row["cnt"] for row in cursor.fetchall()}
+        cursor.execute(
+            "SELECT current_registered FROM EVENT_SESSION WHERE session_id = %s",
+            (sid,),
+        )
+        current = cursor.fetchone()["current_registered"]
+
+    detail = f"{total} requests in {elapsed:.2f}s, stats={engine.stats()}"
+    assert rows.get("registered", 0) == capacity, detail
+    assert current == capacity
+    assert rows.get("waiting", 0) == total - capacity
+
+
+@pytest.mark.requires_db
+@pytest.mark.perf
+def test_conditional_update_registration_capacity(db_ready):
+    """短临界区报名：并发抢名额不超卖，重复请求不会多占名额。"""
+    user_ids = insert_users(300)
+    info = create_event_with_session(capacity=20, waiting=600)
+    sid = info["session_id"]
+
+    def worker(uid: int):
+        try:
+            return register_for_session_fast(user_id=uid, session_id=sid)["status"]
+        except Exception:
+            return "error"
+
+    # 每个用户提交两次，模拟重复点击
+    with ThreadPoolExecutor(max_workers=50) as executor:
+        list(executor.map(worker, user_ids + user_ids))
+
+    with get_cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT status, COUNT(*) AS cnt
+            FROM REGISTRATION
+            WHERE session_id = %s
+            GROUP BY status
+            """,
+            (sid,),
+        )
+        rows = {row["status"]: row["cnt"] for row in cursor.fetchall()}
+        cursor.execute(
+            "SELECT current_registered FROM EVENT_SESSION WHERE session_id = %s",
+            (sid,),
+        )
+        current = cursor.fetchone()["current_registered"]
+
+    assert rows.get("registered", 0) == 20
+    assert current == 20
+    assert rows.get("waiting", 0) == 280
@@ -2,12 +2,26 @@
 中文注释描述每个步骤，其余代码保持英文。
 """
 from http import HTTPStatus
-from datetime import datetime
+from datetime import datetime, timedelta
 
 import pytest
 
-from backend.services.registration_service import register_for_session, cancel_registration
-from tests.db_utils import create_event_with_session, insert_users
+from backend.api.analytics_api import _load_event_group_stats, _load_tag_overview
+from backend.db import get_cursor
+from backend.services import analytic_service, analytics_cube
+from backend.services.admin_service import delete_user, force_set_registration
+from backend.services.analytic_service import (
+    get_event_overview,
+    get_event_overview_counters,
+    get_event_no_show_rates,
+    get_registration_trend,
+    get_session_stats,
+)
+from backend.services.registration_service import register_for_session, register_for_session_fast, cancel_registration
+from backend.services.snapshot_service import event_registration_report, export_snapshot, load_snapshot
+from backend.services.stats_service import find_stats_mismatches, rebuild_stats, reconcile_registration_stats
+from backend.utils.pagination import decode_registration_cursor
+from tests.db_utils import create_event_with_session, insert_registrations_bulk, insert_users
 
 
 @pytest.mark.requires_db
@@ -55,6 +69,46 @@ def test_register_and_cancel_flow_db(db_ready):
     assert promoted["queue_position"] == 1
 
 
+@pytest.mark.requires_db
+def test_waiting_list_cancel_does_not_renumber(db_ready):
+    """候补号单调递增：中间有人取消时其余记录不改写，名次在读取时重新计算。"""
+    insert_users(10)
+    sid = create_event_with_session(capacity=1, waiting=10)["session_id"]
+
+    register_for_session(user_id=1, session_id=sid)
+    positions = [register_for_session(user_id=u, session_id=sid)["queue_position"] for u in (2, 3, 4)]
+    assert positions == [1, 2, 3]
+
+    with get_cursor() as cursor:
+        cursor.execute(
+            "SELECT user_id, queue_position FROM REGISTRATION WHERE session_id = %s AND status = 'waiting'",
+            (sid,),
+        )
+        tickets_before = {r["user_id"]: r["queue_position"] for r in cursor.fetchall()}
+
+    cancel_registration(user_id=3, session_id=sid)
+    cancel_registration(user_id=1, session_id=sid)  # 用户 2 转正
+
+    with get_cursor() as cursor:
+        cursor.execute(
+            "SELECT user_id, status, queue_position FROM REGISTRATION WHERE session_id = %s",
+            (sid,),
+        )
+        rows = {r["user_id"]: r for r in cursor.fetchall()}
+        cursor.execute(
+            "SELECT current_registered, current_waiting FROM EVENT_SESSION WHERE session_id = %s",
+            (sid,),
+        )
+        session_row = cursor.fetchone()
+
+    assert rows[2]["status"] == "registered"
+    assert rows[4]["queue_position"] == tickets_before[4]
+    assert session_row["current_registered"] == 1
+    assert session_row["current_waiting"] == 1
+    # 重复报名返回现有记录，名次已前移到第 1 位
+    assert register_for_session(user_id=4, session_id=sid)["queue_position"] == 1
+
+
 @pytest.mark.requires_db
 def test_event_detail_api(client, db_ready):
     """事件详情 API 应能返回基础字段。"""
@@ -63,3 +117,325 @@ def test_event_detail_api(client, db_ready):
     body = resp.get_json()
     assert body.get("eid") == 1
     assert isinstance(body.get("sessions"), list)
+
+
+@pytest.mark.requires_db
+def test_register_batch_mixed_results(db_ready):
+    """批量报名：名额用完后进入候补，重复条目与不存在的场次各自返回结果。"""
+    from backend.services.registration_service import register_batch
+
+    user_ids = insert_users(6)
+    sid = create_event_with_session(capacity=3, waiting=10)["session_id"]
+
+    items = [(uid, sid) for uid in user_ids[:5]] + [(user_ids[0], sid), (user_ids[5], 999999)]
+    results = register_batch(items)
+
+    assert [r["status"] for r in results[:5]] == ["registered"] * 3 + ["waiting"] * 2
+    assert [r["queue_position"] for r in results[3:5]] == [1, 2]
+    assert results[5]["status"] == "registered"
+    assert results[6]["status"] == "failed"
+
+    with get_cursor() as cursor:
+        cursor.execute(
+            "SELECT current_registered, current_waiting FROM EVENT_SESSION WHERE session_id = %s",
+            (sid,),
+        )
+        row = cursor.fetchone()
+    assert row["current_registered"] == 3
+    assert row["current_waiting"] == 2
+
+
+@pytest.mark.requires_db
+def test_no_show_sweep_blocks_in_bulk(db_ready, monkeypatch):
+    """爽约台账：sweep 统计窗口内爽约并批量封禁，报名路径读取台账即可拒绝。"""
+    from datetime import timedelta
+
+    from backend.services import registration_service
+    from backend.services.registration_service import RegistrationError
+    from backend.services.user_penalty_service import run_no_show_sweep
+
+    uid = insert_users(1)[0]
+    sessions = [create_event_with_session(capacity=5)["session_id"] for _ in range(3)]
+    for sid in sessions:
+        register_for_session(user_id=uid, session_id=sid)
+
+    # 把三个场次挪到过去，模拟报名但未签到
+    past_end = datetime.now() - timedelta(days=1)
+    with get_cursor() as cursor:
+        for sid in sessions:
+            cursor.execute(
+                "UPDATE EVENT_SESSION SET start_time = %s, end_time = %s WHERE session_id = %s",
+                (past_end - timedelta(hours=2), past_end, sid),
+            )
+        cursor.execute("UPDATE `USER` SET blocked_until = NULL WHERE user_id = %s", (uid,))
+
+    result = run_no_show_sweep()
+    assert uid in result["blocked_user_ids"]
+
+    with get_cursor() as cursor:
+        cursor.execute("SELECT no_show_count FROM USER_NO_SHOW_STATS WHERE user_id = %s", (uid,))
+        assert cursor.fetchone()["no_show_count"] == 3
+        cursor.execute("SELECT blocked_until FROM `USER` WHERE user_id = %s", (uid,))
+        assert cursor.fetchone()["blocked_until"] is not None
+        # 解除封禁后，ledger 模式下报名路径仍会根据台账重新封禁并提交
+        cursor.execute("UPDATE `USER` SET blocked_until = NULL WHERE user_id = %s", (uid,))
+
+    target = create_event_with_session(capacity=5)["session_id"]
+    monkeypatch.setattr(registration_service.config, "NO_SHOW_COUNT_SOURCE", "ledger")
+    with pytest.raises(RegistrationError):
+        register_for_session(user_id=uid, session_id=target)
+
+    with get_cursor() as cursor:
+        cursor.execute("SELECT blocked_until FROM `USER` WHERE user_id = %s", (uid,))
+        assert cursor.fetchone()["blocked_until"] is not None
+
+
+@pytest.mark.requires_db
+def test_no_show_sweep_incremental_after_full(db_ready):
+    """第二次 sweep 走增量模式，并记录水位、耗时与影响行数。"""
+    from backend.services.user_penalty_service import run_no_show_sweep
+
+    first = run_no_show_sweep(full=True)
+    assert first["mode"] == "full"
+
+    second = run_no_show_sweep()
+    assert second["mode"] == "incremental"
+    assert second["since"] == first["watermark"]
+    assert second["duration_ms"] >= 0
+
+    with get_cursor() as cursor:
+        cursor.execute("SELECT * FROM JOB_STATE WHERE job_name = 'no_show_sweep'")
+        state = cursor.fetchone()
+    assert state["last_duration_ms"] == second["duration_ms"]
+    assert state["last_rows"] == second["refreshed"] + second["blocked"]
+
+
+@pytest.mark.requires_db
+def test_fulltext_search_chinese_title_and_description(db_ready):
+    """FULLTEXT ngram：中文标题子串与简介都能命中，标题命中更多的活动排在前面。"""
+    from backend.services.search_service import search_events
+
+    strong = create_event_with_session(capacity=5)["eid"]
+    weak = create_event_with_session(capacity=5)["eid"]
+    with get_cursor() as cursor:
+        cursor.execute(
+            "UPDATE EVENT SET title = %s, description = %s WHERE eid = %s",
+            ("数据科学讲座：数据可视化", "面向本科生的数据科学入门", strong),
+        )
+        cursor.execute(
+            "UPDATE EVENT SET title = %s, description = %s WHERE eid = %s",
+            ("周末读书会", "本期话题涉及数据科学", weak),
+        )
+
+    results = search_events(keyword="数据科学", status=["published"])
+    eids = [r["eid"] for r in results]
+    assert strong in eids and weak in eids
+    assert eids.index(strong) < eids.index(weak)
+
+    # 单个汉字短于 ngram_token_size，回退到 LIKE（只查标题 / 地点）
+    assert strong in [r["eid"] for r in search_events(keyword="讲", status=["published"])]
+
+
+@pytest.mark.requires_db
+def test_event_overview_engines_agree_and_paginate(db_ready):
+    """聚合版概览与旧实现的计数一致；报名明细分页不重不漏，registrations=False 时不返回明细。"""
+    created = create_event_with_session(capacity=50)
+    user_ids = insert_users(9)
+    insert_registrations_bulk(created["session_id"], user_ids)
+
+    legacy = get_event_overview(created["eid"], engine="legacy")
+    aggregated = get_event_overview(created["eid"], engine="aggregated")
+    assert aggregated == legacy
+    assert aggregated["total_registrations"] == 9
+    assert aggregated["registered_count"] == 5
+    assert aggregated["checked_in_count"] == 3
+
+    seen = []
+    cursor = None
+    while True:
+        page = get_event_overview(created["eid"], registrations_limit=4, registrations_cursor=cursor)
+        seen.extend(r["user_id"] for r in page["registrations"])
+        cursor = page["registrations_next_cursor"]
+        if cursor is None:
+            break
+        cursor = decode_registration_cursor(cursor)
+    assert sorted(seen) == sorted(user_ids)
+
+    counters_only = get_event_overview(created["eid"], include_registrations=False)
+    assert "registrations" not in counters_only
+    assert counters_only["total_registrations"] == 9
+
+
+@pytest.mark.requires_db
+def test_materialized_stats_follow_write_paths(db_ready, client, auth_header, monkeypatch):
+    """报名 / 候补 / 取消转正 / 签到 / 强制改状态后，物化计数与实时统计一致；被篡改后对账可修正。"""
+    user_ids = insert_users(6)
+    created = create_event_with_session(capacity=2, waiting=5)
+    sid = created["session_id"]
+
+    register_for_session(user_id=user_ids[0], session_id=sid)
+    register_for_session_fast(user_id=user_ids[1], session_id=sid)
+    register_for_session(user_id=user_ids[2], session_id=sid)  # waiting
+    resp = client.post("/api/checkin/", headers=auth_header, json={"user_id": user_ids[0], "session_id": sid})
+    assert resp.status_code == HTTPStatus.OK
+    cancel_registration(user_id=user_ids[0], session_id=sid)  # 签到后取消，候补转正
+    force_set_registration(user_ids[3], sid, "waiting")
+    register_for_session(user_id=user_ids[0], session_id=sid)  # 复用签到过的 cancelled 记录
+
+    def _mismatched():
+        with get_cursor() as cursor:
+            found = find_stats_mismatches(cursor)
+        return sid in found["session_ids"] or created["eid"] in found["eids"]
+
+    assert not _mismatched()
+    live = get_session_stats(sid)
+    monkeypatch.setattr(analytic_service.config, "ANALYTICS_STATS_SOURCE", "materialized")
+    assert get_session_stats(sid) == live
+    assert get_event_overview(created["eid"], include_registrations=False)["checked_in_count"] == live["checked_in_count"]
+
+    with get_cursor() as cursor:
+        cursor.execute("UPDATE SESSION_STATS SET registered_count = 99 WHERE session_id = %s", (sid,))
+    assert _mismatched()
+    result = reconcile_registration_stats(fix=True)
+    assert result["rebuilt_sessions"] >= 1
+    assert not _mismatched()
+    assert get_session_stats(sid) == live
+
+
+@pytest.mark.requires_db
+def test_registration_trend_rollup_matches_live(db_ready, monkeypatch):
+    """写路径维护的小时汇总与实时分组在小时 / 日 / 周粒度上一致（含重新报名挪动报名时间）；被篡改后对账可修正。"""
+    user_ids = insert_users(4)
+    created = create_event_with_session(capacity=2, waiting=5)
+    sid, eid = created["session_id"], created["eid"]
+
+    register_for_session(user_id=user_ids[0], session_id=sid)
+    register_for_session_fast(user_id=user_ids[1], session_id=sid)
+    register_for_session(user_id=user_ids[2], session_id=sid)  # waiting
+    cancel_registration(user_id=user_ids[0], session_id=sid)
+    # 把已取消记录的报名时间挪到三天前并重建汇总，重新报名时应从那个小时扣除
+    with get_cursor() as cursor:
+        cursor.execute(
+            """
+            UPDATE REGISTRATION SET register_time = register_time - INTERVAL 3 DAY
+            WHERE user_id = %s AND session_id = %s
+            """,
+            (user_ids[0], sid),
+        )
+        rebuild_stats(cursor, [eid])
+    register_for_session(user_id=user_ids[0], session_id=sid)
+    force_set_registration(user_ids[3], sid, "waiting")
+    force_set_registration(user_ids[2], sid, "cancelled")
+
+    window = {"start": datetime.now() - timedelta(days=5), "end": datetime.now() + timedelta(days=2)}
+
+    def _trends():
+        return {b: get_registration_trend("event", eid, b, **window) for b in ("hour", "day", "week")}
+
+    live = _trends()
+    assert sum(p["count"] for p in live["day"]["series"]) == 4
+    monkeypatch.setattr(analytic_service.config, "ANALYTICS_TREND_SOURCE", "rollup")
+    assert _trends() == live
+
+    with get_cursor() as cursor:
+        cursor.execute(
+            "UPDATE REGISTRATION_HOURLY SET registration_count = registration_count + 5 WHERE eid = %s",
+            (eid,),
+        )
+        assert eid in find_stats_mismatches(cursor)["rollup_eids"]
+    reconcile_registration_stats(fix=True)
+    assert _trends() == live
+
+    # 总数不变、只错了桶（整体挪后一小时）也能被对账发现
+    with get_cursor() as cursor:
+        cursor.execute(
+            """
+            UPDATE REGISTRATION_HOURLY SET bucket_start = bucket_start + INTERVAL 1 HOUR
+            WHERE eid = %s ORDER BY bucket_start DESC
+            """,
+            (eid,),
+        )
+        assert eid in find_stats_mismatches(cursor)["rollup_eids"]
+    reconcile_registration_stats(fix=True)
+    assert _trends() == live
+
+
+@pytest.mark.requires_db
+def test_snapshot_report_matches_overview_counters(db_ready, tmp_path):
+    """列式快照导出后，快照上的活动报表与数据库上的批量概览计数一致。"""
+    created = create_event_with_session(capacity=50)
+    insert_registrations_bulk(created["session_id"], insert_users(9))
+
+    result = export_snapshot(out_dir=str(tmp_path / "snap"), chunk_rows=4)
+    assert result["rows"]["REGISTRATION"] >= 9
+
+    report = {r["eid"]: r for r in event_registration_report(load_snapshot(result["path"]))}
+    assert report[created["eid"]] == get_event_overview_counters([created["eid"]])[created["eid"]]
+
+
+@pytest.mark.requires_db
+def test_analytics_cube_matches_sql_and_follows_writes(db_ready, monkeypatch):
+    """立方体的群体统计 / 标签概览 / 爽约率 / 趋势与 SQL 版本一致；报名写入、删除用户后 sync 按 version 增量刷新。"""
+    user_ids = insert_users(5)
+    created = create_event_with_session(capacity=3, waiting=5)
+    sid, eid = created["session_id"], created["eid"]
+    for uid in user_ids[:4]:
+        register_for_session(user_id=uid, session_id=sid)
+    with get_cursor() as cursor:
+        cursor.execute("SELECT group_id FROM AUDIENCE_GROUP ORDER BY group_id LIMIT 2")
+        group_ids = [r["group_id"] for r in cursor.fetchall()]
+        cursor.executemany(
+            "INSERT INTO EVENT_USER_GROUP (user_id, eid, group_id) VALUES (%s, %s, %s)",
+            [(uid, eid, group_ids[i % len(group_ids)]) for i, uid in enumerate(user_ids[:3])],
+        )
+        cursor.execute("INSERT IGNORE INTO TAG (tag_name) VALUES ('cube-test')")
+        cursor.execute(
+            "INSERT INTO EVENT_TAG (eid, tag_id) SELECT %s, tag_id FROM TAG WHERE tag_name = 'cube-test'",
+            (eid,),
+        )
+        # 场次挪到过去并给一人签到，让爽约率有值
+        cursor.execute(
+            """
+            UPDATE EVENT_SESSION
+            SET start_time = NOW() - INTERVAL 2 DAY, end_time = NOW() - INTERVAL 1 DAY
+            WHERE session_id = %s
+            """,
+            (sid,),
+        )
+        cursor.execute(
+            "UPDATE REGISTRATION SET checkin_time = NOW() WHERE user_id = %s AND session_id = %s",
+            (user_ids[0], sid),
+        )
+
+    window = {"start": datetime.now() - timedelta(days=2), "end": datetime.now() + timedelta(days=1)}
+
+    def _results():
+        return {
+            "groups": sorted(_load_event_group_stats(eid), key=lambda r: r["group_name"]),
+            "tag": sorted(_load_tag_overview("cube-test"), key=lambda r: r["eid"]),
+            "no_show": get_event_no_show_rates([eid]),
+            "trend": get_registration_trend("event", eid, "hour", **window),
+        }
+
+    sql = _results()
+    assert sql["no_show"][eid]["no_show_count"] == 2
+    monkeypatch.setattr(analytics_cube, "_managed", analytics_cube._ManagedCube(3600, 3600))
+    monkeypatch.setattr(analytics_cube.config, "ANALYTICS_CUBE", True)
+    assert _results() == sql
+
+    # 写入后查询读的仍是上次同步的视图；sync（通常由后台线程执行）只重读 version 变化的场次
+    cancel_registration(user_id=user_ids[1], session_id=sid)
+    register_for_session(user_id=user_ids[4], session_id=sid)
+    assert _results() == sql
+    assert analytics_cube._managed.cube.sync()["changed_sessions"] == 1
+    cube_after = _results()
+    monkeypatch.setattr(analytics_cube.config, "ANALYTICS_CUBE", False)
+    assert cube_after == _results()
+
+    # 删除用户：报名与分组级联删除，delete_user 递增 version，立方体随之更新
+    delete_user(user_ids[0])
+    monkeypatch.setattr(analytics_cube.config, "ANALYTICS_CUBE", True)
+    analytics_cube._managed.cube.sync()
+    cube_after = _results()
+    monkeypatch.setattr(analytics_cube.config, "ANALYTICS_CUBE", False)
+    assert cube_after == _results()
@@ -0,0 +1,155 @@
+"""连接池的单元测试：使用假连接，不依赖真实数据库。"""
+import threading
+import time
+
+import pytest
+
+from backend.db.pool import ConnectionPool, PoolTimeoutError
+
+
+class FakeConn:
+    def __init__(self):
+        self.closed = False
+        self.rollbacks = 0
+        self.pings = 0
+        self.fail_ping = False
+
+    def cursor(self):
+        return object()
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def ping(self, reconnect=False):
+        self.pings += 1
+        if self.fail_ping:
+            raise RuntimeError("gone away")
+
+    def close(self):
+        self.closed = True
+
+
+def _make_pool(**kwargs):
+    created = []
+
+    def creator():
+        conn = FakeConn()
+        created.append(conn)
+        return conn
+
+    kwargs.setdefault("pre_ping_after", 60)
+    return ConnectionPool(creator, **kwargs), created
+
+
+def test_connection_is_reused_after_close():
+    """close() 应归还连接，下次借出复用同一条底层连接。"""
+    pool, created = _make_pool(max_size=2)
+    conn = pool.connect()
+    raw = conn._entry.raw
+    conn.close()
+    conn.close()  # 幂等
+
+    again = pool.connect()
+    assert again._entry.raw is raw
+    assert len(created) == 1
+    stats = pool.stats()
+    assert stats["checked_out"] == 1
+    assert stats["created"] == 1
+
+
+def test_dirty_connection_rolled_back_on_release():
+    """用过 cursor 但未提交的连接，归还时应 rollback。"""
+    pool, created = _make_pool(max_size=1)
+    conn = pool.connect()
+    conn.cursor()
+    conn.close()
+    assert created[0].rollbacks == 1
+
+    conn = pool.connect()
+    conn.cursor()
+    conn.commit()
+    conn.close()
+    assert created[0].rollbacks == 1
+
+
+def test_pool_times_out_when_exhausted():
+    """池满且无人归还时应抛 PoolTimeoutError。"""
+    pool, _ = _make_pool(max_size=1, timeout=0.05)
+    held = pool.connect()
+    with pytest.raises(PoolTimeoutError):
+        pool.connect()
+    held.close()
+
+
+def test_waiter_gets_released_connection():
+    """等待中的线程应在连接归还后拿到连接。"""
+    pool, created = _make_pool(max_size=1, timeout=2)
+    held = pool.connect()
+    got = []
+
+    def worker():
+        c = pool.connect()
+        got.append(c._entry.raw)
+        c.close()
+
+    t = threading.Thread(target=worker)
+    t.start()
+    time.sleep(0.05)
+    assert pool.stats()["waiting"] == 1
+    held.close()
+    t.join(timeout=2)
+    assert got == [created[0]]
+    assert pool.stats()["waiting"] == 0
+
+
+def test_idle_connections_evicted_and_broken_ones_recycled():
+    """空闲过久的连接被淘汰；ping 失败的连接被重建。"""
+    pool, created = _make_pool(max_size=2, max_idle=0.01, pre_ping_after=0)
+    pool.connect().close()
+    time.sleep(0.02)
+    pool.connect().close()
+    assert created[0].closed
+    assert pool.stats()["recycled"] == 1
+
+    pool.max_idle = 0
+    created[1].fail_ping = True
+    conn = pool.connect()
+    assert conn._entry.raw is created[2]
+    assert created[1].closed
+    assert pool.stats()["recycled"] == 2
+    assert pool.stats()["size"] == 1
+
+
+def test_engine_connection_defaults_to_dict_cursor():
+    """共享 engine 连接：cursor() 默认 DictCursor，close() 只归还一次。"""
+    import pymysql
+
+    from backend.db.db import _EngineConnection
+
+    class FakeProxied:
+        def __init__(self):
+            self.cursor_args = []
+            self.closes = 0
+
+        def cursor(self, *args):
+            self.cursor_args.append(args)
+            return object()
+
+        def close(self):
+            self.closes += 1
+
+    proxied = FakeProxied()
+    conn = _EngineConnection(proxied)
+    conn.cursor()
+    conn.cursor(pymysql.cursors.SSCursor)
+    assert proxied.cursor_args == [
+        (pymysql.cursors.DictCursor,),
+        (pymysql.cursors.SSCursor,),
+    ]
+    conn.close()
+    conn.close()
+    assert proxied.closes == 1
+    assert conn.closed
@@ -0,0 +1,79 @@
+"""公开活动接口缓存的单元测试：打桩数据库读取，只验证缓存与失效逻辑。"""
+from backend.services import event_service
+from backend.utils.cache import TTLCache
+
+
+def _install(monkeypatch, seat_ttl=60):
+    calls = {"static": 0, "seats": 0, "published": 0}
+    seats = {10: {"capacity": 5, "current_registered": 1, "status": "open"}}
+
+    def fake_static(eid):
+        calls["static"] += 1
+        if eid != 1:
+            return None
+        return {
+            "event": {"eid": 1, "title": "Expo", "status": "published"},
+            "sessions": [{"session_id": 10, "eid": 1, "waiting_list_limit": 3}],
+        }
+
+    def fake_seats(eid):
+        calls["seats"] += 1
+        return {sid: dict(v) for sid, v in seats.items()}
+
+    def fake_published():
+        calls["published"] += 1
+        return [{"eid": 1, "title": "Expo"}]
+
+    monkeypatch.setattr(event_service, "_fetch_event_static", fake_static)
+    monkeypatch.setattr(event_service, "_fetch_session_seats", fake_seats)
+    monkeypatch.setattr(event_service, "_fetch_published_events", fake_published)
+    monkeypatch.setattr(event_service, "_event_cache", TTLCache(maxsize=16, ttl=60))
+    monkeypatch.setattr(event_service, "_seat_cache", TTLCache(maxsize=16, ttl=seat_ttl))
+    return calls, seats
+
+
+def test_detail_cached_and_invalidated(monkeypatch):
+    """重复读取只查一次；invalidate_event_cache 之后重新加载。"""
+    calls, _ = _install(monkeypatch)
+
+    first = event_service.get_event_detail(1)
+    first["title"] = "mutated"  # 修改返回值不应污染缓存
+    second = event_service.get_event_detail(1)
+    assert second["title"] == "Expo"
+    assert second["sessions"] == [
+        {
+            "session_id": 10,
+            "eid": 1,
+            "waiting_list_limit": 3,
+            "capacity": 5,
+            "current_registered": 1,
+            "status": "open",
+        }
+    ]
+    assert calls["static"] == 1
+    assert calls["seats"] == 1
+
+    event_service.list_published_events()
+    event_service.list_published_events()
+    assert calls["published"] == 1
+
+    event_service.invalidate_event_cache(1)
+    event_service.get_event_detail(1)
+    event_service.list_published_events()
+    assert calls["static"] == 2
+    assert calls["published"] == 2
+
+
+def test_seat_counts_refresh_independently(monkeypatch):
+    """余量层过期后只重新读取余量，不重新读取活动静态信息。"""
+    calls, seats = _install(monkeypatch, seat_ttl=0)
+
+    assert event_service.get_event_sessions(1)[0]["current_registered"] == 1
+    seats[10]["current_registered"] = 4
+    assert event_service.get_event_sessions(1)[0]["current_registered"] == 4
+    assert calls["static"] == 1
+    assert calls["seats"] == 2
+
+    # 不存在的活动：不缓存，返回空列表
+    assert event_service.get_event_sessions(99) == []
+    assert event_service.get_event_detail(99) is None
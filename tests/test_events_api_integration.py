@@ -3,6 +3,8 @@ from http import HTTPStatus
 
 import pytest
 
+from backend.services.search_service import SearchError
+
 
 def test_search_events_stubbed(monkeypatch, client):
     """搜索接口应返回打桩数据并保持 200。"""
@@ -38,6 +40,33 @@ def test_search_events_invalid_limit(client):
     assert body.get("error") == "invalid_request"
 
 
+def test_search_facets_passes_filters(monkeypatch, client):
+    """分面接口与 /search 共用过滤参数解析；SearchError 映射为 400。"""
+    captured = {}
+
+    def _fake_facets(**filters):
+        captured.update(filters)
+        return {"total": 1, "facets": {"tags": {"Art": 1}, "type_id": {"2": 1}, "status": {"published": 1}}}
+
+    monkeypatch.setattr("backend.api.events_api.get_search_facets", _fake_facets)
+
+    resp = client.get("/api/events/search/facets?tag=Art&type_id=2&type_id=x&status=published&q=demo")
+    assert resp.status_code == HTTPStatus.OK
+    assert resp.get_json()["facets"]["tags"] == {"Art": 1}
+    assert captured["tag_names"] == ["Art"]
+    assert captured["type_ids"] == [2]
+    assert captured["status"] == ["published"]
+    assert captured["keyword"] == "demo"
+
+    def _boom(**_):
+        raise SearchError("bad filter")
+
+    monkeypatch.setattr("backend.api.events_api.get_search_facets", _boom)
+    resp = client.get("/api/events/search/facets")
+    assert resp.status_code == HTTPStatus.BAD_REQUEST
+    assert resp.get_json()["error"] == "search_error"
+
+
 def test_create_event_requires_auth(client):
     """缺少 Authorization 时应返回 401。"""
     resp = client.post("/api/events/", json={"title": "No Auth"})
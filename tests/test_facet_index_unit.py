@@ -0,0 +1,177 @@
+"""进程内分面索引的单元测试：直接喂入查询结果，不依赖数据库。"""
+import random
+from datetime import datetime, timedelta
+from time import perf_counter
+
+import pytest
+
+from backend.services import admin_service, facet_index
+from backend.services.facet_index import FacetIndex
+
+BASE = datetime(2025, 1, 1)
+
+
+def _rows(total, seed=7):
+    rnd = random.Random(seed)
+    events, tags, sessions = [], [], []
+    sid = 0
+    for eid in range(1, total + 1):
+        events.append(
+            {
+                "eid": eid,
+                "type_id": rnd.choice([1, 2, 3]),
+                "status": rnd.choice(["published", "published", "draft", "closed"]),
+                "created_at": BASE + timedelta(minutes=eid // 3),
+            }
+        )
+        for name in rnd.sample(["Art", "Tech", "Music", "Sport"], rnd.randint(0, 2)):
+            tags.append({"eid": eid, "tag_name": name})
+        for _ in range(rnd.randint(0, 2)):
+            sid += 1
+            start = BASE + timedelta(hours=rnd.randint(0, 24 * 60))
+            sessions.append({"session_id": sid, "eid": eid, "start_time": start, "end_time": start + timedelta(hours=2)})
+    return events, tags, sessions
+
+
+def _brute_force(events, tags, sessions, *, tag_names=None, type_ids=None, status=None, start_dt=None, end_dt=None):
+    tags_by = {}
+    for t in tags:
+        tags_by.setdefault(t["eid"], set()).add(t["tag_name"])
+    out = []
+    for e in events:
+        ok_sessions = [
+            s for s in sessions
+            if s["eid"] == e["eid"]
+            and (start_dt is None or s["start_time"] >= start_dt)
+            and (end_dt is None or s["end_time"] <= end_dt)
+        ]
+        if not ok_sessions:
+            continue
+        if tag_names and not (tags_by.get(e["eid"], set()) & set(tag_names)):
+            continue
+        if type_ids and e["type_id"] not in type_ids:
+            continue
+        if status and e["status"] not in status:
+            continue
+        out.append(e)
+    out.sort(key=lambda e: (e["created_at"], e["eid"]), reverse=True)
+    return [e["eid"] for e in out]
+
+
+def test_match_and_page_agree_with_brute_force():
+    """过滤语义（维度内 OR、维度间 AND、时间窗）与分页顺序和数据库路径一致。"""
+    events, tags, sessions = _rows(400)
+    index = FacetIndex()
+    index.load(events, tags, sessions)
+    filters = {
+        "tag_names": ["Art", "Music"],
+        "status": ["published"],
+        "start_dt": BASE + timedelta(days=10),
+        "end_dt": BASE + timedelta(days=40),
+    }
+    expected = _brute_force(events, tags, sessions, **filters)
+    bits = index.match(**filters)
+    assert bits.bit_count() == len(expected)
+    assert index.page(bits, 10) == expected[:10]
+    assert index.page(bits, 10, offset=5) == expected[5:15]
+
+    by_eid = {e["eid"]: e for e in events}
+    last = by_eid[expected[9]]
+    assert index.page(bits, 10, cursor=(last["created_at"], last["eid"])) == expected[10:20]
+
+    facets = index.facets(bits)
+    assert facets["status"] == {"published": len(expected)}
+    assert sum(facets["type_id"].values()) == len(expected)
+    assert set(facets["tags"]) <= {"Art", "Tech", "Music", "Sport"}
+
+
+def test_replace_event_updates_bitmaps_and_order():
+    """增量更新：改标签 / 状态、删除活动后查询结果随之变化。"""
+    index = FacetIndex()
+    index.load(
+        [{"eid": 1, "type_id": 1, "status": "published", "created_at": BASE}],
+        [{"eid": 1, "tag_name": "Art"}],
+        [{"session_id": 1, "eid": 1, "start_time": BASE, "end_time": BASE + timedelta(hours=1)}],
+    )
+    assert index.page(index.match(tag_names=["Art"]), 10) == [1]
+
+    index.replace_event(
+        2,
+        {
+            "created_at": BASE + timedelta(days=1),
+            "type_id": 2,
+            "status": "published",
+            "tags": ["Art", "Tech"],
+            "sessions": [(BASE + timedelta(days=2), BASE + timedelta(days=2, hours=1), 2)],
+        },
+    )
+    index.replace_event(
+        1,
+        {"created_at": BASE, "type_id": 1, "status": "closed", "tags": ["Tech"], "sessions": [(BASE, BASE + timedelta(hours=1), 1)]},
+    )
+    assert index.page(index.match(tag_names=["Art"]), 10) == [2]
+    assert index.page(index.match(tag_names=["Tech"]), 10) == [2, 1]
+    assert index.facets(index.match())["status"] == {"published": 1, "closed": 1}
+
+    index.replace_event(2, None)
+    assert index.page(index.match(), 10) == [1]
+    assert index.match(start_dt=BASE + timedelta(days=1)) == 0
+
+
+@pytest.mark.perf
+def test_facet_index_query_speed():
+    """10 万活动下，多维过滤 + 分页 + 分面计数应在毫秒级完成。"""
+    events, tags, sessions = _rows(100000, seed=11)
+    index = FacetIndex()
+    index.load(events, tags, sessions)
+
+    start = perf_counter()
+    bits = index.match(tag_names=["Art"], type_ids=[1, 2], status=["published"])
+    page = index.page(bits, 50)
+    facets = index.facets(bits)
+    elapsed = perf_counter() - start
+    assert len(page) == 50
+    assert facets["status"] == {"published": bits.bit_count()}
+    assert elapsed < 0.05
+
+
+class _FakeTagConnection:
+    def cursor(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        pass
+
+    def fetchone(self):
+        return {"tag_id": 3}
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_tag_rename_and_delete_mark_index_stale(monkeypatch):
+    """标签改名 / 删除提交后，本进程的索引在下次查询时整体重建。"""
+    managed = facet_index._ManagedIndex(refresh_seconds=3600)
+    managed._loaded_at = 0.0
+    monkeypatch.setattr(facet_index, "_managed", managed)
+    monkeypatch.setattr(facet_index.config, "SEARCH_FACET_INDEX", True)
+    monkeypatch.setattr(admin_service, "get_connection", _FakeTagConnection)
+
+    admin_service.update_tag(3, "Renamed")
+    assert managed._loaded_at == float("-inf")
+
+    managed._loaded_at = 0.0
+    admin_service.delete_tag(3)
+    assert managed._loaded_at == float("-inf")
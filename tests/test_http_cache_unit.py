@@ -0,0 +1,57 @@
+"""条件 GET（ETag / If-None-Match）的单元测试：打桩版本查询，不依赖数据库。"""
+from backend.api import registration_api
+from backend.services import event_service
+from backend.utils.cache import TTLCache
+
+
+def test_event_detail_returns_304_until_session_version_changes(client, monkeypatch):
+    """ETag 取自缓存中的 updated_at + 场次 version；version 变化后返回 200 和新 ETag。"""
+    seats = {10: {"capacity": 5, "current_registered": 1, "status": "open", "version": 3}}
+    monkeypatch.setattr(
+        event_service,
+        "_fetch_event_static",
+        lambda eid: {
+            "event": {"eid": 1, "title": "Expo", "updated_at": None},
+            "sessions": [{"session_id": 10, "eid": 1}],
+        },
+    )
+    monkeypatch.setattr(event_service, "_fetch_session_seats", lambda eid: {k: dict(v) for k, v in seats.items()})
+    monkeypatch.setattr(event_service, "_event_cache", TTLCache(maxsize=16, ttl=60))
+    monkeypatch.setattr(event_service, "_seat_cache", TTLCache(maxsize=16, ttl=0))
+
+    first = client.get("/api/events/1/detail")
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    assert first.headers["Cache-Control"] == "no-cache"
+
+    again = client.get("/api/events/1/detail", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.data == b""
+
+    seats[10].update(current_registered=2, version=4)
+    changed = client.get("/api/events/1/detail", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert changed.get_json()["sessions"][0]["current_registered"] == 2
+
+
+def test_session_registrations_skip_list_query_on_304(client, monkeypatch):
+    """场次 version 未变时只执行版本查询，不加载报名列表。"""
+    loads = []
+    version = {"value": 7}
+    monkeypatch.setattr(registration_api, "get_session_version", lambda sid: version["value"])
+
+    def fake_load(session_id):
+        loads.append(session_id)
+        return [{"user_id": 1, "session_id": session_id, "status": "registered"}]
+
+    monkeypatch.setattr(registration_api, "_load_session_registrations", fake_load)
+
+    first = client.get("/api/registrations/session/5")
+    etag = first.headers["ETag"]
+    assert client.get("/api/registrations/session/5", headers={"If-None-Match": etag}).status_code == 304
+    assert loads == [5]
+
+    version["value"] = 8
+    assert client.get("/api/registrations/session/5", headers={"If-None-Match": etag}).status_code == 200
+    assert loads == [5, 5]
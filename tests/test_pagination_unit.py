@@ -0,0 +1,58 @@
+"""游标分页辅助函数与活动列表分页参数的单元测试（不依赖数据库）。"""
+from datetime import datetime
+
+import pytest
+
+from backend.utils.pagination import (
+    CursorError,
+    decode_cursor,
+    decode_registration_cursor,
+    encode_cursor,
+    encode_registration_cursor,
+    next_cursor,
+    parse_limit,
+)
+
+
+def test_cursor_round_trip_and_invalid_input():
+    """游标可往返编码；空值表示第一页；篡改后的游标抛 CursorError。"""
+    ts = datetime(2025, 12, 1, 9, 30)
+    token = encode_cursor(ts, 42)
+    assert decode_cursor(token) == (ts, 42)
+    assert decode_cursor(encode_cursor(ts.isoformat(), 42)) == (ts, 42)
+    assert decode_cursor("") is None
+    with pytest.raises(CursorError):
+        decode_cursor("not-a-cursor")
+
+    assert parse_limit(None) == 50
+    assert parse_limit("1000") == 100
+    rows = [{"eid": 3, "created_at": ts}, {"eid": 2, "created_at": ts}]
+    assert next_cursor(rows, 3) is None
+    assert decode_cursor(next_cursor(rows, 2)) == (ts, 2)
+
+    assert decode_registration_cursor(encode_registration_cursor(7, 1001)) == (7, 1001)
+    assert decode_registration_cursor(None) is None
+    with pytest.raises(CursorError):
+        decode_registration_cursor(token)
+
+
+def test_list_events_pages_with_header(client, monkeypatch):
+    """带 limit 时走分页查询，下一页游标放在 X-Next-Cursor；非法游标返回 400。"""
+    ts = datetime(2025, 12, 1, 9, 30)
+    calls = []
+
+    def fake_page(limit, cursor):
+        calls.append((limit, cursor))
+        return [{"eid": 9, "created_at": ts, "updated_at": ts}, {"eid": 8, "created_at": ts, "updated_at": ts}]
+
+    monkeypatch.setattr("backend.api.events_api.list_published_events_page", fake_page)
+
+    resp = client.get("/api/events/?limit=2")
+    assert resp.status_code == 200
+    assert [r["eid"] for r in resp.get_json()] == [9, 8]
+    token = resp.headers["X-Next-Cursor"]
+
+    client.get(f"/api/events/?limit=2&cursor={token}")
+    assert calls == [(2, None), (2, (ts, 8))]
+
+    assert client.get("/api/events/?cursor=bogus").status_code == 400
@@ -1,12 +1,46 @@
 """查询效率与可扩展性简单基准。
 中文注释描述性能阈值。
 """
+import os
+import statistics
+from datetime import datetime, timedelta
 from time import perf_counter
 
 import pytest
 
-from backend.services import search_service
-from backend.services.analytic_service import get_event_overview
+from backend.db import get_cursor
+from backend.api.analytics_api import _load_event_group_stats
+from backend.services import analytic_service, analytics_cube, search_service
+from backend.services.analytic_service import get_event_no_show_rates, get_event_overview, get_registration_trend
+from backend.services.calendar_service import sessions_overlapping, sessions_within, upcoming_sessions
+from backend.services.event_service import list_published_events_page
+from backend.services.stats_service import rebuild_stats
+from tests.db_utils import (
+    create_event_with_session,
+    insert_dense_sessions,
+    insert_events_bulk,
+    insert_registrations_bulk,
+    insert_users_bulk,
+)
+
+
+# 对比类基准：每种实现跑 PERF_RUNS 次取中位数，允许 PERF_TOLERANCE 倍的抖动
+PERF_RUNS = int(os.getenv("PERF_RUNS", 5))
+PERF_TOLERANCE = float(os.getenv("PERF_TOLERANCE", 1.2))
+
+
+def _median_timed(fn):
+    """重复调用 fn PERF_RUNS 次，返回（最后一次的结果, 耗时中位数）。"""
+    elapsed = []
+    for _ in range(PERF_RUNS):
+        start = perf_counter()
+        result = fn()
+        elapsed.append(perf_counter() - start)
+    return result, statistics.median(elapsed)
+
+
+def _describe(label, timings):
+    return f"{label}: " + ", ".join(f"{k}={v:.4f}s" for k, v in timings.items())
 
 
 @pytest.mark.requires_db
@@ -29,3 +63,221 @@ def test_analytics_overview_perf(db_ready):
     elapsed = perf_counter() - start
     assert data.get("eid") == 1
     assert elapsed < 1.0
+
+
+@pytest.mark.requires_db
+@pytest.mark.perf
+def test_overview_aggregated_vs_legacy(db_ready):
+    """大场次下，只取计数的聚合版概览与旧实现结果一致，且不慢于旧实现（中位数，留容差）。"""
+    total = int(os.getenv("OVERVIEW_BENCH_REGISTRATIONS", 50000))
+    created = create_event_with_session(capacity=total)
+    insert_registrations_bulk(created["session_id"], insert_users_bulk(total, prefix="overview_bench"))
+
+    timings = {}
+    results = {}
+    for engine in ("legacy", "aggregated"):
+        results[engine], timings[engine] = _median_timed(
+            lambda: get_event_overview(created["eid"], include_registrations=False, engine=engine)
+        )
+
+    assert results["aggregated"] == results["legacy"]
+    assert timings["aggregated"] <= timings["legacy"] * PERF_TOLERANCE, _describe(
+        f"overview over {total} registrations", timings
+    )
+
+
+@pytest.mark.requires_db
+@pytest.mark.perf
+def test_trend_rollup_vs_live(db_ready, monkeypatch):
+    """一年跨度的按日趋势：小时汇总与实时分组结果一致，且汇总版不慢于实时分组（中位数，留容差）。"""
+    total = int(os.getenv("TREND_BENCH_REGISTRATIONS", 50000))
+    created = create_event_with_session(capacity=total)
+    # 每 10 分钟一条，约覆盖一年
+    insert_registrations_bulk(created["session_id"], insert_users_bulk(total, prefix="trend_bench"), step_minutes=10)
+    with get_cursor() as cursor:
+        rebuild_stats(cursor, [created["eid"]])
+
+    window = {"start": datetime.now() - timedelta(days=366), "end": datetime.now() + timedelta(days=1)}
+    timings = {}
+    results = {}
+    for source in ("live", "rollup"):
+        monkeypatch.setattr(analytic_service.config, "ANALYTICS_TREND_SOURCE", source)
+        results[source], timings[source] = _median_timed(
+            lambda: get_registration_trend("event", created["eid"], "day", **window)
+        )
+
+    assert results["rollup"] == results["live"]
+    assert sum(p["count"] for p in results["rollup"]["series"]) == total
+    assert timings["rollup"] <= timings["live"] * PERF_TOLERANCE, _describe(
+        f"daily trend over {total} registrations", timings
+    )
+
+
+@pytest.mark.requires_db
+@pytest.mark.perf
+def test_analytics_cube_vs_sql(db_ready, monkeypatch):
+    """
+    群体统计 / 爽约率 / 按周趋势：立方体与 SQL 结果一致，加载后的查询（中位数，留容差）不慢于 SQL。
+    默认 20 万条报名；CUBE_BENCH_REGISTRATIONS=10000000 跑千万级基准。
+    """
+    total = int(os.getenv("CUBE_BENCH_REGISTRATIONS", 200000))
+    created = create_event_with_session(capacity=total)
+    sid, eid = created["session_id"], created["eid"]
+    # 每分钟一条（千万级约跨 19 年，按周分桶不超过 ANALYTICS_TREND_MAX_BUCKETS），按用户号奇偶分到两个群体，场次挪到过去并让约一半人签到
+    insert_registrations_bulk(sid, insert_users_bulk(total, prefix="cube_bench"), step_minutes=1)
+    with get_cursor() as cursor:
+        cursor.execute("SELECT group_id FROM AUDIENCE_GROUP ORDER BY group_id LIMIT 2")
+        group_ids = [r["group_id"] for r in cursor.fetchall()]
+        cursor.execute(
+            """
+            INSERT INTO EVENT_USER_GROUP (user_id, eid, group_id)
+            SELECT user_id, %s, IF(user_id %% 2 = 0, %s, %s) FROM REGISTRATION WHERE session_id = %s
+            """,
+            (eid, group_ids[0], group_ids[-1], sid),
+        )
+        cursor.execute(
+            "UPDATE REGISTRATION SET checkin_time = register_time WHERE session_id = %s AND user_id %% 3 = 0",
+            (sid,),
+        )
+        cursor.execute(
+            "UPDATE EVENT_SESSION SET end_time = NOW() - INTERVAL 1 DAY WHERE session_id = %s",
+            (sid,),
+        )
+
+    window = {"start": datetime.now() - timedelta(days=total // 1440 + 2), "end": datetime.now() + timedelta(days=1)}
+
+    def _run():
+        return {
+            "groups": sorted(_load_event_group_stats(eid), key=lambda r: r["group_name"]),
+            "no_show": get_event_no_show_rates([eid]),
+            "trend": get_registration_trend("event", eid, "week", **window),
+        }
+
+    sql, sql_elapsed = _median_timed(_run)
+
+    managed = analytics_cube._ManagedCube(3600, 3600)
+    start = perf_counter()
+    managed.reload()
+    load_elapsed = perf_counter() - start
+    monkeypatch.setattr(analytics_cube, "_managed", managed)
+    monkeypatch.setattr(analytics_cube.config, "ANALYTICS_CUBE", True)
+    cube, cube_elapsed = _median_timed(_run)
+    detail = _describe(
+        f"cube vs sql over {total} registrations",
+        {"sql": sql_elapsed, "cube": cube_elapsed, "initial_load": load_elapsed},
+    )
+
+    assert cube == sql
+    assert sum(p["count"] for p in cube["trend"]["series"]) == total
+    assert cube_elapsed <= sql_elapsed * PERF_TOLERANCE, detail
+
+
+@pytest.mark.requires_db
+@pytest.mark.perf
+def test_keyset_pagination_deep_page_is_flat(db_ready):
+    """游标分页：第 1 页与约第 5000 页（末尾附近）的耗时应处于同一量级，且分页不重不漏。"""
+    limit = 20
+    total = int(os.getenv("EVENT_PAGE_BENCH_EVENTS", 100000))
+    insert_events_bulk(total)
+
+    # 取倒数第 limit+1 行作为深页游标（按 created_at DESC, eid DESC 排在最后一页之前）
+    with get_cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT created_at, eid FROM EVENT
+            WHERE status = 'published'
+            ORDER BY created_at ASC, eid ASC
+            LIMIT 1 OFFSET %s
+            """,
+            (limit,),
+        )
+        row = cursor.fetchone()
+    deep_cursor = (row["created_at"], row["eid"])
+
+    def timed(cursor_value):
+        best = None
+        for _ in range(3):
+            start = perf_counter()
+            rows = list_published_events_page(limit, cursor_value)
+            elapsed = perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return rows, best
+
+    first_rows, first_elapsed = timed(None)
+    deep_rows, deep_elapsed = timed(deep_cursor)
+    assert len(first_rows) == limit
+    assert len(deep_rows) == limit
+    assert deep_elapsed < max(first_elapsed * 5, 0.05)
+
+    # 相邻两页衔接：第二页第一行紧接第一页最后一行，不重复
+    last = first_rows[-1]
+    second = list_published_events_page(limit, (last["created_at"], last["eid"]))
+    assert {r["eid"] for r in first_rows}.isdisjoint(r["eid"] for r in second)
+
+
+@pytest.mark.requires_db
+@pytest.mark.perf
+def test_two_phase_search_vs_joined(db_ready):
+    """两阶段搜索与旧的 JOIN 分页返回相同的活动顺序，且在大数据量下不慢于旧实现（中位数，留容差）。"""
+    total = int(os.getenv("SEARCH_BENCH_EVENTS", 100000))
+    insert_events_bulk(total, prefix="SearchBench", sessions_per_event=3, tag_name="BenchTag")
+    filters = {"tag_names": ["BenchTag"], "status": ["published"], "limit": 50}
+
+    timings = {}
+    results = {}
+    for strategy in ("joined", "two_phase"):
+        results[strategy], timings[strategy] = _median_timed(
+            lambda: search_service.search_events(strategy=strategy, **filters)
+        )
+
+    assert [r["eid"] for r in results["two_phase"]] == [r["eid"] for r in results["joined"]]
+    assert all(len(r["sessions"]) == 3 for r in results["two_phase"])
+    assert timings["two_phase"] <= timings["joined"] * PERF_TOLERANCE, _describe(f"search over {total} events", timings)
+
+
+@pytest.mark.requires_db
+@pytest.mark.perf
+def test_calendar_window_queries_over_dense_year(db_ready):
+    """一年密集排期下，日历三类查询与朴素 SQL 结果一致，且单次查询（中位数）在 CALENDAR_BENCH_MAX_SECONDS 内。"""
+    per_day = int(os.getenv("CALENDAR_BENCH_SESSIONS_PER_DAY", 300))
+    max_seconds = float(os.getenv("CALENDAR_BENCH_MAX_SECONDS", 0.5))
+    insert_dense_sessions(365, per_day)
+    week_start = datetime(2025, 6, 2)
+    week_end = week_start + timedelta(days=7)
+
+    def naive(where, params):
+        with get_cursor() as cursor:
+            start = perf_counter()
+            cursor.execute(
+                f"""
+                SELECT s.session_id FROM EVENT_SESSION s
+                IGNORE INDEX (idx_session_start_end)
+                JOIN EVENT e ON e.eid = s.eid
+                WHERE {where} AND e.status = 'published'
+                ORDER BY s.start_time, s.session_id
+                """,
+                params,
+            )
+            ids = [r["session_id"] for r in cursor.fetchall()]
+            return ids, perf_counter() - start
+
+    timings = {}
+    overlap, timings["overlap"] = _median_timed(lambda: sessions_overlapping(week_start, week_end))
+    expected, timings["overlap_naive"] = naive(
+        "s.start_time < %s AND s.end_time > %s", (week_end, week_start)
+    )
+    assert [r["session_id"] for r in overlap] == expected
+
+    within, timings["within"] = _median_timed(lambda: sessions_within(week_start, week_end))
+    expected, timings["within_naive"] = naive(
+        "s.start_time >= %s AND s.end_time <= %s", (week_start, week_end)
+    )
+    assert [r["session_id"] for r in within] == expected
+
+    upcoming, timings["upcoming"] = _median_timed(lambda: upcoming_sessions(20, after=week_start))
+    assert len(upcoming) == 20
+    assert all(r["start_time"] >= week_start for r in upcoming)
+
+    assert max(timings["overlap"], timings["within"], timings["upcoming"]) < max_seconds, _describe(
+        f"calendar over {365 * per_day} sessions", timings
+    )
@@ -33,3 +33,60 @@ def test_search_events_wraps_errors(monkeypatch):
         search_service.search_events()
 
     assert "query failed" in str(exc.value)
+
+
+def test_search_events_rejects_unknown_strategy():
+    """未知的 strategy 应直接抛 SearchError，不访问数据库。"""
+    with pytest.raises(search_service.SearchError):
+        search_service.search_events(strategy="bogus")
+
+
+def test_keyword_filter_uses_fulltext_or_falls_back(monkeypatch):
+    """fulltext 模式生成 MATCH ... AGAINST 布尔短语；过短关键词与 like 模式回退到 LIKE。"""
+    from sqlalchemy.dialects import mysql
+
+    def render(expr):
+        return str(expr.compile(dialect=mysql.dialect(), compile_kwargs={"literal_binds": True}))
+
+    monkeypatch.setattr(search_service.config, "SEARCH_KEYWORD_MODE", "fulltext")
+    sql = render(search_service._keyword_filter('数据 "科学"'))
+    assert "MATCH (`EVENT`.title, `EVENT`.location, `EVENT`.description)" in sql
+    assert "+\"数据\" +\"科学\"" in sql and "IN BOOLEAN MODE" in sql
+    assert "LIKE" in render(search_service._keyword_filter("讲"))
+    assert search_service.resolve_sort("数据", None, strategy="two_phase") == "relevance"
+    assert search_service.resolve_sort("数据", None, strategy="joined") == "created_at"
+
+    monkeypatch.setattr(search_service.config, "SEARCH_KEYWORD_MODE", "like")
+    assert "LIKE" in render(search_service._keyword_filter("数据"))
+    with pytest.raises(search_service.SearchError):
+        search_service.resolve_sort("数据", None, sort="relevance")
+
+
+def test_facets_from_db_is_one_grouped_query():
+    """分面计数编译为一条语句：过滤结果作为 CTE，三个维度的分组计数 UNION ALL。"""
+    from sqlalchemy.dialects import mysql
+
+    class CapturingSession:
+        statement = None
+
+        def query(self, *entities):
+            from sqlalchemy.orm import Query
+            return Query(entities)
+
+        def execute(self, stmt):
+            CapturingSession.statement = stmt
+            return []
+
+    result = search_service._facets_from_db(
+        CapturingSession(),
+        tag_names=["Art"],
+        type_ids=None,
+        status=["published"],
+        start_dt=None,
+        end_dt=None,
+        keyword=None,
+    )
+    sql = str(CapturingSession.statement.compile(dialect=mysql.dialect()))
+    assert sql.count("WITH matched") == 1
+    assert sql.count("UNION ALL") >= 2
+    assert result == {"total": 0, "facets": {"tags": {}, "type_id": {}, "status": {}}}
@@ -0,0 +1,149 @@
+"""snapshot_service 列式快照导出 / 读取 / 报表的单元测试（打桩连接，不依赖数据库）。"""
+import json
+import os
+import re
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from backend.services import snapshot_service
+from backend.services.snapshot_service import (
+    SnapshotError,
+    event_registration_report,
+    export_snapshot,
+    load_snapshot,
+)
+
+T0 = datetime(2025, 12, 1, 9, 30)
+
+TABLE_ROWS = {
+    "EVENT": [
+        (1, None, 2, "讲座", "A101", "published", T0),
+        (2, 5, 3, "工作坊", "B202", "draft", T0),
+        (3, 5, 3, "讲座", "A101", "published", T0),
+    ],
+    "EVENT_SESSION": [
+        (10, 1, T0, T0, 50, 2, 1, 5, "open"),
+        (11, 1, T0, T0, 50, 0, 0, 0, "closed"),
+        (20, 2, T0, T0, 10, 1, 0, 0, "open"),
+    ],
+    "REGISTRATION": [
+        (100, 10, T0, "registered", T0, None),
+        (100, 20, T0, "cancelled", T0, None),
+        (101, 10, T0, "registered", None, None),
+        (102, 10, T0, "waiting", None, 1),
+        (103, 11, T0, "cancelled", None, None),
+    ],
+    "EVENT_USER_GROUP": [(100, 1, 7), (101, 1, 8)],
+}
+
+
+class FakeCursor:
+    def __init__(self, conn, streaming):
+        self.conn = conn
+        self.streaming = streaming
+        self._rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        self.conn.statements.append(" ".join(sql.split()))
+        m = re.search(r"FROM (\w+)", sql)
+        if m:
+            self._rows = list(self.conn.tables[m.group(1)])
+            self._table = m.group(1)
+
+    def fetchone(self):
+        return {"n": len(self._rows)}
+
+    def fetchmany(self, size):
+        assert self.streaming, "全表读取必须走服务端游标"
+        chunk, self._rows = self._rows[:size], self._rows[size:]
+        if chunk:
+            self.conn.chunks.append((self._table, len(chunk)))
+        return chunk
+
+
+class FakeConnection:
+    def __init__(self, tables):
+        self.tables = tables
+        self.statements = []
+        self.chunks = []
+
+    def cursor(self, cursorclass=None):
+        return FakeCursor(self, streaming=cursorclass is not None)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def fake_conn(monkeypatch):
+    conn = FakeConnection(TABLE_ROWS)
+    monkeypatch.setattr(snapshot_service, "get_connection", lambda: conn)
+    return conn
+
+
+def test_export_streams_in_chunks_and_round_trips(fake_conn, tmp_path):
+    """按 chunk_rows 分批读取写入 .npy；字符串列字典编码，NULL 为 -1 / NaT；读取后与源数据一致。"""
+    out = tmp_path / "snap"
+    result = export_snapshot(out_dir=str(out), chunk_rows=2)
+
+    assert result["rows"] == {"EVENT": 3, "EVENT_SESSION": 3, "REGISTRATION": 5, "EVENT_USER_GROUP": 2}
+    assert ("REGISTRATION", 2) in fake_conn.chunks and ("REGISTRATION", 1) in fake_conn.chunks
+    assert "START TRANSACTION WITH CONSISTENT SNAPSHOT" in fake_conn.statements
+    assert not os.path.exists(str(out) + ".tmp")
+
+    snap = load_snapshot(str(out))
+    titles = snap.column("EVENT", "title")
+    assert titles.dtype == np.int32
+    assert snap.dictionary("EVENT", "title") == ["讲座", "工作坊"]
+    assert snap.decode("EVENT", "title", titles) == ["讲座", "工作坊", "讲座"]
+    assert list(snap.column("EVENT", "org_id")) == [-1, 5, 5]
+    checkin = snap.column("REGISTRATION", "checkin_time")
+    assert checkin.dtype == np.dtype("datetime64[s]")
+    assert np.isnat(checkin).tolist() == [False, False, True, True, True]
+    assert snap.column("REGISTRATION", "register_time")[0] == np.datetime64(T0, "s")
+
+    with open(out / "manifest.json", encoding="utf-8") as f:
+        manifest = json.load(f)
+    assert manifest["tables"]["REGISTRATION"]["columns"]["status"]["encoding"] == "dictionary"
+
+
+def test_event_report_matches_source_counts(fake_conn, tmp_path):
+    """快照上的活动报表：场次数、各状态报名数、签到数（含取消后保留的签到）。"""
+    export_snapshot(out_dir=str(tmp_path / "snap"), chunk_rows=4)
+    report = {r["eid"]: r for r in event_registration_report(load_snapshot(str(tmp_path / "snap")))}
+
+    assert report[1] == {
+        "eid": 1,
+        "title": "讲座",
+        "status": "published",
+        "session_count": 2,
+        "total_registrations": 4,
+        "registered_count": 2,
+        "waiting_count": 1,
+        "cancelled_count": 1,
+        "checked_in_count": 1,
+    }
+    assert report[2]["cancelled_count"] == 1 and report[2]["checked_in_count"] == 1
+    assert report[3]["session_count"] == 0 and report[3]["total_registrations"] == 0
+
+
+def test_export_refuses_existing_directory_and_unknown_tables(fake_conn, tmp_path):
+    """目标目录已存在或表名未知时报错，不覆盖已有快照。"""
+    with pytest.raises(SnapshotError):
+        export_snapshot(out_dir=str(tmp_path), chunk_rows=2)
+    with pytest.raises(SnapshotError):
+        export_snapshot(out_dir=str(tmp_path / "x"), tables=["USER"])
@@ -0,0 +1,90 @@
+"""stats_service 增量计算的单元测试（打桩 cursor，不依赖数据库）。"""
+from datetime import datetime, timezone
+
+from backend.services.stats_service import RegistrationChange, record_registration_changes
+
+
+class RecordingCursor:
+    """记录执行的 SQL；查询 EVENT_SESSION 时按 eids 映射返回 session_id -> eid。"""
+
+    def __init__(self, eids):
+        self.eids = eids
+        self.statements = []
+        self._rows = []
+
+    def execute(self, sql, params=None):
+        self.statements.append((" ".join(sql.split()), list(params or [])))
+        if "FROM EVENT_SESSION" in sql:
+            self._rows = [{"session_id": sid, "eid": self.eids[sid]} for sid in params if sid in self.eids]
+
+    def fetchall(self):
+        return self._rows
+
+
+def test_changes_fold_into_per_session_and_per_event_deltas():
+    """同一活动两个场次的变化合并为一行 EVENT_STATS 增量；净变化为 0 的场次不写入。"""
+    cursor = RecordingCursor({10: 1, 11: 1, 12: 2})
+    record_registration_changes(
+        cursor,
+        [
+            RegistrationChange(10, None, "registered"),
+            RegistrationChange(10, "waiting", "registered"),
+            RegistrationChange(11, "registered", "cancelled", True, True),
+            RegistrationChange(12, None, "waiting"),
+            RegistrationChange(12, "waiting", None),
+        ],
+    )
+    lookup, session_upsert, event_upsert = cursor.statements
+    assert lookup[1] == [10, 11]
+    assert session_upsert[0].startswith("INSERT INTO SESSION_STATS")
+    # (session_id, eid, registered, waiting, cancelled, checked_in, updated_at)
+    assert session_upsert[1][:6] == [10, 1, 2, -1, 0, 0]
+    assert session_upsert[1][7:13] == [11, 1, -1, 0, 1, 0]
+    assert event_upsert[0].startswith("INSERT INTO EVENT_STATS")
+    assert event_upsert[1][:5] == [1, 1, -1, 1, 0]
+    assert "registered_count = registered_count + VALUES(registered_count)" in event_upsert[0]
+
+
+def test_no_net_change_skips_writes():
+    """重新签到等净变化为 0 的操作不访问数据库。"""
+    cursor = RecordingCursor({10: 1})
+    record_registration_changes(cursor, [RegistrationChange(10, "registered", "registered", True, True)])
+    assert cursor.statements == []
+
+
+def test_register_time_moves_fold_into_hourly_deltas():
+    """重新报名在旧报名时间所在小时减 1、新时间所在小时加 1；状态计数与小时增量分别写入。"""
+    cursor = RecordingCursor({10: 1, 11: 1})
+    old_time = datetime(2025, 12, 1, 9, 45)
+    new_time = datetime(2025, 12, 3, 14, 5, tzinfo=timezone.utc)
+    record_registration_changes(
+        cursor,
+        [
+            RegistrationChange(10, "cancelled", "registered", old_register_time=old_time, new_register_time=new_time),
+            RegistrationChange(11, None, "waiting", new_register_time=new_time.replace(minute=30)),
+        ],
+    )
+    lookup, _, _, hourly_upsert = cursor.statements
+    assert lookup[1] == [10, 11]
+    assert hourly_upsert[0].startswith("INSERT INTO REGISTRATION_HOURLY")
+    # (eid, bucket_start, delta, updated_at)，同一活动同一小时合并
+    assert hourly_upsert[1][:3] == [1, datetime(2025, 12, 1, 9), -1]
+    assert hourly_upsert[1][4:7] == [1, datetime(2025, 12, 3, 14), 2]
+
+
+def test_same_hour_move_without_status_change_skips_writes():
+    """register_time 在同一小时内变化且状态不变时不写库。"""
+    cursor = RecordingCursor({10: 1})
+    record_registration_changes(
+        cursor,
+        [
+            RegistrationChange(
+                10,
+                "registered",
+                "registered",
+                old_register_time=datetime(2025, 12, 1, 9, 5),
+                new_register_time=datetime(2025, 12, 1, 9, 50),
+            )
+        ],
+    )
+    assert cursor.statements == []